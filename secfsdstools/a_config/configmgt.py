@@ -171,7 +171,24 @@ class ConfigurationManager:
             rapid_api_key=config['DEFAULT'].get('RapidApiKey', None),
             rapid_api_plan=config['DEFAULT'].get('RapidApiPlan', 'basic'),
             auto_update=config['DEFAULT'].getboolean('AutoUpdate', True),
-            keep_zip_files=config['DEFAULT'].getboolean('KeepZipFiles', False)
+            keep_zip_files=config['DEFAULT'].getboolean('KeepZipFiles', False),
+            transform_batch_size=config['DEFAULT'].getint('TransformBatchSize', None),
+            transform_reader_engine=config['DEFAULT'].get('TransformReaderEngine', 'pandas'),
+            parquet_schema_version=config['DEFAULT'].getint('ParquetSchemaVersion', 1),
+            transform_row_group_size=config['DEFAULT'].getint('TransformRowGroupSize', 50_000),
+            parquet_partitioned=config['DEFAULT'].getboolean('ParquetPartitioned', False),
+            parquet_compression=config['DEFAULT'].get('ParquetCompression', 'snappy'),
+            parquet_compression_level=config['DEFAULT'].getint('ParquetCompressionLevel', None),
+            parquet_materialize_join=config['DEFAULT'].getboolean('ParquetMaterializeJoin', False),
+            parquet_tag_dimension=config['DEFAULT'].getboolean('ParquetTagDimension', False),
+            download_workers=config['DEFAULT'].getint('DownloadWorkers', 3),
+            download_max_calls_per_sec=config['DEFAULT'].getint('DownloadMaxCallsPerSec', 8),
+            update_pipelined=config['DEFAULT'].getboolean('UpdatePipelined', False),
+            pipeline_transform_workers=config['DEFAULT'].getint('PipelineTransformWorkers', 2),
+            pipeline_queue_size=config['DEFAULT'].getint('PipelineQueueSize', 4),
+            pipeline_index_workers=config['DEFAULT'].getint('PipelineIndexWorkers', 2),
+            index_snapshot=config['DEFAULT'].getboolean('IndexSnapshot', False),
+            index_tags=config['DEFAULT'].getboolean('IndexTags', False)
         )
 
         check_messages = ConfigurationManager.check_basic_configuration(config)
@@ -261,11 +278,14 @@ class ConfigurationManager:
             try:
                 rapidurlbuilder = RapidUrlBuilder(rapid_api_key=config.rapid_api_key,
                                                   rapid_plan='basic')
-                UrlDownloader(config.user_agent_email).get_url_content(
+                response = UrlDownloader(config.user_agent_email).get_url_content(
                     url=rapidurlbuilder.get_heartbeat_url(),
                     headers=rapidurlbuilder.get_headers(),
                     max_tries=2
                 )
+                # the content is not needed, closing the streamed response releases the
+                # connection
+                response.close()
                 # store the key that was successfully tested
                 accessor.set_key(ConfigurationManager.SUCCESSFULL_RAPID_API_KEY,
                                  config.rapid_api_key)
@@ -19,6 +19,23 @@ class Configuration:
     daily_download_dir: Optional[str] = None
     auto_update: Optional[bool] = True
     keep_zip_files: Optional[bool] = False
+    transform_batch_size: Optional[int] = None
+    transform_reader_engine: Optional[str] = 'pandas'
+    parquet_schema_version: Optional[int] = 1
+    transform_row_group_size: Optional[int] = 50_000
+    parquet_partitioned: Optional[bool] = False
+    parquet_compression: Optional[str] = 'snappy'
+    parquet_compression_level: Optional[int] = None
+    parquet_materialize_join: Optional[bool] = False
+    parquet_tag_dimension: Optional[bool] = False
+    download_workers: Optional[int] = 3
+    download_max_calls_per_sec: Optional[int] = 8
+    update_pipelined: Optional[bool] = False
+    pipeline_transform_workers: Optional[int] = 2
+    pipeline_queue_size: Optional[int] = 4
+    pipeline_index_workers: Optional[int] = 2
+    index_snapshot: Optional[bool] = False
+    index_tags: Optional[bool] = False
 
     def __post_init__(self):
         self.daily_download_dir = os.path.join(self.download_dir, "daily")
@@ -6,6 +6,7 @@ NUM_TXT = "num.txt"
 PRE_TXT = "pre.txt"
 SUB_TXT = "sub.txt"
 PRE_NUM_TXT = "pre_num.txt"
+TAG_TXT = "tag.txt"
 
 NUM_COLS = ['adsh', 'tag', 'version', 'coreg', 'ddate', 'qtrs', 'uom', 'value', 'footnote']
 PRE_COLS = ['adsh', 'report', 'line', 'stmt', 'inpth', 'rfile',
@@ -43,6 +44,20 @@ PRE_DTYPE = {'adsh': str,
              'line': float,  # may be nan in some entries
              'stmt': str,
              'inpth': int,
+             'rfile': str,
              'tag': str,
              'version': str,
+             'plabel': str,
              'negating': int}
+
+# doc is not read, since it is long and not needed for the analysis
+TAG_COLS = ['tag', 'version', 'custom', 'abstract', 'datatype', 'iord', 'crdr', 'tlabel']
+
+TAG_DTYPE = {'tag': str,
+             'version': str,
+             'custom': int,
+             'abstract': int,
+             'datatype': str,
+             'iord': str,
+             'crdr': str,
+             'tlabel': str}
@@ -0,0 +1,122 @@
+"""
+helper utils to handle pandas dataframes with categorical columns.
+"""
+from functools import reduce
+from typing import List, Optional
+
+import pandas as pd
+
+
+def get_categorical_columns(data_df: pd.DataFrame) -> List[str]:
+    """
+    returns the names of the categorical columns of the dataframe.
+
+    Args:
+        data_df (pd.DataFrame): the dataframe
+
+    Returns:
+        List[str]: names of the categorical columns
+    """
+    return [column for column, dtype in data_df.dtypes.items()
+            if isinstance(dtype, pd.CategoricalDtype)]
+
+
+def sort_categories(data_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    sorts the categories of all categorical columns in place, so that sorting by a
+    categorical column has the same result as sorting by the string values.
+    Categorical columns read from parquet files have their categories in the order
+    in which they appeared in the file.
+
+    Args:
+        data_df (pd.DataFrame): the dataframe
+
+    Returns:
+        pd.DataFrame: the same dataframe with sorted categories
+    """
+    for column in get_categorical_columns(data_df):
+        categories = data_df[column].cat.categories
+        if not categories.is_monotonic_increasing:
+            data_df[column] = data_df[column].cat.set_categories(categories.sort_values())
+    return data_df
+
+
+def unify_categories(data_dfs: List[pd.DataFrame],
+                     columns: Optional[List[str]] = None) -> List[pd.DataFrame]:
+    """
+    ensures that the columns that are categorical in all of the provided dataframes have the
+    same categories. This is necessary, so that pd.concat and pd.merge keep the columns
+    categorical instead of converting them into object columns.
+    The provided dataframes are not changed, shallow copies are returned instead.
+
+    Args:
+        data_dfs (List[pd.DataFrame]): the dataframes
+        columns (List[str], optional, None): restricts the unification on these columns
+
+    Returns:
+        List[pd.DataFrame]: shallow copies of the dataframes with unified categories
+    """
+    if len(data_dfs) == 0:
+        return data_dfs
+
+    common_columns = reduce(lambda cols, df: cols & set(get_categorical_columns(df)),
+                            data_dfs[1:], set(get_categorical_columns(data_dfs[0])))
+    if columns is not None:
+        common_columns = common_columns & set(columns)
+
+    if len(common_columns) == 0:
+        return data_dfs
+
+    unified_dfs = [data_df.copy(deep=False) for data_df in data_dfs]
+    for column in sorted(common_columns):
+        categories = data_dfs[0][column].cat.categories
+        for data_df in data_dfs[1:]:
+            categories = categories.union(data_df[column].cat.categories)
+        categories = categories.sort_values()
+        for unified_df in unified_dfs:
+            if not unified_df[column].cat.categories.equals(categories):
+                unified_df[column] = unified_df[column].cat.set_categories(categories)
+    return unified_dfs
+
+
+def concat_dataframes(data_dfs: List[pd.DataFrame], ignore_index: bool = True) -> pd.DataFrame:
+    """
+    concatenates the dataframes and keeps columns categorical, which are categorical
+    in all dataframes.
+
+    Args:
+        data_dfs (List[pd.DataFrame]): the dataframes to concat
+        ignore_index (bool, optional, True): passed to pd.concat
+
+    Returns:
+        pd.DataFrame: the concatenated dataframe
+    """
+    return pd.concat(unify_categories(data_dfs), ignore_index=ignore_index)
+
+
+def merge_pre_num(num_df: pd.DataFrame, pre_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    merges the content of num.txt and pre.txt. Only rows in num are considered for which
+    entries in pre exist.
+    If both dataframes contain the integer tag_id column (see tagdimension module), they are
+    joined on adsh and tag_id instead of adsh, tag, and version.
+
+    Args:
+        num_df (pd.DataFrame): the content of num.txt
+        pre_df (pd.DataFrame): the content of pre.txt
+
+    Returns:
+        pd.DataFrame: the merged dataframe
+    """
+    if ('tag_id' in num_df.columns) and ('tag_id' in pre_df.columns):
+        # tag and version are already contained in num_df
+        join_columns = ['adsh', 'tag_id']
+        pre_df = pre_df.drop(columns=['tag', 'version'])
+    else:
+        join_columns = ['adsh', 'tag', 'version']
+
+    # categorical join columns need the same categories in both dataframes, otherwise
+    # they would be converted to object columns by the merge
+    num_df, pre_df = unify_categories([num_df, pre_df], columns=join_columns)
+
+    return pd.merge(num_df, pre_df, on=join_columns)
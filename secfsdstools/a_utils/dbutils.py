@@ -1,13 +1,24 @@
 """
 Basic DB handling functionality
+
+The read methods of the DB class use a connection that is cached per process, thread, and
+database, so that a loop of lookups doesn't have to open a new connection for every lookup.
+Since every thread has its own connection, the connections are never shared between threads.
+All cached connections are closed with close_all_connections, which is also called when the
+interpreter exits.
 """
 
+import atexit
+import dataclasses
 import logging
 import os
 import sqlite3
+import threading
 from abc import ABC
+from contextlib import contextmanager
 from dataclasses import Field
-from typing import List, TypeVar, Tuple, Optional
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, TypeVar, Tuple, Optional
 
 import pandas as pd
 
@@ -15,6 +26,52 @@ T = TypeVar("T")  # pylint: disable=W0621
 
 LOGGER = logging.getLogger(__name__)
 
+# number of prepared statements that are cached per connection
+CACHED_STATEMENTS = 256
+# size of the memory map for the db file in bytes
+MMAP_SIZE = 256 * 1024 * 1024
+# size of the page cache per connection in KiB
+CACHE_SIZE_KIB = 64 * 1024
+
+# temporary table of a connection which contains the keys of a lookup,
+# sql statements use it with "... IN (SELECT key FROM temp.lookup_keys)"
+LOOKUP_KEYS_TABLE = 'temp.lookup_keys'
+
+# key is database path, process id, thread id, and read_only flag
+ConnectionKey = Tuple[str, int, int, bool]
+
+_CACHED_CONNECTIONS: Dict[ConnectionKey, sqlite3.Connection] = {}
+_CACHED_CONNECTIONS_LOCK = threading.Lock()
+
+
+def _close_connections(keys: List[ConnectionKey]):
+    for key in keys:
+        conn = _CACHED_CONNECTIONS.pop(key)
+        # connections that were inherited from the parent process are only dropped
+        if key[1] == os.getpid():
+            try:
+                conn.close()
+            except sqlite3.Error as err:
+                LOGGER.debug("failed to close connection to %s: %s", key[0], err)
+
+
+def _close_connections_of_finished_threads():
+    alive_threads = {thread.ident for thread in threading.enumerate()}
+    _close_connections([key for key in _CACHED_CONNECTIONS
+                        if key[1] != os.getpid() or key[2] not in alive_threads])
+
+
+def close_all_connections():
+    """
+    closes all cached connections of the current process. The next call of a read method
+    opens a new connection.
+    """
+    with _CACHED_CONNECTIONS_LOCK:
+        _close_connections(list(_CACHED_CONNECTIONS.keys()))
+
+
+atexit.register(close_all_connections)
+
 
 # noinspection SqlResolve
 class DB(ABC):
@@ -22,9 +79,16 @@ class DB(ABC):
     Base class for DB handling. Provides some basic functionality.
     """
 
-    def __init__(self, db_dir="db/"):
+    def __init__(self, db_dir="db/", read_only: bool = False):
+        """
+        Args:
+            db_dir (str, optional, 'db/'): the directory of the db file
+            read_only (bool, optional, False): if True, the cached connection is opened
+                in read only mode. Use it for instances that only read from the db.
+        """
         self.db_dir = db_dir
         self.database = os.path.join(self.db_dir, 'secfsdstools.db')
+        self.read_only = read_only
 
     def db_file_exists(self) -> bool:
         """
@@ -58,20 +122,50 @@ class DB(ABC):
         """
         return sqlite3.connect(self.database)
 
-    def execute_read_as_df(self, sql: str) -> pd.DataFrame:
+    def _connect_cached(self) -> sqlite3.Connection:
+        if self.read_only:
+            uri = f"{Path(self.database).absolute().as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                   cached_statements=CACHED_STATEMENTS)
+        else:
+            conn = sqlite3.connect(self.database, check_same_thread=False,
+                                   cached_statements=CACHED_STATEMENTS)
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+        # the lookup keys are staged in a temporary table
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def get_cached_connection(self) -> sqlite3.Connection:
+        """
+        returns the connection of the current thread to the db. The connection is opened
+        with the first call and then kept open, so it must not be closed by the caller.
+        Use get_connection for writing in a transaction.
+
+        Returns:
+            sqlite3.Connection: sqlite3 connection instance
+        """
+        key = (os.path.abspath(self.database), os.getpid(), threading.get_ident(),
+               self.read_only)
+        with _CACHED_CONNECTIONS_LOCK:
+            conn = _CACHED_CONNECTIONS.get(key)
+            if conn is None:
+                _close_connections_of_finished_threads()
+                conn = self._connect_cached()
+                _CACHED_CONNECTIONS[key] = conn
+            return conn
+
+    def execute_read_as_df(self, sql: str, params: Optional[Tuple] = None) -> pd.DataFrame:
         """
         directly read the content into a pandas dataframe
         Args:
              sql (str): Select String
+             params (Tuple, optional, None): the parameters, if the sql is parameterized
         Returns:
             pd.DataFrame: pd.DataFrame
         """
-        conn = self.get_connection()
-        try:
-            LOGGER.debug("execute %s", sql)
-            return pd.read_sql_query(sql, conn)
-        finally:
-            conn.close()
+        LOGGER.debug("execute %s", sql)
+        return pd.read_sql_query(sql, self.get_cached_connection(), params=params)
 
     def execute_fetchall(self, sql: str) -> List[Tuple]:
         """
@@ -81,14 +175,11 @@ class DB(ABC):
         Returns:
             List[Tuple]: list with tuples
         """
-        conn = self.get_connection()
-        try:
-            LOGGER.debug("execute %s", sql)
-            return conn.execute(sql).fetchall()
-        finally:
-            conn.close()
+        LOGGER.debug("execute %s", sql)
+        return self.get_cached_connection().execute(sql).fetchall()
 
-    def execute_fetchall_typed(self, sql: str, T) -> List[T]:  # pylint: disable=W0621,C0103
+    def execute_fetchall_typed(self, sql: str, T,  # pylint: disable=W0621,C0103
+                               params: Optional[Tuple] = None) -> List[T]:
         """fetches all data of the sql statement and directly wraps it
         into the provided type.
         Note all selected columns in the sql have to exist with the same
@@ -97,29 +188,98 @@ class DB(ABC):
         Args:
              sql (str): sql string
              T: type class
+             params (Tuple, optional, None): the parameters, if the sql is parameterized
         Returns:
              List[T]: list of instances of the type
         """
-        conn = self.get_connection()
+        return self._fetchall_typed(self.get_cached_connection(), sql, T, params)
+
+    @staticmethod
+    def _fetchall_typed(conn: sqlite3.Connection, sql: str, T,  # pylint: disable=W0621,C0103
+                        params: Optional[Tuple]) -> List[T]:
+        LOGGER.debug("execute %s", sql)
+        cursor = conn.cursor()
         try:
-            LOGGER.debug("execute %s", sql)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute(sql)
+            cursor.execute(sql, params or ())
+            columns = [description[0] for description in cursor.description]
             results = cursor.fetchall()
-            return [T(**dict(x)) for x in results]
         finally:
-            conn.close()
+            cursor.close()
+
+        # creating the instances with positional arguments is considerably faster,
+        # but only possible if the columns are in the order of the fields
+        if columns == [field.name for field in dataclasses.fields(T)]:
+            return [T(*x) for x in results]
+        return [T(**dict(zip(columns, x))) for x in results]
+
+    @contextmanager
+    def _staged_lookup_keys(self, keys: List[Any]) -> Iterator[sqlite3.Connection]:
+        """
+        inserts the keys into the lookup_keys table of the cached connection and returns the
+        connection. The keys are only visible within the with block and removed afterwards.
+        """
+        conn = self.get_cached_connection()
+        with conn:
+            # sqlite creates an index on the keys for the IN operator by itself
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {LOOKUP_KEYS_TABLE} (key)")
+            conn.executemany(f"INSERT INTO {LOOKUP_KEYS_TABLE} (key) VALUES (?)",
+                             [(key,) for key in dict.fromkeys(keys)])
+            try:
+                yield conn
+            finally:
+                conn.execute(f"DELETE FROM {LOOKUP_KEYS_TABLE}")
+
+    def execute_fetchall_typed_for_keys(self, sql: str, T,  # pylint: disable=W0621,C0103
+                                        keys: List[Any],
+                                        params: Optional[Tuple] = None) -> List[T]:
+        """
+        like execute_fetchall_typed, but the keys are first inserted into the temporary table
+        LOOKUP_KEYS_TABLE, so that the sql can select them with
+        "IN (SELECT key FROM temp.lookup_keys)". This works for any number of keys and the
+        sql text doesn't depend on the keys.
+
+        Args:
+             sql (str): sql string that uses the LOOKUP_KEYS_TABLE
+             T: type class
+             keys (List[Any]): the keys to look up
+             params (Tuple, optional, None): further parameters, if the sql is parameterized
+        Returns:
+             List[T]: list of instances of the type
+        """
+        with self._staged_lookup_keys(keys) as conn:
+            return self._fetchall_typed(conn, sql, T, params)
 
-    def execute_single(self, sql: str, conn: sqlite3.Connection):
+    def execute_read_as_df_for_keys(self, sql: str, keys: List[Any],
+                                    params: Optional[Tuple] = None) -> pd.DataFrame:
         """
-        executes a single sql statement without any parameters.
+        like execute_read_as_df, but the keys are first inserted into the temporary table
+        LOOKUP_KEYS_TABLE (see execute_fetchall_typed_for_keys).
+
         Args:
-             sql (str): sql string, not paramterized
+             sql (str): sql string that uses the LOOKUP_KEYS_TABLE
+             keys (List[Any]): the keys to look up
+             params (Tuple, optional, None): further parameters, if the sql is parameterized
+        Returns:
+            pd.DataFrame: pd.DataFrame
+        """
+        with self._staged_lookup_keys(keys) as conn:
+            LOGGER.debug("execute %s", sql)
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def execute_single(self, sql: str, conn: sqlite3.Connection,
+                       params: Optional[Tuple] = None):
+        """
+        executes a single sql statement.
+        Args:
+             sql (str): sql string
              conn (sqlite3.Connection): connection to use
+             params (Tuple, optional, None): the parameters, if the sql is parameterized
         """
         LOGGER.debug("execute %s", sql)
-        conn.execute(sql)
+        if params is None:
+            conn.execute(sql)
+        else:
+            conn.execute(sql, params)
 
     def execute_many(self, sql: str, params: List[Tuple], conn: sqlite3.Connection):
         """
@@ -136,14 +296,40 @@ class DB(ABC):
                            conn: sqlite3.Connection):
         """
         add the content of a df to the table. The name of the columns in df
-        and table have to match
+        and table have to match.
+        All rows are inserted with a single executemany call, so they are written in the
+        transaction of the provided connection.
 
         Args:
              table_name (str): name of the table to append the data
              dataframe (pd.DataFrame):  the df with the data
              conn (sqlite3.Connection): connection to use
         """
-        dataframe.to_sql(table_name, conn, if_exists="append", index=False)
+        column_str = ', '.join([f"'{column}'" for column in dataframe.columns])
+        placeholder_str = ', '.join(['?'] * len(dataframe.columns))
+        sql = f"INSERT INTO {table_name} ({column_str}) VALUES ({placeholder_str})"
+
+        # sqlite3 only accepts python types, NaN values are stored as NULL
+        params = dataframe.astype(object).where(dataframe.notna(), None).values.tolist()
+        self.execute_many(sql, params, conn)
+
+    def create_parameterized_insert_for_dataclass(self, table_name: str, data) \
+            -> Tuple[str, Tuple]:
+        """
+        creates the parameterized insert sql statement and its parameters based on the
+        fields of a dataclass
+
+        Args:
+             table_name (str): name of the table to insert into
+             data: object of the dataclass
+        Returns:
+            Tuple[str, Tuple]: 'insert into' statement and the parameters
+        """
+        fields = dataclasses.fields(data)
+        column_str = ', '.join([f"'{field.name}'" for field in fields])
+        placeholder_str = ', '.join(['?'] * len(fields))
+        params = tuple(getattr(data, field.name) for field in fields)
+        return f"INSERT INTO {table_name} ({column_str}) VALUES ({placeholder_str})", params
 
     def create_insert_statement_for_dataclass(self, table_name: str, data) -> str:
         """
@@ -2,35 +2,136 @@
 Download utils to download data from the SEC website.
 """
 
+import contextlib
 import logging
-from time import sleep
-from typing import Dict
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from secfsdstools.a_utils.fileutils import write_content_to_zip
+from secfsdstools.a_utils.httpcacheutils import HttpCacheEntry, HttpMetadataCache
+from secfsdstools.a_utils.parallelexecution import TokenBucket
+from secfsdstools.a_utils.retryutils import RetryPolicy
 
 LOGGER = logging.getLogger(__name__)
 
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# receives the number of bytes written so far and the total size, if it is known
+ProgressCallback = Callable[[int, Optional[int]], None]
+
 
 class UrlDownloader:
     """
     Main downloader class
+
+    Every thread uses its own requests.Session, so that the connections to a host are kept
+    alive and reused by all requests of the thread, instead of opening a new connection for
+    every download and retry.
+
+    Failed requests are retried by the retry_policy, which is shared by all threads.
+
+    If max_calls_per_sec is set, every request, also every retry, takes a token from the
+    token bucket of its host, which is shared by all threads and all downloaders that use
+    this UrlDownloader. So at most max_calls_per_sec requests per second are sent to a host.
     """
 
-    def __init__(self, user_agent: str = "<not set>"):
+    def __init__(self, user_agent: str = "<not set>", pool_size: int = 4,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 max_calls_per_sec: float = 0):
         """
         Args:
             user_agent (str): according to https://www.sec.gov/os/accessing-edgar-data in the form
         User-Agent: Sample Company Name AdminContact@<sample company domain>.com
+            pool_size (int, optional, 4): the number of connections per host that are kept
+              alive by the session of a thread
+            retry_policy (RetryPolicy, optional, None): the retry policy, default is a
+              RetryPolicy with exponential backoff
+            max_calls_per_sec (float, optional, 0): the maximum number of requests per second
+              to a host, 0 means no limit
         """
 
         self.user_agent = user_agent
+        self.pool_size = pool_size
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self._local = threading.local()
+        self._sessions_lock = threading.Lock()
+        self._sessions: List[requests.Session] = []
+        self.max_calls_per_sec = max_calls_per_sec
+        self._buckets_lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def __getstate__(self):
+        # sessions, thread locals, and buckets can't be pickled, the copy creates its own
+        return {'user_agent': self.user_agent, 'pool_size': self.pool_size,
+                'retry_policy': self.retry_policy, 'max_calls_per_sec': self.max_calls_per_sec}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def get_session(self) -> requests.Session:
+        """
+        returns the session of the current thread, it is created on the first call.
+
+        Returns:
+            requests.Session: the session of the current thread
+        """
+        session: Optional[requests.Session] = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def set_max_calls_per_sec(self, max_calls_per_sec: float):
+        """
+        changes the maximum number of requests per second to a host. The token buckets are
+        only replaced if the value changes.
+
+        Args:
+            max_calls_per_sec (float): the maximum number of requests per second to a host,
+              0 means no limit
+        """
+        with self._buckets_lock:
+            if max_calls_per_sec != self.max_calls_per_sec:
+                self.max_calls_per_sec = max_calls_per_sec
+                self._buckets = {}
+
+    def _wait_for_rate_limit(self, url: str):
+        """ blocks until the token bucket of the host of the url allows the next request """
+        with self._buckets_lock:
+            if self.max_calls_per_sec <= 0:
+                return
+            host = urlparse(url).netloc
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(rate=self.max_calls_per_sec)
+                self._buckets[host] = bucket
+        bucket.wait()
+
+    def close(self):
+        """
+        closes the sessions of all threads and their connections.
+        """
+        with self._sessions_lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+        # sessions of other threads are closed, so every thread has to create a new one
+        self._local = threading.local()
 
     def download_url_to_file(self, file_url: str, target_file: str,
                              expected_size: int = None,
-                             max_tries: int = 6,
-                             sleep_time: int = 1,
+                             max_tries: Optional[int] = None,
+                             sleep_time: Optional[float] = None,
                              headers: Dict[str, str] = None):
         """
             downloads the content auf an url and stores it into the target-file.
@@ -43,9 +144,10 @@ class UrlDownloader:
             expected_size (str, optional, None): the expected size of
               the data that is downloaded.
             logs a warning if the size doesn't match
-            max_tries (int, optional, 6): maximum retries, default is 6
-            sleep_time (int, optional, 1): wait time between retries,
-              default is one second
+            max_tries (int, optional, None): maximum number of tries, default is the
+              max_tries of the retry policy (6)
+            sleep_time (float, optional, None): wait time before the first retry, it grows
+              exponentially with every retry, default is the base_delay of the retry policy (1s)
             headers (Dict[str, str], optional, None}): additional headers
 
         Returns:
@@ -62,60 +164,217 @@ class UrlDownloader:
 
     def binary_download_url_to_file(self, file_url: str,
                                     target_file: str,
-                                    max_tries: int = 6,
-                                    sleep_time: int = 1,
-                                    headers: Dict[str, str] = None):
+                                    max_tries: Optional[int] = None,
+                                    sleep_time: Optional[float] = None,
+                                    headers: Dict[str, str] = None,
+                                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                                    progress_callback: Optional[ProgressCallback] = None):
         """
             downloads the binary of an url and stores it into the target-file.
-            retries a download several times, if it fails
+            The content is streamed in chunks into the temporary file <target-file>.part,
+            which is renamed to the target-file when the download is complete.
+            If a download fails, it is retried by the retry policy. Every retry, and also the
+            next call after a failed download, resumes the download at the end of the .part
+            file, if the server supports range requests.
+            The ETag (or Last-Modified) of the response that started the .part file is stored
+            in <target-file>.part.validator and sent as If-Range, so that the server sends the
+            whole file again if it changed in the meantime. A .part file without validator is
+            downloaded again from the beginning.
 
         Args:
             file_url (str): url that referencese the file to be downloaded
             target_file (str): the file to store the content into
-              (it will be written into a zipfile)
-            max_tries (int, optional, 6): maximum retries, default is 6
-            sleep_time (int, optional, 1): wait time between retries, default is one second
+            max_tries (int, optional, None): maximum number of tries, default is the
+              max_tries of the retry policy (6)
+            sleep_time (float, optional, None): wait time before the first retry, it grows
+              exponentially with every retry, default is the base_delay of the retry policy (1s)
             headers (Dict[str, str], optional, None}): additional headers
+            chunk_size (int, optional, 1MB): size of the chunks that are written
+            progress_callback (ProgressCallback, optional, None): called after every chunk with
+              the number of bytes written so far and the total size (None if unknown)
         """
-        response = self.get_url_content(file_url, max_tries, sleep_time, headers=headers)
+        part_file = f'{target_file}.part'
+        self.retry_policy.execute(
+            file_url,
+            lambda: self._stream_to_part_file(file_url, part_file, headers=headers,
+                                              chunk_size=chunk_size,
+                                              progress_callback=progress_callback),
+            max_tries=max_tries, base_delay=sleep_time)
+
+        os.replace(part_file, target_file)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(f'{part_file}.validator')
 
-        with open(target_file, "wb") as target_fp:
-            target_fp.write(response.content)
+    @staticmethod
+    def _is_resumed(response: requests.models.Response, offset: int) -> bool:
+        content_range = response.headers.get('Content-Range', '')
+        return (response.status_code == 206) and content_range.startswith(f'bytes {offset}-')
 
-    def get_url_content(self, url: str, max_tries: int = 6,
-                        sleep_time: int = 1, headers: Dict[str, str] = None) \
+    @staticmethod
+    def _read_part_validator(part_file: str) -> Optional[str]:
+        try:
+            with open(f'{part_file}.validator', 'r', encoding='utf-8') as validator_fp:
+                return validator_fp.read().strip() or None
+        except OSError:
+            return None
+
+    @staticmethod
+    def _store_part_validator(part_file: str, response: requests.models.Response):
+        # a weak ETag must not be used in If-Range, Last-Modified is used instead
+        etag = response.headers.get('ETag')
+        validator = etag if (etag is not None) and not etag.startswith('W/') \
+            else response.headers.get('Last-Modified')
+        validator_file = f'{part_file}.validator'
+        if validator is None:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(validator_file)
+            return
+        with open(validator_file, 'w', encoding='utf-8') as validator_fp:
+            validator_fp.write(validator)
+
+    def _get_resume_headers(self, part_file: str, headers: Optional[Dict[str, str]]) \
+            -> Tuple[int, Dict[str, str]]:
+        """ returns the offset at which the download is resumed and the request headers """
+        offset = os.path.getsize(part_file) if os.path.isfile(part_file) else 0
+        validator = self._read_part_validator(part_file) if offset > 0 else None
+
+        # the content must not be encoded, so that the range refers to the bytes of the file
+        request_headers = dict(headers or {})
+        request_headers['Accept-Encoding'] = 'identity'
+        if validator is None:
+            # without validator, it is unknown whether the file changed on the server
+            return 0, request_headers
+
+        request_headers['Range'] = f'bytes={offset}-'
+        # the server sends the whole file, if it doesn't match the validator anymore
+        request_headers['If-Range'] = validator
+        return offset, request_headers
+
+    def _stream_to_part_file(self, file_url: str, part_file: str,
+                             headers: Optional[Dict[str, str]],
+                             chunk_size: int,
+                             progress_callback: Optional[ProgressCallback]):
+        offset, request_headers = self._get_resume_headers(part_file, headers)
+
+        try:
+            response = self._request(file_url, headers=request_headers)
+        except requests.exceptions.HTTPError as err:
+            if (offset > 0) and (err.response is not None) and (err.response.status_code == 416):
+                # the range doesn't fit the file on the server, start from the beginning
+                err.response.close()
+                os.remove(part_file)
+                self._stream_to_part_file(file_url, part_file, headers=headers,
+                                          chunk_size=chunk_size,
+                                          progress_callback=progress_callback)
+                return
+            raise err
+
+        with response:
+            if (offset > 0) and not self._is_resumed(response, offset):
+                LOGGER.info('server does not resume %s, downloading the whole file', file_url)
+                offset = 0
+            if offset == 0:
+                self._store_part_validator(part_file, response)
+
+            content_length = response.headers.get('Content-Length')
+            total_size = offset + int(content_length) if content_length is not None else None
+            if offset > 0:
+                LOGGER.info('resuming download of %s at byte %d', file_url, offset)
+
+            written = offset
+            with open(part_file, 'ab' if offset > 0 else 'wb') as part_fp:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    part_fp.write(chunk)
+                    written += len(chunk)
+                    if progress_callback is not None:
+                        progress_callback(written, total_size)
+                part_fp.flush()
+                os.fsync(part_fp.fileno())
+
+        if (total_size is not None) and (written != total_size):
+            raise requests.exceptions.ChunkedEncodingError(
+                f'incomplete download of {file_url}: {written} of {total_size} bytes')
+
+    def get_url_content(self, url: str, max_tries: Optional[int] = None,
+                        sleep_time: Optional[float] = None, headers: Dict[str, str] = None) \
             -> requests.models.Response:
         """
             downloads the content auf an url and returns it as a string.
             retries a download several times, if it fails.
-            Uses the defined user-agent as header information
+            Uses the defined user-agent as header information, the provided headers
+            are not changed.
 
         Args:
             url (str): url that referencese the file to be downloaded
-            max_tries (int, optional, 6): maximum number of tries to get the data
-            sleep_time (int, optional, 1): wait time between retries, default is one second
+            max_tries (int, optional, None): maximum number of tries, default is the
+              max_tries of the retry policy (6)
+            sleep_time (float, optional, None): wait time before the first retry, it grows
+              exponentially with every retry, default is the base_delay of the retry policy (1s)
             headers (Dict[str, str], optional, None}): additional headers
 
         Returns:
              requests.models.Response
         """
-        response = None
-        current_try = 0
-        while current_try < max_tries:
-            current_try += 1
-            try:
-                if headers is None:
-                    headers = {'User-Agent': self.user_agent}
-                else:
-                    headers.update({'User-Agent': self.user_agent})
-                response = requests.get(url, timeout=10,
-                                        headers=headers, stream=True)
-                response.raise_for_status()
-                break
-            except requests.exceptions.RequestException as err:
-                if current_try >= max_tries:
-                    LOGGER.info('RequestException: failed to download %s2', url)
-                    raise err
-                sleep(sleep_time)
+        return self.retry_policy.execute(url, lambda: self._request(url, headers=headers),
+                                         max_tries=max_tries, base_delay=sleep_time)
+
+    def _request(self, url: str, headers: Optional[Dict[str, str]]) -> requests.models.Response:
+        request_headers = dict(headers or {})
+        request_headers['User-Agent'] = self.user_agent
 
+        self._wait_for_rate_limit(url)
+        response = self.get_session().get(url, timeout=10, headers=request_headers, stream=True)
+        if response.status_code >= 400:
+            # read the error page to release the connection, so that the retry can reuse it
+            _ = response.content
+            response.close()
+        response.raise_for_status()
         return response
+
+    def get_url_content_cached(self, url: str,
+                               parse: Callable[[requests.models.Response], Any],
+                               cache: Optional[HttpMetadataCache] = None,
+                               max_tries: Optional[int] = None,
+                               sleep_time: Optional[float] = None,
+                               headers: Dict[str, str] = None) -> Tuple[Any, bool]:
+        """
+            downloads the content of an url and returns it parsed by the parse function.
+            If there is a cache entry for the url, a conditional request is sent and if the
+            content wasn't modified since, the parsed content from the cache is returned.
+
+        Args:
+            url (str): url that referencese the content to be downloaded
+            parse (Callable[[requests.models.Response], Any]): parses the response, the
+              result has to be json serializable
+            cache (HttpMetadataCache, optional, None): the cache, without a cache the content
+              is always downloaded
+            max_tries (int, optional, None): maximum number of tries, default is the
+              max_tries of the retry policy (6)
+            sleep_time (float, optional, None): wait time before the first retry, it grows
+              exponentially with every retry, default is the base_delay of the retry policy (1s)
+            headers (Dict[str, str], optional, None}): additional headers
+
+        Returns:
+            Tuple[Any, bool]: the parsed content and whether it was modified
+        """
+        entry = cache.get(url) if cache is not None else None
+        request_headers = dict(headers or {})
+        if entry is not None:
+            request_headers.update(entry.get_conditional_headers())
+
+        # the response is streamed, so it has to be closed to release its connection, also
+        # if its body is not read
+        with self.get_url_content(url, max_tries, sleep_time, headers=request_headers) \
+                as response:
+            if (entry is not None) and (response.status_code == 304):
+                LOGGER.info('%s was not modified', url)
+                return entry.content, False
+
+            content = parse(response)
+
+        if cache is not None:
+            cache.put(HttpCacheEntry(url=url,
+                                     etag=response.headers.get('ETag'),
+                                     last_modified=response.headers.get('Last-Modified'),
+                                     content=content))
+        return content, True
@@ -5,9 +5,17 @@ import glob
 import os
 import zipfile
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Iterator, Tuple
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+# maps the python types used in the dtype dicts of the constants module to arrow types
+ARROW_TYPES: Dict[object, pa.DataType] = {str: pa.string(),
+                                          int: pa.int64(),
+                                          float: pa.float64(),
+                                          bool: pa.bool_()}
 
 
 def get_filenames_in_directory(filter_string: str) -> List[str]:
@@ -59,6 +67,133 @@ def read_df_from_file_in_zip(zip_file: str, file_to_extract: str,
                            dtype=dtype, usecols=usecols, **kwargs)
 
 
+def read_df_chunks_from_file_in_zip(zip_file: str, file_to_extract: str,
+                                    chunksize: int,
+                                    dtype: Optional[Dict[str, object]] = None,
+                                    usecols: Optional[List[str]] = None,
+                                    **kwargs) -> Iterator[pd.DataFrame]:
+    """
+    reads the content of a file inside a zip file in chunks of chunksize rows.
+    The file is streamed directly from the zip file, so only one chunk has to
+    be kept in memory at the time.
+
+    Args:
+        zip_file (str): the zip file containing the data file
+        file_to_extract (str): the file with the data
+        chunksize (int): the number of rows per returned dataframe
+        dtype (Dict[str, object], optional, None): column type array or None
+        usecols (List[str], optional, None): list with all the columns
+        that should be read or None
+    Returns:
+        Iterator[pd.DataFrame]: iterator over the dataframes of the single chunks
+    """
+    with zipfile.ZipFile(zip_file, "r") as zip_fp:
+        file = Path(file_to_extract).name
+        with zip_fp.open(file) as file_fp:
+            yield from pd.read_csv(file_fp, header=0, delimiter="\t",
+                                   dtype=dtype, usecols=usecols,
+                                   chunksize=chunksize, **kwargs)
+
+
+def _get_arrow_csv_options(dtype: Optional[Dict[str, object]],
+                           usecols: Optional[List[str]],
+                           use_threads: bool = True) \
+        -> Tuple[pacsv.ReadOptions, pacsv.ParseOptions, pacsv.ConvertOptions]:
+    column_types = {column: ARROW_TYPES[col_type] for column, col_type in dtype.items()} \
+        if dtype else None
+
+    # strings_can_be_null ensures that empty fields are read as null (resp. NaN), as pandas does
+    return (pacsv.ReadOptions(use_threads=use_threads),
+            pacsv.ParseOptions(delimiter="\t"),
+            pacsv.ConvertOptions(column_types=column_types,
+                                 include_columns=usecols,
+                                 strings_can_be_null=True))
+
+
+def read_table_from_file_in_zip(zip_file: str, file_to_extract: str,
+                                dtype: Optional[Dict[str, object]] = None,
+                                usecols: Optional[List[str]] = None,
+                                use_threads: bool = True) -> pa.Table:
+    """
+    reads the content of a file inside a zip file directly into an arrow table by using the
+    multithreaded csv parser of pyarrow.
+
+    Args:
+        zip_file (str): the zip file containing the data file
+        file_to_extract (str): the file with the data
+        dtype (Dict[str, object], optional, None): column type array or None.
+         the same python types as for pandas are used (str, int, float, bool)
+        usecols (List[str], optional, None): list with all the columns
+        that should be read or None
+        use_threads (bool, optional, True): if True, parsing is done with multiple threads
+    Returns:
+        pa.Table: the arrow table
+    """
+    read_options, parse_options, convert_options = \
+        _get_arrow_csv_options(dtype=dtype, usecols=usecols, use_threads=use_threads)
+
+    with zipfile.ZipFile(zip_file, "r") as zip_fp:
+        file = Path(file_to_extract).name
+        with zip_fp.open(file) as file_fp:
+            return pacsv.read_csv(file_fp, read_options=read_options,
+                                  parse_options=parse_options,
+                                  convert_options=convert_options)
+
+
+def read_table_chunks_from_file_in_zip(zip_file: str, file_to_extract: str,
+                                       chunksize: int,
+                                       dtype: Optional[Dict[str, object]] = None,
+                                       usecols: Optional[List[str]] = None) \
+        -> Iterator[pa.Table]:
+    """
+    reads the content of a file inside a zip file in chunks of at least chunksize rows
+    (except the last chunk) as arrow tables by using the streaming csv reader of pyarrow.
+    Note: if dtype does not define all the columns of the file, the types of the other columns
+    are inferred from the first block of the file.
+
+    Args:
+        zip_file (str): the zip file containing the data file
+        file_to_extract (str): the file with the data
+        chunksize (int): the minimal number of rows per returned table
+        dtype (Dict[str, object], optional, None): column type array or None
+        usecols (List[str], optional, None): list with all the columns
+        that should be read or None
+    Returns:
+        Iterator[pa.Table]: iterator over the tables of the single chunks
+    """
+    read_options, parse_options, convert_options = \
+        _get_arrow_csv_options(dtype=dtype, usecols=usecols)
+
+    with zipfile.ZipFile(zip_file, "r") as zip_fp:
+        file = Path(file_to_extract).name
+        with zip_fp.open(file) as file_fp:
+            reader = pacsv.open_csv(file_fp, read_options=read_options,
+                                    parse_options=parse_options,
+                                    convert_options=convert_options)
+            yield from _combine_batches(reader, chunksize)
+
+
+def _combine_batches(reader: pacsv.CSVStreamingReader, chunksize: int) -> Iterator[pa.Table]:
+    """
+    combines the record batches of the reader into tables with at least chunksize rows.
+    At least one (maybe empty) table is returned.
+    """
+    batches: List[pa.RecordBatch] = []
+    rows = 0
+    chunks_returned = False
+    for batch in reader:
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows >= chunksize:
+            yield pa.Table.from_batches(batches)
+            chunks_returned = True
+            batches = []
+            rows = 0
+
+    if (len(batches) > 0) or not chunks_returned:
+        yield pa.Table.from_batches(batches, schema=reader.schema)
+
+
 def read_content_from_file_in_zip(zip_file: str, file_to_extract: str) -> str:
     """
     reads the text content of a file inside a zip file
@@ -105,3 +240,19 @@ def read_content_from_zip(filename: str) -> str:
     with zipfile.ZipFile(f"{filename}.zip", mode="r") as zf_fp:
         file = Path(filename).name
         return zf_fp.read(file).decode("utf-8")
+
+
+def get_size_of_path(path: str) -> int:
+    """
+    returns the size of a file or the total size of all files in a directory in bytes.
+
+    Args:
+        path (str): path to a file or a directory
+
+    Returns:
+        int: the size in bytes, 0 if the path doesn't exist
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, file_name))
+               for root, _, file_names in os.walk(path) for file_name in file_names)
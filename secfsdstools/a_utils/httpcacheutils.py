@@ -0,0 +1,92 @@
+"""
+on-disk cache for the metadata of http responses, used to send conditional requests.
+
+For every url, the cache stores the ETag and Last-Modified headers of the last response
+together with the parsed content in a json file. The next request for the url sends
+If-None-Match and If-Modified-Since, and if the server answers with 304 Not Modified,
+the parsed content is taken from the cache, so the content is neither downloaded nor
+parsed again.
+"""
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class HttpCacheEntry:
+    """
+    The cached metadata and the parsed content of the response of an url.
+    The content has to be json serializable.
+    """
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content: Any
+
+    def get_conditional_headers(self) -> Dict[str, str]:
+        """
+        returns the headers for a conditional request.
+
+        Returns:
+            Dict[str, str]: If-None-Match and If-Modified-Since, if the values are known
+        """
+        headers: Dict[str, str] = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HttpMetadataCache:
+    """
+    Stores a HttpCacheEntry per url as json file in the cache_dir.
+    """
+
+    def __init__(self, cache_dir: str):
+        """
+        Args:
+            cache_dir (str): the directory of the cache files, it is created if necessary
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _get_path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def get(self, url: str) -> Optional[HttpCacheEntry]:
+        """
+        reads the entry of the url.
+
+        Args:
+            url (str): the url
+
+        Returns:
+            Optional[HttpCacheEntry]: the entry or None, if there is no readable entry
+        """
+        path = self._get_path(url)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                entry = HttpCacheEntry(**json.load(file))
+        except (OSError, ValueError, TypeError):
+            return None
+        return entry if entry.url == url else None
+
+    def put(self, entry: HttpCacheEntry):
+        """
+        writes the entry. It is first written into a temporary file, which then replaces the
+        current entry, so that a reader never sees a partial entry.
+
+        Args:
+            entry (HttpCacheEntry): the entry
+        """
+        path = self._get_path(entry.url)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(asdict(entry), file)
+        os.replace(tmp_path, path)
@@ -0,0 +1,181 @@
+"""
+helper utils to read and write the manifest of a transformed zip file.
+
+Every directory a zip file is transformed into contains a manifest.json file. It describes the
+source zip file (size, modification time, and sha256 hash), the number of rows of every
+transformed file, the schema version, and whether the transformation was completed.
+
+Directories without a manifest were transformed by an older version of the library and
+are regarded as completed.
+"""
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class TransformManifest:
+    """
+    The manifest of a transformed zip file.
+    """
+    source_file: str
+    source_size: int
+    source_mtime: float
+    source_sha256: str
+    schema_version: int
+    partitioned: bool = False
+    row_counts: Dict[str, int] = field(default_factory=dict)
+    completed: bool = False
+    created: str = ''
+    manifest_version: int = MANIFEST_VERSION
+
+
+def compute_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    computes the sha256 hash of a file without loading it into memory at once.
+
+    Args:
+        file_path (str): path to the file
+        chunk_size (int, optional, 1MB): the number of bytes that are read at once
+
+    Returns:
+        str: the hex digest of the sha256 hash
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def create_manifest(zip_file_path: str, schema_version: int,
+                    partitioned: bool = False) -> TransformManifest:
+    """
+    creates a not completed manifest for the provided zip file.
+
+    Args:
+        zip_file_path (str): path to the source zip file
+        schema_version (int): the schema version of the transformed files
+        partitioned (bool, optional, False): whether the files are hive partitioned
+
+    Returns:
+        TransformManifest: the manifest
+    """
+    stat = os.stat(zip_file_path)
+    return TransformManifest(source_file=os.path.basename(zip_file_path),
+                             source_size=stat.st_size,
+                             source_mtime=stat.st_mtime,
+                             source_sha256=compute_sha256(zip_file_path),
+                             schema_version=schema_version,
+                             partitioned=partitioned,
+                             created=datetime.now(timezone.utc).isoformat())
+
+
+def write_manifest(target_dir: str, manifest: TransformManifest):
+    """
+    writes the manifest into the target_dir. The manifest is first written into a temporary
+    file, which then replaces the manifest, so that a reader never sees a partial manifest.
+
+    Args:
+        target_dir (str): the directory of the transformed zip file
+        manifest (TransformManifest): the manifest
+    """
+    manifest_path = os.path.join(target_dir, MANIFEST_FILE)
+    tmp_path = f'{manifest_path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(asdict(manifest), file, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, manifest_path)
+
+
+def read_manifest(target_dir: str) -> Optional[TransformManifest]:
+    """
+    reads the manifest of the target_dir.
+
+    Args:
+        target_dir (str): the directory of the transformed zip file
+
+    Returns:
+        Optional[TransformManifest]: the manifest or None, if there is no readable manifest
+    """
+    manifest_path = os.path.join(target_dir, MANIFEST_FILE)
+    if not os.path.isfile(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            return TransformManifest(**json.load(file))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def is_transform_completed(target_dir: str) -> bool:
+    """
+    checks whether the transformation into the target_dir was completed.
+    Directories without a manifest (transformed by an older version) are regarded as completed,
+    directories with an unreadable or not completed manifest are not.
+
+    Args:
+        target_dir (str): the directory of the transformed zip file
+
+    Returns:
+        bool: True if the transformation was completed
+    """
+    if not os.path.exists(os.path.join(target_dir, MANIFEST_FILE)):
+        return True
+    manifest = read_manifest(target_dir)
+    return (manifest is not None) and manifest.completed
+
+
+def source_matches(manifest: TransformManifest, zip_file_path: str) -> bool:
+    """
+    checks whether the zip file is the one the manifest was created for.
+    The sha256 hash is only calculated, if the size matches but the modification time
+    differs, so that checking unchanged zip files is cheap.
+
+    Args:
+        manifest (TransformManifest): the manifest
+        zip_file_path (str): path to the zip file
+
+    Returns:
+        bool: True if the zip file is unchanged
+    """
+    stat = os.stat(zip_file_path)
+    if stat.st_size != manifest.source_size:
+        return False
+    if stat.st_mtime == manifest.source_mtime:
+        return True
+    return compute_sha256(zip_file_path) == manifest.source_sha256
+
+
+def compute_fingerprint(target_dir: str) -> str:
+    """
+    computes a fingerprint of the content of the target_dir, which changes whenever the
+    directory is transformed again. If there is a manifest, the fingerprint is derived from the
+    hash of the source zip file and the creation time of the manifest. Otherwise, it is derived
+    from the names, sizes, and modification times of all files in the directory.
+
+    Args:
+        target_dir (str): the directory of the transformed zip file
+
+    Returns:
+        str: the fingerprint
+    """
+    manifest = read_manifest(target_dir)
+    if manifest is not None:
+        return f'manifest:{manifest.source_sha256}:{manifest.created}'
+
+    sha256 = hashlib.sha256()
+    for root, dir_names, file_names in os.walk(target_dir):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            stat = os.stat(os.path.join(root, file_name))
+            relative_path = os.path.relpath(os.path.join(root, file_name), target_dir)
+            sha256.update(f'{relative_path}:{stat.st_size}:{stat.st_mtime_ns};'.encode('utf-8'))
+    return f'stat:{sha256.hexdigest()}'
@@ -5,10 +5,12 @@ using pathos.multiprocessing instead of multiprocessing, so that method function
 -> pypi.org "pathos"
 """
 
+import asyncio
 import concurrent.futures
 import logging
+import threading
 from abc import ABC, abstractmethod
-from time import time, sleep
+from time import time, sleep, monotonic
 from typing import Generic, TypeVar, List, Callable, Optional, Tuple
 
 from pathos.multiprocessing import ProcessingPool as Pool
@@ -214,6 +216,121 @@ class ThreadExecutor(ParallelExecutorBase[IT, PT, OT]):
     Parallel exector that uses Threads to parallelize
     """
     def _execute_parallel(self, chunk: List[IT]) -> List[PT]:
-        with concurrent.futures.ThreadPoolExecutor() as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.processes) as executor:
             # Herunterladen der Dateien parallel
             return list(executor.map(self._process_throttled_parallel, chunk))
+
+
+class TokenBucket:
+    """
+    Token bucket that limits the rate of calls, either of the tasks of an asyncio event loop
+    (acquire) or of several threads (wait).
+    The bucket is refilled with `rate` tokens per second and holds at most `capacity` tokens,
+    so at most `capacity` calls are made at once, and `rate` calls per second on average.
+
+    Every call to acquire or wait takes a token. If there is no token left, the token is
+    reserved and the caller sleeps until it is refilled. The tokens are calculated while
+    holding a lock, the sleeping happens outside of it.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0,
+                 clock: Callable[[], float] = monotonic):
+        """
+        Args:
+            rate (float): the number of tokens that are refilled per second, must be positive
+            capacity (float, optional, 1.0): the maximum number of tokens in the bucket
+            clock (Callable[[], float], optional, monotonic): the clock to measure the time
+        """
+        if rate <= 0:
+            raise ValueError(f'rate must be positive, but was {rate}')
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.last_refill = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        takes a token and returns the time to wait until the token is available.
+
+        Returns:
+            float: the seconds to wait, 0.0 if a token was available
+        """
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    async def acquire(self):
+        """
+        waits until a token is available and takes it.
+        """
+        wait_time = self.reserve()
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+    def wait(self):
+        """
+        blocks the calling thread until a token is available and takes it.
+        """
+        wait_time = self.reserve()
+        if wait_time > 0:
+            sleep(wait_time)
+
+
+class AsyncExecutor(ParallelExecutorBase[IT, PT, OT]):
+    """
+    Parallel executor that runs the elements as tasks of an asyncio event loop.
+
+    At most `processes` elements are processed at the same time and a token bucket, which is
+    shared by all tasks of all chunks, makes sure that at most `max_calls_per_sec` elements
+    are started per second. As soon as an element is processed, the next one is started, so there
+    is no waiting for the slowest element of a group of elements like in the ThreadExecutor.
+    The process_element_function is blocking, it runs in a thread pool with `processes`
+    threads.
+    """
+
+    def __init__(self,
+                 processes: int = cpu_count(),
+                 chunksize: int = 100,
+                 max_calls_per_sec: int = 0,
+                 intend: str = "    ",
+                 execute_serial: bool = False):
+        super().__init__(processes=processes, chunksize=chunksize,
+                         max_calls_per_sec=max_calls_per_sec, intend=intend,
+                         execute_serial=execute_serial)
+        self.bucket: Optional[TokenBucket] = None
+        if not execute_serial:
+            # the parallel calls are throttled by the token bucket
+            self.min_roundtrip_time = 0
+            if max_calls_per_sec > 0:
+                self.bucket = TokenBucket(rate=max_calls_per_sec)
+
+    async def _execute_async(self, chunk: List[IT]) -> List[PT]:
+        loop = asyncio.get_event_loop()
+        semaphore = asyncio.Semaphore(self.processes)
+        bucket = self.bucket
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.processes) as pool:
+            async def process(entry: IT) -> PT:
+                async with semaphore:
+                    if bucket is not None:
+                        await bucket.acquire()
+                    return await loop.run_in_executor(pool, self._process_throttled_parallel,
+                                                      entry)
+
+            return list(await asyncio.gather(*[process(entry) for entry in chunk]))
+
+    def _execute_parallel(self, chunk: List[IT]) -> List[PT]:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._execute_async(chunk))
+
+        # there is already a running event loop in this thread (e.g. in a jupyter notebook),
+        # so the tasks need their own event loop in a separate thread.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as loop_thread:
+            return loop_thread.submit(asyncio.run, self._execute_async(chunk)).result()
@@ -0,0 +1,491 @@
+"""
+helper utils to read parquet files with filters.
+
+The filters are pushed down to the row groups of the parquet files: row groups whose
+column statistics (min/max) show that they cannot contain matching rows are not read
+at all. The read functions report how many row groups could be skipped that way.
+
+The row groups are selected directly based on the min/max statistics, since pyarrow
+doesn't use the statistics of dictionary encoded columns (compact schema) to skip row groups.
+
+If the row groups that contain the searched rows are already known (for instance from the
+row group locations the indexer records for every report), read_row_groups_df reads exactly
+these row groups without discovering the whole dataset. Since the files can be rewritten after
+the row groups were located, a validator of the files is recorded together with the locations,
+and read_row_groups_df refuses to read locations whose validator doesn't match anymore.
+"""
+import glob
+import hashlib
+import os
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+COMPRESSION_ZSTD = 'zstd'
+COMPRESSION_LZ4 = 'lz4'
+COMPRESSION_SNAPPY = 'snappy'
+COMPRESSION_NONE = 'none'
+
+COMPRESSION_CODECS = [COMPRESSION_ZSTD, COMPRESSION_LZ4, COMPRESSION_SNAPPY, COMPRESSION_NONE]
+
+# the codecs that support a compression level
+COMPRESSION_CODECS_WITH_LEVEL = [COMPRESSION_ZSTD]
+
+DEFAULT_COMPRESSION = COMPRESSION_SNAPPY
+
+
+def get_compression_options(compression: str = DEFAULT_COMPRESSION,
+                            compression_level: Optional[int] = None) -> Dict[str, Any]:
+    """
+    validates the compression codec and level and returns them as options that can be
+    passed to pq.ParquetWriter, pq.write_table, and pd.DataFrame.to_parquet.
+
+    Args:
+        compression (str, optional, 'snappy'): the codec: 'zstd', 'lz4', 'snappy', or 'none'
+        compression_level (int, optional, None): the compression level, only supported by zstd.
+            the default level of the codec is used if not set.
+
+    Returns:
+        Dict[str, Any]: the compression options
+    """
+    if compression not in COMPRESSION_CODECS:
+        raise ValueError(f'unknown compression {compression}. '
+                         f'Allowed values are {COMPRESSION_CODECS}')
+
+    options: Dict[str, Any] = {'compression': None if compression == COMPRESSION_NONE
+                               else compression}
+    if compression_level is not None:
+        if compression not in COMPRESSION_CODECS_WITH_LEVEL:
+            raise ValueError(f'compression {compression} does not support a compression level')
+        options['compression_level'] = compression_level
+    return options
+
+
+@dataclass
+class ParquetReadStats:
+    """
+    Contains the information how many row groups of a parquet file (or a directory
+    of parquet files) had to be read.
+    """
+    path: str
+    row_groups_total: int
+    row_groups_read: int
+
+    @property
+    def row_groups_skipped(self) -> int:
+        """ the number of row groups that were not read thanks to the filters """
+        return self.row_groups_total - self.row_groups_read
+
+
+def _value_in_range(value, min_value, max_value) -> bool:
+    try:
+        return min_value <= value <= max_value
+    except TypeError:
+        # not comparable, so we cannot exclude the row group
+        return True
+
+
+def _values_in_range(sorted_values: List, min_value, max_value) -> bool:
+    try:
+        index = bisect_left(sorted_values, min_value)
+        return (index < len(sorted_values)) and (sorted_values[index] <= max_value)
+    except TypeError:
+        # not comparable, so we cannot exclude the row group
+        return True
+
+
+def _row_group_may_match(statistics: Optional[Dict[str, Dict[str, Any]]],
+                         filters: List[Tuple[str, str, Any]]) -> bool:
+    """
+    checks whether a row group with the provided column statistics can contain rows
+    that match all the filters. Only '==' and 'in' filters are evaluated, all other
+    filters are regarded as matching.
+    """
+    if not statistics:
+        return True
+
+    for column, operator, value in filters:
+        column_stats = statistics.get(column)
+        if not column_stats or (column_stats.get('min') is None) \
+                or (column_stats.get('max') is None):
+            continue
+
+        if operator in ('=', '=='):
+            if not _value_in_range(value, column_stats['min'], column_stats['max']):
+                return False
+        elif operator == 'in':
+            if not _values_in_range(value, column_stats['min'], column_stats['max']):
+                return False
+    return True
+
+
+def _get_partition_columns(fragments: List[ds.Fragment]) -> List[str]:
+    partition_columns: List[str] = []
+    for fragment in fragments:
+        for column in ds.get_partition_keys(fragment.partition_expression):
+            if column not in partition_columns:
+                partition_columns.append(column)
+    return partition_columns
+
+
+def _select_row_groups(fragment: ds.ParquetFileFragment,
+                       filters: List[Tuple[str, str, Any]]) -> List[int]:
+    return [row_group.id for row_group in fragment.row_groups
+            if _row_group_may_match(row_group.statistics, filters)]
+
+
+def read_table_with_stats(path: str, filters: Optional[List] = None,
+                          partition_filters: Optional[List] = None,
+                          columns: Optional[List[str]] = None) \
+        -> Tuple[pa.Table, ParquetReadStats]:
+    """
+    reads the parquet file (or the directory with parquet files) at path into an arrow table.
+    Only the row groups which can contain rows matching the filters are read.
+
+    If path is a directory with hive partitions, whole partitions are skipped based on the
+    partition_filters. Partition filters on columns the data is not partitioned by are ignored,
+    so that the same partition filters can be used for partitioned and not partitioned data.
+    The partition columns are not part of the returned table.
+
+    Args:
+        path (str): path to the parquet file or directory
+        filters (List[Tuple], optional, None): list of (column, operator, value) filters
+            that all have to match, as they are also used for pd.read_parquet
+        partition_filters (List[Tuple], optional, None): list of (column, operator, value)
+            filters on the partition columns
+        columns (List[str], optional, None): the columns to read, all columns if not set.
+            Only these columns are read from the files.
+
+    Returns:
+        Tuple[pa.Table, ParquetReadStats]: the read table and the read statistics
+    """
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    fragments = list(dataset.get_fragments())
+    partition_columns = _get_partition_columns(fragments)
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name not in partition_columns]
+
+    applied_partition_filters = [partition_filter for partition_filter in partition_filters or []
+                                 if partition_filter[0] in partition_columns]
+    expression = pq.filters_to_expression((filters or []) + applied_partition_filters) \
+        if (filters or applied_partition_filters) else None
+
+    # the values of 'in' filters are sorted once, so that they can be checked with bisect
+    sorted_filters = [(column, operator, sorted(value) if operator == 'in' else value)
+                      for column, operator, value in (filters or [])]
+
+    matching_paths = {fragment.path for fragment in dataset.get_fragments(filter=expression)} \
+        if applied_partition_filters else None
+
+    stats = ParquetReadStats(path=path, row_groups_total=0, row_groups_read=0)
+    tables: List[pa.Table] = []
+    for fragment in fragments:
+        stats.row_groups_total += fragment.num_row_groups
+
+        if (matching_paths is not None) and (fragment.path not in matching_paths):
+            continue
+
+        row_group_ids = _select_row_groups(fragment, sorted_filters)
+        stats.row_groups_read += len(row_group_ids)
+
+        if len(row_group_ids) > 0:
+            fragment = fragment.subset(row_group_ids=row_group_ids)
+            tables.append(fragment.to_table(columns=columns, filter=expression,
+                                            schema=dataset.schema))
+
+    if len(tables) == 0:
+        tables.append(pa.schema([dataset.schema.field(name) for name in columns],
+                                metadata=dataset.schema.metadata).empty_table())
+    return pa.concat_tables(tables), stats
+
+
+def read_df_with_stats(path: str, filters: Optional[List] = None,
+                       partition_filters: Optional[List] = None,
+                       columns: Optional[List[str]] = None) \
+        -> Tuple[pd.DataFrame, ParquetReadStats]:
+    """
+    reads the parquet file (or the directory with parquet files) at path into a dataframe.
+    Only the row groups which can contain rows matching the filters are read.
+    See read_table_with_stats for details.
+
+    Args:
+        path (str): path to the parquet file or directory
+        filters (List[Tuple], optional, None): list of (column, operator, value) filters
+            that all have to match, as they are also used for pd.read_parquet
+        partition_filters (List[Tuple], optional, None): list of (column, operator, value)
+            filters on the partition columns
+        columns (List[str], optional, None): the columns to read, all columns if not set
+
+    Returns:
+        Tuple[pd.DataFrame, ParquetReadStats]: the read dataframe and the read statistics
+    """
+    table, stats = read_table_with_stats(path=path, filters=filters,
+                                         partition_filters=partition_filters, columns=columns)
+    return table.to_pandas(), stats
+
+
+def read_parquet_df(path: str, filters: Optional[List] = None,
+                    columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    reads the parquet file (or the directory with hive partitioned parquet files) at path into
+    a dataframe. In contrast to pd.read_parquet, the partition columns are not part of the
+    returned dataframe.
+
+    Args:
+        path (str): path to the parquet file or directory
+        filters (List[Tuple], optional, None): list of (column, operator, value) filters
+            that all have to match, as they are also used for pd.read_parquet
+        columns (List[str], optional, None): the columns to read, all columns if not set
+
+    Returns:
+        pd.DataFrame: the read dataframe
+    """
+    data_df, _ = read_df_with_stats(path=path, filters=filters, columns=columns)
+    return data_df
+
+
+# maps the path of a parquet file, relative to the path of the dataset, to row group ids.
+# the relative path of a dataset that consists of a single file is ''
+RowGroupLocations = Dict[str, List[int]]
+
+
+def _get_relative_path(path: str, fragment_path: str) -> str:
+    if os.path.isfile(path):
+        return ''
+    return os.path.relpath(fragment_path, path).replace(os.sep, '/')
+
+
+def get_parquet_files(path: str) -> List[str]:
+    """
+    returns the path itself, if it is a parquet file, or the parquet files in the directory
+    at path, including the files in hive partitions.
+
+    Args:
+        path (str): path to the parquet file or directory
+
+    Returns:
+        List[str]: the sorted paths of the parquet files, empty if path doesn't exist
+    """
+    if os.path.isfile(path):
+        return [path]
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, '**', '*.parquet'), recursive=True))
+    return []
+
+
+def get_row_groups_validator(path: str) -> str:
+    """
+    returns a validator of the parquet file (or the directory with parquet files) at path.
+    It is derived from the names, sizes, and modification times of the files, so it changes
+    whenever a file is rewritten, but computing it doesn't read the files.
+
+    Args:
+        path (str): path to the parquet file or directory
+
+    Returns:
+        str: the validator
+    """
+    sha256 = hashlib.sha256()
+    for file_path in get_parquet_files(path):
+        stat = os.stat(file_path)
+        sha256.update(f'{_get_relative_path(path, file_path)}:{stat.st_size}:'
+                      f'{stat.st_mtime_ns};'.encode('utf-8'))
+    return sha256.hexdigest()
+
+
+def locate_row_groups(path: str, column: str, values: List[Any]) \
+        -> Optional[Dict[Any, RowGroupLocations]]:
+    """
+    finds the row groups that may contain each of the provided values, only based on the
+    min/max statistics of the column. The data itself is not read.
+    This is only useful if the data is sorted by the column, otherwise the ranges of the row
+    groups overlap and the values are located in many row groups.
+
+    Args:
+        path (str): path to the parquet file or directory
+        column (str): the column, for instance 'adsh'
+        values (List[Any]): the values to locate
+
+    Returns:
+        Optional[Dict[Any, RowGroupLocations]]: the row group locations of every value that
+            may be present, or None if a row group has no statistics for the column
+    """
+    sorted_values = sorted(set(values))
+    locations: Dict[Any, RowGroupLocations] = {}
+
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    for fragment in dataset.get_fragments():
+        relative_path = _get_relative_path(path, fragment.path)
+        for row_group in fragment.row_groups:
+            column_stats = (row_group.statistics or {}).get(column)
+            if not column_stats or (column_stats.get('min') is None) \
+                    or (column_stats.get('max') is None):
+                return None
+            start = bisect_left(sorted_values, column_stats['min'])
+            end = bisect_right(sorted_values, column_stats['max'])
+            for value in sorted_values[start:end]:
+                locations.setdefault(value, {}).setdefault(relative_path, []) \
+                    .append(row_group.id)
+    return locations
+
+
+def get_row_count(path: str) -> int:
+    """
+    returns the number of rows of the parquet file (or the directory with parquet files),
+    only based on the metadata in the footers.
+
+    Args:
+        path (str): path to the parquet file or directory
+
+    Returns:
+        int: the number of rows
+    """
+    return ds.dataset(path, format='parquet', partitioning='hive').count_rows()
+
+
+def get_min_max(path: str, column: str) -> Optional[Tuple[Any, Any]]:
+    """
+    returns the minimum and maximum of a column, only based on the statistics of the
+    row groups.
+
+    Args:
+        path (str): path to the parquet file or directory
+        column (str): the column, for instance 'ddate'
+
+    Returns:
+        Optional[Tuple[Any, Any]]: minimum and maximum, or None if there are no rows or
+            a row group has no statistics for the column
+    """
+    minimum, maximum = None, None
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    for fragment in dataset.get_fragments():
+        for row_group in fragment.row_groups:
+            column_stats = (row_group.statistics or {}).get(column)
+            if not column_stats or (column_stats.get('min') is None) \
+                    or (column_stats.get('max') is None):
+                return None
+            minimum = column_stats['min'] if minimum is None \
+                else min(minimum, column_stats['min'])
+            maximum = column_stats['max'] if maximum is None \
+                else max(maximum, column_stats['max'])
+    return None if minimum is None else (minimum, maximum)
+
+
+def count_values_per_row_group(path: str, column: str) \
+        -> Dict[Any, Tuple[RowGroupLocations, int]]:
+    """
+    finds the row groups that contain each value of the column and counts the rows per value.
+    In contrast to locate_row_groups, the column itself is read, so the data doesn't have
+    to be sorted by the column.
+
+    Args:
+        path (str): path to the parquet file or directory
+        column (str): the column, for instance 'tag'
+
+    Returns:
+        Dict[Any, Tuple[RowGroupLocations, int]]: the row group locations and the number
+            of rows of every value
+    """
+    result: Dict[Any, Tuple[RowGroupLocations, int]] = {}
+
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    for fragment in dataset.get_fragments():
+        relative_path = _get_relative_path(path, fragment.path)
+        parquet_file = pq.ParquetFile(fragment.path)
+        for row_group_id in range(parquet_file.num_row_groups):
+            values = parquet_file.read_row_group(row_group_id, columns=[column]) \
+                .column(column).combine_chunks()
+            if pa.types.is_dictionary(values.type):
+                values = values.dictionary_decode()
+            counts = pc.value_counts(values)  # pylint: disable=no-member
+            for value, count in zip(counts.field('values').to_pylist(),
+                                    counts.field('counts').to_pylist()):
+                if value is None:
+                    continue
+                locations, rows = result.get(value, ({}, 0))
+                locations.setdefault(relative_path, []).append(row_group_id)
+                result[value] = (locations, rows + count)
+    return result
+
+
+def _get_hive_keys(relative_path: str) -> Dict[str, str]:
+    return dict(part.split('=', 1) for part in relative_path.split('/')[:-1] if '=' in part)
+
+
+def _partition_may_match(hive_keys: Dict[str, str],
+                         partition_filters: List[Tuple[str, str, Any]]) -> bool:
+    for column, operator, value in partition_filters:
+        if column not in hive_keys:
+            continue
+        if operator in ('=', '==') and hive_keys[column] != str(value):
+            return False
+        if operator == 'in' and hive_keys[column] not in {str(entry) for entry in value}:
+            return False
+    return True
+
+
+def read_row_groups_df(path: str, locations: RowGroupLocations,
+                       filters: Optional[List] = None,
+                       partition_filters: Optional[List] = None,
+                       validator: Optional[str] = None) \
+        -> Tuple[pd.DataFrame, ParquetReadStats]:
+    """
+    reads the row groups in locations of the parquet file (or the directory with parquet
+    files) at path into a dataframe. Only the footers of the files in locations are read,
+    the rest of the dataset is not touched. The filters are applied on the read rows,
+    the partition_filters skip the files in partitions that don't match.
+
+    Args:
+        path (str): path to the parquet file or directory
+        locations (RowGroupLocations): the row groups to read, empty if there are no
+            matching rows
+        filters (List[Tuple], optional, None): list of (column, operator, value) filters
+            that all have to match, as they are also used for pd.read_parquet
+        partition_filters (List[Tuple], optional, None): list of (column, operator, value)
+            filters on the partition columns
+        validator (str, optional, None): the validator of the files at the time the row
+            groups were located, see get_row_groups_validator. Not checked if not set.
+
+    Returns:
+        Tuple[pd.DataFrame, ParquetReadStats]: the read dataframe and the read statistics
+
+    Raises:
+        ValueError: if the files were changed since the row groups were located
+    """
+    if (validator is not None) and (validator != get_row_groups_validator(path)):
+        raise ValueError(f'{path} was changed since its row groups were located')
+
+    stats = ParquetReadStats(path=path, row_groups_total=0, row_groups_read=0)
+    expression = pq.filters_to_expression(filters) if filters else None
+
+    tables: List[pa.Table] = []
+    schema: Optional[pa.Schema] = None
+    for relative_path, row_group_ids in sorted(locations.items()):
+        parquet_file = pq.ParquetFile(os.path.join(path, relative_path) if relative_path
+                                      else path)
+        schema = parquet_file.schema_arrow
+        if any(row_group_id >= parquet_file.num_row_groups for row_group_id in row_group_ids):
+            raise ValueError(f'{path} has only {parquet_file.num_row_groups} row groups in '
+                             f'{relative_path or "the file"}')
+        stats.row_groups_total += len(row_group_ids)
+        if not _partition_may_match(_get_hive_keys(relative_path), partition_filters or []):
+            continue
+
+        stats.row_groups_read += len(row_group_ids)
+        table = parquet_file.read_row_groups(row_group_ids)
+        tables.append(table.filter(expression) if expression is not None else table)
+
+    if len(tables) == 0:
+        if schema is None:
+            # no rows at all, the schema for the columns of the empty result is read from
+            # the footer of the first file, it doesn't contain the partition columns
+            schema = pq.read_schema(get_parquet_files(path)[0])
+        tables.append(schema.empty_table())
+    return pa.concat_tables(tables).to_pandas(), stats
@@ -0,0 +1,327 @@
+"""
+retry policy for http requests: exponential backoff with jitter, Retry-After and 429 handling,
+and a circuit breaker per host.
+
+The delay before the n-th retry is base_delay * multiplier^(n-1), at most max_delay, of which
+a random share (jitter) is subtracted, so that parallel downloads don't retry at the same time.
+If the server answers with 429 Too Many Requests or 503 Service Unavailable and sends a
+Retry-After header, the delay requested by the server is used instead, without applying
+max_delay or jitter. If the server asks to wait longer than max_retry_after, the request is
+not retried but fails immediately.
+
+Requests that fail with a connection error, a timeout, or a 5xx status other than 503 count
+as failures of the host. Throttling (429 and 503) and client errors don't, since the host
+answered. After failure_threshold consecutive failures, the circuit of the host opens and
+every request to the host fails immediately with a CircuitOpenError, until reset_timeout
+seconds have passed. Then a single request is let through: if it succeeds, the circuit
+closes again, otherwise it stays open for another reset_timeout. If the single request
+fails with an error that is not a RequestException, the circuit stays open, but the next
+request is let through again.
+
+The counters of the policy (RetryStats) tell how many retries were made and how long was
+spent backing off.
+"""
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional, TypeVar
+from urllib.parse import urlparse
+
+import requests
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# status codes with which a request is retried
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# status codes that tell that the server throttles the requests
+THROTTLE_STATUS_CODES = {429, 503}
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    raised, if a request is not made since the circuit of its host is open.
+    """
+
+
+@dataclass
+class RetryStats:
+    """
+    The counters of a RetryPolicy.
+    """
+    attempts: int = 0
+    retries: int = 0
+    failures: int = 0
+    throttled: int = 0
+    backoff_seconds: float = 0.0
+    circuit_opened: int = 0
+    circuit_rejections: int = 0
+
+
+@dataclass
+class _HostCircuit:
+    consecutive_failures: int = 0
+    open_until: Optional[float] = None
+    half_open: bool = False
+
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    """
+    parses the value of a Retry-After header, which is either a number of seconds or
+    a http date.
+
+    Args:
+        value (str, optional): the value of the header
+        now (datetime, optional, None): the current time, used for a http date
+
+    Returns:
+        Optional[float]: the seconds to wait, None if the value is missing or invalid
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at is None:
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+def _get_status_code(err: Exception) -> Optional[int]:
+    response = getattr(err, 'response', None)
+    return response.status_code if response is not None else None
+
+
+def _get_retry_after(err: Optional[Exception]) -> Optional[float]:
+    if _get_status_code(err) not in THROTTLE_STATUS_CODES:
+        return None
+    return parse_retry_after(err.response.headers.get('Retry-After'))
+
+
+class RetryPolicy:
+    """
+    Executes an action, like a http request, and retries it with exponential backoff.
+    The policy is thread safe and is meant to be shared by all downloads.
+    """
+
+    def __init__(self,
+                 max_tries: int = 6,
+                 base_delay: float = 1.0,
+                 multiplier: float = 2.0,
+                 max_delay: float = 60.0,
+                 max_retry_after: float = 300.0,
+                 jitter: float = 0.5,
+                 failure_threshold: int = 10,
+                 reset_timeout: float = 60.0,
+                 sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.monotonic,
+                 rand: Callable[[], float] = random.random):
+        """
+        Args:
+            max_tries (int, optional, 6): maximum number of tries of an action
+            base_delay (float, optional, 1.0): the delay before the first retry in seconds
+            multiplier (float, optional, 2.0): factor by which the delay grows with every retry
+            max_delay (float, optional, 60.0): the maximum calculated delay
+            max_retry_after (float, optional, 300.0): the maximum delay requested by the
+              server with Retry-After, the request fails immediately if it asks for longer
+            jitter (float, optional, 0.5): the share of the delay that is randomized,
+              0 means no jitter, 1 means a random delay between 0 and the calculated delay
+            failure_threshold (int, optional, 10): the number of consecutive failures after
+              which the circuit of a host opens, 0 disables the circuit breaker
+            reset_timeout (float, optional, 60.0): the seconds a circuit stays open
+            sleep (Callable[[float], None], optional, time.sleep): the sleep function
+            clock (Callable[[], float], optional, time.monotonic): the clock of the circuits
+            rand (Callable[[], float], optional, random.random): random number in [0, 1)
+        """
+        if max_tries < 1:
+            raise ValueError(f'max_tries must be at least 1, but was {max_tries}')
+        if not 0.0 <= jitter <= 1.0:
+            raise ValueError(f'jitter must be between 0 and 1, but was {jitter}')
+        self.max_tries = max_tries
+        self.base_delay = base_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.jitter = jitter
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.sleep = sleep
+        self.clock = clock
+        self.rand = rand
+
+        self._lock = threading.Lock()
+        self._circuits: Dict[str, _HostCircuit] = {}
+        self._stats = RetryStats()
+
+    def __getstate__(self):
+        # the lock can't be pickled, the copy starts with closed circuits and new counters
+        state = self.__dict__.copy()
+        for key in ['_lock', '_circuits', '_stats']:
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._circuits = {}
+        self._stats = RetryStats()
+
+    def get_stats(self) -> RetryStats:
+        """
+        returns a copy of the counters.
+
+        Returns:
+            RetryStats: the counters
+        """
+        with self._lock:
+            return replace(self._stats)
+
+    @staticmethod
+    def is_retryable(err: Exception) -> bool:
+        """
+        checks whether a failed request should be retried: connection errors, timeouts,
+        incomplete responses, and the status codes in RETRY_STATUS_CODES.
+
+        Args:
+            err (Exception): the error of the request
+
+        Returns:
+            bool: True if the request should be retried
+        """
+        if isinstance(err, CircuitOpenError):
+            return False
+        if isinstance(err, requests.exceptions.HTTPError):
+            return _get_status_code(err) in RETRY_STATUS_CODES
+        return isinstance(err, requests.exceptions.RequestException)
+
+    def compute_delay(self, retry: int, err: Optional[Exception] = None,
+                      base_delay: Optional[float] = None) -> float:
+        """
+        calculates the delay before a retry. The delay requested by the server with
+        Retry-After is returned as it is.
+
+        Args:
+            retry (int): the number of the retry, starting with 1
+            err (Exception, optional, None): the error of the failed request
+            base_delay (float, optional, None): overrides the base_delay of the policy
+
+        Returns:
+            float: the delay in seconds
+        """
+        retry_after = _get_retry_after(err)
+        if retry_after is not None:
+            return retry_after
+
+        base_delay = self.base_delay if base_delay is None else base_delay
+        delay = min(self.max_delay, base_delay * (self.multiplier ** (retry - 1)))
+        return delay * (1.0 - self.jitter * self.rand())
+
+    def _check_circuit(self, host: str):
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if (circuit is None) or (circuit.open_until is None):
+                return
+            if (self.clock() < circuit.open_until) or circuit.half_open:
+                self._stats.circuit_rejections += 1
+                raise CircuitOpenError(f'circuit for {host} is open')
+            # the reset timeout has passed, let a single request through
+            circuit.half_open = True
+
+    def _record_success(self, host: str):
+        with self._lock:
+            self._circuits.pop(host, None)
+
+    def _release_probe(self, host: str):
+        # the single request failed without telling anything about the host
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is not None:
+                circuit.half_open = False
+
+    def _record_failure(self, host: str, err: Exception):
+        with self._lock:
+            self._stats.failures += 1
+            if _get_status_code(err) in THROTTLE_STATUS_CODES:
+                self._stats.throttled += 1
+            if self.failure_threshold <= 0:
+                return
+            if (_get_status_code(err) in THROTTLE_STATUS_CODES) or not self.is_retryable(err):
+                # the host answered, throttling and client errors are no failures of the host
+                self._circuits.pop(host, None)
+                return
+            circuit = self._circuits.setdefault(host, _HostCircuit())
+            circuit.consecutive_failures += 1
+            if circuit.half_open or (circuit.consecutive_failures >= self.failure_threshold):
+                circuit.open_until = self.clock() + self.reset_timeout
+                circuit.half_open = False
+                self._stats.circuit_opened += 1
+                LOGGER.warning('circuit for %s opened after %d failures, retry after %.0fs',
+                               host, circuit.consecutive_failures, self.reset_timeout)
+
+    def execute(self, url: str, action: Callable[[], T],
+                max_tries: Optional[int] = None,
+                base_delay: Optional[float] = None) -> T:
+        """
+        executes the action, which requests the url, and retries it if it fails with an
+        error that is retryable.
+
+        Args:
+            url (str): the requested url, its host identifies the circuit
+            action (Callable[[], T]): the action
+            max_tries (int, optional, None): overrides the max_tries of the policy
+            base_delay (float, optional, None): overrides the base_delay of the policy
+
+        Returns:
+            T: the result of the action
+        """
+        host = urlparse(url).netloc
+        max_tries = self.max_tries if max_tries is None else max_tries
+        current_try = 0
+        while True:
+            current_try += 1
+            self._check_circuit(host)
+            with self._lock:
+                self._stats.attempts += 1
+            try:
+                result = action()
+            except requests.exceptions.RequestException as err:
+                self._record_failure(host, err)
+                if (current_try >= max_tries) or not self.is_retryable(err):
+                    LOGGER.info('RequestException: failed to download %s', url)
+                    raise err
+
+                retry_after = _get_retry_after(err)
+                if (retry_after is not None) and (retry_after > self.max_retry_after):
+                    LOGGER.info('server asks to wait %.0fs for %s, more than %.0fs: giving up',
+                                retry_after, url, self.max_retry_after)
+                    raise err
+
+                delay = self.compute_delay(current_try, err, base_delay=base_delay)
+                with self._lock:
+                    self._stats.retries += 1
+                    self._stats.backoff_seconds += delay
+                LOGGER.info('request to %s failed (%s), retry %d in %.1fs', url, err,
+                            current_try, delay)
+                self.sleep(delay)
+                continue
+            except Exception:
+                self._release_probe(host)
+                raise
+
+            self._record_success(host)
+            return result
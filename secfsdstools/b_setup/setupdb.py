@@ -5,6 +5,7 @@ Creation of the database.
 import glob
 import logging
 import os
+import sqlite3
 from typing import Dict
 
 from secfsdstools.a_utils.dbutils import DB
@@ -49,6 +50,14 @@ class DbCreator(DB):
             with open(sqlfile, 'r', encoding='utf8') as scriptfile:
                 script = scriptfile.read()
                 LOGGER.debug("execute creation script %s", sqlfile)
-                curr.executescript(script)
+                try:
+                    curr.executescript(script)
+                except sqlite3.OperationalError as err:
+                    # the full text search is optional, since not every sqlite build
+                    # contains the fts5 extension
+                    if 'fts5' not in str(err):
+                        raise
+                    LOGGER.warning("fts5 is not available, skipping creation script %s",
+                                   sqlfile)
             conn.commit()
         conn.close()
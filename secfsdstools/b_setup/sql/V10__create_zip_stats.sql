@@ -0,0 +1,11 @@
+-- statistics about the content of every indexed zip file, used to plan the reading of zip files.
+-- category is one of rows, bytes (key is the file, like num.txt), form, stmt, uom (key is the
+-- value, value is the number of rows), min, max (key is the column, like period or ddate)
+CREATE TABLE IF NOT EXISTS index_parquet_zip_stats
+(
+    fileName,
+    category,
+    key,
+    value,
+    PRIMARY KEY (fileName, category, key)
+) WITHOUT ROWID;
@@ -0,0 +1,17 @@
+-- the fingerprint of every indexed folder, a folder whose fingerprint changed is indexed again
+CREATE TABLE IF NOT EXISTS index_parquet_fingerprints
+(
+    fileName,
+    fingerprint,
+    PRIMARY KEY (fileName)
+) WITHOUT ROWID;
+
+-- the entries of a folder are replaced when it is indexed again
+CREATE INDEX IF NOT EXISTS idx_parquet_reports_origin_file
+    ON index_parquet_reports (originFile);
+
+CREATE INDEX IF NOT EXISTS idx_parquet_row_groups_origin_file
+    ON index_parquet_row_groups (originFile);
+
+CREATE INDEX IF NOT EXISTS idx_parquet_tags_origin_file
+    ON index_parquet_tags (originFile);
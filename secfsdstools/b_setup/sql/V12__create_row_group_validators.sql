@@ -0,0 +1,12 @@
+-- the validators of the parquet files of every indexed folder, recorded together with the row group
+-- locations. source is 'reports' for the locations in index_parquet_row_groups and 'tags' for the
+-- locations in index_parquet_tags, fileName is the file, like num.txt. The row group locations of a
+-- file are only used as long as its validator still matches.
+CREATE TABLE IF NOT EXISTS index_parquet_validators
+(
+    originFile,
+    source,
+    fileName,
+    validator,
+    PRIMARY KEY (originFile, source, fileName)
+) WITHOUT ROWID;
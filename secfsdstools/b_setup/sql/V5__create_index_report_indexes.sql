@@ -0,0 +1,15 @@
+-- write ahead logging allows to read the index while it is being updated
+-- and makes committing a transaction considerably faster
+PRAGMA journal_mode = WAL;
+
+CREATE INDEX IF NOT EXISTS idx_parquet_reports_cik
+    ON index_parquet_reports (cik);
+
+CREATE INDEX IF NOT EXISTS idx_parquet_reports_cik_form_period
+    ON index_parquet_reports (cik, form, period);
+
+CREATE INDEX IF NOT EXISTS idx_parquet_reports_filed
+    ON index_parquet_reports (filed);
+
+CREATE INDEX IF NOT EXISTS idx_parquet_reports_name
+    ON index_parquet_reports (name);
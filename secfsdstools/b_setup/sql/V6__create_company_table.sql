@@ -0,0 +1,15 @@
+-- one entry per company and name, a company that changed its name has several entries
+CREATE TABLE IF NOT EXISTS index_parquet_companies
+(
+    cik,
+    name,
+    filed,
+    PRIMARY KEY (cik, name)
+);
+
+-- fill the table from the already indexed reports when it is created
+INSERT OR IGNORE INTO index_parquet_companies (cik, name, filed)
+SELECT cik, name, MAX(filed)
+FROM index_parquet_reports
+WHERE NOT EXISTS (SELECT 1 FROM index_parquet_companies)
+GROUP BY cik, name;
@@ -0,0 +1,34 @@
+-- full text index on the company names, it requires the fts5 extension of sqlite.
+-- if the extension is not available, the company search falls back to a like query.
+CREATE VIRTUAL TABLE IF NOT EXISTS index_parquet_companies_fts USING fts5
+(
+    name,
+    content='index_parquet_companies',
+    tokenize='unicode61 remove_diacritics 1',
+    prefix='1 2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS index_parquet_companies_ai AFTER INSERT ON index_parquet_companies
+BEGIN
+    INSERT INTO index_parquet_companies_fts (rowid, name) VALUES (new.rowid, new.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS index_parquet_companies_ad AFTER DELETE ON index_parquet_companies
+BEGIN
+    INSERT INTO index_parquet_companies_fts (index_parquet_companies_fts, rowid, name)
+    VALUES ('delete', old.rowid, old.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS index_parquet_companies_au AFTER UPDATE OF name ON index_parquet_companies
+BEGIN
+    INSERT INTO index_parquet_companies_fts (index_parquet_companies_fts, rowid, name)
+    VALUES ('delete', old.rowid, old.name);
+    INSERT INTO index_parquet_companies_fts (rowid, name) VALUES (new.rowid, new.name);
+END;
+
+-- the full text index is only rebuilt, if it is not in sync with the company table,
+-- for instance directly after it was created for an existing company table
+INSERT INTO index_parquet_companies_fts (index_parquet_companies_fts)
+SELECT 'rebuild'
+WHERE (SELECT COUNT(*) FROM index_parquet_companies_fts_docsize)
+      != (SELECT COUNT(*) FROM index_parquet_companies);
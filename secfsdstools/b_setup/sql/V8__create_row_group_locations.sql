@@ -0,0 +1,9 @@
+-- the row groups of the sub, pre, num, and pre_num parquet files that contain the rows of a report.
+-- locations is a json object: {"<file>": {"<path relative to the file>": [<row group ids>]}}
+CREATE TABLE IF NOT EXISTS index_parquet_row_groups
+(
+    adsh,
+    originFile,
+    locations,
+    PRIMARY KEY (adsh, originFile)
+) WITHOUT ROWID;
@@ -0,0 +1,19 @@
+-- inverted index: the row groups of pre.txt and num.txt of every zip file that contain a tag.
+-- locations is a json object: {"<path relative to the file>": [<row group ids>]}
+CREATE TABLE IF NOT EXISTS index_parquet_tags
+(
+    tag,
+    originFile,
+    fileName,
+    locations,
+    rows,
+    PRIMARY KEY (tag, originFile, fileName)
+) WITHOUT ROWID;
+
+-- the zip files whose tags are indexed
+CREATE TABLE IF NOT EXISTS index_parquet_tag_files
+(
+    fileName PRIMARY KEY,
+    tags,
+    processTime
+);
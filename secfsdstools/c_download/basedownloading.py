@@ -2,14 +2,16 @@
 Contains BaseDownloader class.
 """
 
+import contextlib
 import logging
 import os
 from abc import ABC, abstractmethod
-from typing import Tuple, List, Dict
+from typing import Callable, Tuple, List, Dict, Optional
 
 from secfsdstools.a_utils.downloadutils import UrlDownloader
 from secfsdstools.a_utils.fileutils import get_filenames_in_directory, get_directories_in_directory
-from secfsdstools.a_utils.parallelexecution import ThreadExecutor
+from secfsdstools.a_utils.httpcacheutils import HttpMetadataCache
+from secfsdstools.a_utils.parallelexecution import AsyncExecutor
 
 LOGGER = logging.getLogger(__name__)
 
@@ -18,16 +20,44 @@ class BaseDownloader(ABC):
     """
     Base class for Downloaders. Implements basic methods to download files
     from an url and store it.
+
+    A download listener can be registered, which is called for every file as soon
+    as it was downloaded successfully. This allows to process downloaded files while
+    other files are still being downloaded.
+
+    The files are downloaded by at most `download_workers` concurrent downloads. The requests
+    are limited to `max_calls_per_sec` per host by the token buckets of the urldownloader, which
+    are shared by all downloaders that use the same urldownloader.
+
+    If a http_cache is provided, the list of the available files is requested with a
+    conditional request and only downloaded and parsed again if it was modified.
+    If it was not modified since the last download that downloaded all files, nothing is
+    downloaded and the download folders are not scanned at all. A download that downloaded
+    all files is marked by the file COMPLETED_MARKER in the zip_dir.
     """
+    COMPLETED_MARKER = '.download_completed'
 
     def __init__(self, zip_dir: str,
                  parquet_dir_typed: str,
                  urldownloader: UrlDownloader,
-                 execute_serial: bool = False):
+                 execute_serial: bool = False,
+                 download_workers: int = 3,
+                 max_calls_per_sec: int = 8,
+                 http_cache: Optional[HttpMetadataCache] = None):
         self.urldownloader = urldownloader
+        self.http_cache = http_cache
         self.parquet_dir_typed = parquet_dir_typed
 
         self.execute_serial = execute_serial
+        self.download_workers = download_workers
+        self.max_calls_per_sec = max_calls_per_sec
+        self.urldownloader.set_max_calls_per_sec(max_calls_per_sec)
+
+        self.download_listener: Optional[Callable[[str, str], None]] = None
+
+        # whether the list of the available files was modified, set by the subclasses
+        # whenever they request the list
+        self.listing_modified = True
 
         self.result = None
 
@@ -37,6 +67,17 @@ class BaseDownloader(ABC):
             LOGGER.info("creating download folder: %s", self.zip_dir)
             os.makedirs(self.zip_dir)
 
+    def set_download_listener(self, download_listener: Callable[[str, str], None]):
+        """
+        set the function that is called for every successfully downloaded file.
+        the function receives the name and the path of the downloaded file and is called
+        from the download threads.
+
+        Args:
+            download_listener (Callable[[str, str], None]): the listener function
+        """
+        self.download_listener = download_listener
+
     def _get_headers(self) -> Dict[str, str]:
         return {}
 
@@ -55,7 +96,11 @@ class BaseDownloader(ABC):
         url: str = data[1]
 
         LOGGER.info('    start to download %s ', file)
-        return self._download_zip(url=url, file=file)
+        result = self._download_zip(url=url, file=file)
+
+        if (result == 'success') and (self.download_listener is not None):
+            self.download_listener(file, os.path.join(self.zip_dir, file))
+        return result
 
     def _get_downloaded_zips(self) -> List[str]:
         return get_filenames_in_directory(os.path.join(self.zip_dir, '*.zip'))
@@ -67,15 +112,40 @@ class BaseDownloader(ABC):
     def _calculate_missing_zips(self) -> List[Tuple[str, str]]:
         pass
 
+    def _get_available_zips(self) -> List:
+        """
+        requests the list of the available files and sets listing_modified. Only needed for
+        downloaders that are used with a http_cache.
+        """
+        raise NotImplementedError
+
+    def _is_up_to_date(self) -> bool:
+        """
+        checks whether the list of the available files was not modified since the last
+        download that downloaded all files. This is only known with a http_cache.
+        """
+        if (self.http_cache is None) or \
+                not os.path.isfile(os.path.join(self.zip_dir, self.COMPLETED_MARKER)):
+            return False
+        self._get_available_zips()
+        return not self.listing_modified
+
     def download(self):
         """
         downloads the missing quarterly zip files from the sec.
         """
-
-        executor = ThreadExecutor[Tuple[str, str], str, type(None)](
-            processes=3,
-            max_calls_per_sec=8,
-            chunksize=3,
+        marker_file = os.path.join(self.zip_dir, self.COMPLETED_MARKER)
+        if self._is_up_to_date():
+            LOGGER.info('the available files were not modified since the last download, '
+                        'nothing to download')
+            return
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(marker_file)
+
+        # a single chunk, so that a new download starts as soon as any download is finished
+        executor = AsyncExecutor[Tuple[str, str], str, type(None)](
+            processes=self.download_workers,
+            chunksize=0,
             execute_serial=False
             # execute_serial=self.execute_serial
         )
@@ -84,3 +154,12 @@ class BaseDownloader(ABC):
         executor.set_post_process_chunk_function(lambda x: x)
 
         self.result = executor.execute()
+        _, missing = self.result
+        if len(missing) == 0:
+            with open(marker_file, 'w', encoding='utf-8'):
+                pass
+
+        stats = self.urldownloader.retry_policy.get_stats()
+        LOGGER.info('downloads: %d requests, %d retries, %.1fs backing off, %d throttled, '
+                    '%d rejected by open circuits', stats.attempts, stats.retries,
+                    stats.backoff_seconds, stats.throttled, stats.circuit_rejections)
@@ -5,10 +5,11 @@ Logic to download the zipfiles from the rapid api.
 import json
 import logging
 import os
-from typing import List, Tuple, Dict
+from typing import List, Optional, Tuple, Dict
 
 from secfsdstools.a_utils.downloadutils import UrlDownloader
 from secfsdstools.a_utils.fileutils import get_filenames_in_directory
+from secfsdstools.a_utils.httpcacheutils import HttpMetadataCache
 from secfsdstools.a_utils.rapiddownloadutils import RapidUrlBuilder
 from secfsdstools.c_download.basedownloading import BaseDownloader
 
@@ -26,10 +27,16 @@ class RapidZipDownloader(BaseDownloader):
                  qrtr_zip_dir: str,
                  parquet_root_dir: str,
                  urldownloader: UrlDownloader,
-                 execute_serial: bool = False):
+                 execute_serial: bool = False,
+                 download_workers: int = 3,
+                 max_calls_per_sec: int = 8,
+                 http_cache: Optional[HttpMetadataCache] = None):
         super().__init__(zip_dir=daily_zip_dir,
                          urldownloader=urldownloader,
                          execute_serial=execute_serial,
+                         download_workers=download_workers,
+                         max_calls_per_sec=max_calls_per_sec,
+                         http_cache=http_cache,
                          parquet_dir_typed=os.path.join(parquet_root_dir, 'quarter'))
         self.rapidurlbuilder = rapidurlbuilder
 
@@ -43,9 +50,10 @@ class RapidZipDownloader(BaseDownloader):
         return self.rapidurlbuilder.get_headers()
 
     def _get_content(self) -> str:
-        response = self.urldownloader.get_url_content(self.rapidurlbuilder.get_content_url(),
-                                                      headers=self._get_headers())
-        return response.text
+        content, self.listing_modified = self.urldownloader.get_url_content_cached(
+            self.rapidurlbuilder.get_content_url(), parse=lambda response: response.text,
+            cache=self.http_cache, headers=self._get_headers())
+        return content
 
     def _get_latest_quarter_file_name(self):
         files = get_filenames_in_directory(os.path.join(self.qrtr_zip_dir, '*.zip'))
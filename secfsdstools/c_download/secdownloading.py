@@ -4,9 +4,12 @@ Downloading zip files of the financial statement data sets from the sec.
 import logging
 import os
 import re
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+
+import requests
 
 from secfsdstools.a_utils.downloadutils import UrlDownloader
+from secfsdstools.a_utils.httpcacheutils import HttpMetadataCache
 from secfsdstools.c_download.basedownloading import BaseDownloader
 
 LOGGER = logging.getLogger(__name__)
@@ -22,18 +25,27 @@ class SecZipDownloader(BaseDownloader):
     href_re = re.compile("href=\".*?\"", re.IGNORECASE + re.MULTILINE + re.DOTALL)
 
     def __init__(self, zip_dir: str, parquet_root_dir: str,
-                 urldownloader: UrlDownloader, execute_serial: bool = False):
+                 urldownloader: UrlDownloader, execute_serial: bool = False,
+                 download_workers: int = 3, max_calls_per_sec: int = 8,
+                 http_cache: Optional[HttpMetadataCache] = None):
         super().__init__(zip_dir=zip_dir, urldownloader=urldownloader,
                          parquet_dir_typed=os.path.join(parquet_root_dir, 'quarter'),
-                         execute_serial=execute_serial)
+                         execute_serial=execute_serial,
+                         download_workers=download_workers,
+                         max_calls_per_sec=max_calls_per_sec,
+                         http_cache=http_cache)
 
-    def _get_available_zips(self) -> List[Tuple[str, str]]:
-        content = self.urldownloader.get_url_content(self.FIN_STAT_DATASET_URL)
-        first_table = self.table_re.findall(content.text)[0]
+    def _parse_available_zips(self, response: requests.models.Response) -> List[List[str]]:
+        first_table = self.table_re.findall(response.text)[0]
         hrefs = self.href_re.findall(first_table)
 
         hrefs = [f'https://www.sec.gov{href[6:-1]}' for href in hrefs]
-        return [(os.path.basename(href), href) for href in hrefs]
+        return [[os.path.basename(href), href] for href in hrefs]
+
+    def _get_available_zips(self) -> List[Tuple[str, str]]:
+        available_zips, self.listing_modified = self.urldownloader.get_url_content_cached(
+            self.FIN_STAT_DATASET_URL, parse=self._parse_available_zips, cache=self.http_cache)
+        return [tuple(entry) for entry in available_zips]
 
     def _calculate_missing_zips(self) -> List[Tuple[str, str]]:
         downloaded_zip_files = self._get_downloaded_zips()
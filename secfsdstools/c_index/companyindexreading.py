@@ -9,7 +9,9 @@ import pandas as pd
 from secfsdstools.a_config.configmgt import ConfigurationManager
 from secfsdstools.a_config.configmodel import Configuration
 from secfsdstools.c_index.indexdataaccess import IndexReport, ParquetDBIndexingAccessor
+from secfsdstools.c_index.indexsnapshot import get_index_accessor
 from secfsdstools.a_utils.constants import SUB_TXT
+from secfsdstools.a_utils.parquetutils import read_parquet_df
 
 
 class CompanyIndexReader:
@@ -32,7 +34,7 @@ class CompanyIndexReader:
         """
         if configuration is None:
             configuration = ConfigurationManager.read_config_file()
-        dbaccessor = ParquetDBIndexingAccessor(db_dir=configuration.db_dir)
+        dbaccessor = get_index_accessor(configuration)
         return CompanyIndexReader(cik, dbaccessor=dbaccessor)
 
     def __init__(self, cik: int, dbaccessor: ParquetDBIndexingAccessor):
@@ -51,7 +53,7 @@ class CompanyIndexReader:
         return self._get_latest_company_filing_parquet(latest_report)
 
     def _get_latest_company_filing_parquet(self, latest_report: IndexReport) -> Dict[str, str]:
-        latest_filing = pd.read_parquet(os.path.join(latest_report.fullPath, f'{SUB_TXT}.parquet'),
+        latest_filing = read_parquet_df(os.path.join(latest_report.fullPath, f'{SUB_TXT}.parquet'),
                                         filters=[('adsh', '==', latest_report.adsh)])
 
         return latest_filing.iloc[0].to_dict()
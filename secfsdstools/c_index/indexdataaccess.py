@@ -1,11 +1,21 @@
 """Database logic to hanlde the indexing"""
+import json
+import logging
+import re
 import sqlite3
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 
-from secfsdstools.a_utils.dbutils import DB
+from secfsdstools.a_utils.dbutils import DB, LOOKUP_KEYS_TABLE
+from secfsdstools.a_utils.parquetutils import RowGroupLocations
+
+LOGGER = logging.getLogger(__name__)
+
+# the sources of the validators of the files whose row group locations are recorded
+VALIDATOR_SOURCE_REPORTS = 'reports'
+VALIDATOR_SOURCE_TAGS = 'tags'
 
 
 @dataclass
@@ -33,13 +43,22 @@ class IndexFileProcessingState:
     processTime: str  # pylint: disable=C0103
 
 
-class ParquetDBIndexingAccessor(DB):
+class ParquetDBIndexingAccessor(DB):  # pylint: disable=too-many-public-methods
     """ Dataaccess class for index related tables of parquet files"""
     index_reports_table = 'index_parquet_reports'
     index_processing_table = 'index_parquet_processing_state'
-
-    def __init__(self, db_dir: str):
-        super().__init__(db_dir=db_dir)
+    index_companies_table = 'index_parquet_companies'
+    index_companies_fts_table = 'index_parquet_companies_fts'
+    index_row_groups_table = 'index_parquet_row_groups'
+    index_tags_table = 'index_parquet_tags'
+    index_tag_files_table = 'index_parquet_tag_files'
+    index_zip_stats_table = 'index_parquet_zip_stats'
+    index_fingerprints_table = 'index_parquet_fingerprints'
+    index_validators_table = 'index_parquet_validators'
+
+    def __init__(self, db_dir: str, read_only: bool = False):
+        super().__init__(db_dir=db_dir, read_only=read_only)
+        self._company_fts: Optional[bool] = None
 
     def read_all_indexreports(self) -> List[IndexReport]:
         """
@@ -90,8 +109,8 @@ class ParquetDBIndexingAccessor(DB):
         Returns:
             IndexFileProcessingState: the processing state instance
         """
-        sql = f"SELECT * FROM {self.index_processing_table} WHERE fileName = '{filename}'"
-        return self.execute_fetchall_typed(sql, IndexFileProcessingState)[0]
+        sql = f"SELECT * FROM {self.index_processing_table} WHERE fileName = ?"
+        return self.execute_fetchall_typed(sql, IndexFileProcessingState, (filename,))[0]
 
     def read_index_files_for_filenames(self, filenames: List[str]) \
             -> List[IndexFileProcessingState]:
@@ -103,10 +122,9 @@ class ParquetDBIndexingAccessor(DB):
         Returns:
             List[IndexFileProcessingState]: the processing state instance
         """
-        filenames_str = ", ".join(["'" + x + "'" for x in filenames])
-
-        sql = f"SELECT * FROM {self.index_processing_table} WHERE fileName in ({filenames_str})"
-        return self.execute_fetchall_typed(sql, IndexFileProcessingState)
+        sql = f"""SELECT * FROM {self.index_processing_table}
+                  WHERE fileName in (SELECT key FROM {LOOKUP_KEYS_TABLE})"""
+        return self.execute_fetchall_typed_for_keys(sql, IndexFileProcessingState, filenames)
 
     def insert_indexreport(self, data: IndexReport):
         """
@@ -114,25 +132,279 @@ class ParquetDBIndexingAccessor(DB):
         Args:
             data (IndexReport): IndexReport data object
         """
-        sql = self.create_insert_statement_for_dataclass(self.index_reports_table, data)
+        sql, params = self.create_parameterized_insert_for_dataclass(self.index_reports_table,
+                                                                     data)
         with self.get_connection() as conn:
-            self.execute_single(sql, conn)
+            self.execute_single(sql, conn, params)
 
-    def add_index_report(self, sub_df: pd.DataFrame, processing_state: IndexFileProcessingState):
+    def add_index_report(self, sub_df: pd.DataFrame, processing_state: IndexFileProcessingState,
+                         row_groups_df: Optional[pd.DataFrame] = None,
+                         zip_stats_df: Optional[pd.DataFrame] = None,
+                         fingerprint: Optional[str] = None,
+                         validators: Optional[Dict[str, str]] = None):
         """
         adds the submissions in the sub_df into the index table and stores the processing state
-        in the processing table
+        in the processing table. Everything is written in a single transaction.
+        If the file was already indexed, its old entries are replaced.
         Args:
             sub_df: dataframe with submissions
             processing_state: state entry to write
+            row_groups_df: optional dataframe with the row group locations of the submissions,
+                with the columns adsh, originFile, and locations
+            zip_stats_df: optional dataframe with the statistics of the zip file,
+                with the columns fileName, category, key, and value
+            fingerprint: optional fingerprint of the content of the indexed folder
+            validators: optional validators of the files with row group locations,
+                like num.txt
+
+        Returns:
+
+        """
+        self.add_index_reports(
+            [(sub_df, processing_state)], row_groups_df=row_groups_df, zip_stats_df=zip_stats_df,
+            fingerprints={processing_state.fileName: fingerprint} if fingerprint else None,
+            validators={processing_state.fileName: validators} if validators else None)
+
+    def add_index_reports(self, entries: List[Tuple[pd.DataFrame, IndexFileProcessingState]],
+                          row_groups_df: Optional[pd.DataFrame] = None,
+                          zip_stats_df: Optional[pd.DataFrame] = None,
+                          fingerprints: Optional[Dict[str, str]] = None,
+                          validators: Optional[Dict[str, Dict[str, str]]] = None):
+        """
+        adds the submissions and processing states of several files in a single transaction.
+        The old entries of files that were already indexed are replaced.
+
+        Args:
+            entries (List[Tuple[pd.DataFrame, IndexFileProcessingState]]): list with the
+                dataframe with submissions and the processing state of every file
+            row_groups_df (pd.DataFrame, optional, None): the row group locations of the
+                submissions, with the columns adsh, originFile, and locations
+            zip_stats_df (pd.DataFrame, optional, None): the statistics of the zip files,
+                with the columns fileName, category, key, and value
+            fingerprints (Dict[str, str], optional, None): the fingerprints of the content
+                of the indexed folders per file name
+            validators (Dict[str, Dict[str, str]], optional, None): the validators of the
+                files with row group locations, like num.txt, per file name
+        """
+        sub_dfs = [sub_df for sub_df, _ in entries if len(sub_df) > 0]
+
+        with self.get_connection() as conn:
+            self._delete_index_entries([processing_state.fileName
+                                        for _, processing_state in entries], conn)
+            if len(sub_dfs) > 0:
+                all_subs_df = pd.concat(sub_dfs, ignore_index=True)
+                self._append_indexreport_df(all_subs_df, conn)
+                self._update_companies(all_subs_df, conn)
+            for _, processing_state in entries:
+                self._insert_indexfileprocessing(processing_state, conn)
+            if row_groups_df is not None and len(row_groups_df) > 0:
+                self._append_row_groups_df(row_groups_df, conn)
+            if zip_stats_df is not None and len(zip_stats_df) > 0:
+                self._append_zip_stats_df(zip_stats_df, conn)
+            if fingerprints:
+                self._update_fingerprints(fingerprints, conn)
+            for file_name, file_validators in (validators or {}).items():
+                self._insert_validators(file_name, VALIDATOR_SOURCE_REPORTS, file_validators,
+                                        conn)
+
+    def _delete_index_entries(self, file_names: List[str], conn: sqlite3.Connection):
+        """
+        deletes all entries of the files that were already indexed. The companies are kept.
+        The tag index of the files is deleted as well, so that it is built again.
+        """
+        # the processing table is small, so it is cheaper to read it completely than to
+        # bind the file names as parameters
+        present = {row[0] for row in conn.execute(
+            f"SELECT fileName FROM {self.index_processing_table}").fetchall()}
+        indexed = [file_name for file_name in file_names if file_name in present]
+        if len(indexed) == 0:
+            return
+
+        LOGGER.info("replacing the index entries of %s", indexed)
+        params = [(file_name,) for file_name in indexed]
+        for table, column in [(self.index_reports_table, 'originFile'),
+                              (self.index_row_groups_table, 'originFile'),
+                              (self.index_zip_stats_table, 'fileName'),
+                              (self.index_tags_table, 'originFile'),
+                              (self.index_tag_files_table, 'fileName'),
+                              (self.index_validators_table, 'originFile'),
+                              (self.index_processing_table, 'fileName')]:
+            self.execute_many(f"DELETE FROM {table} WHERE {column} = ?", params, conn)
+
+    def _update_fingerprints(self, fingerprints: Dict[str, str], conn: sqlite3.Connection):
+        self.execute_many(f"INSERT OR REPLACE INTO {self.index_fingerprints_table} "
+                          f"(fileName, fingerprint) VALUES (?, ?)",
+                          list(fingerprints.items()), conn)
+
+    def update_fingerprints(self, fingerprints: Dict[str, str]):
+        """
+        stores the fingerprints of the content of indexed folders.
+
+        Args:
+            fingerprints (Dict[str, str]): the fingerprints per file name
+        """
+        with self.get_connection() as conn:
+            self._update_fingerprints(fingerprints, conn)
+
+    def read_fingerprints(self) -> Dict[str, str]:
+        """
+        reads the fingerprints of the indexed folders. Folders that were indexed by an older
+        version have no fingerprint.
+
+        Returns:
+            Dict[str, str]: the fingerprints per file name
+        """
+        return dict(self.execute_fetchall(
+            f'SELECT fileName, fingerprint FROM {self.index_fingerprints_table}'))
+
+    def _insert_validators(self, origin_file: str, source: str, validators: Dict[str, str],
+                           conn: sqlite3.Connection):
+        self.execute_many(f"INSERT OR REPLACE INTO {self.index_validators_table} "
+                          f"(originFile, source, fileName, validator) VALUES (?, ?, ?, ?)",
+                          [(origin_file, source, file_name, validator)
+                           for file_name, validator in validators.items()], conn)
+
+    def read_row_group_validators(self, origin_files: List[str], source: str) \
+            -> Dict[str, Dict[str, str]]:
+        """
+        reads the validators of the files whose row group locations were recorded.
+
+        Args:
+            origin_files (List[str]): the names of the zip files
+            source (str): VALIDATOR_SOURCE_REPORTS for the locations of the reports,
+                VALIDATOR_SOURCE_TAGS for the locations in the tag index
+
+        Returns:
+            Dict[str, Dict[str, str]]: the validators per file, like num.txt, per zip file.
+                Zip files that were indexed by an older version are missing.
+        """
+        sql = f"""SELECT originFile, fileName, validator FROM {self.index_validators_table}
+                  WHERE originFile IN (SELECT key FROM {LOOKUP_KEYS_TABLE}) AND source = ?"""
+        rows_df = self.execute_read_as_df_for_keys(sql, sorted(set(origin_files)), (source,))
+        validators: Dict[str, Dict[str, str]] = {}
+        for origin_file, file_name, validator in rows_df.itertuples(index=False):
+            validators.setdefault(origin_file, {})[file_name] = validator
+        return validators
+
+    def _append_zip_stats_df(self, zip_stats_df: pd.DataFrame, conn: sqlite3.Connection):
+        self.append_df_to_table(table_name=self.index_zip_stats_table,
+                                dataframe=zip_stats_df[['fileName', 'category', 'key', 'value']],
+                                conn=conn)
+
+    def read_zip_stats_df(self) -> pd.DataFrame:
+        """
+        reads the statistics of all zip files. Zip files that were indexed by an older
+        version have no statistics.
+
+        Returns:
+            pd.DataFrame: dataframe with the columns fileName, category, key, and value
+        """
+        return self.execute_read_as_df(f'SELECT * FROM {self.index_zip_stats_table}')
+
+    def _append_row_groups_df(self, row_groups_df: pd.DataFrame, conn: sqlite3.Connection):
+        self.append_df_to_table(table_name=self.index_row_groups_table,
+                                dataframe=row_groups_df[['adsh', 'originFile', 'locations']],
+                                conn=conn)
+
+    def read_row_group_locations(self, adsh: str, origin_file: Optional[str] = None) \
+            -> Optional[Dict[str, RowGroupLocations]]:
+        """
+        reads the row groups of the parquet files that contain the rows of a report.
+        If the report is present in several zip files and no origin_file is provided,
+        the locations of the quarter file are preferred.
+
+        Args:
+            adsh (str): the adsh of the report
+            origin_file (str, optional, None): the zip file of the report
+
+        Returns:
+            Optional[Dict[str, RowGroupLocations]]: the row group locations per file
+                (like 'num.txt'), None if no locations were recorded for the report
+        """
+        sql = f"""SELECT g.locations FROM {self.index_row_groups_table} g
+                  JOIN {self.index_reports_table} r
+                    ON r.adsh = g.adsh AND r.originFile = g.originFile
+                  WHERE g.adsh = ? AND (? IS NULL OR g.originFile = ?)
+                  ORDER BY r.originFileType DESC
+                  LIMIT 1"""
+        row = self.get_cached_connection().execute(
+            sql, (adsh, origin_file, origin_file)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def read_row_group_locations_for_reports(self, reports: List[IndexReport]) \
+            -> Dict[str, Dict[str, RowGroupLocations]]:
+        """
+        reads the row group locations of several reports at once.
+
+        Args:
+            reports (List[IndexReport]): the reports
+
+        Returns:
+            Dict[str, Dict[str, RowGroupLocations]]: the row group locations per adsh, reports
+                without recorded locations are missing
+        """
+        origin_files = {report.adsh: report.originFile for report in reports}
+        sql = f"""SELECT adsh, originFile, locations FROM {self.index_row_groups_table}
+                  WHERE adsh IN (SELECT key FROM {LOOKUP_KEYS_TABLE})"""
+        rows_df = self.execute_read_as_df_for_keys(sql, list(origin_files.keys()))
+        return {adsh: json.loads(locations) for adsh, origin_file, locations
+                in rows_df.itertuples(index=False) if origin_files[adsh] == origin_file}
+
+    def read_tag_indexed_files(self) -> List[str]:
+        """
+        returns the names of the zip files whose tags are indexed.
 
         Returns:
+            List[str]: the names of the zip files
+        """
+        return [row[0] for row in
+                self.execute_fetchall(f'SELECT fileName FROM {self.index_tag_files_table}')]
 
+    def add_tag_index(self, file_name: str, tags_df: pd.DataFrame, process_time: str,
+                      validators: Optional[Dict[str, str]] = None):
         """
+        adds the tags of a zip file to the tag index and marks the zip file as indexed.
+        Everything is written in a single transaction.
 
+        Args:
+            file_name (str): name of the zip file
+            tags_df (pd.DataFrame): dataframe with the columns tag, fileName (like 'num.txt'),
+                locations, and rows
+            process_time (str): the time of the indexing
+            validators (Dict[str, str], optional, None): the validators of the indexed files,
+                like num.txt
+        """
+        tags_df = tags_df.assign(originFile=file_name)
         with self.get_connection() as conn:
-            self._append_indexreport_df(sub_df, conn)
-            self._insert_indexfileprocessing(processing_state, conn)
+            if len(tags_df) > 0:
+                self.append_df_to_table(
+                    table_name=self.index_tags_table,
+                    dataframe=tags_df[['tag', 'originFile', 'fileName', 'locations', 'rows']],
+                    conn=conn)
+            self.execute_single(f"INSERT INTO {self.index_tag_files_table} "
+                                f"(fileName, tags, processTime) VALUES (?, ?, ?)", conn,
+                                (file_name, int(tags_df.tag.nunique()), process_time))
+            if validators:
+                self._insert_validators(file_name, VALIDATOR_SOURCE_TAGS, validators, conn)
+
+    def read_tag_locations_df(self, tags: List[str]) -> pd.DataFrame:
+        """
+        reads the row groups of the pre.txt and num.txt files of all zip files that contain
+        the provided tags.
+
+        Args:
+            tags (List[str]): the tags
+
+        Returns:
+            pd.DataFrame: dataframe with the columns tag, originFile, fullPath, fileName,
+                locations, and rows, ordered by originFile
+        """
+        sql = f"""SELECT t.tag, t.originFile, p.fullPath, t.fileName, t.locations, t.rows
+                  FROM {self.index_tags_table} t
+                  JOIN {self.index_processing_table} p ON p.fileName = t.originFile
+                  WHERE t.tag IN (SELECT key FROM {LOOKUP_KEYS_TABLE})
+                  ORDER BY t.originFile, t.fileName"""
+        return self.execute_read_as_df_for_keys(sql, tags)
 
     def _append_indexreport_df(self, dataframe: pd.DataFrame, conn: sqlite3.Connection):
         """
@@ -143,6 +415,26 @@ class ParquetDBIndexingAccessor(DB):
         """
         self.append_df_to_table(table_name=self.index_reports_table, dataframe=dataframe, conn=conn)
 
+    def _update_companies(self, sub_df: pd.DataFrame, conn: sqlite3.Connection):
+        """
+        adds the companies of the submissions to the company table and updates the
+        date of the latest filing of the companies that are already present.
+
+        Args:
+            sub_df (pd.DataFrame): dataframe with submissions
+            conn (sqlite3.Connection): connection to use
+        """
+        companies_df = sub_df.groupby(['cik', 'name'], as_index=False)['filed'].max()
+        companies = [(int(cik), name, int(filed)) for cik, name, filed
+                     in companies_df[['cik', 'name', 'filed']].itertuples(index=False)]
+
+        # python 3.7 uses sqlite 3.21, which does not support the upsert functionality
+        self.execute_many(f"INSERT OR IGNORE INTO {self.index_companies_table} "
+                          f"(cik, name, filed) VALUES (?, ?, ?)", companies, conn)
+        self.execute_many(f"UPDATE {self.index_companies_table} SET filed = ? "
+                          f"WHERE cik = ? AND name = ? AND filed < ?",
+                          [(filed, cik, name, filed) for cik, name, filed in companies], conn)
+
     def insert_indexfileprocessing(self, data: IndexFileProcessingState):
         """
         inserts an entry into the index_file_processing_state table
@@ -160,8 +452,9 @@ class ParquetDBIndexingAccessor(DB):
         Args:
             data (IndexFileProcessingState): IndexFileProcessingState data object to insert
         """
-        sql = self.create_insert_statement_for_dataclass(self.index_processing_table, data)
-        self.execute_single(sql, conn)
+        sql, params = self.create_parameterized_insert_for_dataclass(self.index_processing_table,
+                                                                     data)
+        self.execute_single(sql, conn, params)
 
     def find_latest_company_report(self, cik: int) -> IndexReport:
         """
@@ -176,9 +469,9 @@ class ParquetDBIndexingAccessor(DB):
 
         sql = f"""SELECT *
                     FROM {self.index_reports_table}
-                    WHERE cik = {cik} and originFileType = 'quarter'
+                    WHERE cik = ? and originFileType = 'quarter'
                     ORDER BY period DESC"""
-        return self.execute_fetchall_typed(sql, IndexReport)[0]
+        return self.execute_fetchall_typed(sql, IndexReport, (int(cik),))[0]
 
     def read_index_report_for_adsh(self, adsh: str) -> IndexReport:
         """
@@ -193,9 +486,9 @@ class ParquetDBIndexingAccessor(DB):
         # over the daily files, in case both should be present.
         sql = f"""SELECT *
                     FROM {self.index_reports_table}
-                    WHERE adsh = '{adsh}'
+                    WHERE adsh = ?
                     ORDER BY originFileType DESC"""
-        return self.execute_fetchall_typed(sql, IndexReport)[0]
+        return self.execute_fetchall_typed(sql, IndexReport, (adsh,))[0]
 
     def read_index_reports_for_adshs(self, adshs: List[str]) -> List[IndexReport]:
         """
@@ -207,15 +500,15 @@ class ParquetDBIndexingAccessor(DB):
             List[IndexReport]: the reports for the provided adshs
         """
 
-        adshs_str = ", ".join(["'" + x.upper() + "'" for x in adshs])
         # sorting by originfiletype, so we prefer official data from SEC,
         # over the daily files, in case both should be present.
         sql = f"""SELECT *
                     FROM {self.index_reports_table}
-                    WHERE adsh in ({adshs_str})
+                    WHERE adsh in (SELECT key FROM {LOOKUP_KEYS_TABLE})
                     ORDER BY adsh, originFileType DESC"""
 
-        reports: List[IndexReport] = self.execute_fetchall_typed(sql, IndexReport)
+        reports: List[IndexReport] = self.execute_fetchall_typed_for_keys(
+            sql, IndexReport, [adsh.upper() for adsh in adshs])
 
         last_adsh = None
         filtered_reports: List[IndexReport] = []
@@ -227,6 +520,16 @@ class ParquetDBIndexingAccessor(DB):
 
         return filtered_reports
 
+    def _create_ciks_sql(self, forms: Optional[List[str]]) -> Tuple[str, Tuple]:
+        sql = f'SELECT * FROM {self.index_reports_table} ' \
+              f'WHERE cik in (SELECT key FROM {LOOKUP_KEYS_TABLE})'
+        params: Tuple = ()
+        if forms is not None:
+            sql = sql + f' and form in ({", ".join(["?"] * len(forms))}) '
+            params = tuple(form.upper() for form in forms)
+        sql = sql + ' ORDER BY period DESC'
+        return sql, params
+
     def read_index_reports_for_ciks(self, ciks: List[int], forms: Optional[List[str]] = None) \
             -> List[IndexReport]:
         """
@@ -241,14 +544,9 @@ class ParquetDBIndexingAccessor(DB):
         Returns:
             List[IndexReport]
         """
-        ciks_str = [str(cik) for cik in ciks]
-        sql = f'SELECT * FROM {self.index_reports_table} WHERE cik in ({",".join(ciks_str)})'
-        if forms is not None:
-            forms_str = ", ".join(["'" + x.upper() + "'" for x in forms])
-            sql = sql + f' and form in ({forms_str}) '
-        sql = sql + ' ORDER BY period DESC'
-
-        return self.execute_fetchall_typed(sql, IndexReport)
+        sql, params = self._create_ciks_sql(forms)
+        return self.execute_fetchall_typed_for_keys(sql, IndexReport,
+                                                    [int(cik) for cik in ciks], params)
 
     def read_index_reports_for_ciks_df(self, ciks: List[int], forms: Optional[List[str]] = None) \
             -> pd.DataFrame:
@@ -264,28 +562,96 @@ class ParquetDBIndexingAccessor(DB):
         Returns:
             pd.DataFrame
         """
-        ciks_str = [str(cik) for cik in ciks]
-        sql = f'SELECT * FROM {self.index_reports_table} WHERE cik in ({",".join(ciks_str)})'
-        if forms is not None:
-            forms_str = ", ".join(["'" + x.upper() + "'" for x in forms])
-            sql = sql + f' and form in ({forms_str}) '
-        sql = sql + ' ORDER BY period DESC'
+        sql, params = self._create_ciks_sql(forms)
+        return self.execute_read_as_df_for_keys(sql, [int(cik) for cik in ciks], params)
 
-        return self.execute_read_as_df(sql)
+    def has_company_fts(self) -> bool:
+        """
+        checks whether the full text index on the company names is present. It is missing,
+        if the sqlite build doesn't contain the fts5 extension. The result is cached.
+
+        Returns:
+            bool: True if the full text index is present
+        """
+        if self._company_fts is None:
+            self._company_fts = self.table_exists(self.index_companies_fts_table)
+        return self._company_fts
+
+    @staticmethod
+    def _create_match_expression(name_part: str) -> Optional[str]:
+        # every word has to match the beginning of a word in the name,
+        # the words are quoted, so that they are not interpreted as fts5 operators
+        tokens = re.findall(r'[^\W_]+', name_part.lower())
+        if len(tokens) == 0:
+            return None
+        return ' '.join([f'"{token}"*' for token in tokens])
+
+    def _find_company_by_name(self, name_part: str, conn: sqlite3.Connection, use_fts: bool,
+                              limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        match_expression = self._create_match_expression(name_part) if use_fts else None
+
+        if match_expression is not None:
+            sql = f"""
+                SELECT c.name, c.cik FROM {self.index_companies_fts_table} AS f
+                JOIN {self.index_companies_table} AS c ON c.rowid = f.rowid
+                WHERE {self.index_companies_fts_table} MATCH ?
+                ORDER BY f.rank, c.filed DESC"""
+            params: List = [match_expression]
+        else:
+            sql = f"""
+                SELECT name, cik FROM {self.index_companies_table}
+                WHERE name like ?
+                ORDER BY name"""
+            params = [f'%{name_part}%']
+
+        if limit is not None:
+            sql = sql + ' LIMIT ?'
+            params.append(limit)
 
-    def find_company_by_name(self, name_part: str) -> pd.DataFrame:
+        LOGGER.debug("execute %s", sql)
+        return conn.execute(sql, params).fetchall()
+
+    def find_company_by_name(self, name_part: str, limit: Optional[int] = None) -> pd.DataFrame:
         """
         Finds companies in the index based on the provided part of the name.
         Lower and uppercase are ignored.
 
+        Every word of name_part has to match the beginning of a word in the name of the
+        company, for instance "appl in" finds "APPLE INC". The results are ordered by
+        their relevance. If the full text index is not available, or if name_part contains
+        no words, the name has to contain name_part and the results are ordered by name.
+
         Args:
             name_part: the part of the name
+            limit (int, optional, None): the maximal number of results
 
         Returns:
             pd.DataFrame: with columns name and cik
         """
-        sql = f"""
-                SELECT DISTINCT name, cik from {self.index_reports_table} 
-                WHERE name like '%{name_part}%' 
-                ORDER BY name"""
-        return self.execute_read_as_df(sql)
+        rows = self._find_company_by_name(name_part=name_part, conn=self.get_cached_connection(),
+                                          use_fts=self.has_company_fts(), limit=limit)
+        return pd.DataFrame(rows, columns=['name', 'cik'])
+
+    def find_companies_by_names(self, names: List[str], limit_per_name: int = 1) \
+            -> pd.DataFrame:
+        """
+        Finds the companies for several names at once, the search for every name
+        works as in find_company_by_name.
+
+        Args:
+            names (List[str]): the names to search for
+            limit_per_name (int, optional, 1): the maximal number of results per name,
+                by default only the best match is returned
+
+        Returns:
+            pd.DataFrame: with columns search_name, name, and cik. names without a result
+                are not contained.
+        """
+        use_fts = self.has_company_fts()
+        results: List[Tuple[str, str, int]] = []
+        conn = self.get_cached_connection()
+        for search_name in names:
+            rows = self._find_company_by_name(name_part=search_name, conn=conn,
+                                              use_fts=use_fts, limit=limit_per_name)
+            results.extend([(search_name, name, cik) for name, cik in rows])
+        return pd.DataFrame(results, columns=['search_name', 'name', 'cik'])
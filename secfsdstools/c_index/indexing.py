@@ -1,18 +1,52 @@
 """Indexing the downloaded to data"""
+import json
 import logging
 import os
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 
-from secfsdstools.a_utils.constants import SUB_TXT
-from secfsdstools.a_utils.fileutils import get_directories_in_directory
+from secfsdstools.a_utils.constants import NUM_TXT, PRE_NUM_TXT, PRE_TXT, SUB_TXT
+from secfsdstools.a_utils.fileutils import get_directories_in_directory, get_size_of_path
+from secfsdstools.a_utils.manifestutils import compute_fingerprint, is_transform_completed
+from secfsdstools.a_utils.parallelexecution import ParallelExecutor
+from secfsdstools.a_utils.parquetutils import count_values_per_row_group, get_min_max, \
+    get_row_count, get_row_groups_validator, locate_row_groups, read_parquet_df
 from secfsdstools.c_index.indexdataaccess import IndexFileProcessingState, ParquetDBIndexingAccessor
 
 LOGGER = logging.getLogger(__name__)
 
+# the number of files whose index entries are written in one transaction
+INDEX_CHUNK_SIZE = 10
+
+
+@dataclass
+class IndexFileEntries:
+    """
+    Contains everything that is written into the index for a single zip file.
+    """
+    sub_df: pd.DataFrame
+    processing_state: IndexFileProcessingState
+    row_groups_df: Optional[pd.DataFrame] = None
+    zip_stats_df: Optional[pd.DataFrame] = None
+    fingerprint: Optional[str] = None
+    validators: Optional[Dict[str, str]] = None
+
+
+def _get_validators(path: str, data_files: List[str]) -> Dict[str, str]:
+    """ returns the validators of the data files that are present in the folder at path """
+    return {data_file: get_row_groups_validator(os.path.join(path, f'{data_file}.parquet'))
+            for data_file in data_files
+            if os.path.exists(os.path.join(path, f'{data_file}.parquet'))}
+
+
+def _concat_optional(data_dfs: List[Optional[pd.DataFrame]]) -> Optional[pd.DataFrame]:
+    data_dfs = [data_df for data_df in data_dfs if data_df is not None]
+    return pd.concat(data_dfs, ignore_index=True) if data_dfs else None
+
 
 class BaseReportIndexer(ABC):
     """
@@ -21,9 +55,11 @@ class BaseReportIndexer(ABC):
     PROCESSED_STR: str = 'processed'
     URL_PREFIX: str = 'https://www.sec.gov/Archives/edgar/data/'
 
-    def __init__(self, accessor: ParquetDBIndexingAccessor, file_type: str):
+    def __init__(self, accessor: ParquetDBIndexingAccessor, file_type: str,
+                 execute_serial: bool = False):
         self.dbaccessor = accessor
         self.file_type = file_type
+        self.execute_serial = execute_serial
 
         # get current datetime in UTC
         utc_dt = datetime.now(timezone.utc)
@@ -53,21 +89,125 @@ class BaseReportIndexer(ABC):
 
         """
 
-    def _calculate_not_indexed(self) -> List[str]:
-        present_files = self.get_present_files()
-        processed_indexfiles_df = self.dbaccessor.read_all_indexfileprocessing_df()
+    def get_row_groups_df(self, file_name: str, sub_df: pd.DataFrame) \
+            -> Optional[pd.DataFrame]:  # pylint: disable=unused-argument
+        """
+        returns the row groups of the data files that contain the rows of every submission
+        in the sub_df. Indexers of data that is not stored in parquet files return None.
+
+        Args:
+            file_name: name of the original zip file
+            sub_df: DataFrame with the content in the sub_txt file
+
+        Returns:
+            Optional[pd.DataFrame]: DataFrame with the columns adsh, originFile, and locations
+        """
+        return None
+
+    def get_zip_stats_df(self, file_name: str, sub_df: pd.DataFrame) \
+            -> Optional[pd.DataFrame]:  # pylint: disable=unused-argument
+        """
+        returns statistics about the content of the zip file. Indexers of data that is not
+        stored in parquet files return None.
+
+        Args:
+            file_name: name of the original zip file
+            sub_df: DataFrame with the content in the sub_txt file
+
+        Returns:
+            Optional[pd.DataFrame]: DataFrame with the columns fileName, category, key, and value
+        """
+        return None
+
+    def get_fingerprint(self, file_name: str) -> Optional[str]:  # pylint: disable=unused-argument
+        """
+        returns the fingerprint of the content of the zip file, which changes whenever the
+        content changes. Indexers that cannot detect changes return None.
+
+        Args:
+            file_name: name of the original zip file
+
+        Returns:
+            Optional[str]: the fingerprint
+        """
+        return None
+
+    def get_validators(self, file_name: str) \
+            -> Optional[Dict[str, str]]:  # pylint: disable=unused-argument
+        """
+        returns the validators of the files whose row group locations are recorded, so that
+        the readers can check that the locations still match the files. Indexers of data that
+        is not stored in parquet files return None.
+
+        Args:
+            file_name: name of the original zip file
+
+        Returns:
+            Optional[Dict[str, str]]: the validator per file, like num.txt
+        """
+        return None
 
+    def _get_indexed_files(self) -> List[str]:
+        processed_indexfiles_df = self.dbaccessor.read_all_indexfileprocessing_df()
         indexed_df = processed_indexfiles_df[processed_indexfiles_df.status == self.PROCESSED_STR]
-        indexed_files = indexed_df.fileName.to_list()
+        return indexed_df.fileName.to_list()
+
+    def _calculate_not_indexed(self) -> List[str]:
+        present_files = self.get_present_files()
+        indexed_files = self._get_indexed_files()
 
         not_indexed = set(present_files) - set(indexed_files)
         return list(not_indexed)
 
-    def _index_file(self, file_name: str):
-        LOGGER.info("indexing file %s", file_name)
+    def _get_current_fingerprints(self) -> Dict[str, str]:
+        present_files = set(self.get_present_files())
+        fingerprints = {file_name: self.get_fingerprint(file_name)
+                        for file_name in self._get_indexed_files()
+                        if file_name in present_files}
+        return {file_name: fingerprint for file_name, fingerprint in fingerprints.items()
+                if fingerprint is not None}
+
+    def _calculate_changed(self) -> List[str]:
+        """
+        returns the indexed zip files whose content changed since they were indexed.
+        Zip files without a stored fingerprint are regarded as unchanged.
+        """
+        stored = self.dbaccessor.read_fingerprints()
+        return [file_name for file_name, fingerprint in self._get_current_fingerprints().items()
+                if file_name in stored and stored[file_name] != fingerprint]
+
+    def _store_missing_fingerprints(self):
+        """
+        stores the fingerprints of the zip files that were indexed by an older version,
+        so that changes are detected from now on.
+        """
+        stored = self.dbaccessor.read_fingerprints()
+        missing = {file_name: fingerprint
+                   for file_name, fingerprint in self._get_current_fingerprints().items()
+                   if file_name not in stored}
+        if len(missing) > 0:
+            self.dbaccessor.update_fingerprints(missing)
+
+    def _calculate_to_index(self) -> List[str]:
+        return sorted(set(self._calculate_not_indexed()) | set(self._calculate_changed()))
+
+    def prepare_index_entries(self, file_name: str) -> IndexFileEntries:
+        """
+        reads everything that is written into the index for a single zip file. Nothing is
+        written into the db, so this can be done by several threads at once.
+
+        Args:
+            file_name: name of the original zip file
+
+        Returns:
+            IndexFileEntries: the entries of the zip file
+        """
+        LOGGER.info("reading file %s", file_name)
 
-        # todo: check if table already contains entries
-        #  will fail at the moment, since the the primary key is defined
+        # the fingerprint is calculated first, so that a change during the reading
+        # is detected by the next update
+        fingerprint = self.get_fingerprint(file_name)  # pylint: disable=assignment-from-none
+        validators = self.get_validators(file_name)  # pylint: disable=assignment-from-none
         sub_df, full_path = self.get_sub_df(file_name)
 
         sub_df['fullPath'] = full_path
@@ -77,22 +217,105 @@ class BaseReportIndexer(ABC):
         sub_df['url'] = sub_df['url'] + sub_df['cik'].astype(str) + '/' + \
                         sub_df['adsh'].str.replace('-', '') + '/' + sub_df['adsh'] + '-index.htm'
 
-        self.dbaccessor.add_index_report(sub_df,
-                                         IndexFileProcessingState(
-                                             fileName=file_name,
-                                             fullPath=full_path,
-                                             status=self.PROCESSED_STR,
-                                             entries=len(sub_df),
-                                             processTime=self.process_time
-                                         ))
+        processing_state = IndexFileProcessingState(fileName=file_name,
+                                                    fullPath=full_path,
+                                                    status=self.PROCESSED_STR,
+                                                    entries=len(sub_df),
+                                                    processTime=self.process_time)
+        return IndexFileEntries(sub_df=sub_df,
+                                processing_state=processing_state,
+                                row_groups_df=self.get_row_groups_df(file_name, sub_df),
+                                zip_stats_df=self.get_zip_stats_df(file_name, sub_df),
+                                fingerprint=fingerprint,
+                                validators=validators)
+
+    def write_index_entries(self, parts: List[IndexFileEntries]):
+        """
+        writes the entries of several zip files in a single transaction. The entries of
+        zip files that were already indexed are replaced.
+
+        Args:
+            parts: the entries of the zip files
+        """
+        self.dbaccessor.add_index_reports(
+            [(part.sub_df, part.processing_state) for part in parts],
+            row_groups_df=_concat_optional([part.row_groups_df for part in parts]),
+            zip_stats_df=_concat_optional([part.zip_stats_df for part in parts]),
+            fingerprints={part.processing_state.fileName: part.fingerprint for part in parts
+                          if part.fingerprint is not None},
+            validators={part.processing_state.fileName: part.validators for part in parts
+                        if part.validators})
+
+    def _index_file(self, file_name: str):
+        LOGGER.info("indexing file %s", file_name)
+        self.write_index_entries([self.prepare_index_entries(file_name)])
+
+    def _needs_indexing(self, file_name: str) -> bool:
+        """ checks whether the single zip file was not indexed yet or whether it changed """
+        if file_name not in self._get_indexed_files():
+            return file_name in self.get_present_files()
+        stored = self.dbaccessor.read_fingerprints().get(file_name)
+        return (stored is not None) and (stored != self.get_fingerprint(file_name))
+
+    def index_file(self, file_name: str):
+        """
+        index a single zip-file, if it was not indexed yet or if its content changed
+        since it was indexed. Only this zip file is checked, not all present zip files.
+
+        Args:
+            file_name: name of the original zip file
+        """
+        if self._needs_indexing(file_name):
+            self._index_file(file_name=file_name)
 
     def process(self):
         """
-        index all not zip-files that were not indexed yet.
+        index all zip-files that were not indexed yet or whose content changed since they were
+        indexed. The sub files are read in parallel, the entries are then written by the main
+        process in chunks of INDEX_CHUNK_SIZE files, every chunk in its own transaction, which
+        replaces the old entries of the changed files. A file that can't be read is skipped,
+        so that it doesn't prevent the other files of its chunk from being indexed.
         """
-        not_indexed_files = self._calculate_not_indexed()
-        for not_indexed_file in not_indexed_files:
-            self._index_file(file_name=not_indexed_file)
+        self._store_missing_fingerprints()
+
+        to_index = self._calculate_to_index()
+        if len(to_index) == 0:
+            return
+
+        # the first round uses the entries calculated above, later rounds retry the files
+        # that are still not indexed
+        first_round = [to_index]
+
+        def get_entries() -> List[str]:
+            if first_round:
+                return first_round.pop()
+            return self._calculate_to_index()
+
+        def process_element(file_name: str) -> Optional[IndexFileEntries]:
+            try:
+                return self.prepare_index_entries(file_name)
+            except Exception as ex:  # pylint: disable=W0703
+                LOGGER.error("failed to read %s: %s", file_name, ex)
+                return None
+
+        def post_process(parts: List[Optional[IndexFileEntries]]) -> List[str]:
+            parts = [part for part in parts if part is not None]
+            if len(parts) > 0:
+                self.write_index_entries(parts)
+            return [part.processing_state.fileName for part in parts]
+
+        # no need for parallel execution if there is at most one file to index
+        execute_serial = self.execute_serial or len(to_index) <= 1
+        executor = ParallelExecutor(chunksize=INDEX_CHUNK_SIZE, execute_serial=execute_serial)
+
+        executor.set_get_entries_function(get_entries)
+        executor.set_process_element_function(process_element)
+        executor.set_post_process_chunk_function(post_process)
+
+        _, failed = executor.execute()
+
+        if len(failed) > 0:
+            LOGGER.error("The following files could not be indexed: %s", failed)
 
 
 class ReportParquetIndexer(BaseReportIndexer):
@@ -100,13 +323,16 @@ class ReportParquetIndexer(BaseReportIndexer):
     Index the reports in parquet files.
     """
 
-    def __init__(self, db_dir: str, parquet_dir: str, file_type: str):
-        super().__init__(ParquetDBIndexingAccessor(db_dir=db_dir), file_type)
+    def __init__(self, db_dir: str, parquet_dir: str, file_type: str,
+                 execute_serial: bool = False):
+        super().__init__(ParquetDBIndexingAccessor(db_dir=db_dir), file_type, execute_serial)
         self.parquet_dir = parquet_dir
 
     def get_present_files(self) -> List[str]:
-        return get_directories_in_directory(
-            os.path.join(self.parquet_dir, self.file_type))
+        # directories whose transformation was not completed are not indexed
+        type_dir = os.path.join(self.parquet_dir, self.file_type)
+        return [directory for directory in get_directories_in_directory(type_dir)
+                if is_transform_completed(os.path.join(type_dir, directory))]
 
     def get_sub_df(self, file_name: str) -> Tuple[pd.DataFrame, str]:
         path = os.path.join(self.parquet_dir, self.file_type, file_name)
@@ -118,4 +344,147 @@ class ReportParquetIndexer(BaseReportIndexer):
                    'form',
                    'filed',
                    'period']
-        return pd.read_parquet(sub_file, columns=usecols), full_path
+        # sub_file is either a single parquet file or a directory with hive partitions
+        sub_df = read_parquet_df(sub_file, columns=usecols)
+        # the compact schema stores adsh and form as dictionary columns, which are read as
+        # categoricals. the index needs them as plain strings
+        return sub_df.astype({'adsh': str, 'form': object}), full_path
+
+    def get_fingerprint(self, file_name: str) -> Optional[str]:
+        return compute_fingerprint(os.path.join(self.parquet_dir, self.file_type, file_name))
+
+    def get_validators(self, file_name: str) -> Optional[Dict[str, str]]:
+        return _get_validators(os.path.join(self.parquet_dir, self.file_type, file_name),
+                               [SUB_TXT, PRE_TXT, NUM_TXT, PRE_NUM_TXT])
+
+    def get_row_groups_df(self, file_name: str, sub_df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        # the row groups are located with the adsh statistics in the footers of the parquet
+        # files, the data itself is not read. Files without statistics are left out, the
+        # collectors then read them as before.
+        path = os.path.join(self.parquet_dir, self.file_type, file_name)
+        adshs = sub_df.adsh.to_list()
+
+        locations = {adsh: {} for adsh in adshs}
+        for data_file in [SUB_TXT, PRE_TXT, NUM_TXT, PRE_NUM_TXT]:
+            data_path = os.path.join(path, f'{data_file}.parquet')
+            if not os.path.exists(data_path):
+                continue
+            file_locations = locate_row_groups(data_path, column='adsh', values=adshs)
+            if file_locations is None:
+                LOGGER.info("no adsh statistics in %s, row groups are not recorded", data_path)
+                continue
+            # an empty entry means that the file contains no rows of the submission
+            for adsh in adshs:
+                locations[adsh][data_file] = file_locations.get(adsh, {})
+
+        return pd.DataFrame({'adsh': adshs,
+                             'originFile': file_name,
+                             'locations': [json.dumps(locations[adsh], sort_keys=True)
+                                           for adsh in adshs]})
+
+    def get_zip_stats_df(self, file_name: str, sub_df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        # only the columns stmt and uom are read, all other statistics come from the sub_df
+        # and from the metadata of the parquet files
+        path = os.path.join(self.parquet_dir, self.file_type, file_name)
+
+        stats: List[Tuple[str, str, object]] = []
+        for data_file in [SUB_TXT, PRE_TXT, NUM_TXT, PRE_NUM_TXT]:
+            data_path = os.path.join(path, f'{data_file}.parquet')
+            if os.path.exists(data_path):
+                stats.append(('rows', data_file, get_row_count(data_path)))
+                stats.append(('bytes', data_file, get_size_of_path(data_path)))
+
+        stats.extend(('form', form, int(count))
+                     for form, count in sub_df.form.value_counts().items())
+        if sub_df.period.notna().any():
+            stats.append(('min', 'period', int(sub_df.period.min())))
+            stats.append(('max', 'period', int(sub_df.period.max())))
+
+        for data_file, column in [(PRE_TXT, 'stmt'), (NUM_TXT, 'uom')]:
+            data_path = os.path.join(path, f'{data_file}.parquet')
+            if os.path.exists(data_path):
+                stats.extend((column, value, rows) for value, (_, rows)
+                             in count_values_per_row_group(data_path, column).items())
+
+        num_path = os.path.join(path, f'{NUM_TXT}.parquet')
+        ddate_range = get_min_max(num_path, 'ddate') if os.path.exists(num_path) else None
+        if ddate_range is not None:
+            stats.append(('min', 'ddate', int(ddate_range[0])))
+            stats.append(('max', 'ddate', int(ddate_range[1])))
+
+        stats_df = pd.DataFrame(stats, columns=['category', 'key', 'value'])
+        stats_df.insert(0, 'fileName', file_name)
+        return stats_df
+
+
+class TagParquetIndexer:
+    """
+    Maintains the inverted tag index: for every tag, the row groups of the pre.txt and num.txt
+    files of every zip file that contain the tag, together with the number of rows.
+    Only zip files whose reports are already indexed are processed.
+    """
+
+    def __init__(self, db_dir: str, parquet_dir: str, file_type: str,
+                 execute_serial: bool = False):
+        self.dbaccessor = ParquetDBIndexingAccessor(db_dir=db_dir)
+        self.parquet_dir = parquet_dir
+        self.file_type = file_type
+        self.execute_serial = execute_serial
+        self.process_time = datetime.now(timezone.utc).astimezone().isoformat()
+
+    def _calculate_not_indexed(self) -> List[str]:
+        type_dir = os.path.join(self.parquet_dir, self.file_type)
+        present_files = set(get_directories_in_directory(type_dir)) \
+            if os.path.isdir(type_dir) else set()
+
+        processed_df = self.dbaccessor.read_all_indexfileprocessing_df()
+        indexed_reports = set(processed_df[processed_df.status ==
+                                           BaseReportIndexer.PROCESSED_STR].fileName)
+        return sorted((present_files & indexed_reports)
+                      - set(self.dbaccessor.read_tag_indexed_files()))
+
+    def _prepare_tag_index(self, file_name: str) -> Tuple[pd.DataFrame, Dict[str, str]]:
+        LOGGER.info("indexing tags of %s", file_name)
+        path = os.path.join(self.parquet_dir, self.file_type, file_name)
+
+        # the validators are calculated first, so that a change during the reading is detected
+        validators = _get_validators(path, [PRE_TXT, NUM_TXT])
+        entries = []
+        for data_file in [PRE_TXT, NUM_TXT]:
+            data_path = os.path.join(path, f'{data_file}.parquet')
+            if not os.path.exists(data_path):
+                continue
+            for tag, (locations, rows) in count_values_per_row_group(data_path, 'tag').items():
+                entries.append((tag, data_file, json.dumps(locations, sort_keys=True), rows))
+        return pd.DataFrame(entries, columns=['tag', 'fileName', 'locations', 'rows']), validators
+
+    def process(self):
+        """
+        indexes the tags of all zip files that are not in the tag index yet. The files are read
+        in parallel, the tags of every zip file are then written in their own transaction.
+        """
+        not_indexed = self._calculate_not_indexed()
+
+        # the executor calls get_entries again after every round, only the zip files that are
+        # still not indexed are failures
+        get_entries = self._calculate_not_indexed
+
+        def process_element(file_name: str) -> Tuple[str, pd.DataFrame, Dict[str, str]]:
+            return (file_name,) + self._prepare_tag_index(file_name)
+
+        def post_process(parts: List[Tuple[str, pd.DataFrame, Dict[str, str]]]) -> List[str]:
+            for file_name, tags_df, validators in parts:
+                self.dbaccessor.add_tag_index(file_name, tags_df, self.process_time,
+                                              validators=validators)
+            return [file_name for file_name, _, _ in parts]
+
+        executor = ParallelExecutor(chunksize=0,
+                                    execute_serial=self.execute_serial or len(not_indexed) <= 1)
+        executor.set_get_entries_function(get_entries)
+        executor.set_process_element_function(process_element)
+        executor.set_post_process_chunk_function(post_process)
+
+        _, failed = executor.execute()
+
+        if len(failed) > 0:
+            LOGGER.error("The tags of the following files could not be indexed: %s", failed)
@@ -0,0 +1,338 @@
+"""
+Columnar snapshot of the index_parquet_reports table.
+
+The snapshot is an uncompressed Arrow IPC file next to the sqlite db. It is memory mapped
+when it is read, so that several processes share the same pages and no data is copied.
+The rows are sorted by adsh and, within an adsh, by originFileType descending, so that a
+report from a quarter file comes before the same report from a daily file. Lookups by adsh
+are binary searches in the sorted adsh column. For the lookups by cik, the rows are ordered by
+cik once when the snapshot is read, so that the rows of a cik are found by a binary search as
+well. Forms and periods are vectorized masks on the found rows.
+
+The snapshot is written by the update process after the indexing, if the IndexSnapshot
+option is set in the configuration. SnapshotIndexingAccessor uses the snapshot for the
+lookups of reports and falls back to the sqlite db if there is no snapshot.
+"""
+import logging
+import os
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from secfsdstools.a_config.configmodel import Configuration
+from secfsdstools.c_index.indexdataaccess import IndexReport, ParquetDBIndexingAccessor
+
+LOGGER = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = 'index_parquet_reports.arrow'
+
+REPORT_COLUMNS = ['adsh', 'cik', 'name', 'form', 'filed', 'period', 'fullPath', 'originFile',
+                  'originFileType', 'url']
+
+
+def get_snapshot_path(db_dir: str) -> str:
+    """
+    returns the path of the snapshot file.
+
+    Args:
+        db_dir (str): the directory of the sqlite db
+
+    Returns:
+        str: path of the snapshot file
+    """
+    return os.path.join(db_dir, SNAPSHOT_FILE)
+
+
+def _create_snapshot_table(reports_df: pd.DataFrame) -> pa.Table:
+    reports_df = reports_df[REPORT_COLUMNS].sort_values(['adsh', 'originFileType'],
+                                                        ascending=[True, False])
+    reports_df = reports_df.astype({'cik': 'int64', 'filed': 'int64', 'period': 'int64'})
+    return pa.Table.from_pandas(reports_df, preserve_index=False).combine_chunks()
+
+
+def write_index_snapshot(db_dir: str) -> int:
+    """
+    writes the snapshot of the index_parquet_reports table. The snapshot is first written
+    into a temporary file, which then replaces the current snapshot, so that readers always
+    see a complete snapshot.
+
+    Args:
+        db_dir (str): the directory of the sqlite db
+
+    Returns:
+        int: the number of reports in the snapshot
+    """
+    reports_df = ParquetDBIndexingAccessor(db_dir=db_dir).read_all_indexreports_df()
+    table = _create_snapshot_table(reports_df)
+
+    target_file = get_snapshot_path(db_dir)
+    tmp_file = f'{target_file}.tmp'
+    with pa.OSFile(tmp_file, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(1, table.num_rows))
+    os.replace(tmp_file, target_file)
+
+    LOGGER.info('index snapshot with %d reports written', table.num_rows)
+    return table.num_rows
+
+
+class IndexSnapshot:
+    """
+    memory mapped snapshot of the index_parquet_reports table.
+    """
+
+    def __init__(self, snapshot_file: str):
+        self.snapshot_file = snapshot_file
+        self.mtime_ns = os.stat(snapshot_file).st_mtime_ns
+
+        with pa.memory_map(snapshot_file, 'r') as source:
+            self.table: pa.Table = pa.ipc.open_file(source).read_all()
+
+        # zero copy views on the memory mapped buffers
+        self.ciks: np.ndarray = self.table['cik'].to_numpy()
+        self.periods: np.ndarray = self.table['period'].to_numpy()
+
+        # the lookup structures are built once, every lookup is then a binary search
+        self.adshs: np.ndarray = self.table['adsh'].to_numpy(zero_copy_only=False)
+        self.cik_order: np.ndarray = np.argsort(self.ciks, kind='stable')
+        self.sorted_ciks: np.ndarray = self.ciks[self.cik_order]
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def is_current(self) -> bool:
+        """
+        checks whether the snapshot file was not replaced since it was read.
+
+        Returns:
+            bool: True if the snapshot file is unchanged
+        """
+        try:
+            return os.stat(self.snapshot_file).st_mtime_ns == self.mtime_ns
+        except FileNotFoundError:
+            return False
+
+    def find_adsh_rows(self, adshs: List[str]) -> np.ndarray:
+        """
+        finds the row of every adsh. If a report is present in a quarter and in a daily file,
+        the row of the quarter file is returned.
+
+        Args:
+            adshs (List[str]): the adshs, lower case is ignored
+
+        Returns:
+            np.ndarray: the row indices, -1 for adshs that are not present
+        """
+        keys = np.array([adsh.upper() for adsh in adshs], dtype=object)
+        # the leftmost position of an adsh is its first occurrence, the row of the quarter file
+        rows = np.searchsorted(self.adshs, keys, side='left').astype(np.int64)
+        found = rows < len(self.adshs)
+        found[found] = self.adshs[rows[found]] == keys[found]
+        rows[~found] = -1
+        return rows
+
+    def find_cik_rows(self, ciks: List[int]) -> np.ndarray:
+        """
+        finds the rows of the provided ciks.
+
+        Args:
+            ciks (List[int]): the ciks of the companies
+
+        Returns:
+            np.ndarray: the row indices in the order of the snapshot
+        """
+        keys = np.unique(np.array([int(cik) for cik in ciks], dtype=np.int64))
+        starts = np.searchsorted(self.sorted_ciks, keys, side='left')
+        ends = np.searchsorted(self.sorted_ciks, keys, side='right')
+        rows = [self.cik_order[start:end] for start, end in zip(starts, ends)]
+        return np.sort(np.concatenate(rows)) if len(rows) > 0 else np.empty(0, dtype=np.int64)
+
+    def _isin(self, column: str, values: List[str],
+              rows: Optional[np.ndarray] = None) -> np.ndarray:
+        data = self.table[column] if rows is None \
+            else self.table[column].take(pa.array(rows, type=pa.int64()))
+        return pc.is_in(data,  # pylint: disable=no-member
+                        value_set=pa.array(values, type=pa.string())) \
+            .to_numpy(zero_copy_only=False)
+
+    def find_rows(self,
+                  ciks: Optional[List[int]] = None,
+                  forms: Optional[List[str]] = None,
+                  period_from: Optional[int] = None,
+                  period_to: Optional[int] = None) -> np.ndarray:
+        """
+        finds the rows that match all provided conditions.
+
+        Args:
+            ciks (List[int], optional, None): the ciks of the companies
+            forms (List[str], optional, None): the forms, like ['10-K', '10-Q']
+            period_from (int, optional, None): the first period, in the format YYYYMMDD
+            period_to (int, optional, None): the last period, in the format YYYYMMDD
+
+        Returns:
+            np.ndarray: the row indices in the order of the snapshot
+        """
+        rows = None if ciks is None else self.find_cik_rows(ciks)
+        periods = self.periods if rows is None else self.periods[rows]
+
+        mask = np.ones(len(periods), dtype=bool)
+        if forms is not None:
+            mask &= self._isin(column='form', values=[form.upper() for form in forms],
+                               rows=rows)
+        if period_from is not None:
+            mask &= periods >= period_from
+        if period_to is not None:
+            mask &= periods <= period_to
+        return np.flatnonzero(mask) if rows is None else rows[mask]
+
+    def is_quarter(self, rows: np.ndarray) -> np.ndarray:
+        """
+        checks whether the reports in the provided rows are from a quarter file.
+
+        Args:
+            rows (np.ndarray): row indices
+
+        Returns:
+            np.ndarray: boolean array
+        """
+        return self._isin(column='originFileType', values=['quarter'], rows=rows)
+
+    def take_df(self, rows: np.ndarray) -> pd.DataFrame:
+        """
+        returns the reports in the provided rows.
+
+        Args:
+            rows (np.ndarray): row indices
+
+        Returns:
+            pd.DataFrame: dataframe with the columns of the index_parquet_reports table
+        """
+        return self.table.select(REPORT_COLUMNS).take(pa.array(rows, type=pa.int64())) \
+            .to_pandas()
+
+    def take_reports(self, rows: np.ndarray) -> List[IndexReport]:
+        """
+        returns the reports in the provided rows as IndexReport instances.
+
+        Args:
+            rows (np.ndarray): row indices
+
+        Returns:
+            List[IndexReport]: the reports
+        """
+        selected = self.table.select(REPORT_COLUMNS).take(pa.array(rows, type=pa.int64()))
+        columns: List[List[Any]] = [selected[column].to_pylist() for column in REPORT_COLUMNS]
+        return [IndexReport(*values) for values in zip(*columns)]
+
+
+class SnapshotIndexingAccessor(ParquetDBIndexingAccessor):
+    """
+    reads the reports from the memory mapped snapshot instead of the sqlite db.
+    All other methods, and the report lookups when there is no snapshot, use the sqlite db.
+    """
+
+    def __init__(self, db_dir: str, read_only: bool = True):
+        super().__init__(db_dir=db_dir, read_only=read_only)
+        self._snapshot: Optional[IndexSnapshot] = None
+
+    def get_snapshot(self) -> Optional[IndexSnapshot]:
+        """
+        returns the snapshot. It is read again, if the snapshot file was replaced.
+
+        Returns:
+            Optional[IndexSnapshot]: the snapshot or None, if there is no snapshot file
+        """
+        if self._snapshot is None or not self._snapshot.is_current():
+            snapshot_file = get_snapshot_path(self.db_dir)
+            self._snapshot = IndexSnapshot(snapshot_file) if os.path.isfile(snapshot_file) \
+                else None
+        return self._snapshot
+
+    def read_index_report_for_adsh(self, adsh: str) -> IndexReport:
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return super().read_index_report_for_adsh(adsh)
+        rows = snapshot.find_adsh_rows([adsh])
+        if rows[0] < 0:
+            raise IndexError(f'no report for adsh {adsh}')
+        return snapshot.take_reports(rows)[0]
+
+    def read_index_reports_for_adshs(self, adshs: List[str]) -> List[IndexReport]:
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return super().read_index_reports_for_adshs(adshs)
+        rows = np.unique(snapshot.find_adsh_rows(adshs))
+        return snapshot.take_reports(rows[rows >= 0])
+
+    def _find_cik_rows(self, snapshot: IndexSnapshot, ciks: List[int],
+                       forms: Optional[List[str]]) -> np.ndarray:
+        rows = snapshot.find_rows(ciks=ciks, forms=forms)
+        # ordered by period descending, like the sqlite query
+        return rows[np.argsort(-snapshot.periods[rows], kind='stable')]
+
+    def read_index_reports_for_ciks(self, ciks: List[int], forms: Optional[List[str]] = None) \
+            -> List[IndexReport]:
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return super().read_index_reports_for_ciks(ciks, forms)
+        return snapshot.take_reports(self._find_cik_rows(snapshot, ciks, forms))
+
+    def read_index_reports_for_ciks_df(self, ciks: List[int], forms: Optional[List[str]] = None) \
+            -> pd.DataFrame:
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return super().read_index_reports_for_ciks_df(ciks, forms)
+        return snapshot.take_df(self._find_cik_rows(snapshot, ciks, forms))
+
+    def find_latest_company_report(self, cik: int) -> IndexReport:
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return super().find_latest_company_report(cik)
+        rows = self._find_cik_rows(snapshot, [cik], None)
+        rows = rows[snapshot.is_quarter(rows)]
+        if len(rows) == 0:
+            raise IndexError(f'no quarter report for cik {cik}')
+        return snapshot.take_reports(rows[:1])[0]
+
+    def find_reports_df(self,
+                        ciks: Optional[List[int]] = None,
+                        forms: Optional[List[str]] = None,
+                        period_from: Optional[int] = None,
+                        period_to: Optional[int] = None) -> pd.DataFrame:
+        """
+        finds the reports that match all provided conditions.
+
+        Args:
+            ciks (List[int], optional, None): the ciks of the companies
+            forms (List[str], optional, None): the forms, like ['10-K', '10-Q']
+            period_from (int, optional, None): the first period, in the format YYYYMMDD
+            period_to (int, optional, None): the last period, in the format YYYYMMDD
+
+        Returns:
+            pd.DataFrame: the reports, ordered by adsh
+        """
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            raise ValueError(f'there is no index snapshot in {self.db_dir}')
+        return snapshot.take_df(snapshot.find_rows(ciks=ciks, forms=forms,
+                                                   period_from=period_from,
+                                                   period_to=period_to))
+
+
+def get_index_accessor(configuration: Configuration) -> ParquetDBIndexingAccessor:
+    """
+    returns the accessor to read the reports from the index. If the index_snapshot
+    option is set, the SnapshotIndexingAccessor is returned.
+
+    Args:
+        configuration (Configuration): the configuration
+
+    Returns:
+        ParquetDBIndexingAccessor: read only accessor for the index
+    """
+    if configuration.index_snapshot:
+        return SnapshotIndexingAccessor(db_dir=configuration.db_dir)
+    return ParquetDBIndexingAccessor(db_dir=configuration.db_dir, read_only=True)
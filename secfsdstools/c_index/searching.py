@@ -1,7 +1,7 @@
 """
 company search logic.
 """
-from typing import Optional
+from typing import List, Optional
 
 import pandas as pd
 
@@ -31,18 +31,38 @@ class IndexSearch:
         if configuration is None:
             configuration = ConfigurationManager.read_config_file()
 
-        accessor: ParquetDBIndexingAccessor = ParquetDBIndexingAccessor(db_dir=configuration.db_dir)
+        accessor: ParquetDBIndexingAccessor = ParquetDBIndexingAccessor(
+            db_dir=configuration.db_dir, read_only=True)
         return IndexSearch(accessor)
 
-    def find_company_by_name(self, name_part: str) -> pd.DataFrame:
+    def find_company_by_name(self, name_part: str, limit: Optional[int] = None) -> pd.DataFrame:
         """
         Searches entries by the given name part. Upper/lower case is ignored.
+        Every word of the name part has to match the beginning of a word in the name,
+        the results are ordered by relevance.
 
         Args:
             name_part:
+            limit (int, optional, None): the maximal number of results
 
         Returns:
             pd.DataFrame: with columns 'cik', 'name'
         """
 
-        return self.dbaccessor.find_company_by_name(name_part=name_part)
+        return self.dbaccessor.find_company_by_name(name_part=name_part, limit=limit)
+
+    def find_companies_by_names(self, names: List[str], limit_per_name: int = 1) \
+            -> pd.DataFrame:
+        """
+        Searches the companies for several names at once.
+
+        Args:
+            names (List[str]): the names to search for
+            limit_per_name (int, optional, 1): the maximal number of results per name
+
+        Returns:
+            pd.DataFrame: with columns 'search_name', 'name', 'cik'
+        """
+
+        return self.dbaccessor.find_companies_by_names(names=names,
+                                                       limit_per_name=limit_per_name)
@@ -0,0 +1,157 @@
+"""
+Defines the schema versions of the parquet files the zip files are transformed to.
+
+- Version 1 (legacy): the columns are stored with the types pandas uses when reading the CSV
+  files. Strings are stored as plain strings and integers as 64bit integers.
+  Files of version 1 don't contain the schema version in the metadata.
+- Version 2 (compact): low cardinality string columns (like adsh, tag, version, stmt, uom, ...)
+  are stored as dictionary columns and small range integer columns with narrow integer types.
+  Dictionary columns are read back as categorical columns by pandas.
+
+Moreover, it defines the partition columns of the optional partitioned layout. In this layout,
+every file is stored as a directory with hive partitions (e.g. 'pre.txt.parquet/stmt_partition=BS'):
+pre.txt (and the optional pre_num.txt) is partitioned by its stmt, sub.txt and num.txt are
+partitioned by the form family of the report (10-K, 10-Q, ...). The partition columns are not
+part of the loaded data.
+"""
+from typing import Dict, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from secfsdstools.a_utils.constants import SUB_TXT, PRE_TXT, NUM_TXT, PRE_NUM_TXT, TAG_TXT
+
+SCHEMA_VERSION_KEY = b'secfsdstools.schema_version'
+
+SCHEMA_VERSION_LEGACY = 1
+SCHEMA_VERSION_COMPACT = 2
+
+SCHEMA_VERSIONS = [SCHEMA_VERSION_LEGACY, SCHEMA_VERSION_COMPACT]
+
+DICTIONARY_TYPE = pa.dictionary(pa.int32(), pa.string())
+
+COMPACT_TYPES: Dict[str, Dict[str, pa.DataType]] = {
+    SUB_TXT: {'adsh': DICTIONARY_TYPE,
+              'form': DICTIONARY_TYPE},
+    PRE_TXT: {'adsh': DICTIONARY_TYPE,
+              'report': pa.int16(),
+              'line': pa.int32(),
+              'stmt': DICTIONARY_TYPE,
+              'inpth': pa.int8(),
+              'tag': DICTIONARY_TYPE,
+              'version': DICTIONARY_TYPE,
+              'negating': pa.int8()},
+    NUM_TXT: {'adsh': DICTIONARY_TYPE,
+              'tag': DICTIONARY_TYPE,
+              'version': DICTIONARY_TYPE,
+              'coreg': DICTIONARY_TYPE,
+              'ddate': pa.int32(),
+              'qtrs': pa.int8(),
+              'uom': DICTIONARY_TYPE},
+}
+# the optional pre_num.txt contains the joined content of pre.txt and num.txt
+COMPACT_TYPES[PRE_NUM_TXT] = {**COMPACT_TYPES[NUM_TXT], **COMPACT_TYPES[PRE_TXT]}
+# the optional tag.txt is only written if the tag dimension is enabled
+COMPACT_TYPES[TAG_TXT] = {'version': DICTIONARY_TYPE,
+                          'custom': pa.int8(),
+                          'abstract': pa.int8(),
+                          'datatype': DICTIONARY_TYPE,
+                          'iord': DICTIONARY_TYPE,
+                          'crdr': DICTIONARY_TYPE}
+
+
+def get_schema_version(parquet_file: str) -> int:
+    """
+    reads the schema version of a transformed parquet file from its metadata.
+
+    Args:
+        parquet_file (str): path to the parquet file
+
+    Returns:
+        int: the schema version, SCHEMA_VERSION_LEGACY if no version is stored in the file
+    """
+    metadata = pq.read_schema(parquet_file).metadata
+    if metadata is None or SCHEMA_VERSION_KEY not in metadata:
+        return SCHEMA_VERSION_LEGACY
+    return int(metadata[SCHEMA_VERSION_KEY])
+
+
+def to_schema_version(table: pa.Table, file_name: str, schema_version: int) -> pa.Table:
+    """
+    converts the table with the content of file_name (sub.txt, pre.txt, num.txt,
+    pre_num.txt, or tag.txt) into the provided schema version.
+
+    Args:
+        table (pa.Table): the table to convert
+        file_name (str): the name of the file the table belongs to (sub.txt, pre.txt, num.txt,
+            pre_num.txt, tag.txt)
+        schema_version (int): the target schema version
+
+    Returns:
+        pa.Table: the converted table
+    """
+    if schema_version not in SCHEMA_VERSIONS:
+        raise ValueError(f'unknown schema version {schema_version}. '
+                         f'Supported versions are {SCHEMA_VERSIONS}')
+
+    if schema_version == SCHEMA_VERSION_LEGACY:
+        return table
+
+    # the index columns pandas might have added are not needed anymore
+    index_columns = [name for name in table.column_names if name.startswith('__index_level_')]
+    table = table.drop(index_columns)
+
+    for column, target_type in COMPACT_TYPES[file_name].items():
+        index = table.schema.get_field_index(column)
+        if (index < 0) or (table.schema.field(index).type == target_type):
+            continue
+
+        column_data = table.column(index)
+        if pa.types.is_dictionary(target_type):
+            if not pa.types.is_string(column_data.type):
+                column_data = column_data.cast(pa.string())
+            column_data = column_data.dictionary_encode()
+        else:
+            # cast is safe, so it fails if a value does not fit into the narrow type
+            column_data = column_data.cast(target_type)
+        table = table.set_column(index, column, column_data)
+
+    # the pandas metadata would describe the original types, so it is replaced
+    return table.replace_schema_metadata({SCHEMA_VERSION_KEY: str(schema_version).encode()})
+
+
+FORM_FAMILY_COLUMN = 'form_family'
+STMT_PARTITION_COLUMN = 'stmt_partition'
+
+PARTITION_COLUMNS: Dict[str, str] = {SUB_TXT: FORM_FAMILY_COLUMN,
+                                     PRE_TXT: STMT_PARTITION_COLUMN,
+                                     NUM_TXT: FORM_FAMILY_COLUMN,
+                                     PRE_NUM_TXT: STMT_PARTITION_COLUMN}
+
+# name of the partition directory for rows without a value (as used by hive)
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+FORM_FAMILIES = ['10-K', '10-Q', '20-F', '40-F', '8-K', '6-K']
+OTHER_FORM_FAMILY = 'other'
+
+
+def get_form_family(form: Optional[str]) -> str:
+    """
+    returns the form family a form belongs to. Amendments and transition reports belong
+    to the family of the original form (e.g. 10-K/A and 10-KT belong to 10-K).
+    All rare forms belong to the family 'other'.
+
+    Args:
+        form (str): the form, as it appears in sub.txt
+
+    Returns:
+        str: the form family
+    """
+    if form:
+        base_form = form.strip().upper()
+        if base_form.endswith('/A'):
+            base_form = base_form[:-2]
+        for family in FORM_FAMILIES:
+            if base_form.startswith(family):
+                return family
+    return OTHER_FORM_FAMILY
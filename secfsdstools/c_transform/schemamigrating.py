@@ -0,0 +1,180 @@
+"""
+Migrates the parquet files of an existing parquet store to another schema version.
+
+In order to migrate the store that is defined in your configuration file to the schema
+version defined by 'ParquetSchemaVersion' in the configuration file, just run
+
+```
+python -m secfsdstools.c_transform.schemamigrating
+```
+"""
+import logging
+import os
+from datetime import datetime, timezone
+from typing import List, Tuple, Optional
+
+import pyarrow.parquet as pq
+
+from secfsdstools.a_config.configmgt import ConfigurationManager
+from secfsdstools.a_config.configmodel import Configuration
+from secfsdstools.a_utils.constants import SUB_TXT, PRE_TXT, NUM_TXT, PRE_NUM_TXT, TAG_TXT
+from secfsdstools.a_utils.fileutils import get_directories_in_directory
+from secfsdstools.a_utils.manifestutils import read_manifest, write_manifest
+from secfsdstools.a_utils.parallelexecution import ParallelExecutor
+from secfsdstools.a_utils.parquetutils import DEFAULT_COMPRESSION, get_compression_options, \
+    get_parquet_files
+from secfsdstools.c_transform.parquetschema import SCHEMA_VERSION_COMPACT, SCHEMA_VERSIONS, \
+    get_schema_version
+from secfsdstools.c_transform.toparquettransforming import DEFAULT_ROW_GROUP_SIZE, \
+    ParquetTableWriter
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ParquetSchemaMigrator:
+    """
+    Rewrites the sub.txt, pre.txt, num.txt, pre_num.txt, and tag.txt parquet files of all
+    transformed zip files which have a lower schema version than the target schema version.
+    Every file is first written to a temporary file, which then replaces the original file,
+    so an interrupted migration doesn't leave incomplete files behind and can simply be
+    restarted.
+
+    The files are written with the same sort order, row group size, statistics, and page index
+    as the ToParquetTransformer writes them. Hive partitioned files are migrated part file by
+    part file, the partitions stay the same.
+
+    The creation time in the manifests of the migrated directories is updated, so that the
+    index notices the changed content and indexes the directories again.
+    """
+
+    def __init__(self, parquet_dir: str, schema_version: int = SCHEMA_VERSION_COMPACT,
+                 compression: str = DEFAULT_COMPRESSION,
+                 compression_level: Optional[int] = None,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE):
+        """
+        Constructor.
+        Args:
+            parquet_dir: the base directory of the parquet files
+            schema_version: the target schema version
+            compression: the compression codec of the migrated files
+            compression_level: the compression level of the migrated files
+            row_group_size: the maximum number of rows in a row group of the migrated files
+        """
+        if schema_version not in SCHEMA_VERSIONS:
+            raise ValueError(f'unknown schema_version {schema_version}. '
+                             f'Allowed values are {SCHEMA_VERSIONS}')
+        self.parquet_dir = parquet_dir
+        self.schema_version = schema_version
+        self.compression_options = get_compression_options(compression=compression,
+                                                           compression_level=compression_level)
+        self.table_writer = ParquetTableWriter(schema_version=schema_version,
+                                               row_group_size=row_group_size,
+                                               compression_options=self.compression_options)
+
+    def _calculate_not_migrated(self) -> List[Tuple[str, str]]:
+        """
+        calculates the parquet files which have a lower schema version than the target version.
+
+        Returns:
+            List[Tuple[str, str]]: List with tuples of the file name (sub.txt, pre.txt, num.txt,
+             pre_num.txt, tag.txt) and the path to the parquet file, respectively to the part
+             file of a partitioned file
+        """
+        not_migrated: List[Tuple[str, str]] = []
+        for file_type in ['quarter', 'daily']:
+            type_dir = os.path.join(self.parquet_dir, file_type)
+            for zip_dir in get_directories_in_directory(type_dir):
+                for file_name in [SUB_TXT, PRE_TXT, NUM_TXT, PRE_NUM_TXT, TAG_TXT]:
+                    path = os.path.join(type_dir, zip_dir, f'{file_name}.parquet')
+                    for file_path in get_parquet_files(path):
+                        if get_schema_version(file_path) < self.schema_version:
+                            not_migrated.append((file_name, file_path))
+        return not_migrated
+
+    def _migrate_file(self, file_name: str, path: str):
+        # the file is read on its own, so that the partition columns of a part file
+        # are not added to its content
+        table = pq.ParquetFile(path).read()
+
+        tmp_path = f'{path}.tmp'
+        self.table_writer.write_tables(tables=iter([table]), file_name=file_name,
+                                       target_file=tmp_path)
+        os.replace(tmp_path, path)
+
+    def _get_zip_dir(self, path: str) -> str:
+        """ returns the directory of the transformed zip file the (part) file belongs to """
+        file_type, zip_dir = os.path.relpath(path, self.parquet_dir).split(os.sep)[:2]
+        return os.path.join(self.parquet_dir, file_type, zip_dir)
+
+    def _update_manifests(self, migrated: List[Tuple[str, str]]):
+        """
+        updates the schema version and the creation time in the manifests of the migrated
+        directories. The fingerprint of a directory is derived from the creation time, so the
+        index replaces the now outdated row group locations and statistics of the directory.
+        """
+        for directory in sorted({self._get_zip_dir(path) for _, path in migrated}):
+            manifest = read_manifest(directory)
+            if manifest is not None:
+                manifest.schema_version = self.schema_version
+                manifest.created = datetime.now(timezone.utc).isoformat()
+                write_manifest(directory, manifest)
+
+    def process(self) -> List[Tuple[str, str]]:
+        """
+        migrates all parquet files with a lower schema version than the target schema version.
+        processing is done in parallel.
+
+        Returns:
+            List[Tuple[str, str]]: the migrated files
+        """
+
+        def process_element(element: Tuple[str, str]) -> Tuple[str, str]:
+            LOGGER.info('migrating %s', element[1])
+            self._migrate_file(file_name=element[0], path=element[1])
+            return element
+
+        executor = ParallelExecutor(chunksize=0)
+
+        executor.set_get_entries_function(self._calculate_not_migrated)
+        executor.set_process_element_function(process_element)
+        executor.set_post_process_chunk_function(lambda parts: parts)
+
+        result, failed = executor.execute()
+
+        if len(failed) > 0:
+            LOGGER.error("The following files could not be migrated: %s", failed)
+
+        self._update_manifests(result)
+        return result
+
+
+def migrate_parquet_store(configuration: Optional[Configuration] = None,
+                          schema_version: Optional[int] = None) -> List[Tuple[str, str]]:
+    """
+    migrates the parquet store to the provided schema version.
+    If no configuration is provided, the configuration is read from the config file.
+    If no schema_version is provided, the ParquetSchemaVersion of the configuration is used.
+
+    Args:
+        configuration (Configuration, optional, None): the configuration
+        schema_version (int, optional, None): the target schema version
+
+    Returns:
+        List[Tuple[str, str]]: the migrated files
+    """
+    if configuration is None:
+        configuration = ConfigurationManager.read_config_file()
+
+    if schema_version is None:
+        schema_version = configuration.parquet_schema_version
+
+    migrator = ParquetSchemaMigrator(parquet_dir=configuration.parquet_dir,
+                                     schema_version=schema_version,
+                                     compression=configuration.parquet_compression,
+                                     compression_level=configuration.parquet_compression_level,
+                                     row_group_size=configuration.transform_row_group_size)
+    return migrator.process()
+
+
+if __name__ == '__main__':
+    migrate_parquet_store()
@@ -0,0 +1,353 @@
+"""
+Defines the global tag dimension.
+
+Every combination of tag and version gets a dense 32bit integer tag_id from the TagRegistry.
+The ids are numbered consecutively in the order in which the tags are first seen and never
+change, so the same tag has the same id in all zip files, also in zip files that are
+transformed later.
+
+If the tag dimension is enabled, pre.txt and num.txt get an additional tag_id column, their
+tag and version columns are stored as dictionary columns, and the content of tag.txt of every
+zip file is stored as tag.txt.parquet. The tag dimension combines the content of all these
+tag.txt files without duplicates and is stored once as tag_dimension.parquet directly in the
+parquet dir. It is rebuilt by every update.
+"""
+import contextlib
+import glob
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from secfsdstools.a_utils.constants import TAG_TXT
+from secfsdstools.a_utils.fileutils import get_directories_in_directory
+from secfsdstools.a_utils.manifestutils import is_transform_completed
+
+LOGGER = logging.getLogger(__name__)
+
+TAG_ID_COLUMN = 'tag_id'
+TAG_DIMENSION_FILE = 'tag_dimension.parquet'
+TAG_REGISTRY_DIR = 'tag_registry'
+
+# the tag and version columns of pre.txt and num.txt are stored as dictionary columns
+TAG_COLUMNS = ['tag', 'version']
+
+# separates the version and the tag in the key of a tag, it appears in neither of them
+KEY_SEPARATOR = '\x1f'
+
+# a lock file that is older is regarded as left behind by a crashed process. On the same host,
+# the lock is also regarded as stale as soon as the process that created it is gone.
+LOCK_TIMEOUT_SECONDS = 600
+
+# once there are more part files, they are compacted into the registry file
+COMPACT_PART_COUNT = 100
+
+REGISTRY_FILE = 'registry.parquet'
+PART_FILE_PREFIX = 'part-'
+
+
+def _get_keys(tags: pa.ChunkedArray, versions: pa.ChunkedArray) -> pa.ChunkedArray:
+    return pc.binary_join_element_wise(  # pylint: disable=no-member
+        pc.cast(versions, pa.string()), pc.cast(tags, pa.string()), KEY_SEPARATOR)
+
+
+def _get_first_id(part_file: str) -> int:
+    """ the name of a part file contains the tag_id of its first tag """
+    return int(os.path.basename(part_file)[len(PART_FILE_PREFIX):-len('.parquet')])
+
+
+def _is_process_alive(pid: int) -> bool:
+    if os.name != 'posix':
+        # os.kill can't check a process without affecting it on other platforms
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _is_stale_lock(lock_file: str) -> bool:
+    """ checks whether the lock was left behind by a crashed process """
+    try:
+        if time.time() - os.path.getmtime(lock_file) > LOCK_TIMEOUT_SECONDS:
+            return True
+        with open(lock_file, 'r', encoding='utf-8') as file:
+            owner = file.read().split()
+    except OSError:
+        return False
+    # the lock file contains the host and the pid of the owner, once it is written
+    if (len(owner) != 2) or (owner[0] != socket.gethostname()) or not owner[1].isdigit():
+        return False
+    return not _is_process_alive(int(owner[1]))
+
+
+class TagRegistry:
+    """
+    Assigns a dense tag_id to every combination of tag and version. The tag_id is the position
+    of the tag in the registry, so the ids are numbered consecutively and never change.
+
+    The registry is stored in the directory tag_registry in the parquet dir. Every call that
+    registers new tags appends a part file with these tags, so the existing files are never
+    rewritten. Once there are more than COMPACT_PART_COUNT part files, they are compacted into
+    the registry file. Since zip files are transformed by several processes at once, new tags
+    are only registered while holding a lock file, which contains the host and the pid of its
+    owner. A lock of a process that is gone is removed at once.
+
+    The registered keys are cached, and new tags of other processes are only read if a tag is
+    not known yet.
+    """
+
+    def __init__(self, parquet_dir: str):
+        """
+        Args:
+            parquet_dir (str): the base directory of the parquet files
+        """
+        self.parquet_dir = parquet_dir
+        self.registry_dir = os.path.join(parquet_dir, TAG_REGISTRY_DIR)
+        self._lock = threading.Lock()
+        self._keys = pd.Index([], dtype=object)
+
+    def __getstate__(self):
+        # the lock can't be pickled, the copy reads the registry again
+        state = self.__dict__.copy()
+        for key in ['_lock', '_keys']:
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._keys = pd.Index([], dtype=object)
+
+    @contextlib.contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        os.makedirs(self.registry_dir, exist_ok=True)
+        lock_file = os.path.join(self.registry_dir, '.lock')
+        while True:
+            try:
+                file_descriptor = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if _is_stale_lock(lock_file):
+                    LOGGER.warning('removing the stale lock %s', lock_file)
+                    with contextlib.suppress(OSError):
+                        os.remove(lock_file)
+                    continue
+                time.sleep(0.05)
+        try:
+            os.write(file_descriptor, f'{socket.gethostname()} {os.getpid()}'.encode('utf-8'))
+            yield
+        finally:
+            os.close(file_descriptor)
+            os.remove(lock_file)
+
+    def _append_keys(self, table: pa.Table):
+        self._keys = self._keys.append(
+            pd.Index(_get_keys(table['tag'], table['version']).to_pylist(), dtype=object))
+
+    def _read_new_keys(self):
+        """
+        appends the keys that were registered since the last call to the cached keys. Without
+        holding the lock, a compaction can remove the parts while they are read. The keys are
+        only appended as long as they continue the cached keys, so the missing keys are read
+        again the next time.
+        """
+        registry_file = os.path.join(self.registry_dir, REGISTRY_FILE)
+        with contextlib.suppress(OSError):
+            if pq.ParquetFile(registry_file).metadata.num_rows > len(self._keys):
+                self._append_keys(pq.read_table(
+                    registry_file, columns=TAG_COLUMNS,
+                    filters=[(TAG_ID_COLUMN, '>=', len(self._keys))]))
+
+        parts = sorted(glob.glob(os.path.join(self.registry_dir,
+                                              f'{PART_FILE_PREFIX}*.parquet')))
+        for part in parts:
+            first_id = _get_first_id(part)
+            if first_id < len(self._keys):
+                continue
+            if first_id > len(self._keys):
+                return
+            try:
+                table = pq.read_table(part, columns=TAG_COLUMNS)
+            except OSError:
+                return
+            self._append_keys(table)
+
+    def _get_missing(self, keys: List[str]) -> List[str]:
+        return [key for key, position in zip(keys, self._keys.get_indexer(keys))
+                if position < 0]
+
+    def _compact(self):
+        """
+        writes all registered keys into the registry file and removes the part files.
+        It has to be called while holding the lock.
+        """
+        parts = glob.glob(os.path.join(self.registry_dir, f'{PART_FILE_PREFIX}*.parquet'))
+        if (len(parts) <= COMPACT_PART_COUNT) or \
+                any(_get_first_id(part) >= len(self._keys) for part in parts):
+            # the keys of all parts have to be cached, otherwise they would be lost
+            return
+
+        versions, tags = zip(*[key.split(KEY_SEPARATOR, 1) for key in self._keys])
+        registry_table = pa.table({'tag': pa.array(tags, type=pa.string()),
+                                   'version': pa.array(versions, type=pa.string()),
+                                   TAG_ID_COLUMN: pa.array(range(len(self._keys)),
+                                                           type=pa.int32())})
+        registry_file = os.path.join(self.registry_dir, REGISTRY_FILE)
+        pq.write_table(registry_table, f'{registry_file}.tmp')
+        os.replace(f'{registry_file}.tmp', registry_file)
+        for part in parts:
+            os.remove(part)
+        LOGGER.info('compacted %d parts of the tag registry with %d tags', len(parts),
+                    len(self._keys))
+
+    def _register(self, keys: List[str]):
+        """ registers the keys that are not registered yet by any process """
+        with self._file_lock():
+            self._read_new_keys()
+            missing = self._get_missing(keys)
+            if len(missing) == 0:
+                return
+
+            first_id = len(self._keys)
+            versions, tags = zip(*[key.split(KEY_SEPARATOR, 1) for key in missing])
+            part_table = pa.table({'tag': pa.array(tags, type=pa.string()),
+                                   'version': pa.array(versions, type=pa.string()),
+                                   TAG_ID_COLUMN: pa.array(range(first_id,
+                                                                 first_id + len(missing)),
+                                                           type=pa.int32())})
+            part_file = os.path.join(self.registry_dir,
+                                     f'{PART_FILE_PREFIX}{first_id:010d}.parquet')
+            pq.write_table(part_table, f'{part_file}.tmp')
+            os.replace(f'{part_file}.tmp', part_file)
+            self._read_new_keys()
+            self._compact()
+
+    def get_tag_ids(self, tags: pa.ChunkedArray, versions: pa.ChunkedArray) -> pa.ChunkedArray:
+        """
+        returns the tag_ids of the provided tags. Tags that are not registered yet are
+        registered. Rows without a tag or a version have no tag_id.
+
+        Args:
+            tags (pa.ChunkedArray): the tags
+            versions (pa.ChunkedArray): the versions of the tags
+
+        Returns:
+            pa.ChunkedArray: the tag_ids as 32bit integers
+        """
+        keys = _get_keys(tags, versions)
+        unique_keys = pc.unique(keys).drop_null()  # pylint: disable=no-member
+        unique_key_list = unique_keys.to_pylist()
+        with self._lock:
+            if len(self._get_missing(unique_key_list)) > 0:
+                self._read_new_keys()
+                if len(self._get_missing(unique_key_list)) > 0:
+                    self._register(unique_key_list)
+            unique_ids = pa.array(self._keys.get_indexer(unique_key_list), type=pa.int32())
+
+        indices = pc.index_in(keys, value_set=unique_keys)  # pylint: disable=no-member
+        return unique_ids.take(indices)
+
+
+def add_tag_ids(table: pa.Table, registry: TagRegistry) -> pa.Table:
+    """
+    appends the tag_id column to a table with a tag and a version column.
+
+    Args:
+        table (pa.Table): the table with the tag and version column
+        registry (TagRegistry): the registry that assigns the tag_ids
+
+    Returns:
+        pa.Table: the table with the additional tag_id column
+    """
+    return table.append_column(TAG_ID_COLUMN,
+                               registry.get_tag_ids(table['tag'], table['version']))
+
+
+def prepare_tag_df(tag_df: pd.DataFrame, registry: TagRegistry) -> pd.DataFrame:
+    """
+    prepares the content of a tag.txt file: adds the tag_id and removes duplicates.
+
+    Args:
+        tag_df (pd.DataFrame): the content of the tag.txt file
+        registry (TagRegistry): the registry that assigns the tag_ids
+
+    Returns:
+        pd.DataFrame: the prepared dataframe
+    """
+    tag_df = tag_df.drop_duplicates(subset=['tag', 'version'], keep='last').copy()
+    tag_ids = registry.get_tag_ids(pa.chunked_array([pa.array(tag_df.tag, type=pa.string())]),
+                                   pa.chunked_array([pa.array(tag_df.version,
+                                                              type=pa.string())]))
+    tag_df[TAG_ID_COLUMN] = tag_ids.to_pandas().values
+    return tag_df.reset_index(drop=True)
+
+
+def _get_tag_files(parquet_dir: str) -> List[str]:
+    tag_files: List[str] = []
+    for file_type in ['quarter', 'daily']:
+        type_dir = os.path.join(parquet_dir, file_type)
+        for zip_dir in sorted(get_directories_in_directory(type_dir)):
+            tag_file = os.path.join(type_dir, zip_dir, f'{TAG_TXT}.parquet')
+            if os.path.isfile(tag_file) and is_transform_completed(os.path.join(type_dir,
+                                                                                zip_dir)):
+                tag_files.append(tag_file)
+    return tag_files
+
+
+def build_tag_dimension(parquet_dir: str) -> int:
+    """
+    combines the tag.txt.parquet files of all transformed zip files into the tag dimension.
+    If a tag appears in several zip files, the entry of the latest zip file is kept.
+    The tag dimension is first written to a temporary file, which then replaces the current
+    tag dimension.
+
+    Args:
+        parquet_dir (str): the base directory of the parquet files
+
+    Returns:
+        int: the number of tags in the tag dimension
+    """
+    tag_files = _get_tag_files(parquet_dir)
+    if len(tag_files) == 0:
+        LOGGER.info('no tag.txt files found, tag dimension is not built')
+        return 0
+
+    tag_df = pd.concat([pd.read_parquet(tag_file) for tag_file in tag_files],
+                       ignore_index=True)
+    tag_df = tag_df.drop_duplicates(subset=[TAG_ID_COLUMN], keep='last') \
+        .sort_values(TAG_ID_COLUMN).reset_index(drop=True)
+
+    target_file = os.path.join(parquet_dir, TAG_DIMENSION_FILE)
+    tmp_file = f'{target_file}.tmp'
+    pq.write_table(pa.Table.from_pandas(tag_df, preserve_index=False), tmp_file)
+    os.replace(tmp_file, target_file)
+
+    LOGGER.info('tag dimension with %d tags built from %d files', len(tag_df), len(tag_files))
+    return len(tag_df)
+
+
+def read_tag_dimension(parquet_dir: str, tag_ids: Optional[List[int]] = None) -> pd.DataFrame:
+    """
+    reads the tag dimension.
+
+    Args:
+        parquet_dir (str): the base directory of the parquet files
+        tag_ids (List[int], optional, None): if set, only these tags are read
+
+    Returns:
+        pd.DataFrame: the tag dimension with the columns tag_id, tag, version, custom, abstract,
+            datatype, iord, crdr, and tlabel
+    """
+    filters = [(TAG_ID_COLUMN, 'in', tag_ids)] if tag_ids is not None else None
+    return pd.read_parquet(os.path.join(parquet_dir, TAG_DIMENSION_FILE), filters=filters)
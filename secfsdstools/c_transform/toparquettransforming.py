@@ -2,27 +2,401 @@
 
 import contextlib
 import glob
+import itertools
 import logging
 import os
 import shutil
-from typing import List, Tuple
+import zipfile
+from typing import Dict, List, Tuple, Optional, Iterator
 
-from secfsdstools.a_utils.constants import SUB_TXT, PRE_TXT, NUM_TXT, NUM_DTYPE, PRE_DTYPE, \
-    SUB_DTYPE
-from secfsdstools.a_utils.fileutils import get_directories_in_directory, \
-    read_df_from_file_in_zip
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from secfsdstools.a_utils.constants import SUB_TXT, PRE_TXT, NUM_TXT, PRE_NUM_TXT, TAG_TXT, \
+    NUM_DTYPE, PRE_DTYPE, SUB_DTYPE, TAG_COLS, TAG_DTYPE
+from secfsdstools.a_utils.dataframeutils import merge_pre_num
+from secfsdstools.a_utils.fileutils import read_df_from_file_in_zip, \
+    read_df_chunks_from_file_in_zip, read_table_from_file_in_zip, \
+    read_table_chunks_from_file_in_zip
+from secfsdstools.a_utils.manifestutils import MANIFEST_FILE, create_manifest, read_manifest, \
+    source_matches, write_manifest
 from secfsdstools.a_utils.parallelexecution import ParallelExecutor
+from secfsdstools.a_utils.parquetutils import DEFAULT_COMPRESSION, get_compression_options, \
+    read_parquet_df
+from secfsdstools.c_transform.parquetschema import SCHEMA_VERSION_LEGACY, SCHEMA_VERSIONS, \
+    DICTIONARY_TYPE, FORM_FAMILY_COLUMN, NULL_PARTITION, PARTITION_COLUMNS, get_form_family, \
+    to_schema_version
+from secfsdstools.c_transform.tagdimension import TAG_COLUMNS, TagRegistry, add_tag_ids, \
+    prepare_tag_df
 
 LOGGER = logging.getLogger(__name__)
 
+ENGINE_PANDAS = 'pandas'
+ENGINE_PYARROW = 'pyarrow'
+
+FILE_DTYPES = {SUB_TXT: SUB_DTYPE,
+               PRE_TXT: PRE_DTYPE,
+               NUM_TXT: NUM_DTYPE}
+
+# the daily files can also contain the ticker name and stockexchange as strings in the value field
+STRING_VALUE_TAGS = ['SecurityExchangeName', 'TradingSymbol']
+
+# pre.txt and num.txt are sorted by these columns, so that the min/max statistics of the
+# row groups allow to skip the row groups which don't contain the filtered adsh, stmt or tag
+SORT_COLUMNS = {PRE_TXT: ['adsh', 'stmt', 'tag'],
+                NUM_TXT: ['adsh', 'tag'],
+                PRE_NUM_TXT: ['adsh', 'stmt', 'tag']}
+
+
+# a single report has at most a few thousand entries, so reading it touches one or two row groups
+DEFAULT_ROW_GROUP_SIZE = 50_000
+
+# writing the page index is only supported since pyarrow 13
+PAGE_INDEX_SUPPORTED = int(pa.__version__.split('.', maxsplit=1)[0]) >= 13
+
+# zip files are transformed into this directory (inside the parquet dir) and are only moved
+# to their final location once they are complete
+TMP_DIR = '_tmp'
+
+
+def _fill_null_and_cast(table: pa.Table, column: str, fill_value, target_type: pa.DataType) \
+        -> pa.Table:
+    index = table.schema.get_field_index(column)
+    filled = pc.fill_null(table[column], pa.scalar(fill_value, type=table[column].type))
+    return table.set_column(index, column, pc.cast(filled, target_type))
+
+
+def _encode_dictionaries(table: pa.Table) -> pa.Table:
+    """
+    encodes the dictionary columns again, so that their dictionaries only contain the values
+    that appear in the table. A slice of a table shares the dictionary of the whole table.
+    """
+    for index, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            values = table.column(index).cast(pa.string()).combine_chunks()
+            table = table.set_column(index, field.name,
+                                     values.dictionary_encode().cast(field.type))
+    return table
+
+
+def _null_columns_to_string(table: pa.Table) -> pa.Table:
+    """ columns which only contain empty values cannot be typed by pyarrow, so they are strings """
+    for index, field in enumerate(table.schema):
+        if pa.types.is_null(field.type):
+            table = table.set_column(index, field.name, table.column(index).cast(pa.string()))
+    return table
+
+
+class ParquetTableWriter:
+    """
+    Writes arrow tables into parquet files in the defined schema_version. pre.txt, num.txt, and
+    pre_num.txt are sorted by their SORT_COLUMNS. The data is written in row groups of at most
+    row_group_size rows together with the column statistics (and the page index, if supported
+    by the installed pyarrow version). Every row group only stores the dictionary values of
+    the rows it contains.
+
+    It is used by the ToParquetTransformer and by the ParquetSchemaMigrator, so that migrated
+    files have the same layout as newly transformed files.
+    """
+
+    def __init__(self, schema_version: int = SCHEMA_VERSION_LEGACY,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                 compression_options: Optional[Dict] = None,
+                 dictionary_columns: Optional[List[str]] = None):
+        """
+        Constructor.
+        Args:
+            schema_version: the schema version of the written parquet files
+            row_group_size: the maximum number of rows in a row group of the parquet files
+            compression_options: the compression options, as returned by
+                                 get_compression_options
+            dictionary_columns: columns of pre.txt, num.txt, and pre_num.txt that are stored
+                                as dictionary columns, independent of the schema version
+        """
+        self.schema_version = schema_version
+        self.row_group_size = row_group_size
+        self.compression_options = compression_options or get_compression_options()
+        self.dictionary_columns = dictionary_columns or []
+
+    def to_target_schema(self, table: pa.Table, file_name: str) -> pa.Table:
+        """
+        converts the table into the configured schema version.
+        Columns which only contain empty values cannot be typed by pyarrow,
+        so they are defined as string columns.
+        """
+        table = to_schema_version(table=_null_columns_to_string(table), file_name=file_name,
+                                  schema_version=self.schema_version)
+        if file_name not in SORT_COLUMNS:
+            return table
+        for column in self.dictionary_columns:
+            index = table.schema.get_field_index(column)
+            if (index >= 0) and not pa.types.is_dictionary(table.schema.field(index).type):
+                table = table.set_column(index, column, pc.cast(table.column(index), pa.string())
+                                         .dictionary_encode().cast(DICTIONARY_TYPE))
+        return table
+
+    @staticmethod
+    def sort_table(table: pa.Table, file_name: str) -> pa.Table:
+        """
+        sorts the table by the SORT_COLUMNS of the file_name.
+        Dictionary columns (compact schema) cannot be sorted, so the sort columns are converted
+        back to strings. They are encoded again when the table is converted into the target
+        schema.
+        """
+        sort_columns = SORT_COLUMNS.get(file_name, [])
+        if len(sort_columns) == 0:
+            return table
+        for column in sort_columns:
+            index = table.schema.get_field_index(column)
+            if (index >= 0) and pa.types.is_dictionary(table.schema.field(index).type):
+                table = table.set_column(index, column, table.column(index).cast(pa.string()))
+        return table.sort_by([(column, 'ascending') for column in sort_columns])
+
+    def sort_tables(self, tables: Iterator[pa.Table], file_name: str,
+                    tmp_dir: str) -> Iterator[pa.Table]:
+        """
+        sorts the content of all provided tables by the SORT_COLUMNS of the file_name with an
+        external merge sort: every table is sorted and written as a run into tmp_dir, then the
+        runs are merged. So only about the size of a single table has to be kept in memory,
+        but the returned tables are sorted across table boundaries. tmp_dir is removed
+        afterwards.
+        """
+        sort_columns = SORT_COLUMNS.get(file_name, [])
+        tables = iter(tables)
+        first_table = next(tables, None)
+        second_table = next(tables, None)
+        if (len(sort_columns) == 0) or (second_table is None):
+            # a single table is simply sorted in memory
+            yield from (table for table in [first_table, second_table] if table is not None)
+            yield from tables
+            return
+
+        os.makedirs(tmp_dir, exist_ok=True)
+        try:
+            schema: Optional[pa.Schema] = None
+            run_files: List[str] = []
+            max_rows = 0
+            for table in itertools.chain([first_table, second_table], tables):
+                table = self.sort_table(table=_null_columns_to_string(table), file_name=file_name)
+                if schema is None:
+                    schema = table.schema
+                if not table.schema.equals(schema, check_metadata=False):
+                    table = table.cast(schema)
+                run_file = os.path.join(tmp_dir, f'run-{len(run_files)}.parquet')
+                pq.write_table(table, run_file, compression='none')
+                run_files.append(run_file)
+                max_rows = max(max_rows, table.num_rows)
+
+            yield from self._merge_runs(run_files=run_files, file_name=file_name,
+                                        batch_size=max(1, max_rows // len(run_files)))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _split_at(table: pa.Table, column: str, bound) -> Tuple[pa.Table, pa.Table]:
+        """ splits the table into the rows with a value in column below bound and the rest """
+        mask = pc.less(table[column], bound)  # pylint: disable=no-member
+        return table.filter(mask), table.filter(pc.invert(mask))  # pylint: disable=no-member
+
+    def _merge_runs(self, run_files: List[str], file_name: str,
+                    batch_size: int) -> Iterator[pa.Table]:
+        """
+        merges the sorted runs. Every run is read in batches of batch_size rows. Since the runs
+        are sorted by the first sort column, all rows with a smaller key than the smallest of
+        the last keys of the buffered batches are already buffered, so they can be returned.
+        """
+        key_column = SORT_COLUMNS[file_name][0]
+        # the reader of a run is set to None, once the run is read completely
+        readers: List[Optional[Iterator[pa.RecordBatch]]] = [
+            pq.ParquetFile(run_file).iter_batches(batch_size=batch_size) for run_file in run_files]
+        buffers: List[pa.Table] = [pq.read_schema(run_file).empty_table() for run_file in run_files]
+
+        def read_next(index: int):
+            """ appends the next not empty batch of the run to its buffer """
+            while readers[index] is not None:
+                batch = next(readers[index], None)
+                if batch is None:
+                    readers[index] = None
+                    return
+                buffers[index] = pa.concat_tables([buffers[index],
+                                                   pa.Table.from_batches([batch])])
+                if batch.num_rows > 0:
+                    return
+
+        while True:
+            for index, buffer in enumerate(buffers):
+                if buffer.num_rows == 0:
+                    read_next(index)
+            open_runs = [index for index, reader in enumerate(readers) if reader is not None]
+            if len(open_runs) == 0:
+                yield self.sort_table(pa.concat_tables(buffers), file_name)
+                return
+
+            bound = min(buffers[index][key_column][-1].as_py() for index in open_runs)
+            parts: List[pa.Table] = []
+            for index, buffer in enumerate(buffers):
+                part, buffers[index] = self._split_at(buffer, key_column, bound)
+                parts.append(part)
+
+            if sum(part.num_rows for part in parts) == 0:
+                # the rows of the smallest key fill the whole buffers of some runs
+                for index in open_runs:
+                    if buffers[index][key_column][-1].as_py() == bound:
+                        read_next(index)
+                continue
+            yield self.sort_table(pa.concat_tables(parts), file_name)
+
+    def create_writer(self, target_file: str, schema: pa.Schema) -> pq.ParquetWriter:
+        """ creates a writer with statistics, page index, and the compression options """
+        writer_options = {'write_statistics': True, **self.compression_options}
+        if PAGE_INDEX_SUPPORTED:
+            writer_options['write_page_index'] = True
+        return pq.ParquetWriter(target_file, schema, **writer_options)
+
+    def create_row_group_writer(self, target_file: str, schema: pa.Schema) -> 'RowGroupWriter':
+        """ creates a RowGroupWriter with a writer as returned by create_writer """
+        return RowGroupWriter(writer=self.create_writer(target_file, schema),
+                              row_group_size=self.row_group_size)
+
+    def write_tables(self, tables: Iterator[pa.Table], file_name: str, target_file: str):
+        """
+        writes the provided tables into the target_file. Every table is sorted, the
+        tables are written one after the other in row groups of row_group_size rows.
+        """
+        writer: Optional[RowGroupWriter] = None
+        try:
+            for table in tables:
+                table = self.sort_table(table=table, file_name=file_name)
+                table = self.to_target_schema(table=table, file_name=file_name)
+                if writer is None:
+                    writer = self.create_row_group_writer(target_file, table.schema)
+                if not table.schema.equals(writer.schema, check_metadata=False):
+                    table = table.cast(writer.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+class RowGroupWriter:
+    """
+    Writes tables into a parquet file in row groups of row_group_size rows. The rows are
+    buffered until a row group is full, so the row groups don't depend on the size of the
+    written tables: the slices of a streamed transformation result in the same row groups
+    as a single table. Only the last row group can be smaller.
+
+    The parquet writer stores the whole dictionary of a dictionary column in every row group,
+    so the dictionaries are encoded again for every row group.
+    """
+
+    def __init__(self, writer: pq.ParquetWriter, row_group_size: int):
+        """
+        Constructor.
+        Args:
+            writer: the parquet writer, it is closed by close
+            row_group_size: the number of rows in a row group of the parquet file
+        """
+        self.writer = writer
+        self.row_group_size = row_group_size
+        self.schema = writer.schema
+        self.buffer: List[pa.Table] = []
+        self.buffered_rows = 0
+        self.row_groups_written = 0
+
+    def write_table(self, table: pa.Table):
+        """ appends the table, every full row group is written """
+        self.buffer.append(table)
+        self.buffered_rows += table.num_rows
+        if self.buffered_rows >= self.row_group_size:
+            self._write_buffer(final=False)
+
+    def close(self):
+        """ writes the remaining rows as last row group and closes the writer """
+        try:
+            self._write_buffer(final=True)
+        finally:
+            self.writer.close()
+
+    def _write_buffer(self, final: bool):
+        table = pa.concat_tables(self.buffer) if self.buffer else self.schema.empty_table()
+        rows_to_write = table.num_rows if final \
+            else table.num_rows - table.num_rows % self.row_group_size
+        for offset in range(0, rows_to_write, self.row_group_size):
+            row_group = table.slice(offset, min(self.row_group_size, rows_to_write - offset))
+            self.writer.write_table(_encode_dictionaries(row_group),
+                                    row_group_size=self.row_group_size)
+            self.row_groups_written += 1
+        if final and (self.row_groups_written == 0):
+            # a file without content still gets an empty row group
+            self.writer.write_table(table, row_group_size=self.row_group_size)
+
+        rest = table.slice(rows_to_write)
+        self.buffer = [rest] if rest.num_rows > 0 else []
+        self.buffered_rows = rest.num_rows
+
 
 class ToParquetTransformer:
     """
     Transforming zip files containing the sub.txt, num.txt, and pre.txt as CSV into
     parquet format.
+
+    If a batch_size is defined, pre.txt and num.txt are not loaded completely into memory.
+    Instead, they are streamed in batches of batch_size rows, which are written into row groups
+    of row_group_size rows, just as the whole file would be. Therefore, the memory that is needed to
+    transform a zip file is bounded by the batch_size and not by the size of the file.
+    sub.txt is always read at once, since it is small.
+
+    The CSV files are either parsed with pandas (reader_engine 'pandas') or with the
+    multithreaded csv parser of pyarrow (reader_engine 'pyarrow'). The pyarrow engine
+    directly produces arrow tables which are written to parquet without converting them
+    to pandas first.
+
+    The parquet files are written in the defined schema_version (see parquetschema module).
+    The compact schema version stores low cardinality string columns as dictionary columns
+    and uses narrow integer types, which reduces the memory usage of the loaded data
+    significantly.
+
+    pre.txt is sorted by adsh, stmt, and tag, num.txt by adsh and tag. The data is written
+    in row groups of at most row_group_size rows together with the column statistics
+    (and the page index, if supported by the installed pyarrow version). Therefore, filters on
+    adsh, stmt, or tag can skip most of the row groups when the files are read.
+    In streaming mode, the sorted batches are written as runs into a temporary directory and
+    are merged afterwards, so the files are sorted as a whole as well.
+
+    If partitioned is True, every file is written as a directory with hive partitions
+    (see parquetschema module): pre.txt is partitioned by stmt, sub.txt and num.txt by the
+    form family of the report. Readers can therefore skip whole partitions.
+
+    The parquet files are compressed with the defined compression codec and level.
+
+    If materialize_join is True, the joined content of pre.txt and num.txt (the same
+    as RawDataBag.join returns) is additionally stored as pre_num.txt. It is sorted and
+    partitioned like pre.txt. Since the join is done in memory, batch_size doesn't bound the
+    memory needed for this step.
+
+    If tag_dimension is True, pre.txt and num.txt get an additional tag_id column from the
+    TagRegistry in the parquet_dir, their tag and version columns are stored as dictionary
+    columns, and the content of tag.txt is stored as tag.txt (see tagdimension module).
+
+    A zip file is first transformed into a temporary directory, which is then moved to its final
+    location. Afterwards, the manifest (see manifestutils module) of the directory is marked as
+    completed. Directories with a not completed manifest are transformed again, as are
+    directories whose zip file changed since it was transformed.
     """
 
-    def __init__(self, zip_dir: str, parquet_dir: str, file_type: str, keep_zip_files: bool):
+    def __init__(self, zip_dir: str, parquet_dir: str, file_type: str, keep_zip_files: bool,
+                 batch_size: Optional[int] = None,
+                 reader_engine: str = ENGINE_PANDAS,
+                 schema_version: int = SCHEMA_VERSION_LEGACY,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                 partitioned: bool = False,
+                 compression: str = DEFAULT_COMPRESSION,
+                 compression_level: Optional[int] = None,
+                 materialize_join: bool = False,
+                 tag_dimension: bool = False):
         """
         Constructor.
         Args:
@@ -30,38 +404,148 @@ class ToParquetTransformer:
             parquet_dir: target base directory for the parguet files
             file_type: file_type, either 'quarter' or 'daily' used to define the
                        subfolder in the parquet dir
+            keep_zip_files: if False, the zip file is removed after it was transformed
+            batch_size: if set, pre.txt and num.txt are transformed in a streaming manner
+                       in batches of batch_size rows.
+            reader_engine: the engine to parse the CSV files, either 'pandas' or 'pyarrow'
+            schema_version: the schema version of the written parquet files
+            row_group_size: the maximum number of rows in a row group of the parquet files
+            partitioned: if True, the files are written as hive partitioned directories
+            compression: the compression codec, either 'zstd', 'lz4', 'snappy', or 'none'
+            compression_level: the compression level, only supported by 'zstd'
+            materialize_join: if True, the joined pre.txt and num.txt are stored as pre_num.txt
+            tag_dimension: if True, pre.txt and num.txt get a tag_id column and tag.txt is stored
         """
+        if reader_engine not in [ENGINE_PANDAS, ENGINE_PYARROW]:
+            raise ValueError(f'unknown reader_engine {reader_engine}. '
+                             f'Allowed values are {ENGINE_PANDAS}, {ENGINE_PYARROW}')
+        if schema_version not in SCHEMA_VERSIONS:
+            raise ValueError(f'unknown schema_version {schema_version}. '
+                             f'Allowed values are {SCHEMA_VERSIONS}')
+
         self.zip_dir = zip_dir
         self.parquet_dir = parquet_dir
         self.file_type = file_type
         self.keep_zip_files = keep_zip_files
+        self.batch_size = batch_size
+        self.reader_engine = reader_engine
+        self.schema_version = schema_version
+        self.row_group_size = row_group_size
+        self.partitioned = partitioned
+        self.materialize_join = materialize_join
+        self.tag_dimension = tag_dimension
+        # also validates compression and compression_level
+        self.compression_options = get_compression_options(compression=compression,
+                                                           compression_level=compression_level)
+        self.table_writer = ParquetTableWriter(
+            schema_version=schema_version, row_group_size=row_group_size,
+            compression_options=self.compression_options,
+            dictionary_columns=TAG_COLUMNS if tag_dimension else None)
+        self.tag_registry = TagRegistry(parquet_dir) if tag_dimension else None
+
+    def _needs_transformation(self, zip_file_name: str, zip_file_path: str) -> bool:
+        target_path = os.path.join(self.parquet_dir, self.file_type, zip_file_name)
+        if not os.path.isdir(target_path):
+            return True
+
+        manifest = read_manifest(target_path)
+        if manifest is None:
+            # directories without manifest were transformed by an older version and are
+            # trusted, directories with an unreadable manifest are not
+            return os.path.exists(os.path.join(target_path, MANIFEST_FILE))
+
+        if not manifest.completed:
+            LOGGER.info('transformation of %s was not completed', zip_file_name)
+            return True
+
+        if not source_matches(manifest, zip_file_path):
+            LOGGER.info('%s changed since it was transformed', zip_file_name)
+            return True
+        return False
 
     def _calculate_not_transformed(self) -> List[Tuple[str, str]]:
         """
         calculates the untransformed zip files in the zip_dir.
         simply reads all the existing file names in the zip_dir and checks if there is a
-         subfolder with the same name in the parguet-dir
+         subfolder with the same name in the parguet-dir, which contains a completed manifest
+         for the same zip file.
         Returns:
             List[Tuple[str, str]]: List with tuple of zipfile-name and zipfile path.
         """
         downloaded_zipfiles = glob.glob(os.path.join(self.zip_dir, "*.zip"))
-        present_parquet_dirs = get_directories_in_directory(
-            os.path.join(self.parquet_dir, self.file_type))
-
         zip_file_names = {os.path.basename(p): p for p in downloaded_zipfiles}
-        parquet_dirs = [os.path.basename(p) for p in present_parquet_dirs]
-
-        not_transformed_names = set(zip_file_names.keys()) - set(parquet_dirs)
 
         # key is the zipfile name, value is the whole path of the file
-        # the returned dict only contains elements for which not parquet directory does exist yet
-        return [(k, v) for k, v in zip_file_names.items() if k in not_transformed_names]
+        return [(k, v) for k, v in zip_file_names.items() if self._needs_transformation(k, v)]
+
+    def get_not_transformed(self) -> List[Tuple[str, str]]:
+        """
+        returns the zip files in the zip_dir that were not transformed yet.
+
+        Returns:
+            List[Tuple[str, str]]: List with tuple of zipfile-name and zipfile path.
+        """
+        return self._calculate_not_transformed()
+
+    def transform_zip_file(self, zip_file_name: str, zip_file_path: str) -> bool:
+        """
+        transforms a single zip file in the current thread.
+
+        Args:
+            zip_file_name: the name of the zip file
+            zip_file_path: the path to the zip file
+
+        Returns:
+            bool: True if the zip file was transformed successfully
+        """
+        self._transform_zip_file(zip_file_name=zip_file_name, zip_file_path=zip_file_path)
+        manifest = read_manifest(os.path.join(self.parquet_dir, self.file_type, zip_file_name))
+        return (manifest is not None) and manifest.completed
+
+    @staticmethod
+    def _count_rows(path: str) -> Dict[str, int]:
+        row_counts: Dict[str, int] = {}
+        for file_name in [SUB_TXT, PRE_TXT, NUM_TXT, PRE_NUM_TXT, TAG_TXT]:
+            file_path = os.path.join(path, f'{file_name}.parquet')
+            if os.path.exists(file_path):
+                row_counts[file_name] = ds.dataset(file_path, format='parquet',
+                                                   partitioning='hive').count_rows()
+        return row_counts
+
+    @staticmethod
+    def _move_into_place(tmp_path: str, target_path: str):
+        """
+        moves the transformed tmp_path to the target_path. An existing target_path is replaced.
+        """
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        if os.path.exists(target_path):
+            old_path = f'{tmp_path}.old'
+            shutil.rmtree(old_path, ignore_errors=True)
+            os.replace(target_path, old_path)
+            os.replace(tmp_path, target_path)
+            shutil.rmtree(old_path, ignore_errors=True)
+        else:
+            os.replace(tmp_path, target_path)
 
     def _transform_zip_file(self, zip_file_name: str, zip_file_path: str):
         target_path = os.path.join(self.parquet_dir, self.file_type, zip_file_name)
+        tmp_path = os.path.join(self.parquet_dir, TMP_DIR, self.file_type, zip_file_name)
         try:
-            os.makedirs(target_path, exist_ok=True)
-            self._inner_transform_zip_file(target_path, zip_file_path)
+            # remove leftovers of an interrupted transformation
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+
+            manifest = create_manifest(zip_file_path=zip_file_path,
+                                       schema_version=self.schema_version,
+                                       partitioned=self.partitioned)
+            self._inner_transform_zip_file(tmp_path, zip_file_path)
+            manifest.row_counts = self._count_rows(tmp_path)
+            write_manifest(tmp_path, manifest)
+
+            self._move_into_place(tmp_path=tmp_path, target_path=target_path)
+
+            manifest.completed = True
+            write_manifest(target_path, manifest)
 
             # remove the file if keep_zip_files is False
             if not self.keep_zip_files:
@@ -72,31 +556,234 @@ class ToParquetTransformer:
             LOGGER.error('failed to process %s', zip_file_path)
             LOGGER.error(ex)
             # the created dir has to be removed with all its content
-            shutil.rmtree(target_path, ignore_errors=True)
-
-    def _inner_transform_zip_file(self, target_path, zip_file_path):
-        sub_df = read_df_from_file_in_zip(zip_file=zip_file_path, file_to_extract=SUB_TXT,
-                                          dtype=SUB_DTYPE)
-        pre_df = read_df_from_file_in_zip(zip_file=zip_file_path, file_to_extract=PRE_TXT,
-                                          dtype=PRE_DTYPE)
-
-        num_df = read_df_from_file_in_zip(zip_file=zip_file_path, file_to_extract=NUM_TXT,
-                                          dtype=NUM_DTYPE)
+            shutil.rmtree(tmp_path, ignore_errors=True)
 
+    @staticmethod
+    def _prepare_sub_df(sub_df: pd.DataFrame) -> pd.DataFrame:
         # ensure period columns are valid ints
         # some report types don't have a value set for period
         sub_df['period'] = sub_df['period'].fillna(-1).astype(int)
+        return sub_df
+
+    @staticmethod
+    def _prepare_pre_df(pre_df: pd.DataFrame) -> pd.DataFrame:
         # same for line
         pre_df['line'] = pre_df['line'].fillna(-1).astype(int)
+        return pre_df
 
+    def _prepare_num_df(self, num_df: pd.DataFrame) -> pd.DataFrame:
         # special handling for field value in num, since the daily files can also contain strings
         if self.file_type == 'daily':
-            num_df = num_df[~num_df.tag.isin(['SecurityExchangeName', 'TradingSymbol'])]
+            num_df = num_df[~num_df.tag.isin(STRING_VALUE_TAGS)].copy()
         num_df['value'] = num_df['value'].astype(float)
+        return num_df
+
+    @staticmethod
+    def _prepare_sub_table(sub_table: pa.Table) -> pa.Table:
+        return _fill_null_and_cast(sub_table, 'period', -1, pa.int64())
+
+    @staticmethod
+    def _prepare_pre_table(pre_table: pa.Table) -> pa.Table:
+        return _fill_null_and_cast(pre_table, 'line', -1, pa.int64())
+
+    def _prepare_num_table(self, num_table: pa.Table) -> pa.Table:
+        if self.file_type == 'daily':
+            string_value_mask = pc.is_in(  # pylint: disable=no-member
+                num_table['tag'], value_set=pa.array(STRING_VALUE_TAGS))
+            num_table = num_table.filter(
+                pc.invert(pc.fill_null(string_value_mask, False)))  # pylint: disable=no-member
+        value_index = num_table.schema.get_field_index('value')
+        return num_table.set_column(value_index, 'value',
+                                    pc.cast(num_table['value'], pa.float64()))
+
+    def _read_tables(self, zip_file_path: str, file_to_extract: str,
+                     streaming: bool) -> Iterator[pa.Table]:
+        """
+        reads the content of file_to_extract with the configured reader_engine and returns it
+        as prepared arrow tables. If streaming is True, the content is returned in chunks
+        of batch_size rows, otherwise as a single table.
+        """
+        dtype = FILE_DTYPES[file_to_extract]
+
+        if self.reader_engine == ENGINE_PYARROW:
+            prepare_table = {SUB_TXT: self._prepare_sub_table,
+                             PRE_TXT: self._prepare_pre_table,
+                             NUM_TXT: self._prepare_num_table}[file_to_extract]
+            if streaming:
+                for table in read_table_chunks_from_file_in_zip(zip_file=zip_file_path,
+                                                                file_to_extract=file_to_extract,
+                                                                chunksize=self.batch_size,
+                                                                dtype=dtype):
+                    yield prepare_table(table)
+            else:
+                yield prepare_table(read_table_from_file_in_zip(zip_file=zip_file_path,
+                                                                file_to_extract=file_to_extract,
+                                                                dtype=dtype))
+            return
+
+        prepare_df = {SUB_TXT: self._prepare_sub_df,
+                      PRE_TXT: self._prepare_pre_df,
+                      NUM_TXT: self._prepare_num_df}[file_to_extract]
+        if streaming:
+            chunks_returned = False
+            for chunk_df in read_df_chunks_from_file_in_zip(zip_file=zip_file_path,
+                                                            file_to_extract=file_to_extract,
+                                                            chunksize=self.batch_size,
+                                                            dtype=dtype):
+                chunks_returned = True
+                yield pa.Table.from_pandas(prepare_df(chunk_df), preserve_index=False)
+            if chunks_returned:
+                return
+
+        # either not streaming or the file has no content, so we return the whole content
+        data_df = read_df_from_file_in_zip(zip_file=zip_file_path,
+                                           file_to_extract=file_to_extract,
+                                           dtype=dtype)
+        yield pa.Table.from_pandas(prepare_df(data_df), preserve_index=False)
+
+    @staticmethod
+    def _get_partition_values(table: pa.Table, file_name: str,
+                              form_families: Optional[pa.Table]) -> pa.ChunkedArray:
+        if file_name == SUB_TXT:
+            return pa.chunked_array([[get_form_family(form) for form in table['form'].to_pylist()]],
+                                    type=pa.string())
+        if file_name in (PRE_TXT, PRE_NUM_TXT):
+            return pc.cast(table['stmt'], pa.string())
+
+        # num.txt is partitioned by the form family of the report, as defined in sub.txt
+        indices = pc.index_in(table['adsh'],  # pylint: disable=no-member
+                              value_set=form_families['adsh'].combine_chunks())
+        return form_families[FORM_FAMILY_COLUMN].take(indices)
+
+    @staticmethod
+    def _read_form_families(sub_dir: str) -> pa.Table:
+        """ reads the form family for every adsh from the partitioned sub.txt """
+        sub_table = pq.read_table(sub_dir, columns=['adsh', 'form'])
+        form_families = [get_form_family(form) for form in sub_table['form'].to_pylist()]
+        return pa.table({'adsh': pc.cast(sub_table['adsh'], pa.string()),
+                         FORM_FAMILY_COLUMN: pa.array(form_families, type=pa.string())})
+
+    def _write_partitioned_tables(self, tables: Iterator[pa.Table], file_name: str,
+                                  target_dir: str, form_families: Optional[pa.Table]):
+        """
+        writes the provided tables as hive partitions into the target_dir. Every partition
+        is written into its own file, every table is sorted, the tables are written one after
+        the other in row groups of row_group_size rows.
+        """
+        partition_column = PARTITION_COLUMNS[file_name]
+        os.makedirs(target_dir, exist_ok=True)
+
+        schema: Optional[pa.Schema] = None
+        writers: Dict[str, RowGroupWriter] = {}
+        try:
+            for table in tables:
+                table = self.table_writer.sort_table(table=table, file_name=file_name)
+                partition_values = self._get_partition_values(table=table, file_name=file_name,
+                                                              form_families=form_families)
+                table = self.table_writer.to_target_schema(table=table, file_name=file_name)
+                if schema is None:
+                    schema = table.schema
+                if not table.schema.equals(schema, check_metadata=False):
+                    table = table.cast(schema)
+
+                for value in partition_values.unique().to_pylist():
+                    partition_name = NULL_PARTITION if value is None else value
+                    if partition_name not in writers:
+                        partition_dir = os.path.join(target_dir,
+                                                     f'{partition_column}={partition_name}')
+                        os.makedirs(partition_dir, exist_ok=True)
+                        writers[partition_name] = self.table_writer.create_row_group_writer(
+                            os.path.join(partition_dir, 'part-0.parquet'), schema)
+
+                    if value is None:
+                        mask = partition_values.is_null()
+                    else:
+                        mask = pc.equal(partition_values, value)  # pylint: disable=no-member
+                    writers[partition_name].write_table(table.filter(mask))
+
+            if (len(writers) == 0) and (schema is not None):
+                # the file has no content, so an empty file without a partition is written
+                pq.write_table(schema.empty_table(), os.path.join(target_dir, 'part-0.parquet'),
+                               **self.compression_options)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+    def _inner_transform_zip_file(self, target_path, zip_file_path):
+        form_families: Optional[pa.Table] = None
+        for file_to_extract in [SUB_TXT, PRE_TXT, NUM_TXT]:
+            # sub.txt is always read at once, since it is small
+            streaming = (self.batch_size is not None) and (self.batch_size > 0) \
+                        and (file_to_extract != SUB_TXT)
+            tables = self._read_tables(zip_file_path=zip_file_path,
+                                       file_to_extract=file_to_extract,
+                                       streaming=streaming)
+            if self.tag_dimension and (file_to_extract != SUB_TXT):
+                tables = (add_tag_ids(table, self.tag_registry) for table in tables)
+            if streaming:
+                tables = self.table_writer.sort_tables(
+                    tables=tables, file_name=file_to_extract,
+                    tmp_dir=os.path.join(target_path, f'_{file_to_extract}.runs'))
+            target_file = os.path.join(target_path, f'{file_to_extract}.parquet')
+
+            if not self.partitioned:
+                self.table_writer.write_tables(tables=tables, file_name=file_to_extract,
+                                               target_file=target_file)
+                continue
+
+            self._write_partitioned_tables(tables=tables, file_name=file_to_extract,
+                                           target_dir=target_file, form_families=form_families)
+            if file_to_extract == SUB_TXT:
+                form_families = self._read_form_families(target_file)
+
+        if self.tag_dimension:
+            self._write_tags(target_path, zip_file_path)
+
+        if self.materialize_join:
+            self._write_joined(target_path)
+
+    def _write_tags(self, target_path: str, zip_file_path: str):
+        """
+        writes the content of tag.txt together with the tag_id as tag.txt.
+        """
+        with zipfile.ZipFile(zip_file_path) as zip_file:
+            if TAG_TXT not in zip_file.namelist():
+                LOGGER.info('%s does not contain a %s', zip_file_path, TAG_TXT)
+                return
+
+        tag_df = prepare_tag_df(read_df_from_file_in_zip(zip_file=zip_file_path,
+                                                         file_to_extract=TAG_TXT,
+                                                         dtype=TAG_DTYPE,
+                                                         usecols=TAG_COLS),
+                                registry=self.tag_registry)
+        self.table_writer.write_tables(
+            tables=iter([pa.Table.from_pandas(tag_df, preserve_index=False)]),
+            file_name=TAG_TXT, target_file=os.path.join(target_path, f'{TAG_TXT}.parquet'))
+
+    def _write_joined(self, target_path: str):
+        """
+        joins the written pre.txt and num.txt and writes the result as pre_num.txt.
+        """
+        pre_df = read_parquet_df(os.path.join(target_path, f'{PRE_TXT}.parquet'))
+        num_df = read_parquet_df(os.path.join(target_path, f'{NUM_TXT}.parquet'))
+
+        pre_num_table = pa.Table.from_pandas(merge_pre_num(num_df=num_df, pre_df=pre_df),
+                                             preserve_index=False)
+
+        # dictionary columns (compact schema) cannot be sorted, so they are converted back to
+        # strings. they are encoded again when the table is converted into the target schema
+        for index, field in enumerate(pre_num_table.schema):
+            if pa.types.is_dictionary(field.type):
+                pre_num_table = pre_num_table.set_column(
+                    index, field.name, pre_num_table.column(index).cast(pa.string()))
 
-        sub_df.to_parquet(os.path.join(target_path, f'{SUB_TXT}.parquet'))
-        pre_df.to_parquet(os.path.join(target_path, f'{PRE_TXT}.parquet'))
-        num_df.to_parquet(os.path.join(target_path, f'{NUM_TXT}.parquet'))
+        target_file = os.path.join(target_path, f'{PRE_NUM_TXT}.parquet')
+        if self.partitioned:
+            self._write_partitioned_tables(tables=iter([pre_num_table]), file_name=PRE_NUM_TXT,
+                                           target_dir=target_file, form_families=None)
+        else:
+            self.table_writer.write_tables(tables=iter([pre_num_table]), file_name=PRE_NUM_TXT,
+                                           target_file=target_file)
 
     def process(self) -> List[Tuple[str, str]]:
         """
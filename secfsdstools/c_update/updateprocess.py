@@ -1,23 +1,40 @@
 """
 this module contains the update logic. This means downloading new zipfiles, transforming the data
 into parquet format, and indexing the reports.
+
+Per default, these three steps are executed one after the other. In the pipelined mode,
+they run concurrently: every zip file is put into a bounded transform queue as soon as it is
+downloaded and is indexed as soon as it is transformed.
 """
 import logging
+import os
+import queue
+import threading
 import time
-from typing import Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 from secfsdstools.a_config.configmodel import Configuration
 from secfsdstools.a_utils.dbutils import DBStateAcessor
 from secfsdstools.a_utils.downloadutils import UrlDownloader
+from secfsdstools.a_utils.httpcacheutils import HttpMetadataCache
 from secfsdstools.a_utils.rapiddownloadutils import RapidUrlBuilder
 from secfsdstools.b_setup.setupdb import DbCreator
 from secfsdstools.c_download.rapiddownloading import RapidZipDownloader
 from secfsdstools.c_download.secdownloading import SecZipDownloader
-from secfsdstools.c_index.indexing import ReportParquetIndexer
+from secfsdstools.c_index.indexing import IndexFileEntries, ReportParquetIndexer, \
+    TagParquetIndexer
+from secfsdstools.c_index.indexsnapshot import write_index_snapshot
+from secfsdstools.c_transform.tagdimension import build_tag_dimension
 from secfsdstools.c_transform.toparquettransforming import ToParquetTransformer
 
 LOGGER = logging.getLogger(__name__)
 
+# directory in the db_dir with the cached metadata of the lists of available zip files
+HTTP_CACHE_DIR = 'http_cache'
+
+# the maximum number of zip files whose index entries are written in one transaction
+INDEX_WRITE_BATCH_SIZE = 10
+
 
 class Updater:
     """Manages the update process: download zipfiles, transform to parquet, and index the reports"""
@@ -43,10 +60,27 @@ class Updater:
             user_agent=config.user_agent_email,
             keep_zip_files=config.keep_zip_files,
             rapid_api_key=config.rapid_api_key,
-            rapid_api_plan=config.rapid_api_plan
+            rapid_api_plan=config.rapid_api_plan,
+            transform_batch_size=config.transform_batch_size,
+            transform_reader_engine=config.transform_reader_engine,
+            parquet_schema_version=config.parquet_schema_version,
+            transform_row_group_size=config.transform_row_group_size,
+            parquet_partitioned=config.parquet_partitioned,
+            parquet_compression=config.parquet_compression,
+            parquet_compression_level=config.parquet_compression_level,
+            parquet_materialize_join=config.parquet_materialize_join,
+            parquet_tag_dimension=config.parquet_tag_dimension,
+            download_workers=config.download_workers,
+            download_max_calls_per_sec=config.download_max_calls_per_sec,
+            update_pipelined=config.update_pipelined,
+            pipeline_transform_workers=config.pipeline_transform_workers,
+            pipeline_queue_size=config.pipeline_queue_size,
+            pipeline_index_workers=config.pipeline_index_workers,
+            index_snapshot=config.index_snapshot,
+            index_tags=config.index_tags
         )
 
-    def __init__(self,
+    def __init__(self,  # pylint: disable=too-many-locals
                  db_dir: str,
                  dld_dir: str,
                  daily_dld_dir: str,
@@ -54,7 +88,24 @@ class Updater:
                  user_agent: str,
                  keep_zip_files: bool,
                  rapid_api_plan: Optional[str],
-                 rapid_api_key: Optional[str]):
+                 rapid_api_key: Optional[str],
+                 transform_batch_size: Optional[int] = None,
+                 transform_reader_engine: str = 'pandas',
+                 parquet_schema_version: int = 1,
+                 transform_row_group_size: int = 50_000,
+                 parquet_partitioned: bool = False,
+                 parquet_compression: str = 'snappy',
+                 parquet_compression_level: Optional[int] = None,
+                 parquet_materialize_join: bool = False,
+                 parquet_tag_dimension: bool = False,
+                 download_workers: int = 3,
+                 download_max_calls_per_sec: int = 8,
+                 update_pipelined: bool = False,
+                 pipeline_transform_workers: int = 2,
+                 pipeline_queue_size: int = 4,
+                 pipeline_index_workers: int = 2,
+                 index_snapshot: bool = False,
+                 index_tags: bool = False):
         self.db_state_accesor = DBStateAcessor(db_dir=db_dir)
         self.db_dir = db_dir
         self.dld_dir = dld_dir
@@ -64,6 +115,23 @@ class Updater:
         self.rapid_api_plan = rapid_api_plan
         self.rapid_api_key = rapid_api_key
         self.keep_zip_files = keep_zip_files
+        self.transform_batch_size = transform_batch_size
+        self.transform_reader_engine = transform_reader_engine
+        self.parquet_schema_version = parquet_schema_version
+        self.transform_row_group_size = transform_row_group_size
+        self.parquet_partitioned = parquet_partitioned
+        self.parquet_compression = parquet_compression
+        self.parquet_compression_level = parquet_compression_level
+        self.parquet_materialize_join = parquet_materialize_join
+        self.parquet_tag_dimension = parquet_tag_dimension
+        self.download_workers = download_workers
+        self.download_max_calls_per_sec = download_max_calls_per_sec
+        self.update_pipelined = update_pipelined
+        self.pipeline_transform_workers = pipeline_transform_workers
+        self.pipeline_queue_size = pipeline_queue_size
+        self.pipeline_index_workers = pipeline_index_workers
+        self.index_snapshot = index_snapshot
+        self.index_tags = index_tags
 
     def _check_for_update(self) -> bool:
         """checks if a new update check should be conducted."""
@@ -78,14 +146,29 @@ class Updater:
 
         return float(last_check) + Updater.CHECK_EVERY_SECONDS < time.time()
 
-    def _do_download(self):
-        urldownloader = UrlDownloader(user_agent=self.user_agent)
+    def _do_download(self,
+                     download_listeners: Optional[Dict[str, Callable[[str, str], None]]] = None):
+        """
+        downloads the missing zip files. If download_listeners are provided, the listener
+        for the file type ('quarter' or 'daily') is called for every downloaded zip file.
+        """
+        max_calls_per_sec = self.download_max_calls_per_sec
+        # the sec and the rapid downloader share the urldownloader and its token buckets
+        urldownloader = UrlDownloader(user_agent=self.user_agent,
+                                      max_calls_per_sec=max_calls_per_sec)
+        download_listeners = download_listeners or {}
+        http_cache = HttpMetadataCache(os.path.join(self.db_dir, HTTP_CACHE_DIR))
 
         # download data from sec
         LOGGER.info("check if there are new files to download from sec.gov ...")
         secdownloader = SecZipDownloader(zip_dir=self.dld_dir,
                                          parquet_root_dir=self.parquet_dir,
-                                         urldownloader=urldownloader)
+                                         urldownloader=urldownloader,
+                                         download_workers=self.download_workers,
+                                         max_calls_per_sec=max_calls_per_sec,
+                                         http_cache=http_cache)
+        if 'quarter' in download_listeners:
+            secdownloader.set_download_listener(download_listeners['quarter'])
         secdownloader.download()
 
         # download data from rapid
@@ -98,7 +181,12 @@ class Updater:
                                                      daily_zip_dir=self.daily_dld_dir,
                                                      qrtr_zip_dir=self.dld_dir,
                                                      urldownloader=urldownloader,
-                                                     parquet_root_dir=self.parquet_dir)
+                                                     parquet_root_dir=self.parquet_dir,
+                                                     download_workers=self.download_workers,
+                                                     max_calls_per_sec=max_calls_per_sec,
+                                                     http_cache=http_cache)
+                if 'daily' in download_listeners:
+                    rapiddownloader.set_download_listener(download_listeners['daily'])
                 rapiddownloader.download()
                 return
             except Exception as ex:  # pylint: disable=W0703
@@ -108,20 +196,37 @@ class Updater:
               + "If you are interested in daily updates, please have a look at "
               + "https://rapidapi.com/hansjoerg.wingeier/api/daily-sec-financial-statement-dataset")
 
+    def _create_transformer(self, zip_dir: str, file_type: str) -> ToParquetTransformer:
+        return ToParquetTransformer(zip_dir=zip_dir,
+                                    parquet_dir=self.parquet_dir,
+                                    keep_zip_files=self.keep_zip_files,
+                                    file_type=file_type,
+                                    batch_size=self.transform_batch_size,
+                                    reader_engine=self.transform_reader_engine,
+                                    schema_version=self.parquet_schema_version,
+                                    row_group_size=self.transform_row_group_size,
+                                    partitioned=self.parquet_partitioned,
+                                    compression=self.parquet_compression,
+                                    compression_level=self.parquet_compression_level,
+                                    materialize_join=self.parquet_materialize_join,
+                                    tag_dimension=self.parquet_tag_dimension)
+
     def _do_transform(self):
         LOGGER.info("start to transform to parquet format ...")
-        qrtr_transformer = ToParquetTransformer(zip_dir=self.dld_dir,
-                                                parquet_dir=self.parquet_dir,
-                                                keep_zip_files=self.keep_zip_files,
-                                                file_type='quarter')
+        qrtr_transformer = self._create_transformer(zip_dir=self.dld_dir, file_type='quarter')
         qrtr_transformer.process()
 
-        daily_transformer = ToParquetTransformer(zip_dir=self.daily_dld_dir,
-                                                 parquet_dir=self.parquet_dir,
-                                                 keep_zip_files=self.keep_zip_files,
-                                                 file_type='daily')
+        daily_transformer = self._create_transformer(zip_dir=self.daily_dld_dir,
+                                                     file_type='daily')
         daily_transformer.process()
 
+        self._do_build_tag_dimension()
+
+    def _do_build_tag_dimension(self):
+        if self.parquet_tag_dimension:
+            LOGGER.info("start to build the tag dimension ...")
+            build_tag_dimension(parquet_dir=self.parquet_dir)
+
     def _do_index(self):
         # create parquet index
         LOGGER.info("start to index parquet files ...")
@@ -135,7 +240,157 @@ class Updater:
                                                      file_type='daily')
         daily_parquet_indexer.process()
 
+        if self.index_tags:
+            LOGGER.info("start to index the tags ...")
+            for file_type in ['quarter', 'daily']:
+                TagParquetIndexer(db_dir=self.db_dir, parquet_dir=self.parquet_dir,
+                                  file_type=file_type).process()
+
+        if self.index_snapshot:
+            LOGGER.info("start to write the index snapshot ...")
+            write_index_snapshot(db_dir=self.db_dir)
+
+    @staticmethod
+    def _transform_worker(transform_queue: queue.Queue, index_queue: queue.Queue,
+                          transformers: Dict[str, ToParquetTransformer]):
+        """
+        transforms the zip files from the transform_queue and puts the successfully
+        transformed zip files into the index_queue. Stops when it receives None.
+        """
+        while True:
+            entry: Optional[Tuple[str, str, str]] = transform_queue.get()
+            if entry is None:
+                return
+
+            file_type, zip_file_name, zip_file_path = entry
+            try:
+                LOGGER.info("pipeline: transforming %s", zip_file_name)
+                if transformers[file_type].transform_zip_file(zip_file_name=zip_file_name,
+                                                              zip_file_path=zip_file_path):
+                    index_queue.put((file_type, zip_file_name))
+            except Exception as ex:  # pylint: disable=W0703
+                # a failing file must not stop the pipeline
+                LOGGER.error("pipeline: failed to transform %s: %s", zip_file_name, ex)
+
+    @staticmethod
+    def _index_worker(index_queue: queue.Queue, write_queue: queue.Queue,
+                      indexers: Dict[str, ReportParquetIndexer]):
+        """
+        reads the index entries of the transformed zip files from the index_queue and puts
+        them into the write_queue. The zip files were just transformed, so they are indexed
+        without checking whether they need to be indexed. Stops when it receives None.
+        """
+        while True:
+            entry: Optional[Tuple[str, str]] = index_queue.get()
+            if entry is None:
+                return
+
+            file_type, zip_file_name = entry
+            try:
+                LOGGER.info("pipeline: indexing %s", zip_file_name)
+                write_queue.put((file_type,
+                                 indexers[file_type].prepare_index_entries(zip_file_name)))
+            except Exception as ex:  # pylint: disable=W0703
+                LOGGER.error("pipeline: failed to index %s: %s", zip_file_name, ex)
+
+    @staticmethod
+    def _index_writer(write_queue: queue.Queue, indexers: Dict[str, ReportParquetIndexer]):
+        """
+        writes the index entries from the write_queue into the db. There is only one writer,
+        so that there is always just one thread writing into the sqlite db. All entries that
+        are waiting, but at most INDEX_WRITE_BATCH_SIZE, are written in one transaction.
+        Stops when it receives None.
+        """
+        stopped = False
+        while not stopped:
+            entries: List[Tuple[str, IndexFileEntries]] = []
+            entry = write_queue.get()
+            while entry is not None:
+                entries.append(entry)
+                if (len(entries) >= INDEX_WRITE_BATCH_SIZE) or write_queue.empty():
+                    break
+                entry = write_queue.get()
+            stopped = entry is None
+
+            for file_type, indexer in indexers.items():
+                parts = [part for part_file_type, part in entries if part_file_type == file_type]
+                if len(parts) == 0:
+                    continue
+                try:
+                    indexer.write_index_entries(parts)
+                except Exception as ex:  # pylint: disable=W0703
+                    LOGGER.error("pipeline: failed to write the index of %s: %s",
+                                 [part.processing_state.fileName for part in parts], ex)
+
+    def _do_pipelined_update(self):
+        """
+        downloads, transforms, and indexes the zip files concurrently.
+        Downloaded zip files are put into a bounded transform queue, so that downloading
+        pauses when the transformation can't keep up. Zip files are transformed by
+        pipeline_transform_workers threads. Their index entries are read by
+        pipeline_index_workers threads and are written into the db by a single thread.
+        Since the transformation runs in threads, it scales best with the 'pyarrow' reader
+        engine, which parses the CSV files without holding the GIL.
+        """
+        transform_queue: queue.Queue = queue.Queue(maxsize=self.pipeline_queue_size)
+        index_queue: queue.Queue = queue.Queue()
+        write_queue: queue.Queue = queue.Queue()
+
+        transformers = {'quarter': self._create_transformer(zip_dir=self.dld_dir,
+                                                            file_type='quarter'),
+                        'daily': self._create_transformer(zip_dir=self.daily_dld_dir,
+                                                          file_type='daily')}
+
+        transform_threads = [threading.Thread(target=self._transform_worker,
+                                              args=(transform_queue, index_queue, transformers),
+                                              name=f'transform-{i}', daemon=True)
+                             for i in range(max(1, self.pipeline_transform_workers))]
+        indexers = {file_type: ReportParquetIndexer(db_dir=self.db_dir,
+                                                    parquet_dir=self.parquet_dir,
+                                                    file_type=file_type)
+                    for file_type in ['quarter', 'daily']}
+        index_threads = [threading.Thread(target=self._index_worker,
+                                          args=(index_queue, write_queue, indexers),
+                                          name=f'index-{i}', daemon=True)
+                         for i in range(max(1, self.pipeline_index_workers))]
+        writer_thread = threading.Thread(target=self._index_writer, args=(write_queue, indexers),
+                                         name='index-writer', daemon=True)
+        for thread in transform_threads + index_threads + [writer_thread]:
+            thread.start()
+
+        def create_listener(file_type: str) -> Callable[[str, str], None]:
+            return lambda name, path: transform_queue.put((file_type, name, path))
+
+        try:
+            # zip files that were downloaded earlier, but that are not transformed yet
+            for file_type, transformer in transformers.items():
+                for zip_file_name, zip_file_path in transformer.get_not_transformed():
+                    transform_queue.put((file_type, zip_file_name, zip_file_path))
+
+            self._do_download(download_listeners={'quarter': create_listener('quarter'),
+                                                  'daily': create_listener('daily')})
+        finally:
+            for _ in transform_threads:
+                transform_queue.put(None)
+            for thread in transform_threads:
+                thread.join()
+            for _ in index_threads:
+                index_queue.put(None)
+            for thread in index_threads:
+                thread.join()
+            write_queue.put(None)
+            writer_thread.join()
+
+        self._do_build_tag_dimension()
+
+        # make sure that everything that was transformed is also indexed
+        self._do_index()
+
     def _update(self):
+        if self.update_pipelined:
+            self._do_pipelined_update()
+            return
+
         self._do_download()
         self._do_transform()
         self._do_index()
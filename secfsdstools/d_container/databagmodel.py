@@ -4,11 +4,15 @@ Defines the container that keeps the data of sub.txt, num.txt, and  pre.txt toge
 
 import os
 from dataclasses import dataclass
-from typing import Dict, List, TypeVar, Generic
+from typing import Dict, List, Optional, TypeVar, Generic
 
 import pandas as pd
 
 from secfsdstools.a_utils.constants import SUB_TXT, PRE_TXT, NUM_TXT, PRE_NUM_TXT
+from secfsdstools.a_utils.dataframeutils import concat_dataframes, merge_pre_num, \
+    sort_categories
+from secfsdstools.a_utils.parquetutils import DEFAULT_COMPRESSION, get_compression_options, \
+    read_parquet_df
 from secfsdstools.d_container.filter import FilterBase
 from secfsdstools.d_container.presentation import Presenter
 
@@ -116,7 +120,8 @@ class JoinedDataBag(DataBagBase[JOINED]):
         return JoinedDataBag.create(sub_df=self.sub_df.copy(),
                                     pre_num_df=self.pre_num_df.copy())
 
-    def save(self, target_path: str):
+    def save(self, target_path: str, compression: str = DEFAULT_COMPRESSION,
+             compression_level: Optional[int] = None):
         """
         Stores the bag under the given directory.
         The directory has to exist and must be empty.
@@ -125,16 +130,23 @@ class JoinedDataBag(DataBagBase[JOINED]):
             databag: the bag to be saved
             target_path: the directory under which the parquet files for sub and pre_num
                   will be created
+            compression: the compression codec, either 'zstd', 'lz4', 'snappy', or 'none'
+            compression_level: the compression level, only supported by 'zstd'
 
         """
+        compression_options = get_compression_options(compression=compression,
+                                                      compression_level=compression_level)
+
         if not os.path.isdir(target_path):
             raise ValueError(f"the path {target_path} does not exist")
 
         if len(os.listdir(target_path)) > 0:
             raise ValueError(f"the target_path {target_path} is not empty")
 
-        self.sub_df.to_parquet(os.path.join(target_path, f'{SUB_TXT}.parquet'))
-        self.pre_num_df.to_parquet(os.path.join(target_path, f'{PRE_NUM_TXT}.parquet'))
+        self.sub_df.to_parquet(os.path.join(target_path, f'{SUB_TXT}.parquet'),
+                               **compression_options)
+        self.pre_num_df.to_parquet(os.path.join(target_path, f'{PRE_NUM_TXT}.parquet'),
+                                   **compression_options)
 
     @staticmethod
     def load(target_path: str) -> JOINED:
@@ -150,13 +162,15 @@ class JoinedDataBag(DataBagBase[JOINED]):
         sub_df = pd.read_parquet(os.path.join(target_path, f'{SUB_TXT}.parquet'))
         pre_num_df = pd.read_parquet(os.path.join(target_path, f'{PRE_NUM_TXT}.parquet'))
 
-        return JoinedDataBag.create(sub_df=sub_df, pre_num_df=pre_num_df)
+        return JoinedDataBag.create(sub_df=sort_categories(sub_df),
+                                    pre_num_df=sort_categories(pre_num_df))
 
     @staticmethod
     def concat(bags: List[JOINED]) -> JOINED:
         """
         Merges multiple Bags together into one bag.
         Note: merge does not check if DataBags with the same reports are merged together.
+        Columns that are categorical in all bags stay categorical.
 
         Args:
             bags: List of bags to be merged
@@ -168,8 +182,9 @@ class JoinedDataBag(DataBagBase[JOINED]):
         sub_dfs = [db.sub_df for db in bags]
         pre_num_dfs = [db.pre_num_df for db in bags]
 
-        return JoinedDataBag.create(sub_df=pd.concat(sub_dfs),
-                                    pre_num_df=pd.concat(pre_num_dfs))
+        return JoinedDataBag.create(sub_df=concat_dataframes(sub_dfs, ignore_index=False),
+                                    pre_num_df=concat_dataframes(pre_num_dfs,
+                                                                 ignore_index=False))
 
 
 @dataclass
@@ -257,10 +272,8 @@ class RawDataBag(DataBagBase[RAW]):
         """
 
         # merge num and pre together. only rows in num are considered for which entries in pre exist
-        pre_num_df = pd.merge(self.num_df,
-                              self.pre_df,
-                              on=['adsh', 'tag',
-                                  'version'])  # don't produce index_x and index_y columns
+        # if both contain the tag_id, they are joined on the integer tag_id instead of the strings
+        pre_num_df = merge_pre_num(num_df=self.num_df, pre_df=self.pre_df)
 
         return JoinedDataBag.create(sub_df=self.sub_df, pre_num_df=pre_num_df)
 
@@ -290,7 +303,8 @@ class RawDataBag(DataBagBase[RAW]):
                                reports_per_period_date=reports_per_period_date
                                )
 
-    def save(self, target_path: str):
+    def save(self, target_path: str, compression: str = DEFAULT_COMPRESSION,
+             compression_level: Optional[int] = None):
         """
         Stores the bag under the given directory.
         The directory has to exist and must be empty.
@@ -299,17 +313,25 @@ class RawDataBag(DataBagBase[RAW]):
             databag: the bag to be saved
             target_path: the directory under which three parquet files for sub_txt, pre_text,
                   and num_txt will be created
+            compression: the compression codec, either 'zstd', 'lz4', 'snappy', or 'none'
+            compression_level: the compression level, only supported by 'zstd'
 
         """
+        compression_options = get_compression_options(compression=compression,
+                                                      compression_level=compression_level)
+
         if not os.path.isdir(target_path):
             raise ValueError(f"the path {target_path} does not exist")
 
         if len(os.listdir(target_path)) > 0:
             raise ValueError(f"the target_path {target_path} is not empty")
 
-        self.sub_df.to_parquet(os.path.join(target_path, f'{SUB_TXT}.parquet'))
-        self.pre_df.to_parquet(os.path.join(target_path, f'{PRE_TXT}.parquet'))
-        self.num_df.to_parquet(os.path.join(target_path, f'{NUM_TXT}.parquet'))
+        self.sub_df.to_parquet(os.path.join(target_path, f'{SUB_TXT}.parquet'),
+                               **compression_options)
+        self.pre_df.to_parquet(os.path.join(target_path, f'{PRE_TXT}.parquet'),
+                               **compression_options)
+        self.num_df.to_parquet(os.path.join(target_path, f'{NUM_TXT}.parquet'),
+                               **compression_options)
 
     @staticmethod
     def load(target_path: str) -> RAW:
@@ -323,17 +345,20 @@ class RawDataBag(DataBagBase[RAW]):
         Returns:
             RawDataBag: the loaded Databag
         """
-        sub_df = pd.read_parquet(os.path.join(target_path, f'{SUB_TXT}.parquet'))
-        pre_df = pd.read_parquet(os.path.join(target_path, f'{PRE_TXT}.parquet'))
-        num_df = pd.read_parquet(os.path.join(target_path, f'{NUM_TXT}.parquet'))
+        sub_df = read_parquet_df(os.path.join(target_path, f'{SUB_TXT}.parquet'))
+        pre_df = read_parquet_df(os.path.join(target_path, f'{PRE_TXT}.parquet'))
+        num_df = read_parquet_df(os.path.join(target_path, f'{NUM_TXT}.parquet'))
 
-        return RawDataBag.create(sub_df=sub_df, pre_df=pre_df, num_df=num_df)
+        return RawDataBag.create(sub_df=sort_categories(sub_df),
+                                 pre_df=sort_categories(pre_df),
+                                 num_df=sort_categories(num_df))
 
     @staticmethod
     def concat(bags: List[RAW]) -> RAW:
         """
         Merges multiple Bags together into one bag.
         Note: merge does not check if DataBags with the same reports are merged together.
+        Columns that are categorical in all bags stay categorical.
 
         Args:
             bags: List of bags to be merged
@@ -348,6 +373,6 @@ class RawDataBag(DataBagBase[RAW]):
 
         # todo: might be more efficient if the contained maps were just combined
         #       instead of being recalculated
-        return RawDataBag.create(sub_df=pd.concat(sub_dfs, ignore_index=True),
-                                 pre_df=pd.concat(pre_dfs, ignore_index=True),
-                                 num_df=pd.concat(num_dfs, ignore_index=True))
+        return RawDataBag.create(sub_df=concat_dataframes(sub_dfs),
+                                 pre_df=concat_dataframes(pre_dfs),
+                                 num_df=concat_dataframes(num_dfs))
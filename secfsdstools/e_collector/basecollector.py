@@ -1,14 +1,22 @@
 """
 Collector Base Class
 """
+import logging
 import os
 from abc import ABC
-from typing import List, Optional, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 import pandas as pd
 
-from secfsdstools.a_utils.constants import NUM_TXT, PRE_TXT, SUB_TXT
-from secfsdstools.d_container.databagmodel import RawDataBag
+from secfsdstools.a_utils.constants import NUM_TXT, PRE_TXT, PRE_NUM_TXT, SUB_TXT
+from secfsdstools.a_utils.dataframeutils import sort_categories
+from secfsdstools.a_utils.parquetutils import ParquetReadStats, RowGroupLocations, \
+    read_df_with_stats, read_row_groups_df
+from secfsdstools.c_transform.parquetschema import FORM_FAMILY_COLUMN, STMT_PARTITION_COLUMN, \
+    get_form_family
+from secfsdstools.d_container.databagmodel import JoinedDataBag, RawDataBag
+
+LOGGER = logging.getLogger(__name__)
 
 
 class BaseCollector(ABC):
@@ -18,21 +26,51 @@ class BaseCollector(ABC):
 
     def __init__(self, datapath: str,
                  stmt_filter: Optional[List[str]] = None,
-                 tag_filter: Optional[List[str]] = None):
+                 tag_filter: Optional[List[str]] = None,
+                 row_group_locations: Optional[Dict[str, RowGroupLocations]] = None,
+                 row_group_validators: Optional[Dict[str, str]] = None):
         self.datapath = datapath
         self.stmt_filter = stmt_filter
         self.tag_filter = tag_filter
+        # the row groups that contain the data, per file, as recorded by the indexer.
+        # files without locations are read with the filters on the whole dataset.
+        self.row_group_locations = row_group_locations or {}
+        # the validators of the files at the time the row groups were located, per file
+        self.row_group_validators = row_group_validators or {}
+        # contains the information how many row groups were read/skipped during the last collect
+        self.read_stats: List[ParquetReadStats] = []
 
     def _read_df_from_raw_parquet(self,
                                   file: str,
-                                  filters=None) -> pd.DataFrame:
+                                  filters=None,
+                                  partition_filters=None) -> pd.DataFrame:
+        path = os.path.join(self.datapath, f'{file}.parquet')
+        locations = self.row_group_locations.get(file)
+        if locations is not None:
+            try:
+                data_df, stats = read_row_groups_df(
+                    path, locations=locations, filters=filters,
+                    partition_filters=partition_filters,
+                    validator=self.row_group_validators.get(file))
+                self.read_stats.append(stats)
+                return data_df
+            except (OSError, ValueError, IndexError) as ex:
+                # the file was replaced after it was indexed
+                LOGGER.warning('row group locations of %s are outdated: %s', path, ex)
+
         try:
-            return pd.read_parquet(os.path.join(self.datapath, f'{file}.parquet'),
-                                   filters=filters)
+            data_df, stats = read_df_with_stats(path,
+                                                filters=filters,
+                                                partition_filters=partition_filters)
         except Exception as ex:
             print("Error reading file:", self.datapath, file, ex)
             raise ex
 
+        LOGGER.debug('read %d of %d row groups from %s (skipped %d)', stats.row_groups_read,
+                     stats.row_groups_total, stats.path, stats.row_groups_skipped)
+        self.read_stats.append(stats)
+        return data_df
+
 
     def _get_pre_num_filters(self,
                              adshs: Optional[List[str]],
@@ -56,6 +94,56 @@ class BaseCollector(ABC):
 
         return pre_filter, num_filter
 
+    @staticmethod
+    def _get_form_family_filter(forms: List[str]) -> List[Tuple[str, str, List[str]]]:
+        """
+        filter on the form families. it is only applied on data which is partitioned
+        by the form family and skips the partitions which cannot contain the forms.
+        """
+        if not forms:
+            return []
+        return [(FORM_FAMILY_COLUMN, 'in', sorted({get_form_family(form) for form in forms}))]
+
+    @staticmethod
+    def _get_filtered_forms(sub_df_filter: Optional[Tuple[str, str, Union[str, List[str]]]]) \
+            -> List[str]:
+        if (not sub_df_filter) or (sub_df_filter[0] != 'form'):
+            return []
+        if sub_df_filter[1] in ('=', '=='):
+            return [sub_df_filter[2]]
+        if sub_df_filter[1] == 'in':
+            return list(sub_df_filter[2])
+        return []
+
+    @staticmethod
+    def _fill_coreg(data_df: pd.DataFrame) -> pd.DataFrame:
+        # pandas pivot works better if coreg is not nan, so we set it here to a simple dash
+        if isinstance(data_df.coreg.dtype, pd.CategoricalDtype) \
+                and '' not in data_df.coreg.cat.categories:
+            data_df['coreg'] = data_df.coreg.cat.add_categories('')
+        data_df.loc[data_df.coreg.isna(), 'coreg'] = ''
+        return data_df
+
+    def _read_sub_df(self, sub_df_filter: Optional[Tuple[str, str, Union[str, List[str]]]]) \
+            -> pd.DataFrame:
+        # if the data is stored in the partitioned layout, whole partitions are skipped
+        return self._read_df_from_raw_parquet(
+            file=SUB_TXT,
+            filters=[sub_df_filter] if sub_df_filter else None,
+            partition_filters=self._get_form_family_filter(
+                self._get_filtered_forms(sub_df_filter))
+        )
+
+    def has_joined_data(self) -> bool:
+        """
+        checks whether the pre_num.txt with the joined pre.txt and num.txt was
+        materialized when the data was transformed.
+
+        Returns:
+            bool: True if pre_num.txt is present
+        """
+        return os.path.exists(os.path.join(self.datapath, f'{PRE_NUM_TXT}.parquet'))
+
     def basecollect(self, sub_df_filter: Tuple[str, str, Union[str, List[str]]]) -> RawDataBag:
         """
         basic implementation of the collect method
@@ -67,26 +155,65 @@ class BaseCollector(ABC):
             RawDataBag: the loaded instance of RawDataBag
 
         """
+        self.read_stats = []
 
-        sub_df = self._read_df_from_raw_parquet(file=SUB_TXT,
-                                                filters=[sub_df_filter] if sub_df_filter else None)
+        sub_df = self._read_sub_df(sub_df_filter)
         adshs = sub_df.adsh.to_list()
         pre_filter, num_filter = self._get_pre_num_filters(adshs=adshs,
                                                            stmts=self.stmt_filter,
                                                            tags=self.tag_filter)
 
         pre_df = self._read_df_from_raw_parquet(
-            file=PRE_TXT, filters=pre_filter if pre_filter else None
+            file=PRE_TXT, filters=pre_filter if pre_filter else None,
+            partition_filters=[(STMT_PARTITION_COLUMN, 'in', self.stmt_filter)]
+            if self.stmt_filter else None
         )
 
         num_df = self._read_df_from_raw_parquet(
-            file=NUM_TXT, filters=num_filter if num_filter else None
+            file=NUM_TXT, filters=num_filter if num_filter else None,
+            partition_filters=self._get_form_family_filter(sub_df.form.unique().tolist())
         )
 
-        # pandas pivot works better if coreg is not nan, so we set it here to a simple dash
-        num_df.loc[num_df.coreg.isna(), 'coreg'] = ''
+        num_df = self._fill_coreg(num_df)
+
+        # files with the compact schema are read with categorical columns. their categories
+        # are sorted, so that sorting by these columns works as it does for string columns
+        return RawDataBag.create(sub_df=sort_categories(sub_df),
+                                 pre_df=sort_categories(pre_df),
+                                 num_df=sort_categories(num_df))
+
+    def basecollect_joined(self, sub_df_filter: Tuple[str, str, Union[str, List[str]]]) \
+            -> JoinedDataBag:
+        """
+        basic implementation of the collect_joined method. If the pre_num.txt was materialized
+        when the data was transformed, the joined data is directly read from it with the same
+        filters basecollect uses. Otherwise, the raw data is collected and joined.
+
+        Args:
+            sub_df_filter: filter that applies directly on the sub.txt dataframe.
+
+        Returns:
+            JoinedDataBag: the loaded instance of JoinedDataBag
+        """
+        if not self.has_joined_data():
+            return self.basecollect(sub_df_filter=sub_df_filter).join()
+
+        self.read_stats = []
+
+        sub_df = self._read_sub_df(sub_df_filter)
+        pre_num_filter, _ = self._get_pre_num_filters(adshs=sub_df.adsh.to_list(),
+                                                      stmts=self.stmt_filter,
+                                                      tags=self.tag_filter)
+
+        pre_num_df = self._read_df_from_raw_parquet(
+            file=PRE_NUM_TXT, filters=pre_num_filter if pre_num_filter else None,
+            partition_filters=[(STMT_PARTITION_COLUMN, 'in', self.stmt_filter)]
+            if self.stmt_filter else None
+        )
+        pre_num_df = self._fill_coreg(pre_num_df)
 
-        return RawDataBag.create(sub_df=sub_df, pre_df=pre_df, num_df=num_df)
+        return JoinedDataBag.create(sub_df=sort_categories(sub_df),
+                                    pre_num_df=sort_categories(pre_num_df))
 
     def collect(self) -> RawDataBag:
         """
@@ -5,7 +5,8 @@ from typing import Optional, List
 
 from secfsdstools.a_config.configmgt import ConfigurationManager
 from secfsdstools.a_config.configmodel import Configuration
-from secfsdstools.c_index.indexdataaccess import IndexReport, ParquetDBIndexingAccessor
+from secfsdstools.c_index.indexdataaccess import IndexReport
+from secfsdstools.c_index.indexsnapshot import get_index_accessor
 from secfsdstools.e_collector.multireportcollecting import MultiReportCollector
 
 
@@ -46,7 +47,7 @@ class CompanyReportCollector:
         if configuration is None:
             configuration = ConfigurationManager.read_config_file()
 
-        dbaccessor = ParquetDBIndexingAccessor(db_dir=configuration.db_dir)
+        dbaccessor = get_index_accessor(configuration)
 
         # todo: if daily entries are also in index, it returns mutliple matches!
         #       probably fix directly in read_index_reports-> filter for two and check source
@@ -2,12 +2,14 @@
 Reads several reports from different files parallel
 """
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Dict, List, Optional
 
 from secfsdstools.a_config.configmgt import ConfigurationManager
 from secfsdstools.a_config.configmodel import Configuration
 from secfsdstools.a_utils.parallelexecution import ParallelExecutor
-from secfsdstools.c_index.indexdataaccess import IndexReport, ParquetDBIndexingAccessor
+from secfsdstools.a_utils.parquetutils import RowGroupLocations
+from secfsdstools.c_index.indexdataaccess import VALIDATOR_SOURCE_REPORTS, IndexReport
+from secfsdstools.c_index.indexsnapshot import get_index_accessor
 from secfsdstools.d_container.databagmodel import RawDataBag
 from secfsdstools.e_collector.reportcollecting import SingleReportCollector
 
@@ -44,12 +46,17 @@ class MultiReportCollector:
         if configuration is None:
             configuration = ConfigurationManager.read_config_file()
 
-        dbaccessor = ParquetDBIndexingAccessor(db_dir=configuration.db_dir)
+        dbaccessor = get_index_accessor(configuration)
 
         index_reports = dbaccessor.read_index_reports_for_adshs(adshs=adshs)
-        return MultiReportCollector(index_reports=index_reports,
-                                    stmt_filter=stmt_filter,
-                                    tag_filter=tag_filter)
+        return MultiReportCollector(
+            index_reports=index_reports,
+            stmt_filter=stmt_filter,
+            tag_filter=tag_filter,
+            row_group_locations=dbaccessor.read_row_group_locations_for_reports(index_reports),
+            row_group_validators=dbaccessor.read_row_group_validators(
+                origin_files=[report.originFile for report in index_reports],
+                source=VALIDATOR_SOURCE_REPORTS))
 
     @classmethod
     def get_reports_by_indexreports(cls,
@@ -76,11 +83,17 @@ class MultiReportCollector:
 
     def __init__(self, index_reports: List[IndexReport],
                  stmt_filter: Optional[List[str]] = None,
-                 tag_filter: Optional[List[str]] = None):
+                 tag_filter: Optional[List[str]] = None,
+                 row_group_locations: Optional[Dict[str, Dict[str, RowGroupLocations]]] = None,
+                 row_group_validators: Optional[Dict[str, Dict[str, str]]] = None):
         super().__init__()
         self.index_reports = index_reports
         self.stmt_filter = stmt_filter
         self.tag_filter = tag_filter
+        # the row group locations per adsh
+        self.row_group_locations = row_group_locations or {}
+        # the validators of the files with row group locations per zip file
+        self.row_group_validators = row_group_validators or {}
 
     def _multi_collect(self) -> RawDataBag:
         """
@@ -100,7 +113,9 @@ class MultiReportCollector:
         def process_element(element: IndexReport) -> RawDataBag:
             print(element.adsh)
             collector = SingleReportCollector.get_report_by_indexreport(
-                index_report=element, stmt_filter=self.stmt_filter, tag_filter=self.tag_filter)
+                index_report=element, stmt_filter=self.stmt_filter, tag_filter=self.tag_filter,
+                row_group_locations=self.row_group_locations.get(element.adsh),
+                row_group_validators=self.row_group_validators.get(element.originFile))
 
             return collector.collect()
 
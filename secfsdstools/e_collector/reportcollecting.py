@@ -1,10 +1,12 @@
 """ contains collector, that reads a single report """
-from typing import Optional, List
+from typing import Dict, List, Optional
 
 from secfsdstools.a_config.configmgt import ConfigurationManager
 from secfsdstools.a_config.configmodel import Configuration
-from secfsdstools.c_index.indexdataaccess import ParquetDBIndexingAccessor, IndexReport
-from secfsdstools.d_container.databagmodel import RawDataBag
+from secfsdstools.a_utils.parquetutils import RowGroupLocations
+from secfsdstools.c_index.indexdataaccess import VALIDATOR_SOURCE_REPORTS, IndexReport
+from secfsdstools.c_index.indexsnapshot import get_index_accessor
+from secfsdstools.d_container.databagmodel import JoinedDataBag, RawDataBag
 from secfsdstools.e_collector.basecollector import BaseCollector
 
 
@@ -41,17 +43,26 @@ class SingleReportCollector(BaseCollector):
         if configuration is None:
             configuration = ConfigurationManager.read_config_file()
 
-        dbaccessor = ParquetDBIndexingAccessor(db_dir=configuration.db_dir)
+        dbaccessor = get_index_accessor(configuration)
+        index_report = dbaccessor.read_index_report_for_adsh(adsh=adsh)
+        validators = dbaccessor.read_row_group_validators(origin_files=[index_report.originFile],
+                                                          source=VALIDATOR_SOURCE_REPORTS)
         return SingleReportCollector.get_report_by_indexreport(
-            dbaccessor.read_index_report_for_adsh(adsh=adsh),
+            index_report,
             stmt_filter=stmt_filter,
-            tag_filter=tag_filter)
+            tag_filter=tag_filter,
+            row_group_locations=dbaccessor.read_row_group_locations(
+                adsh=index_report.adsh, origin_file=index_report.originFile),
+            row_group_validators=validators.get(index_report.originFile))
 
     @classmethod
     def get_report_by_indexreport(cls,
                                   index_report: IndexReport,
                                   stmt_filter: Optional[List[str]] = None,
-                                  tag_filter: Optional[List[str]] = None):
+                                  tag_filter: Optional[List[str]] = None,
+                                  row_group_locations: Optional[
+                                      Dict[str, RowGroupLocations]] = None,
+                                  row_group_validators: Optional[Dict[str, str]] = None):
         """
         crates the ReportReader instance based on the IndexReport instance
 
@@ -64,18 +75,30 @@ class SingleReportCollector(BaseCollector):
             tag_filter (List[str], optional, None:
                 List of tags that should be read (Assets, Liabilities, ...)
 
+            row_group_locations (Dict[str, RowGroupLocations], optional, None):
+                the row groups of the report per file, as recorded by the indexer
+
+            row_group_validators (Dict[str, str], optional, None):
+                the validators of the files at the time the row groups were located
+
         Returns:
             SingleReportCollector: isntance of SingleReportCollector
         """
         return SingleReportCollector(report=index_report,
                                      tag_filter=tag_filter,
-                                     stmt_filter=stmt_filter)
+                                     stmt_filter=stmt_filter,
+                                     row_group_locations=row_group_locations,
+                                     row_group_validators=row_group_validators)
 
     def __init__(self,
                  report: IndexReport,
                  stmt_filter: Optional[List[str]] = None,
-                 tag_filter: Optional[List[str]] = None):
-        super().__init__(datapath=report.fullPath, stmt_filter=stmt_filter, tag_filter=tag_filter)
+                 tag_filter: Optional[List[str]] = None,
+                 row_group_locations: Optional[Dict[str, RowGroupLocations]] = None,
+                 row_group_validators: Optional[Dict[str, str]] = None):
+        super().__init__(datapath=report.fullPath, stmt_filter=stmt_filter, tag_filter=tag_filter,
+                         row_group_locations=row_group_locations,
+                         row_group_validators=row_group_validators)
         self.report = report
         self.databag: Optional[RawDataBag] = None
 
@@ -89,3 +112,15 @@ class SingleReportCollector(BaseCollector):
         """
         adsh_filter = ('adsh', '==', self.report.adsh)
         return self.basecollect(sub_df_filter=adsh_filter)
+
+    def collect_joined(self) -> JoinedDataBag:
+        """
+        collects the data and returns it as JoinedDataBag. This is the same as calling
+        collect().join(), but reads the joined data directly from the pre_num.txt file,
+        if it was materialized when the data was transformed.
+
+        Returns:
+            JoinedDataBag: the collected and joined Data
+        """
+        adsh_filter = ('adsh', '==', self.report.adsh)
+        return self.basecollect_joined(sub_df_filter=adsh_filter)
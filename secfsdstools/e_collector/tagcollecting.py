@@ -0,0 +1,192 @@
+"""
+loads the data of some tags from all zip files. The inverted tag index, which is maintained by
+the update process if the 'IndexTags' option is set, tells which row groups of which zip files
+contain the tags, so that only these row groups are read and all other zip files are skipped.
+Zip files whose pre.txt or num.txt were rewritten since their tags were indexed are read
+completely, filtered by the tags.
+"""
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from secfsdstools.a_config.configmgt import ConfigurationManager
+from secfsdstools.a_config.configmodel import Configuration
+from secfsdstools.a_utils.constants import NUM_TXT, PRE_TXT
+from secfsdstools.a_utils.parallelexecution import ParallelExecutor
+from secfsdstools.a_utils.parquetutils import RowGroupLocations, get_row_groups_validator
+from secfsdstools.c_index.indexdataaccess import VALIDATOR_SOURCE_TAGS, \
+    ParquetDBIndexingAccessor
+from secfsdstools.c_index.indexing import BaseReportIndexer
+from secfsdstools.d_container.databagmodel import JoinedDataBag, RawDataBag
+from secfsdstools.e_collector.basecollector import BaseCollector
+
+LOGGER = logging.getLogger(__name__)
+
+# the datapath of a zip file, the row groups that contain the tags, per file, and the
+# validators of the files at the time the tags were indexed.
+# None if the tags of the zip file are not indexed and the whole files have to be read.
+TagDataPath = Tuple[str, Optional[Dict[str, RowGroupLocations]], Optional[Dict[str, str]]]
+
+
+def _merge_locations(locations_list: List[RowGroupLocations]) -> RowGroupLocations:
+    merged: Dict[str, set] = {}
+    for locations in locations_list:
+        for relative_path, row_groups in locations.items():
+            merged.setdefault(relative_path, set()).update(row_groups)
+    return {relative_path: sorted(row_groups) for relative_path, row_groups in merged.items()}
+
+
+def _get_indexed_datapaths(locations_df: pd.DataFrame,
+                           validators: Dict[str, Dict[str, str]]) -> List[TagDataPath]:
+    datapaths: List[TagDataPath] = []
+    for (origin_file, full_path), file_df in locations_df.groupby(['originFile', 'fullPath'],
+                                                                  sort=False):
+        datapaths.append((full_path, {
+            file_name: _merge_locations([json.loads(locations)
+                                         for locations in group_df.locations])
+            for file_name, group_df in file_df.groupby('fileName')},
+                          validators.get(origin_file)))
+    return datapaths
+
+
+def _is_unchanged(datapath: str, validators: Optional[Dict[str, str]]) -> bool:
+    # zip files that were indexed by an older version have no validators
+    return all(get_row_groups_validator(os.path.join(datapath, f'{file_name}.parquet'))
+               == validator for file_name, validator in (validators or {}).items())
+
+
+class TagCollector:
+    """
+    Reads the data of some tags from all zip files, using the inverted tag index to read
+    only the zip files and row groups that contain the tags.
+    """
+
+    @classmethod
+    def get_tags(cls,
+                 tags: List[str],
+                 forms_filter: Optional[List[str]] = None,
+                 stmt_filter: Optional[List[str]] = None,
+                 configuration: Optional[Configuration] = None):
+        """
+        creates a TagCollector instance for the given tags.
+        Zip files whose tags are not indexed yet are read completely, filtered by the tags.
+
+        Args:
+            tags (List[str]): the tags that should be read (Assets, Liabilities, ...)
+
+            forms_filter (List[str], optional, None):
+                List of forms that should be read (10-K, 10-Q, ...)
+
+            stmt_filter (List[str], optional, None):
+                List of stmts that should be read (BS, IS, ...)
+
+            configuration (Configuration, optional, None): configuration object
+
+        Returns:
+            TagCollector: instance of TagCollector
+        """
+        if configuration is None:
+            configuration = ConfigurationManager.read_config_file()
+
+        dbaccessor = ParquetDBIndexingAccessor(db_dir=configuration.db_dir, read_only=True)
+        tag_indexed_files = set(dbaccessor.read_tag_indexed_files())
+        if len(tag_indexed_files) == 0:
+            raise ValueError("the tag index is empty, set 'IndexTags' to True in the "
+                             "configuration and run the update")
+
+        validators = dbaccessor.read_row_group_validators(origin_files=list(tag_indexed_files),
+                                                          source=VALIDATOR_SOURCE_TAGS)
+        locations_df = dbaccessor.read_tag_locations_df(tags=tags)
+        datapaths = _get_indexed_datapaths(locations_df, validators)
+
+        # zip files without the tags are only skipped, if they didn't change since their
+        # tags were indexed
+        with_tags = set(locations_df.originFile)
+        processed = [processing_state for processing_state
+                     in dbaccessor.read_all_indexfileprocessing()
+                     if processing_state.status == BaseReportIndexer.PROCESSED_STR]
+        datapaths.extend((processing_state.fullPath, None, None) for processing_state in processed
+                         if (processing_state.fileName not in tag_indexed_files)
+                         or ((processing_state.fileName not in with_tags)
+                             and not _is_unchanged(processing_state.fullPath,
+                                                   validators.get(processing_state.fileName))))
+
+        files_skipped = len(processed) - len(datapaths)
+        LOGGER.info("reading %d of %d zip files, %d files don't contain the tags",
+                    len(datapaths), len(processed), files_skipped)
+
+        return TagCollector(tags=tags,
+                            datapaths=datapaths,
+                            forms_filter=forms_filter,
+                            stmt_filter=stmt_filter,
+                            files_skipped=files_skipped)
+
+    def __init__(self,
+                 tags: List[str],
+                 datapaths: List[TagDataPath],
+                 forms_filter: Optional[List[str]] = None,
+                 stmt_filter: Optional[List[str]] = None,
+                 files_skipped: int = 0):
+        self.tags = tags
+        self.datapaths = datapaths
+        self.forms_filter = forms_filter
+        self.stmt_filter = stmt_filter
+        # the number of zip files that were skipped, since they don't contain the tags
+        self.files_skipped = files_skipped
+
+    def _get_sub_filter(self):
+        return ('form', 'in', self.forms_filter) if self.forms_filter else None
+
+    def collect(self) -> RawDataBag:
+        """
+        collects the data and returns a Databag
+
+        Returns:
+            RawDataBag: the collected Data
+        """
+        datapaths: List[TagDataPath] = self.datapaths
+        if len(datapaths) == 0:
+            raise ValueError(f'none of the zip files contains the tags {self.tags}')
+
+        def get_entries() -> List[TagDataPath]:
+            return datapaths
+
+        def process_element(element: TagDataPath) -> RawDataBag:
+            datapath, locations, validators = element
+            LOGGER.info("processing %s", datapath)
+            # a file without locations for pre.txt or num.txt doesn't contain the tags
+            if locations is not None:
+                locations = {PRE_TXT: locations.get(PRE_TXT, {}),
+                             NUM_TXT: locations.get(NUM_TXT, {})}
+            collector = BaseCollector(datapath=datapath,
+                                      stmt_filter=self.stmt_filter,
+                                      tag_filter=self.tags,
+                                      row_group_locations=locations,
+                                      row_group_validators=validators)
+            return collector.basecollect(sub_df_filter=self._get_sub_filter())
+
+        def post_process(parts: List[RawDataBag]) -> List[RawDataBag]:
+            # do nothing
+            return parts
+
+        executor = ParallelExecutor(chunksize=0, execute_serial=len(datapaths) <= 1)
+
+        executor.set_get_entries_function(get_entries)
+        executor.set_process_element_function(process_element)
+        executor.set_post_process_chunk_function(post_process)
+
+        # we ignore the missing, since get_entries always returns the whole list
+        collected, _ = executor.execute()
+        return RawDataBag.concat(collected)
+
+    def collect_joined(self) -> JoinedDataBag:
+        """
+        collects the data and returns it as JoinedDataBag.
+
+        Returns:
+            JoinedDataBag: the collected and joined Data
+        """
+        return self.collect().join()
@@ -1,15 +1,22 @@
 """
 loads all the data from one single zip file, resp. the folder with the three parquet files to
 which the zip file was transformed to.
+
+The statistics the indexer stores for every zip file are used to plan the reading: zip files
+that cannot contain data for the forms and stmts filters are skipped, and the remaining zip
+files are read largest first, so that the biggest zip file doesn't end up last in the pool.
 """
 import logging
-from typing import Optional, List, Callable
+from typing import Any, Optional, List, Callable
+
+import pandas as pd
 
 from secfsdstools.a_config.configmgt import ConfigurationManager
 from secfsdstools.a_config.configmodel import Configuration
 from secfsdstools.a_utils.parallelexecution import ParallelExecutor
-from secfsdstools.c_index.indexdataaccess import ParquetDBIndexingAccessor
-from secfsdstools.d_container.databagmodel import RawDataBag
+from secfsdstools.c_index.indexdataaccess import IndexFileProcessingState, \
+    ParquetDBIndexingAccessor
+from secfsdstools.d_container.databagmodel import JoinedDataBag, RawDataBag
 from secfsdstools.e_collector.basecollector import BaseCollector
 
 LOGGER = logging.getLogger(__name__)
@@ -85,9 +92,12 @@ class ZipCollector:
         if configuration is None:
             configuration = ConfigurationManager.read_config_file()
 
-        dbaccessor = ParquetDBIndexingAccessor(db_dir=configuration.db_dir)
+        dbaccessor = ParquetDBIndexingAccessor(db_dir=configuration.db_dir, read_only=True)
 
-        datapaths = [x.fullPath for x in dbaccessor.read_index_files_for_filenames(filenames=names)]
+        datapaths = cls._plan_datapaths(
+            dbaccessor=dbaccessor,
+            processing_states=dbaccessor.read_index_files_for_filenames(filenames=names),
+            forms_filter=forms_filter, stmt_filter=stmt_filter)
         return ZipCollector(datapaths=datapaths,
                             forms_filter=forms_filter,
                             stmt_filter=stmt_filter,
@@ -126,12 +136,12 @@ class ZipCollector:
         if configuration is None:
             configuration = ConfigurationManager.read_config_file()
 
-        dbaccessor = ParquetDBIndexingAccessor(db_dir=configuration.db_dir)
+        dbaccessor = ParquetDBIndexingAccessor(db_dir=configuration.db_dir, read_only=True)
 
-        # exclude 2009q1.zip, since this is empty and causes and error when it is read
-        # with a filter
-        datapaths = [x.fullPath for x in dbaccessor.read_all_indexfileprocessing()
-                     if not x.fullPath.endswith("2009q1.zip")]
+        datapaths = cls._plan_datapaths(
+            dbaccessor=dbaccessor,
+            processing_states=dbaccessor.read_all_indexfileprocessing(),
+            forms_filter=forms_filter, stmt_filter=stmt_filter)
 
         return ZipCollector(datapaths=datapaths,
                             forms_filter=forms_filter,
@@ -139,6 +149,46 @@ class ZipCollector:
                             tag_filter=tag_filter,
                             post_load_filter=post_load_filter)
 
+    @staticmethod
+    def _plan_datapaths(dbaccessor: ParquetDBIndexingAccessor,
+                        processing_states: List[IndexFileProcessingState],
+                        forms_filter: Optional[List[str]],
+                        stmt_filter: Optional[List[str]]) -> List[str]:
+        """
+        returns the datapaths of the zip files that can contain data for the filters, ordered
+        by their size, largest first. Empty zip files are always skipped, since they cause an
+        error when they are read with a filter. Zip files without statistics (indexed by an
+        older version) are never skipped and read last.
+        """
+        stats_df = dbaccessor.read_zip_stats_df()
+        file_names = [state.fileName for state in processing_states]
+        stats_df = stats_df[stats_df.fileName.isin(file_names)]
+
+        def sum_per_file(category: str, keys: Optional[List[str]] = None) -> pd.Series:
+            category_df = stats_df[stats_df.category == category]
+            if keys:
+                category_df = category_df[category_df.key.isin(keys)]
+            return category_df.groupby('fileName').value.sum()
+
+        with_stats = set(stats_df.fileName)
+        sizes = sum_per_file('bytes')
+
+        candidates = [state for state in processing_states if state.entries > 0]
+        planned = candidates
+        for category, keys in [('form', forms_filter), ('stmt', stmt_filter)]:
+            if keys:
+                rows = sum_per_file(category, keys)
+                planned = [state for state in planned
+                           if state.fileName not in with_stats or rows.get(state.fileName, 0) > 0]
+
+        if len(planned) == 0 and len(candidates) > 0:
+            # keep one zip file, so that the result is an empty bag with the usual columns
+            planned = candidates[:1]
+        LOGGER.info("reading %d of %d zip files", len(planned), len(processing_states))
+
+        planned = sorted(planned, key=lambda state: sizes.get(state.fileName, -1), reverse=True)
+        return [state.fullPath for state in planned]
+
     def __init__(self,
                  datapaths: List[str],
                  forms_filter: Optional[List[str]] = None,
@@ -152,28 +202,13 @@ class ZipCollector:
         self.tag_filter = tag_filter
         self.post_load_filter = post_load_filter
 
-    def _multi_zipcollect(self) -> RawDataBag:
-
+    def _execute(self, process_element: Callable[[str], Any]) -> List[Any]:
         datapaths: List[str] = self.datapaths
 
         def get_entries() -> List[str]:
             return datapaths
 
-        def process_element(datapath: str) -> RawDataBag:
-            LOGGER.info("processing %s", datapath)
-            collector = BaseCollector(datapath=datapath,
-                                      stmt_filter=self.stmt_filter,
-                                      tag_filter=self.tag_filter)
-
-            sub_filter = ('form', 'in', self.forms_filter) if self.forms_filter else None
-
-            rawdatabag = collector.basecollect(sub_df_filter=sub_filter)
-
-            if self.post_load_filter is not None:
-                rawdatabag = self.post_load_filter(rawdatabag)
-            return rawdatabag
-
-        def post_process(parts: List[RawDataBag]) -> List[RawDataBag]:
+        def post_process(parts: List[Any]) -> List[Any]:
             # do nothing
             return parts
 
@@ -188,10 +223,44 @@ class ZipCollector:
         executor.set_post_process_chunk_function(post_process)
 
         # we ignore the missing, since get_entries always returns the whole list
-        collected_reports: List[RawDataBag]
-        collected_reports, _ = executor.execute()
+        collected, _ = executor.execute()
+        return collected
+
+    def _get_sub_filter(self):
+        return ('form', 'in', self.forms_filter) if self.forms_filter else None
+
+    def _multi_zipcollect(self) -> RawDataBag:
+
+        def process_element(datapath: str) -> RawDataBag:
+            LOGGER.info("processing %s", datapath)
+            collector = BaseCollector(datapath=datapath,
+                                      stmt_filter=self.stmt_filter,
+                                      tag_filter=self.tag_filter)
+
+            rawdatabag = collector.basecollect(sub_df_filter=self._get_sub_filter())
+
+            if self.post_load_filter is not None:
+                rawdatabag = self.post_load_filter(rawdatabag)
+            return rawdatabag
+
+        return RawDataBag.concat(self._execute(process_element))
+
+    def _multi_zipcollect_joined(self) -> JoinedDataBag:
+
+        def process_element(datapath: str) -> JoinedDataBag:
+            LOGGER.info("processing %s", datapath)
+            collector = BaseCollector(datapath=datapath,
+                                      stmt_filter=self.stmt_filter,
+                                      tag_filter=self.tag_filter)
+
+            # the post_load_filter works on the raw data, so the data has to be joined here
+            if self.post_load_filter is not None:
+                rawdatabag = collector.basecollect(sub_df_filter=self._get_sub_filter())
+                return self.post_load_filter(rawdatabag).join()
 
-        return RawDataBag.concat(collected_reports)
+            return collector.basecollect_joined(sub_df_filter=self._get_sub_filter())
+
+        return JoinedDataBag.concat(self._execute(process_element))
 
     def collect(self) -> RawDataBag:
         """
@@ -201,3 +270,14 @@ class ZipCollector:
             RawDataBag: the collected Data
         """
         return self._multi_zipcollect()
+
+    def collect_joined(self) -> JoinedDataBag:
+        """
+        collects the data and returns it as JoinedDataBag. This is the same as calling
+        collect().join(), but reads the joined data directly from the pre_num.txt files,
+        if they were materialized when the data was transformed.
+
+        Returns:
+            JoinedDataBag: the collected and joined Data
+        """
+        return self._multi_zipcollect_joined()
@@ -3,7 +3,9 @@ This module contains some basic filter implementations on the JoinedDataBag.
 
 Note: the filters don't create new copies of the pandas dataset
 """
-from typing import List
+from typing import List, Optional
+
+import pandas as pd
 
 from secfsdstools.a_utils.basic import calculate_previous_period
 from secfsdstools.d_container.databagmodel import JoinedDataBag
@@ -149,6 +151,34 @@ class TagJoinedFilter(FilterBase[JoinedDataBag]):
                                     pre_num_df=pre_num_filtered_for_tags)
 
 
+class TagIdJoinedFilter(FilterBase[JoinedDataBag]):
+    """
+    Filters the data by a list of tag_ids (see tagdimension module). In contrast to the
+    TagJoinedFilter, the tag_id also identifies the version of the tag and the filter compares
+    integers instead of strings. This filter operates on the pre_num_df, which has to contain
+    the tag_id column.
+    """
+
+    def __init__(self, tag_ids: List[int]):
+        self.tag_ids = tag_ids
+
+    def filter(self, databag: JoinedDataBag) -> JoinedDataBag:
+        """
+        filters the databag so that only datapoints are contained which have a tag_id
+        that is in the provided list.
+        Args:
+            databag(JoinedDataBag) : databag to apply the filter to
+
+        Returns:
+            JoinedDataBag: the databag with the filtered data
+        """
+        pre_num_filtered_for_tags = \
+            databag.pre_num_df[databag.pre_num_df.tag_id.isin(self.tag_ids)]
+
+        return JoinedDataBag.create(sub_df=databag.sub_df,
+                                    pre_num_df=pre_num_filtered_for_tags)
+
+
 class MainCoregJoinedFilter(FilterBase[JoinedDataBag]):
     """
     Filters only for the main coreg entries (coreg == '')
@@ -175,8 +205,20 @@ class OfficialTagsOnlyJoinedFilter(FilterBase[JoinedDataBag]):
     Filters only the official tags. These are the tags that contain an official XBRL version
     within the version column. "inofficial" (resp. company specific) tags are identified with
     the version column containing the value of the adsh.
+
+    If the tag dimension (see tagdimension module) is provided and the data contains the
+    tag_id column, the custom tags are identified with the custom flag of the tag dimension.
     """
 
+    def __init__(self, tag_dimension_df: Optional[pd.DataFrame] = None):
+        """
+        Args:
+            tag_dimension_df (pd.DataFrame, optional, None): the tag dimension, as returned by
+                read_tag_dimension, only the columns tag_id and custom are needed
+        """
+        self.custom_tag_ids = None if tag_dimension_df is None else \
+            tag_dimension_df.tag_id[tag_dimension_df.custom == 1].to_numpy()
+
     def filter(self, databag: JoinedDataBag) -> JoinedDataBag:
         """
         filters the databag so that official tags are contained.
@@ -187,8 +229,12 @@ class OfficialTagsOnlyJoinedFilter(FilterBase[JoinedDataBag]):
         Returns:
             JoinedDataBag: the databag with the filtered data
         """
-        pre_num_filtered_for_tags = databag.pre_num_df[
-            databag.pre_num_df.version.isin(databag.sub_df.adsh)]
+        if (self.custom_tag_ids is not None) and ('tag_id' in databag.pre_num_df.columns):
+            pre_num_filtered_for_tags = databag.pre_num_df[
+                ~databag.pre_num_df.tag_id.isin(self.custom_tag_ids)]
+        else:
+            pre_num_filtered_for_tags = databag.pre_num_df[
+                databag.pre_num_df.version.isin(databag.sub_df.adsh)]
 
         return JoinedDataBag.create(sub_df=databag.sub_df,
                                     pre_num_df=pre_num_filtered_for_tags)
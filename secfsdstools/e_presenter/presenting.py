@@ -63,7 +63,9 @@ class StandardStatementPresenter(Presenter[JoinedDataBag]):
             index=['adsh', 'coreg', 'tag', 'version', 'stmt',
                    'report', 'line', 'uom', 'negating', 'inpth'],
             columns='ddate',
-            values='value'
+            values='value',
+            # only relevant for categorical columns: don't create rows for all combinations
+            observed=True
         )
 
         # some cleanup and ordering
@@ -126,11 +126,11 @@ def read_all_zip_names() -> List[str]:
         List[str]: list with the names of the available zip files
     """
     configuration = ConfigurationManager.read_config_file()
-    dbaccessor = ParquetDBIndexingAccessor(db_dir=configuration.db_dir)
+    dbaccessor = ParquetDBIndexingAccessor(db_dir=configuration.db_dir, read_only=True)
 
-    # exclude 2009q1.zip, since this is empty and causes an error when it is read with a filter
-    return [x.fileName for x in dbaccessor.read_all_indexfileprocessing() if
-            not x.fullPath.endswith("2009q1.zip")]
+    # exclude empty zip files (like 2009q1.zip), since they cause an error when they are
+    # read with a filter
+    return [x.fileName for x in dbaccessor.read_all_indexfileprocessing() if x.entries > 0]
 
 
 def build_tmp_set(financial_statement: str,
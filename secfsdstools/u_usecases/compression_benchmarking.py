@@ -0,0 +1,136 @@
+"""
+Benchmarks the compression codecs for the parquet files.
+
+A sample zip file is transformed with every compression codec. For every codec, the size of
+the parquet files, the time to transform the zip file, and the time to read the data with a
+typical ZipCollector query (balance sheets of 10-K and 10-Q reports) are reported.
+
+```
+python -m secfsdstools.u_usecases.compression_benchmarking <path-to-a-zip-file>
+```
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from secfsdstools.a_utils.parquetutils import COMPRESSION_LZ4, COMPRESSION_NONE, \
+    COMPRESSION_SNAPPY, COMPRESSION_ZSTD
+from secfsdstools.c_transform.parquetschema import SCHEMA_VERSION_LEGACY
+from secfsdstools.c_transform.toparquettransforming import ToParquetTransformer
+from secfsdstools.e_collector.zipcollecting import ZipCollector
+
+DEFAULT_CODECS: List[Tuple[str, Optional[int]]] = [(COMPRESSION_NONE, None),
+                                                   (COMPRESSION_SNAPPY, None),
+                                                   (COMPRESSION_LZ4, None),
+                                                   (COMPRESSION_ZSTD, 1),
+                                                   (COMPRESSION_ZSTD, 3),
+                                                   (COMPRESSION_ZSTD, 9)]
+
+
+def _get_dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, file))
+               for root, _, files in os.walk(path) for file in files)
+
+
+def _time_read(datapath: str, forms_filter: List[str], stmt_filter: List[str],
+               repetitions: int) -> float:
+    durations: List[float] = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        ZipCollector(datapaths=[datapath],
+                     forms_filter=forms_filter,
+                     stmt_filter=stmt_filter).collect()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def _benchmark_codec(zip_dir: str, parquet_dir: str, compression: str,
+                     compression_level: Optional[int], schema_version: int,
+                     read_function: Callable[[str], float]) -> Dict[str, Any]:
+    os.makedirs(os.path.join(parquet_dir, 'quarter'))
+
+    transformer = ToParquetTransformer(zip_dir=zip_dir,
+                                       parquet_dir=parquet_dir,
+                                       file_type='quarter',
+                                       keep_zip_files=True,
+                                       schema_version=schema_version,
+                                       compression=compression,
+                                       compression_level=compression_level)
+    start = time.perf_counter()
+    transformer.process()
+    write_seconds = time.perf_counter() - start
+
+    datapath = os.path.join(parquet_dir, 'quarter', os.listdir(zip_dir)[0])
+    return {'compression': compression,
+            'compression_level': compression_level,
+            'size_mb': _get_dir_size(datapath) / (1024 * 1024),
+            'write_seconds': write_seconds,
+            'read_seconds': read_function(datapath)}
+
+
+def benchmark_compression(zip_file: str,
+                          codecs: Optional[List[Tuple[str, Optional[int]]]] = None,
+                          forms_filter: Optional[List[str]] = None,
+                          stmt_filter: Optional[List[str]] = None,
+                          schema_version: int = SCHEMA_VERSION_LEGACY,
+                          read_repetitions: int = 3,
+                          work_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    transforms the zip_file with every codec and measures size, write and read time.
+
+    Args:
+        zip_file (str): path to the zip file that is used for the benchmark
+        codecs (List[Tuple[str, Optional[int]]], optional, None): list with the compression
+            codecs and levels to benchmark. If not set, DEFAULT_CODECS are used.
+        forms_filter (List[str], optional, None): the forms to read, default is 10-K and 10-Q
+        stmt_filter (List[str], optional, None): the stmts to read, default is BS
+        schema_version (int, optional, 1): the schema version of the parquet files
+        read_repetitions (int, optional, 3): the read time is the fastest of these repetitions
+        work_dir (str, optional, None): directory for the temporary files.
+
+    Returns:
+        pd.DataFrame: one row per codec with the columns compression, compression_level,
+            size_mb, write_seconds (time to transform the zip file), and read_seconds
+    """
+    if codecs is None:
+        codecs = DEFAULT_CODECS
+    if forms_filter is None:
+        forms_filter = ['10-K', '10-Q']
+    if stmt_filter is None:
+        stmt_filter = ['BS']
+
+    def read_function(datapath: str) -> float:
+        return _time_read(datapath=datapath, forms_filter=forms_filter,
+                          stmt_filter=stmt_filter, repetitions=read_repetitions)
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        zip_dir = os.path.join(tmp_dir, 'zip')
+        os.makedirs(zip_dir)
+        shutil.copy(zip_file, zip_dir)
+
+        for compression, compression_level in codecs:
+            results.append(_benchmark_codec(
+                zip_dir=zip_dir,
+                parquet_dir=os.path.join(tmp_dir, f'{compression}_{compression_level}'),
+                compression=compression,
+                compression_level=compression_level,
+                schema_version=schema_version,
+                read_function=read_function))
+
+    results_df = pd.DataFrame(results)
+    results_df['compression_level'] = results_df['compression_level'].astype('Int64')
+    return results_df
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("usage: python -m secfsdstools.u_usecases.compression_benchmarking <zip-file>")
+        sys.exit(1)
+
+    print(benchmark_compression(zip_file=sys.argv[1]).to_string(index=False))
@@ -0,0 +1,194 @@
+"""
+Benchmarks the lookup of reports by cik and the search of companies by name in the sqlite index.
+
+A temporary index db is filled with synthetic reports. The time of a cik lookup
+(as done by ParquetDBIndexingAccessor.read_index_reports_for_ciks) is measured once with the
+secondary indexes and once after the indexes were dropped, which corresponds to the
+state of an index db before the V5 migration.
+
+The time of a company search by name is measured once with the full text index on the
+company table and once with the like query over all reports that was used before.
+
+```
+python -m secfsdstools.u_usecases.index_benchmarking [<number-of-reports>]
+```
+"""
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from secfsdstools.b_setup.setupdb import DbCreator
+from secfsdstools.c_index.indexdataaccess import IndexFileProcessingState, \
+    ParquetDBIndexingAccessor
+
+INDEX_NAMES = ['idx_parquet_reports_cik', 'idx_parquet_reports_cik_form_period',
+               'idx_parquet_reports_filed', 'idx_parquet_reports_name']
+
+FORMS = ['10-K', '10-Q', '8-K', '20-F']
+
+NAME_WORDS = ['apple', 'micro', 'global', 'energy', 'capital', 'bank', 'pharma', 'tech',
+              'resources', 'holdings', 'partners', 'industries', 'systems', 'american',
+              'first', 'united', 'financial', 'group', 'trust', 'realty']
+
+
+def _create_company_name(cik: int) -> str:
+    rand = random.Random(cik)
+    return f"{' '.join(rand.sample(NAME_WORDS, 2))} {cik} inc".upper()
+
+
+def _create_reports_df(nr_of_reports: int, nr_of_companies: int, seed: int) -> pd.DataFrame:
+    rand = random.Random(seed)
+    ciks = [rand.randrange(1, nr_of_companies + 1) for _ in range(nr_of_reports)]
+    return pd.DataFrame({
+        'adsh': [f'0000000000-00-{i:09d}' for i in range(nr_of_reports)],
+        'cik': ciks,
+        'name': [_create_company_name(cik) for cik in ciks],
+        'form': [rand.choice(FORMS) for _ in range(nr_of_reports)],
+        'filed': [rand.randrange(20090101, 20231231) for _ in range(nr_of_reports)],
+        'period': [rand.randrange(20090101, 20231231) for _ in range(nr_of_reports)],
+        'fullPath': '',
+        'originFile': 'benchmark.zip',
+        'originFileType': 'quarter',
+        'url': ''})
+
+
+def _time_lookups(conn: sqlite3.Connection, table_name: str, ciks: List[int]) -> float:
+    sql = f'SELECT * FROM {table_name} WHERE cik in (?) ORDER BY period DESC'
+    start = time.perf_counter()
+    for cik in ciks:
+        conn.execute(sql, (cik,)).fetchall()
+    return (time.perf_counter() - start) / len(ciks)
+
+
+def _fill_index(db_dir: str, reports_df: pd.DataFrame) -> float:
+    DbCreator(db_dir=db_dir).create_db()
+    accessor = ParquetDBIndexingAccessor(db_dir=db_dir)
+
+    start = time.perf_counter()
+    accessor.add_index_report(reports_df,
+                              IndexFileProcessingState(fileName='benchmark.zip', fullPath='',
+                                                       status='processed',
+                                                       entries=len(reports_df),
+                                                       processTime=''))
+    return time.perf_counter() - start
+
+
+def _run_benchmark(db_dir: str, reports_df: pd.DataFrame, lookup_ciks: List[int]) \
+        -> Tuple[float, float, float]:
+    insert_seconds = _fill_index(db_dir=db_dir, reports_df=reports_df)
+    accessor = ParquetDBIndexingAccessor(db_dir=db_dir)
+    table_name = ParquetDBIndexingAccessor.index_reports_table
+
+    conn = accessor.get_connection()
+    try:
+        with_indexes = _time_lookups(conn, table_name, lookup_ciks)
+        for index_name in INDEX_NAMES:
+            conn.execute(f'DROP INDEX IF EXISTS {index_name}')
+        without_indexes = _time_lookups(conn, table_name, lookup_ciks)
+    finally:
+        conn.close()
+    return insert_seconds, with_indexes, without_indexes
+
+
+def benchmark_cik_lookup(nr_of_reports: int = 300_000,
+                         nr_of_companies: int = 20_000,
+                         nr_of_lookups: int = 200,
+                         seed: int = 42,
+                         work_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    measures the average time of a cik lookup with and without the secondary indexes.
+
+    Args:
+        nr_of_reports (int, optional, 300000): the number of synthetic reports in the index
+        nr_of_companies (int, optional, 20000): the number of distinct ciks
+        nr_of_lookups (int, optional, 200): the number of measured lookups
+        seed (int, optional, 42): seed of the random generator
+        work_dir (str, optional, None): directory for the temporary db
+
+    Returns:
+        pd.DataFrame: one row per variant with the columns indexes, insert_seconds
+            (only for the variant with indexes), and lookup_micros (average time of a lookup)
+    """
+    reports_df = _create_reports_df(nr_of_reports=nr_of_reports,
+                                    nr_of_companies=nr_of_companies, seed=seed)
+    rand = random.Random(seed)
+    lookup_ciks = [rand.randrange(1, nr_of_companies + 1) for _ in range(nr_of_lookups)]
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        insert_seconds, with_indexes, without_indexes = _run_benchmark(
+            db_dir=tmp_dir, reports_df=reports_df, lookup_ciks=lookup_ciks)
+
+    return pd.DataFrame([
+        {'indexes': True, 'insert_seconds': insert_seconds,
+         'lookup_micros': with_indexes * 1_000_000},
+        {'indexes': False, 'insert_seconds': None,
+         'lookup_micros': without_indexes * 1_000_000}])
+
+
+def _time_like_search(accessor: ParquetDBIndexingAccessor, name_part: str) -> float:
+    # the search that was used before the company table existed
+    sql = f"""SELECT DISTINCT name, cik FROM {ParquetDBIndexingAccessor.index_reports_table}
+              WHERE name like ? ORDER BY name"""
+    start = time.perf_counter()
+    accessor.execute_read_as_df(sql, (f'%{name_part}%',))
+    return time.perf_counter() - start
+
+
+def benchmark_name_search(nr_of_reports: int = 300_000,
+                          nr_of_companies: int = 20_000,
+                          name_parts: Optional[List[str]] = None,
+                          limit: int = 10,
+                          repetitions: int = 20,
+                          seed: int = 42,
+                          work_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    measures the average time of a company search by name with the full text index and
+    with the like query over all reports.
+
+    Args:
+        nr_of_reports (int, optional, 300000): the number of synthetic reports in the index
+        nr_of_companies (int, optional, 20000): the number of distinct ciks
+        name_parts (List[str], optional, None): the searched names, default are a
+            selective, a prefix, and a common search
+        limit (int, optional, 10): the maximal number of results of the full text search
+        repetitions (int, optional, 20): the number of measured searches per name
+        seed (int, optional, 42): seed of the random generator
+        work_dir (str, optional, None): directory for the temporary db
+
+    Returns:
+        pd.DataFrame: one row per name with the columns name_part, fts_micros, and
+            like_micros (average time of a search)
+    """
+    if name_parts is None:
+        name_parts = ['apple micro 1234', 'pharm', 'inc']
+    reports_df = _create_reports_df(nr_of_reports=nr_of_reports,
+                                    nr_of_companies=nr_of_companies, seed=seed)
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        _fill_index(db_dir=tmp_dir, reports_df=reports_df)
+        accessor = ParquetDBIndexingAccessor(db_dir=tmp_dir)
+        accessor.has_company_fts()
+
+        for name_part in name_parts:
+            start = time.perf_counter()
+            for _ in range(repetitions):
+                accessor.find_company_by_name(name_part=name_part, limit=limit)
+            fts_seconds = (time.perf_counter() - start) / repetitions
+            like_seconds = _time_like_search(accessor=accessor, name_part=name_part)
+            results.append({'name_part': name_part,
+                            'fts_micros': fts_seconds * 1_000_000,
+                            'like_micros': like_seconds * 1_000_000})
+
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    reports = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    print(benchmark_cik_lookup(nr_of_reports=reports).to_string(index=False))
+    print(benchmark_name_search(nr_of_reports=reports).to_string(index=False))
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from secfsdstools.a_utils.dataframeutils import concat_dataframes, sort_categories, \
+    unify_categories
+
+
+def test_sort_categories():
+    data_df = pd.DataFrame({'cat': pd.Categorical(['b', 'a', 'b'], categories=['b', 'a']),
+                            'val': [1, 2, 3]})
+    assert data_df.cat.cat.categories.tolist() == ['b', 'a']
+
+    sort_categories(data_df)
+
+    assert data_df.cat.cat.categories.tolist() == ['a', 'b']
+    assert data_df.cat.tolist() == ['b', 'a', 'b']
+
+
+def test_unify_categories():
+    df1 = pd.DataFrame({'cat': pd.Categorical(['b', 'a'], categories=['b', 'a']), 'obj': ['x', 'y']})
+    df2 = pd.DataFrame({'cat': pd.Series(['c'], dtype='category'), 'obj': ['z']})
+
+    unified1, unified2 = unify_categories([df1, df2])
+
+    assert unified1.cat.cat.categories.tolist() == ['a', 'b', 'c']
+    assert unified2.cat.cat.categories.tolist() == ['a', 'b', 'c']
+    assert unified1.cat.tolist() == ['b', 'a']
+
+    # the original dataframes are not changed
+    assert df1.cat.cat.categories.tolist() == ['b', 'a']
+
+
+def test_concat_dataframes():
+    df1 = pd.DataFrame({'cat': pd.Categorical(['b', 'a'], categories=['b', 'a']), 'obj': ['x', 'y']})
+    df2 = pd.DataFrame({'cat': pd.Series(['c'], dtype='category'), 'obj': ['z']})
+    df3 = pd.DataFrame({'cat': ['d'], 'obj': ['z']})
+
+    concatenated = concat_dataframes([df1, df2])
+    assert concatenated.cat.dtype == 'category'
+    assert concatenated.cat.tolist() == ['b', 'a', 'c']
+    assert concatenated.index.tolist() == [0, 1, 2]
+
+    # if a column is not categorical in all dataframes, it becomes an object column
+    concatenated = concat_dataframes([df1, df3])
+    assert concatenated.cat.dtype == object
@@ -1,8 +1,12 @@
+import sqlite3
+import threading
 from dataclasses import dataclass
 
+import numpy as np
+import pandas as pd
 import pytest
 
-from secfsdstools.a_utils.dbutils import DB, DBStateAcessor
+from secfsdstools.a_utils.dbutils import DB, DBStateAcessor, close_all_connections
 
 sql_create = """
     CREATE TABLE IF NOT EXISTS testtable1
@@ -108,6 +112,37 @@ def test_insert_dataclass(db: DB):
     assert insert_sql == "INSERT INTO testtable1 ('col1', 'col2') VALUES ('col1', 123)"
 
 
+def test_insert_parameterized_dataclass(db: DB):
+    @dataclass
+    class Row:
+        col1: str
+        col2: int
+
+    with db.get_connection() as conn:
+        db.execute_single(sql_create, conn)
+
+    sql, params = db.create_parameterized_insert_for_dataclass(table_name='testtable1',
+                                                               data=Row(col1="it's", col2=123))
+    assert sql == "INSERT INTO testtable1 ('col1', 'col2') VALUES (?, ?)"
+    assert params == ("it's", 123)
+
+    with db.get_connection() as conn:
+        db.execute_single(sql, conn, params)
+    assert db.execute_fetchall("SELECT * FROM testtable1") == [("it's", 123)]
+
+
+def test_append_df_to_table(db: DB):
+    with db.get_connection() as conn:
+        db.execute_single(sql_create, conn)
+
+    data_df = pd.DataFrame({'col1': ['a', None, 'c'],
+                            'col2': np.array([1, 2, 3], dtype=np.int64)})
+    with db.get_connection() as conn:
+        db.append_df_to_table(table_name='testtable1', dataframe=data_df, conn=conn)
+
+    assert db.execute_fetchall("SELECT * FROM testtable1") == [('a', 1), (None, 2), ('c', 3)]
+
+
 # --- Testing DBStateAccessor
 def test_insert_and_overwrite(dbstatus: DBStateAcessor):
     key = 'key1'
@@ -126,3 +161,41 @@ def test_insert_and_overwrite(dbstatus: DBStateAcessor):
 
     # read key
     assert dbstatus.get_key(key=key) == 'value2'
+
+
+def test_cached_connection(db):
+    with db.get_connection() as conn:
+        db.execute_single(sql_create, conn)
+
+    conn = db.get_cached_connection()
+    assert db.get_cached_connection() is conn
+    assert conn.execute("PRAGMA mmap_size").fetchone()[0] > 0
+
+    # every thread has its own connection
+    thread_conns = []
+    thread = threading.Thread(target=lambda: thread_conns.append(db.get_cached_connection()))
+    thread.start()
+    thread.join()
+    assert thread_conns[0] is not conn
+
+    # the cached connection sees the changes that were written with another connection
+    with db.get_connection() as write_conn:
+        db.execute_single("INSERT INTO testtable1 ('col1', 'col2') VALUES (1, 2)", write_conn)
+    assert db.execute_fetchall("SELECT * FROM testtable1") == [(1, 2)]
+
+    close_all_connections()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert db.get_cached_connection() is not conn
+    assert db.execute_fetchall("SELECT * FROM testtable1") == [(1, 2)]
+
+
+def test_read_only_connection(db):
+    with db.get_connection() as conn:
+        db.execute_single(sql_create, conn)
+
+    read_only_db = DB(db_dir=db.db_dir, read_only=True)
+    assert read_only_db.execute_fetchall("SELECT * FROM testtable1") == []
+    with pytest.raises(sqlite3.OperationalError):
+        read_only_db.get_cached_connection().execute(
+            "INSERT INTO testtable1 ('col1', 'col2') VALUES (1, 2)")
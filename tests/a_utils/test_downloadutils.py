@@ -1,5 +1,14 @@
-from secfsdstools.a_utils.downloadutils import UrlDownloader
 import os
+import pickle
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from secfsdstools.a_utils.downloadutils import UrlDownloader
+from secfsdstools.a_utils.httpcacheutils import HttpMetadataCache
 
 test_download_url = 'https://www.sec.gov/dera/data/financial-statement-data-sets.html'
 
@@ -27,3 +36,313 @@ def test_download_to_zip():
     finally:
         if written_file:
             os.remove(written_file)
+
+
+CONTENT = bytes(range(256)) * 400
+
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    """serves CONTENT, supports range requests and can break off the first response"""
+
+    def do_GET(self):
+        state = self.server.state
+        range_header = self.headers.get('Range')
+        state['ranges'].append(range_header)
+        state['if_ranges'].append(self.headers.get('If-Range'))
+
+        start = 0
+        if range_header is not None and state['support_range'] \
+                and self.headers.get('If-Range') == state['etag']:
+            start = int(range_header[len('bytes='):-1])
+            if start >= len(CONTENT):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(CONTENT)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}')
+        else:
+            self.send_response(200)
+        self.send_header('ETag', state['etag'])
+        self.send_header('Content-Length', str(len(CONTENT) - start))
+        self.end_headers()
+
+        if state['break_after'] is not None:
+            # announce the whole content, but send only a part of it
+            self.wfile.write(CONTENT[start:start + state['break_after']])
+            state['break_after'] = None
+            self.close_connection = True
+            return
+        self.wfile.write(CONTENT[start:])
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def range_server():
+    server = HTTPServer(('127.0.0.1', 0), _RangeHandler)
+    server.state = {'ranges': [], 'if_ranges': [], 'support_range': True, 'break_after': None,
+                    'etag': '"v1"'}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server) -> str:
+    return f'http://127.0.0.1:{server.server_address[1]}/file.zip'
+
+
+def _read(path) -> bytes:
+    with open(path, 'rb') as file_fp:
+        return file_fp.read()
+
+
+def test_binary_download_streamed(range_server, tmp_path):
+    target_file = str(tmp_path / 'file.zip')
+    progress = []
+
+    UrlDownloader('my@test.com').binary_download_url_to_file(
+        _url(range_server), target_file, chunk_size=10_000,
+        progress_callback=lambda written, total: progress.append((written, total)))
+
+    assert _read(target_file) == CONTENT
+    assert not os.path.exists(target_file + '.part')
+    assert len(progress) == 11
+    assert progress[-1] == (len(CONTENT), len(CONTENT))
+    assert range_server.state['ranges'] == [None]
+
+
+def test_binary_download_resumes_after_interruption(range_server, tmp_path):
+    target_file = str(tmp_path / 'file.zip')
+    range_server.state['break_after'] = 30_000
+
+    UrlDownloader('my@test.com').binary_download_url_to_file(
+        _url(range_server), target_file, sleep_time=0, chunk_size=10_000)
+
+    assert _read(target_file) == CONTENT
+    assert range_server.state['ranges'] == [None, 'bytes=30000-']
+    assert range_server.state['if_ranges'] == [None, '"v1"']
+    assert not os.path.exists(target_file + '.part.validator')
+
+
+def _write_part_file(target_file: str, content: bytes, validator=None):
+    with open(target_file + '.part', 'wb') as part_fp:
+        part_fp.write(content)
+    if validator is not None:
+        with open(target_file + '.part.validator', 'w', encoding='utf-8') as validator_fp:
+            validator_fp.write(validator)
+
+
+def test_binary_download_resumes_existing_part_file(range_server, tmp_path):
+    target_file = str(tmp_path / 'file.zip')
+    _write_part_file(target_file, CONTENT[:50_000], validator='"v1"')
+
+    UrlDownloader('my@test.com').binary_download_url_to_file(_url(range_server), target_file)
+
+    assert _read(target_file) == CONTENT
+    assert range_server.state['ranges'] == ['bytes=50000-']
+    assert range_server.state['if_ranges'] == ['"v1"']
+
+
+def test_binary_download_restarts_part_file_without_validator(range_server, tmp_path):
+    target_file = str(tmp_path / 'file.zip')
+    _write_part_file(target_file, b'garbage')
+
+    UrlDownloader('my@test.com').binary_download_url_to_file(_url(range_server), target_file)
+
+    assert _read(target_file) == CONTENT
+    assert range_server.state['ranges'] == [None]
+
+
+def test_binary_download_restarts_if_file_changed(range_server, tmp_path):
+    target_file = str(tmp_path / 'file.zip')
+    # the part file belongs to an older version of the file on the server
+    _write_part_file(target_file, b'garbage', validator='"v0"')
+
+    UrlDownloader('my@test.com').binary_download_url_to_file(_url(range_server), target_file)
+
+    assert _read(target_file) == CONTENT
+    assert range_server.state['ranges'] == ['bytes=7-']
+    assert range_server.state['if_ranges'] == ['"v0"']
+
+
+def test_binary_download_restarts_if_range_not_satisfiable(range_server, tmp_path):
+    target_file = str(tmp_path / 'file.zip')
+    _write_part_file(target_file, CONTENT + b'garbage', validator='"v1"')
+
+    with patch.object(requests.models.Response, 'close', autospec=True,
+                      side_effect=requests.models.Response.close) as close_mock:
+        UrlDownloader('my@test.com').binary_download_url_to_file(_url(range_server),
+                                                                 target_file)
+
+    assert _read(target_file) == CONTENT
+    assert range_server.state['ranges'] == [f'bytes={len(CONTENT) + 7}-', None]
+    # the 416 response is closed as well
+    assert 416 in [call.args[0].status_code for call in close_mock.call_args_list]
+
+
+def test_binary_download_without_range_support(range_server, tmp_path):
+    target_file = str(tmp_path / 'file.zip')
+    range_server.state['support_range'] = False
+    _write_part_file(target_file, b'garbage', validator='"v1"')
+
+    UrlDownloader('my@test.com').binary_download_url_to_file(_url(range_server), target_file)
+
+    assert _read(target_file) == CONTENT
+    assert range_server.state['ranges'] == ['bytes=7-']
+
+
+class _ListingHandler(BaseHTTPRequestHandler):
+    """serves a listing with an ETag and answers conditional requests with 304"""
+
+    def do_GET(self):
+        state = self.server.state
+        state['requests'].append(self.headers.get('If-None-Match'))
+        if self.headers.get('If-None-Match') == state['etag']:
+            self.send_response(304)
+            self.end_headers()
+            return
+        content = state['content'].encode('utf-8')
+        self.send_response(200)
+        self.send_header('ETag', state['etag'])
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def listing_server():
+    server = HTTPServer(('127.0.0.1', 0), _ListingHandler)
+    server.state = {'requests': [], 'etag': '"v1"', 'content': 'a,b'}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_url_content_cached(listing_server, tmp_path):
+    url = f'http://127.0.0.1:{listing_server.server_address[1]}/list'
+    cache = HttpMetadataCache(str(tmp_path / 'cache'))
+    downloader = UrlDownloader('my@test.com')
+    parsed = []
+
+    def parse(response):
+        parsed.append(response.text)
+        return response.text.split(',')
+
+    assert downloader.get_url_content_cached(url, parse=parse, cache=cache) == (['a', 'b'], True)
+    # not modified: the content comes from the cache and is not parsed again, the response
+    # is closed nevertheless
+    with patch.object(requests.models.Response, 'close', autospec=True,
+                      side_effect=requests.models.Response.close) as close_mock:
+        assert downloader.get_url_content_cached(url, parse=parse, cache=cache) == \
+               (['a', 'b'], False)
+    assert [call.args[0].status_code for call in close_mock.call_args_list] == [304]
+    assert parsed == ['a,b']
+
+    listing_server.state['etag'] = '"v2"'
+    listing_server.state['content'] = 'a,b,c'
+    assert downloader.get_url_content_cached(url, parse=parse, cache=cache) == \
+           (['a', 'b', 'c'], True)
+    assert listing_server.state['requests'] == [None, '"v1"', '"v1"']
+
+    # without a cache, the content is always downloaded
+    assert downloader.get_url_content_cached(url, parse=parse) == (['a', 'b', 'c'], True)
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    """answers with keep alive connections and records the client port of every request"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.state['clients'].append(self.client_address)
+        self.server.state['user_agents'].append(self.headers.get('User-Agent'))
+        status = 503 if self.path == '/unavailable' else 200
+        content = b'ok'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def keepalive_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+    server.state = {'clients': [], 'user_agents': []}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_connections_are_reused(keepalive_server, tmp_path):
+    base_url = f'http://127.0.0.1:{keepalive_server.server_address[1]}'
+    downloader = UrlDownloader('my@test.com')
+    headers = {'X-Test': 'a'}
+
+    for i in range(5):
+        assert downloader.get_url_content(f'{base_url}/{i}', headers=headers).text == 'ok'
+    downloader.binary_download_url_to_file(f'{base_url}/file.zip', str(tmp_path / 'file.zip'))
+    with pytest.raises(requests.exceptions.HTTPError):
+        downloader.get_url_content(f'{base_url}/unavailable', max_tries=2, sleep_time=0)
+
+    # all requests of the thread used the same connection
+    assert len(set(keepalive_server.state['clients'])) == 1
+    assert set(keepalive_server.state['user_agents']) == {'my@test.com'}
+    # the headers of the caller are not changed
+    assert headers == {'X-Test': 'a'}
+
+    # another thread uses its own session
+    thread = threading.Thread(target=lambda: downloader.get_url_content(f'{base_url}/t').text)
+    thread.start()
+    thread.join()
+    assert len(set(keepalive_server.state['clients'])) == 2
+
+    downloader.close()
+    downloader.get_url_content(f'{base_url}/after_close').text
+    assert len(set(keepalive_server.state['clients'])) == 3
+
+
+def test_rate_limit_per_host():
+    downloader = UrlDownloader('my@test.com', max_calls_per_sec=2)
+    waits = []
+    with patch('secfsdstools.a_utils.parallelexecution.sleep', side_effect=waits.append):
+        for _ in range(3):
+            downloader._wait_for_rate_limit('https://www.sec.gov/files/2023q1.zip')
+        # another host has its own bucket
+        downloader._wait_for_rate_limit('https://rapid.api/daily/20230102.zip')
+    assert waits == [pytest.approx(0.5, abs=0.05), pytest.approx(1.0, abs=0.05)]
+
+    # the buckets are kept, as long as the limit doesn't change
+    downloader.set_max_calls_per_sec(2)
+    with patch('secfsdstools.a_utils.parallelexecution.sleep', side_effect=waits.append):
+        downloader._wait_for_rate_limit('https://www.sec.gov/files/2023q2.zip')
+    assert len(waits) == 3
+
+    downloader.set_max_calls_per_sec(0)
+    with patch('secfsdstools.a_utils.parallelexecution.sleep', side_effect=waits.append):
+        downloader._wait_for_rate_limit('https://www.sec.gov/files/2023q2.zip')
+    assert len(waits) == 3
+
+
+def test_pickle_downloader():
+    downloader = UrlDownloader('my@test.com', pool_size=2, max_calls_per_sec=5)
+    downloader.get_session()
+
+    copy = pickle.loads(pickle.dumps(downloader))
+    assert copy.user_agent == 'my@test.com'
+    assert copy.pool_size == 2
+    assert copy.max_calls_per_sec == 5
+    assert copy.get_session() is not downloader.get_session()
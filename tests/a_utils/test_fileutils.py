@@ -1,8 +1,10 @@
 import os
 
 import numpy as np
+import pyarrow as pa
 
-from secfsdstools.a_utils.fileutils import write_content_to_zip, read_content_from_zip, read_df_from_file_in_zip, get_filenames_in_directory
+from secfsdstools.a_utils.fileutils import write_content_to_zip, read_content_from_zip, read_df_from_file_in_zip, get_filenames_in_directory, \
+    read_df_chunks_from_file_in_zip, read_table_from_file_in_zip, read_table_chunks_from_file_in_zip
 
 CURRENT_DIR, CURRENT_FILE = os.path.split(__file__)
 
@@ -44,6 +46,44 @@ def test_read_df_from_file_in_zip():
     assert len(cik_as_str_df.columns) == 2
 
 
+def test_read_df_chunks_from_file_in_zip():
+    zip_file = CURRENT_DIR + '/../_testdata/zip/2009q3.zip'
+    chunks = list(read_df_chunks_from_file_in_zip(zip_file=zip_file, file_to_extract='sub.txt',
+                                                  chunksize=100, dtype={'cik': str}))
+
+    assert len(chunks) == 5
+    assert sum(len(chunk) for chunk in chunks) == 439
+    assert all(len(chunk.columns) == 36 for chunk in chunks)
+
+
+def test_read_table_from_file_in_zip():
+    zip_file = CURRENT_DIR + '/../_testdata/zip/2009q3.zip'
+    table = read_table_from_file_in_zip(zip_file=zip_file, file_to_extract='sub.txt',
+                                        dtype={'cik': str, 'period': float})
+
+    assert table.num_rows == 439
+    assert table.num_columns == 36
+    assert table.schema.field('cik').type == pa.string()
+    assert table.schema.field('period').type == pa.float64()
+
+    # test reading only certain columns
+    table = read_table_from_file_in_zip(zip_file=zip_file, file_to_extract='sub.txt',
+                                        usecols=['adsh', 'cik'])
+    assert table.num_rows == 439
+    assert table.column_names == ['adsh', 'cik']
+
+
+def test_read_table_chunks_from_file_in_zip():
+    zip_file = CURRENT_DIR + '/../_testdata/zip/2009q3.zip'
+    chunks = list(read_table_chunks_from_file_in_zip(zip_file=zip_file, file_to_extract='num.txt',
+                                                     chunksize=50_000,
+                                                     dtype={'adsh': str, 'value': str}))
+
+    assert len(chunks) > 1
+    assert all(chunk.num_rows >= 50_000 for chunk in chunks[:-1])
+    assert sum(chunk.num_rows for chunk in chunks) == 116671
+
+
 def test_get_filenames_in_directory(tmp_path):
     list_of_zips = get_filenames_in_directory(os.path.join(tmp_path, '*.zip'))
     assert len(list_of_zips) == 0
@@ -0,0 +1,37 @@
+import os
+
+from secfsdstools.a_utils.httpcacheutils import HttpCacheEntry, HttpMetadataCache
+
+
+def test_put_and_get(tmp_path):
+    cache = HttpMetadataCache(str(tmp_path / 'cache'))
+    assert cache.get('https://a.com/list') is None
+
+    entry = HttpCacheEntry(url='https://a.com/list', etag='"abc"',
+                           last_modified='Wed, 21 Oct 2015 07:28:00 GMT',
+                           content=[['2023q1.zip', 'https://a.com/2023q1.zip']])
+    cache.put(entry)
+
+    assert cache.get('https://a.com/list') == entry
+    assert cache.get('https://a.com/other') is None
+    assert entry.get_conditional_headers() == {
+        'If-None-Match': '"abc"', 'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+
+
+def test_conditional_headers_only_for_known_values():
+    entry = HttpCacheEntry(url='u', etag=None, last_modified='Wed, 21 Oct 2015 07:28:00 GMT',
+                           content='')
+    assert entry.get_conditional_headers() == {
+        'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+
+
+def test_unreadable_entry(tmp_path):
+    cache = HttpMetadataCache(str(tmp_path))
+    cache.put(HttpCacheEntry(url='u', etag='"a"', last_modified=None, content=1))
+
+    cache_files = os.listdir(str(tmp_path))
+    assert len(cache_files) == 1
+    with open(os.path.join(str(tmp_path), cache_files[0]), 'w', encoding='utf-8') as file:
+        file.write('{not json')
+
+    assert cache.get('u') is None
@@ -0,0 +1,72 @@
+import os
+
+from secfsdstools.a_utils.manifestutils import MANIFEST_FILE, compute_fingerprint, \
+    compute_sha256, create_manifest, is_transform_completed, read_manifest, source_matches, \
+    write_manifest
+
+
+def test_write_and_read_manifest(tmp_path):
+    zip_file = tmp_path / 'source.zip'
+    zip_file.write_bytes(b'some content')
+
+    manifest = create_manifest(zip_file_path=str(zip_file), schema_version=2)
+    assert manifest.source_sha256 == compute_sha256(str(zip_file))
+    assert not manifest.completed
+
+    write_manifest(str(tmp_path), manifest)
+    assert not os.path.exists(tmp_path / f'{MANIFEST_FILE}.tmp')
+    assert read_manifest(str(tmp_path)) == manifest
+    assert not is_transform_completed(str(tmp_path))
+
+    manifest.completed = True
+    write_manifest(str(tmp_path), manifest)
+    assert is_transform_completed(str(tmp_path))
+
+
+def test_is_transform_completed(tmp_path):
+    # no manifest at all
+    assert is_transform_completed(str(tmp_path))
+
+    # unreadable manifest
+    (tmp_path / MANIFEST_FILE).write_text('{broken')
+    assert read_manifest(str(tmp_path)) is None
+    assert not is_transform_completed(str(tmp_path))
+
+
+def test_source_matches(tmp_path):
+    zip_file = tmp_path / 'source.zip'
+    zip_file.write_bytes(b'some content')
+    manifest = create_manifest(zip_file_path=str(zip_file), schema_version=1)
+    assert source_matches(manifest, str(zip_file))
+
+    # same content, but touched
+    os.utime(zip_file, (0, 0))
+    assert source_matches(manifest, str(zip_file))
+
+    # same size, different content
+    zip_file.write_bytes(b'other content'[:12])
+    assert not source_matches(manifest, str(zip_file))
+
+    zip_file.write_bytes(b'longer content')
+    assert not source_matches(manifest, str(zip_file))
+
+
+def test_compute_fingerprint(tmp_path):
+    target_dir = tmp_path / 'target'
+    target_dir.mkdir()
+    (target_dir / 'sub.txt.parquet').write_bytes(b'abc')
+
+    # without a manifest, the fingerprint depends on the files
+    fingerprint = compute_fingerprint(str(target_dir))
+    assert fingerprint.startswith('stat:')
+    assert compute_fingerprint(str(target_dir)) == fingerprint
+    (target_dir / 'sub.txt.parquet').write_bytes(b'abcd')
+    assert compute_fingerprint(str(target_dir)) != fingerprint
+
+    # with a manifest, it depends on the source zip file and the transformation
+    zip_file = tmp_path / 'source.zip'
+    zip_file.write_bytes(b'some content')
+    manifest = create_manifest(zip_file_path=str(zip_file), schema_version=2)
+    write_manifest(str(target_dir), manifest)
+    assert compute_fingerprint(str(target_dir)) == \
+           f'manifest:{manifest.source_sha256}:{manifest.created}'
@@ -1,6 +1,11 @@
+import asyncio
+import threading
+import time
 from typing import List
 
-from secfsdstools.a_utils.parallelexecution import ParallelExecutor
+import pytest
+
+from secfsdstools.a_utils.parallelexecution import AsyncExecutor, ParallelExecutor, TokenBucket
 
 
 def test_parallelexcution():
@@ -37,3 +42,78 @@ def test_parallelexcution():
 
     assert len(processed) == 500
     assert len(missing) == 0
+
+
+def test_token_bucket():
+    now = [0.0]
+    bucket = TokenBucket(rate=10, capacity=2, clock=lambda: now[0])
+
+    # the first two calls take the tokens of the full bucket
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    # then every token has to be waited for
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)
+
+    # after one second, the bucket is refilled, but only up to its capacity
+    now[0] = 1.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1)
+
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_asyncexecutor_concurrency_and_rate():
+    lock = threading.Lock()
+    running = [0, 0]  # current, max
+    start_times: List[float] = []
+
+    def process_element(entry: int) -> int:
+        with lock:
+            start_times.append(time.monotonic())
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        # one slow element must not hold back the others
+        time.sleep(0.5 if entry == 0 else 0.05)
+        with lock:
+            running[0] -= 1
+        return entry * 2
+
+    entries = list(range(20))
+    was_read = [False]
+
+    def get_entries() -> List[int]:
+        if was_read[0]:
+            return []
+        was_read[0] = True
+        return entries
+
+    executor = AsyncExecutor[int, int, int](processes=3, max_calls_per_sec=40, chunksize=0)
+    executor.set_get_entries_function(get_entries)
+    executor.set_process_element_function(process_element)
+    executor.set_post_process_chunk_function(lambda x: x)
+
+    start = time.monotonic()
+    processed, missing = executor.execute()
+    duration = time.monotonic() - start
+
+    assert processed == [entry * 2 for entry in entries]
+    assert len(missing) == 0
+    assert running[1] == 3
+    # 20 calls with 40 calls per second take at least 19 / 40 seconds
+    assert max(start_times) - min(start_times) >= 19 / 40 - 0.01
+    # with chunks of three, every chunk would wait for its slowest element
+    assert duration < 1.5
+
+
+def test_asyncexecutor_in_running_loop():
+    executor = AsyncExecutor[int, int, int](processes=2, chunksize=0)
+    executor.set_process_element_function(lambda x: x + 1)
+    executor.set_post_process_chunk_function(lambda x: x)
+
+    async def run_in_loop():
+        return executor._execute_parallel([1, 2, 3])
+
+    assert asyncio.run(run_in_loop()) == [2, 3, 4]
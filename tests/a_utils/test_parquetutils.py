@@ -0,0 +1,169 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import os
+
+from secfsdstools.a_utils.parquetutils import get_compression_options, \
+    get_row_groups_validator, locate_row_groups, read_df_with_stats, read_parquet_df, \
+    read_row_groups_df, read_table_with_stats
+
+
+@pytest.fixture
+def parquet_file(tmp_path):
+    table = pa.table({'adsh': [f'adsh{i:02d}' for i in range(40)],
+                      'tag': ['Assets', 'Liabilities'] * 20,
+                      'value': [float(i) for i in range(40)]})
+    path = str(tmp_path / 'data.parquet')
+    pq.write_table(table, path, row_group_size=10)
+    return path
+
+
+def test_read_without_filter(parquet_file):
+    data_df, stats = read_df_with_stats(parquet_file)
+    assert data_df.shape == (40, 3)
+    assert stats.row_groups_total == 4
+    assert stats.row_groups_read == 4
+    assert stats.row_groups_skipped == 0
+
+
+def test_read_with_eq_filter(parquet_file):
+    data_df, stats = read_df_with_stats(parquet_file, filters=[('adsh', '==', 'adsh15')])
+    assert data_df.adsh.to_list() == ['adsh15']
+    assert stats.row_groups_read == 1
+    assert stats.row_groups_skipped == 3
+
+
+def test_read_with_in_filter(parquet_file):
+    data_df, stats = read_df_with_stats(parquet_file,
+                                        filters=[('adsh', 'in', ['adsh35', 'adsh01', 'xx']),
+                                                 ('tag', 'in', ['Liabilities'])])
+    assert data_df.adsh.to_list() == ['adsh01', 'adsh35']
+    assert stats.row_groups_read == 2
+
+
+def test_read_without_match(parquet_file):
+    table, stats = read_table_with_stats(parquet_file, filters=[('adsh', '==', 'zzz')])
+    assert table.num_rows == 0
+    assert table.column_names == ['adsh', 'tag', 'value']
+    assert stats.row_groups_read == 0
+
+
+def test_read_columns(parquet_file):
+    data_df, stats = read_df_with_stats(parquet_file, filters=[('adsh', '==', 'adsh15')],
+                                        columns=['value', 'tag'])
+    # the filter column doesn't have to be read
+    assert data_df.to_dict('records') == [{'value': 15.0, 'tag': 'Liabilities'}]
+    assert stats.row_groups_read == 1
+
+    table, _ = read_table_with_stats(parquet_file, filters=[('adsh', '==', 'zzz')],
+                                     columns=['value'])
+    assert table.column_names == ['value']
+
+
+def test_read_dictionary_columns(tmp_path):
+    data_df = pd.DataFrame({'adsh': pd.Categorical([f'adsh{i:02d}' for i in range(40)]),
+                            'value': [float(i) for i in range(40)]})
+    path = str(tmp_path / 'dict.parquet')
+    data_df.to_parquet(path, row_group_size=10, index=False)
+
+    read_df, stats = read_df_with_stats(path, filters=[('adsh', 'in', ['adsh05', 'adsh06'])])
+    assert read_df.adsh.dtype == 'category'
+    assert read_df.adsh.to_list() == ['adsh05', 'adsh06']
+    assert stats.row_groups_read == 1
+
+
+def test_read_hive_partitions(tmp_path):
+    for stmt, adshs in [('BS', ['a1', 'a2']), ('IS', ['a1', 'a3'])]:
+        partition_dir = tmp_path / 'pre.parquet' / f'stmt_partition={stmt}'
+        partition_dir.mkdir(parents=True)
+        pq.write_table(pa.table({'adsh': adshs, 'stmt': [stmt] * len(adshs)}),
+                       str(partition_dir / 'part-0.parquet'))
+    path = str(tmp_path / 'pre.parquet')
+
+    data_df, stats = read_df_with_stats(path, filters=[('adsh', '==', 'a1')],
+                                        partition_filters=[('stmt_partition', 'in', ['IS']),
+                                                           ('form_family', 'in', ['10-K'])])
+    # the partition column is not part of the result, unknown partition columns are ignored
+    assert data_df.to_dict('records') == [{'adsh': 'a1', 'stmt': 'IS'}]
+    assert stats.row_groups_total == 2
+    assert stats.row_groups_read == 1
+
+    assert read_parquet_df(path).shape == (4, 2)
+    assert read_parquet_df(path, columns=['adsh']).shape == (4, 1)
+
+
+def test_locate_and_read_row_groups(parquet_file):
+    locations = locate_row_groups(parquet_file, column='adsh', values=['adsh05', 'adsh25', 'x'])
+    assert locations == {'adsh05': {'': [0]}, 'adsh25': {'': [2]}}
+
+    data_df, stats = read_row_groups_df(parquet_file, locations['adsh25'],
+                                        filters=[('adsh', '==', 'adsh25')])
+    assert data_df.adsh.to_list() == ['adsh25']
+    assert stats.row_groups_read == 1
+
+    # no locations, the result has the columns but no rows
+    data_df, _ = read_row_groups_df(parquet_file, {}, filters=[('adsh', '==', 'x')])
+    assert data_df.shape == (0, 3)
+
+
+def test_read_row_groups_checks_the_validator(parquet_file):
+    validator = get_row_groups_validator(parquet_file)
+    data_df, _ = read_row_groups_df(parquet_file, {'': [1]}, validator=validator)
+    assert len(data_df) == 10
+
+    with pytest.raises(ValueError):
+        read_row_groups_df(parquet_file, {'': [4]})
+
+    # the file is rewritten with other row groups
+    pq.write_table(pq.read_table(parquet_file), parquet_file, row_group_size=20)
+    stat = os.stat(parquet_file)
+    os.utime(parquet_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert get_row_groups_validator(parquet_file) != validator
+    with pytest.raises(ValueError):
+        read_row_groups_df(parquet_file, {'': [1]}, validator=validator)
+
+
+def test_locate_and_read_row_groups_in_hive_partitions(tmp_path):
+    for stmt, adshs in [('BS', ['a1', 'a2']), ('IS', ['a1', 'a3'])]:
+        partition_dir = tmp_path / 'pre.parquet' / f'stmt_partition={stmt}'
+        partition_dir.mkdir(parents=True)
+        pq.write_table(pa.table({'adsh': adshs, 'stmt': [stmt] * len(adshs)}),
+                       str(partition_dir / 'part-0.parquet'))
+    path = str(tmp_path / 'pre.parquet')
+
+    locations = locate_row_groups(path, column='adsh', values=['a1', 'a3'])
+    assert locations['a1'] == {'stmt_partition=BS/part-0.parquet': [0],
+                               'stmt_partition=IS/part-0.parquet': [0]}
+    assert locations['a3'] == {'stmt_partition=IS/part-0.parquet': [0]}
+
+    data_df, stats = read_row_groups_df(path, locations['a1'], filters=[('adsh', '==', 'a1')],
+                                        partition_filters=[('stmt_partition', 'in', ['IS']),
+                                                           ('form_family', 'in', ['10-K'])])
+    assert data_df.to_dict('records') == [{'adsh': 'a1', 'stmt': 'IS'}]
+    assert stats.row_groups_total == 2
+    assert stats.row_groups_read == 1
+
+    # the columns of an empty result are read from a footer, without the partition columns
+    data_df, _ = read_row_groups_df(path, {}, validator=get_row_groups_validator(path))
+    assert list(data_df.columns) == ['adsh', 'stmt']
+    assert len(data_df) == 0
+
+
+def test_locate_row_groups_without_statistics(tmp_path):
+    path = str(tmp_path / 'data.parquet')
+    pq.write_table(pa.table({'adsh': ['a1', 'a2']}), path, write_statistics=False)
+    assert locate_row_groups(path, column='adsh', values=['a1']) is None
+
+
+def test_get_compression_options():
+    assert get_compression_options() == {'compression': 'snappy'}
+    assert get_compression_options('none') == {'compression': None}
+    assert get_compression_options('zstd', 9) == {'compression': 'zstd', 'compression_level': 9}
+
+    with pytest.raises(ValueError):
+        get_compression_options('gzip')
+
+    with pytest.raises(ValueError):
+        get_compression_options('snappy', 3)
@@ -0,0 +1,182 @@
+import pickle
+from datetime import datetime, timezone
+
+import pytest
+import requests
+
+from secfsdstools.a_utils.retryutils import CircuitOpenError, RetryPolicy, parse_retry_after
+
+URL = 'https://www.sec.gov/files/2023q1.zip'
+
+
+def _http_error(status_code: int, retry_after: str = None) -> requests.exceptions.HTTPError:
+    response = requests.models.Response()
+    response.status_code = status_code
+    if retry_after is not None:
+        response.headers['Retry-After'] = retry_after
+    return requests.exceptions.HTTPError(f'{status_code}', response=response)
+
+
+class FailingAction:
+    """raises the provided errors one after the other, then returns 'ok'"""
+
+    def __init__(self, *errors: Exception):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+@pytest.fixture
+def sleeps():
+    return []
+
+
+@pytest.fixture
+def clock():
+    return [0.0]
+
+
+@pytest.fixture
+def policy(sleeps, clock) -> RetryPolicy:
+    return RetryPolicy(max_tries=4, base_delay=1.0, max_delay=10.0, jitter=0.5,
+                       failure_threshold=3, reset_timeout=30.0,
+                       sleep=sleeps.append, clock=lambda: clock[0], rand=lambda: 0.0)
+
+
+def test_compute_delay(policy):
+    assert [policy.compute_delay(retry) for retry in range(1, 6)] == [1.0, 2.0, 4.0, 8.0, 10.0]
+    assert policy.compute_delay(2, base_delay=0.5) == 1.0
+
+    policy.rand = lambda: 1.0
+    assert policy.compute_delay(3) == 2.0
+
+    # the delay requested by the server is used for 429 and 503, also beyond max_delay
+    assert policy.compute_delay(1, _http_error(429, retry_after='7')) == 7.0
+    assert policy.compute_delay(1, _http_error(503, retry_after='120')) == 120.0
+    assert policy.compute_delay(1, _http_error(500, retry_after='7')) == 0.5
+
+
+def test_parse_retry_after():
+    now = datetime(2023, 5, 1, 12, 0, 0, tzinfo=timezone.utc)
+    assert parse_retry_after('30') == 30.0
+    assert parse_retry_after('Mon, 01 May 2023 12:00:42 GMT', now=now) == 42.0
+    assert parse_retry_after('Mon, 01 May 2023 11:00:00 GMT', now=now) == 0.0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+
+def test_execute_retries_with_backoff(policy, sleeps):
+    action = FailingAction(requests.exceptions.ConnectionError('reset'), _http_error(502))
+
+    assert policy.execute(URL, action) == 'ok'
+    assert action.calls == 3
+    assert sleeps == [1.0, 2.0]
+
+    stats = policy.get_stats()
+    assert stats.attempts == 3
+    assert stats.retries == 2
+    assert stats.failures == 2
+    assert stats.backoff_seconds == 3.0
+
+
+def test_execute_throttled(policy, sleeps):
+    action = FailingAction(_http_error(429, retry_after='5'), _http_error(429))
+
+    assert policy.execute(URL, action) == 'ok'
+    assert sleeps == [5.0, 2.0]
+    assert policy.get_stats().throttled == 2
+
+
+def test_execute_retry_after_too_long(policy, sleeps):
+    policy.max_retry_after = 60.0
+    action = FailingAction(_http_error(503, retry_after='120'))
+    with pytest.raises(requests.exceptions.HTTPError):
+        policy.execute(URL, action)
+    assert action.calls == 1
+    assert sleeps == []
+
+
+def test_execute_gives_up(policy, sleeps):
+    # client errors are not retried
+    action = FailingAction(_http_error(404))
+    with pytest.raises(requests.exceptions.HTTPError):
+        policy.execute(URL, action)
+    assert action.calls == 1
+
+    # the max_tries of the call overrides the one of the policy
+    action = FailingAction(*[requests.exceptions.Timeout()] * 5)
+    with pytest.raises(requests.exceptions.Timeout):
+        policy.execute(URL, action, max_tries=2)
+    assert action.calls == 2
+    assert sleeps == [1.0]
+
+
+def test_circuit_breaker(policy, clock):
+    # 3 consecutive failures open the circuit
+    action = FailingAction(*[_http_error(502)] * 3)
+    with pytest.raises(CircuitOpenError):
+        policy.execute(URL, action)
+    assert action.calls == 3
+
+    # requests to the host are rejected without calling the action, other hosts are not affected
+    action = FailingAction()
+    with pytest.raises(CircuitOpenError):
+        policy.execute(URL, action)
+    assert action.calls == 0
+    assert policy.execute('https://other.host/file', action) == 'ok'
+
+    # after the reset timeout, a single request is let through. it fails, so the circuit opens
+    clock[0] = 31.0
+    action = FailingAction(requests.exceptions.ConnectionError())
+    with pytest.raises(CircuitOpenError):
+        policy.execute(URL, action)
+    assert action.calls == 1
+
+    # it succeeds, so the circuit closes
+    clock[0] = 62.0
+    assert policy.execute(URL, FailingAction()) == 'ok'
+    assert policy.execute(URL, FailingAction()) == 'ok'
+
+    stats = policy.get_stats()
+    assert stats.circuit_opened == 2
+    assert stats.circuit_rejections == 3
+
+
+def test_throttling_does_not_open_circuit(policy):
+    action = FailingAction(*[_http_error(429), _http_error(503)] * 3)
+    assert policy.execute(URL, action, max_tries=7) == 'ok'
+    assert policy.get_stats().circuit_opened == 0
+
+
+def test_probe_with_unexpected_error(policy, clock):
+    with pytest.raises(CircuitOpenError):
+        policy.execute(URL, FailingAction(*[_http_error(502)] * 3))
+
+    # the single request fails with an error that is not a RequestException
+    clock[0] = 31.0
+    with pytest.raises(OSError):
+        policy.execute(URL, FailingAction(OSError('disk full')))
+
+    # the next request is let through again
+    assert policy.execute(URL, FailingAction()) == 'ok'
+
+
+def test_pickle_policy():
+    policy = RetryPolicy(max_tries=3)
+    policy.execute(URL, FailingAction())
+
+    copy = pickle.loads(pickle.dumps(policy))
+    assert copy.max_tries == 3
+    assert copy.get_stats().attempts == 0
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        RetryPolicy(max_tries=0)
+    with pytest.raises(ValueError):
+        RetryPolicy(jitter=2)
@@ -10,3 +10,45 @@ def test_db_cration(tmp_path):
     # check if expected tables are present
     assert len(creator.execute_fetchall("SELECT * FROM index_parquet_processing_state")) == 0
     assert len(creator.execute_fetchall("SELECT * FROM index_parquet_reports")) == 0
+
+
+def test_db_indexes(tmp_path):
+    creator = DbCreator(db_dir=str(tmp_path))
+    creator.create_db()
+
+    indexes = [row[0] for row in creator.execute_fetchall(
+        "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='index_parquet_reports'")]
+    assert {'idx_parquet_reports_cik', 'idx_parquet_reports_cik_form_period',
+            'idx_parquet_reports_filed', 'idx_parquet_reports_name'} <= set(indexes)
+
+    assert creator.execute_fetchall("PRAGMA journal_mode")[0][0] == 'wal'
+
+    # the scripts can be executed again
+    creator.create_db()
+
+    plan = creator.execute_fetchall(
+        "EXPLAIN QUERY PLAN SELECT * FROM index_parquet_reports WHERE cik = 1")
+    assert 'USING INDEX' in str(plan)
+
+
+def test_company_table_is_filled_from_reports(tmp_path):
+    creator = DbCreator(db_dir=str(tmp_path))
+    creator.create_db()
+
+    with creator.get_connection() as conn:
+        conn.execute("DROP TABLE index_parquet_companies_fts")
+        conn.execute("DROP TABLE index_parquet_companies")
+        conn.executemany("INSERT INTO index_parquet_reports (adsh, cik, name, filed, originFile) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         [('a1', 1, 'APPLE INC', 20220101, 'q1'),
+                          ('a2', 1, 'APPLE INC', 20230101, 'q2'),
+                          ('a3', 2, 'MICROSOFT CORP', 20220101, 'q1')])
+
+    creator.create_db()
+
+    assert creator.execute_fetchall(
+        "SELECT cik, name, filed FROM index_parquet_companies ORDER BY cik") == \
+           [(1, 'APPLE INC', 20230101), (2, 'MICROSOFT CORP', 20220101)]
+    assert creator.execute_fetchall(
+        "SELECT rowid FROM index_parquet_companies_fts WHERE index_parquet_companies_fts "
+        "MATCH 'micro*'") == [(2,)]
@@ -1,4 +1,7 @@
 import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from typing import List, Tuple
 from unittest.mock import MagicMock
 
@@ -53,3 +56,88 @@ def test_downloading(basedownloader):
         assert basedownloader._download_file.call_args_list[0][0][0] == ('file2', 'file2')
     else:
         assert basedownloader._download_file.call_args_list[0].args[0] == ('file2', 'file2')
+
+
+def test_download_listener(basedownloader):
+    basedownloader._download_zip = MagicMock(side_effect=['success', 'failed'])
+    listener = MagicMock()
+    basedownloader.set_download_listener(listener)
+
+    basedownloader._download_file(('file1.zip', 'url1'))
+    basedownloader._download_file(('file2.zip', 'url2'))
+
+    # only called for the successful download
+    listener.assert_called_once_with('file1.zip',
+                                     os.path.join(basedownloader.zip_dir, 'file1.zip'))
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """stand-in for the download server, which counts the concurrent requests"""
+
+    def do_GET(self):
+        state = self.server.state
+        with state['lock']:
+            state['running'] += 1
+            state['max_running'] = max(state['max_running'], state['running'])
+            state['starts'].append(time.monotonic())
+        time.sleep(0.05)
+        content = self.path.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+        with state['lock']:
+            state['running'] -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def standin_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+    server.state = {'lock': threading.Lock(), 'running': 0, 'max_running': 0, 'starts': []}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class StandInDownloader(BaseDownloader):
+
+    def __init__(self, base_url: str, files: List[str], **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+        self.files = files
+
+    def _calculate_missing_zips(self) -> List[Tuple[str, str]]:
+        downloaded = {os.path.basename(path) for path in self._get_downloaded_zips()}
+        return [(file, f'{self.base_url}/{file}') for file in self.files
+                if file not in downloaded]
+
+
+def test_download_from_standin_server(standin_server, tmp_path):
+    base_url = f'http://127.0.0.1:{standin_server.server_address[1]}'
+    files = [f'file{i}.zip' for i in range(12)]
+
+    downloader = StandInDownloader(base_url=base_url, files=files,
+                                   zip_dir=str(tmp_path / 'zipfiles'),
+                                   parquet_dir_typed=str(tmp_path / 'parquet'),
+                                   urldownloader=UrlDownloader(user_agent='test@test.com'),
+                                   download_workers=4, max_calls_per_sec=20)
+    listener = MagicMock()
+    downloader.set_download_listener(listener)
+    downloader.download()
+
+    processed, missing = downloader.result
+    assert len(missing) == 0
+    assert listener.call_count == len(files)
+    for file in files:
+        with open(os.path.join(downloader.zip_dir, file), 'rb') as file_fp:
+            assert file_fp.read() == f'/{file}'.encode('utf-8')
+
+    state = standin_server.state
+    assert 1 < state['max_running'] <= 4
+    # the shared token bucket starts at most 20 downloads per second
+    assert max(state['starts']) - min(state['starts']) >= 11 / 20 - 0.01
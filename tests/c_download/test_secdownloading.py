@@ -6,6 +6,8 @@ from unittest.mock import MagicMock
 import pytest
 
 from secfsdstools.a_utils.downloadutils import UrlDownloader
+from secfsdstools.a_utils.httpcacheutils import HttpMetadataCache
+from secfsdstools.a_utils.retryutils import RetryStats
 from secfsdstools.c_download.secdownloading import SecZipDownloader
 
 RE_MATCH_QRTR_FILENAME = '^20\d{2}q[1-4]\.zip$'
@@ -55,3 +57,50 @@ def test_calculate_missing_zips_transformed_not_downloaded(seczipdownloader):
     # only file2 needs to be downloaded, even if file1 is not present as zip since it was
     # already transformed
     assert missing == [('file2', 'file2')]
+
+
+def test_get_available_zips_cached(tmp_path):
+    urldownloader = MagicMock()
+    urldownloader.get_url_content_cached.return_value = ([['2023q1.zip', 'url1']], False)
+    cache = HttpMetadataCache(str(tmp_path / 'cache'))
+    downloader = SecZipDownloader(zip_dir=str(tmp_path / 'zipfiles'), urldownloader=urldownloader,
+                                  parquet_root_dir=str(tmp_path / 'parquet'), http_cache=cache)
+
+    assert downloader._get_available_zips() == [('2023q1.zip', 'url1')]
+    call = urldownloader.get_url_content_cached.call_args
+    assert call[1]['cache'] is cache
+
+
+def test_unmodified_listing_skips_the_download(tmp_path):
+    urldownloader = MagicMock()
+    urldownloader.retry_policy.get_stats.return_value = RetryStats()
+    urldownloader.get_url_content_cached.return_value = ([['2023q1.zip', 'url1']], True)
+    downloader = SecZipDownloader(zip_dir=str(tmp_path / 'zipfiles'), urldownloader=urldownloader,
+                                  parquet_root_dir=str(tmp_path / 'parquet'),
+                                  http_cache=HttpMetadataCache(str(tmp_path / 'cache')))
+    # the only available file was already transformed
+    os.makedirs(tmp_path / 'parquet' / 'quarter' / '2023q1.zip')
+
+    downloader.download()
+    assert os.path.isfile(tmp_path / 'zipfiles' / SecZipDownloader.COMPLETED_MARKER)
+
+    downloader._get_transformed_parquet = MagicMock(return_value=['2023q1.zip'])
+    urldownloader.get_url_content_cached.return_value = ([['2023q1.zip', 'url1']], False)
+    downloader.download()
+    downloader._get_transformed_parquet.assert_not_called()
+
+    urldownloader.get_url_content_cached.return_value = ([['2023q1.zip', 'url1']], True)
+    downloader.download()
+    downloader._get_transformed_parquet.assert_called()
+
+
+def test_parse_available_zips(seczipdownloader):
+    response = MagicMock()
+    response.text = """<html><table class="list">
+        <tr><td><a href="/files/dera/data/financial-statement-data-sets/2023q2.zip">2023 Q2</a></td></tr>
+        <tr><td><a href="/files/dera/data/financial-statement-data-sets/2023q1.zip">2023 Q1</a></td></tr>
+        </table></html>"""
+
+    assert seczipdownloader._parse_available_zips(response) == [
+        ['2023q2.zip', 'https://www.sec.gov/files/dera/data/financial-statement-data-sets/2023q2.zip'],
+        ['2023q1.zip', 'https://www.sec.gov/files/dera/data/financial-statement-data-sets/2023q1.zip']]
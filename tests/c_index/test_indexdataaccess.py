@@ -45,3 +45,139 @@ def test_parquetindexprocessing(parquetindexaccessor):
     all_states_df: pd.DataFrame = parquetindexaccessor.read_all_indexfileprocessing_df()
     assert len(all_states_df) == 1
     assert all_states_df.iloc[0].fileName == '2022q1.zip'
+
+
+def test_add_index_reports(parquetindexaccessor):
+    def create_entry(file_name: str, adshs: List[str]):
+        sub_df = pd.DataFrame({'adsh': adshs, 'cik': 1, 'form': '10-K', 'name': 'bla',
+                               'filed': 20220130, 'period': 20211231, 'originFile': file_name,
+                               'originFileType': 'quarter', 'fullPath': '', 'url': ''})
+        return sub_df, IndexFileProcessingState(fileName=file_name, status='processed',
+                                                processTime='', fullPath='',
+                                                entries=len(sub_df))
+
+    parquetindexaccessor.add_index_reports([create_entry('2022q1.zip', ['a1', 'a2']),
+                                            create_entry('2022q2.zip', []),
+                                            create_entry('2022q3.zip', ['a3'])])
+
+    assert len(parquetindexaccessor.read_all_indexreports_df()) == 3
+    assert len(parquetindexaccessor.read_all_indexfileprocessing_df()) == 3
+
+    # the whole batch is rolled back if one entry fails
+    with pytest.raises(Exception):
+        parquetindexaccessor.add_index_reports([create_entry('2022q4.zip', ['a4']),
+                                                create_entry('2022q4.zip', ['a5'])])
+
+    assert len(parquetindexaccessor.read_all_indexreports_df()) == 3
+    assert len(parquetindexaccessor.read_all_indexfileprocessing_df()) == 3
+
+    # the entries of a file that is indexed again are replaced
+    parquetindexaccessor.add_index_reports([create_entry('2022q1.zip', ['a5'])],
+                                           fingerprints={'2022q1.zip': 'v2'})
+
+    assert sorted(parquetindexaccessor.read_all_indexreports_df().adsh) == ['a3', 'a5']
+    assert len(parquetindexaccessor.read_all_indexfileprocessing_df()) == 3
+    assert parquetindexaccessor.read_fingerprints() == {'2022q1.zip': 'v2'}
+
+
+def _add_companies(accessor: ParquetDBIndexingAccessor):
+    sub_df = pd.DataFrame({'adsh': ['a1', 'a2', 'a3', 'a4', 'a5'],
+                           'cik': [320193, 320193, 789019, 1018724, 1652044],
+                           'name': ['APPLE INC', 'APPLE INC', 'MICROSOFT CORP', 'AMAZON COM INC',
+                                    'Alphabet Inc.'],
+                           'form': '10-K', 'filed': [20220130, 20230130, 20220130, 20220130,
+                                                     20220130],
+                           'period': 20211231, 'originFile': '2022q1.zip',
+                           'originFileType': 'quarter', 'fullPath': '', 'url': ''})
+    accessor.add_index_report(sub_df, IndexFileProcessingState(
+        fileName='2022q1.zip', status='processed', processTime='', fullPath='', entries=5))
+
+
+def test_find_company_by_name(parquetindexaccessor):
+    _add_companies(parquetindexaccessor)
+    assert parquetindexaccessor.has_company_fts()
+
+    companies_df = parquetindexaccessor.execute_read_as_df(
+        "SELECT * FROM index_parquet_companies WHERE cik = 320193")
+    assert companies_df.filed.to_list() == [20230130]
+
+    assert parquetindexaccessor.find_company_by_name('apple').cik.to_list() == [320193]
+    assert parquetindexaccessor.find_company_by_name('APP IN').cik.to_list() == [320193]
+    assert parquetindexaccessor.find_company_by_name('inc').cik.nunique() == 3
+    assert len(parquetindexaccessor.find_company_by_name('inc', limit=2)) == 2
+    assert len(parquetindexaccessor.find_company_by_name('apple corp')) == 0
+    # words are no fts5 operators
+    assert len(parquetindexaccessor.find_company_by_name('apple OR microsoft')) == 0
+    assert len(parquetindexaccessor.find_company_by_name('"')) == 0
+
+    result_df = parquetindexaccessor.find_companies_by_names(['micro', 'amazon', 'unknown'])
+    assert result_df.search_name.to_list() == ['micro', 'amazon']
+    assert result_df.cik.to_list() == [789019, 1018724]
+
+
+def test_find_company_by_name_without_fts(parquetindexaccessor):
+    _add_companies(parquetindexaccessor)
+    with parquetindexaccessor.get_connection() as conn:
+        conn.execute("DROP TABLE index_parquet_companies_fts")
+        for trigger in ['ai', 'ad', 'au']:
+            conn.execute(f"DROP TRIGGER index_parquet_companies_{trigger}")
+
+    assert not parquetindexaccessor.has_company_fts()
+    assert parquetindexaccessor.find_company_by_name('pple').cik.to_list() == [320193]
+    assert parquetindexaccessor.find_company_by_name('inc').name.to_list() == \
+           ['AMAZON COM INC', 'APPLE INC', 'Alphabet Inc.']
+    assert parquetindexaccessor.find_companies_by_names(['soft']).cik.to_list() == [789019]
+
+
+def test_read_index_reports_for_many_keys(parquetindexaccessor):
+    nr_of_reports = 5_000
+    sub_df = pd.DataFrame({'adsh': [f'A{i:05d}' for i in range(nr_of_reports)],
+                           'cik': [i % 100 for i in range(nr_of_reports)],
+                           'name': 'bla', 'form': ['10-K', '10-Q'] * (nr_of_reports // 2),
+                           'filed': 20220130, 'period': 20211231, 'originFile': '2022q1.zip',
+                           'originFileType': 'quarter', 'fullPath': '', 'url': ''})
+    daily_df = sub_df.head(10).assign(originFile='20220130.zip', originFileType='daily')
+    parquetindexaccessor.add_index_reports([
+        (sub_df, IndexFileProcessingState(fileName='2022q1.zip', status='processed',
+                                          processTime='', fullPath='', entries=nr_of_reports)),
+        (daily_df, IndexFileProcessingState(fileName="20220130.zip", status='processed',
+                                            processTime='', fullPath='', entries=10))])
+
+    # more keys than sqlite accepts as bound parameters, the keys are not case sensitive
+    adshs = [f'a{i:05d}' for i in range(nr_of_reports)] + ["x' OR '1'='1"]
+    reports = parquetindexaccessor.read_index_reports_for_adshs(adshs)
+    assert len(reports) == nr_of_reports
+    assert reports[0].originFileType == 'quarter'
+
+    reports = parquetindexaccessor.read_index_reports_for_ciks(list(range(100)), forms=['10-k'])
+    assert len(reports) == nr_of_reports // 2 + 5
+    assert {report.form for report in reports} == {'10-K'}
+
+    reports_df = parquetindexaccessor.read_index_reports_for_ciks_df([1, 2, '3'])
+    assert len(reports_df) == 3 * nr_of_reports // 100 + 3
+
+    states = parquetindexaccessor.read_index_files_for_filenames(['2022q1.zip', "'"])
+    assert [state.fileName for state in states] == ['2022q1.zip']
+
+    # the staged keys are removed after every lookup
+    assert parquetindexaccessor.execute_fetchall("SELECT * FROM temp.lookup_keys") == []
+
+
+def test_read_row_group_locations(parquetindexaccessor):
+    sub_df = pd.DataFrame({'adsh': ['A1', 'A2'], 'cik': [1, 2], 'name': ['n1', 'n2'],
+                           'form': ['10-K', '10-K'], 'filed': [20220101, 20220101],
+                           'period': [20211231, 20211231], 'fullPath': '',
+                           'originFile': '2022q1.zip', 'originFileType': 'quarter', 'url': ''})
+    row_groups_df = pd.DataFrame({'adsh': ['A1', 'A2'], 'originFile': '2022q1.zip',
+                                  'locations': ['{"num.txt": {"": [0]}}',
+                                                '{"num.txt": {"": [1]}}']})
+    parquetindexaccessor.add_index_report(
+        sub_df, IndexFileProcessingState(fileName='2022q1.zip', fullPath='', status='processed',
+                                         entries=2, processTime=''), row_groups_df)
+
+    assert parquetindexaccessor.read_row_group_locations('A2') == {'num.txt': {'': [1]}}
+    assert parquetindexaccessor.read_row_group_locations('A2', origin_file='x.zip') is None
+
+    reports = parquetindexaccessor.read_index_reports_for_adshs(['A1', 'A2'])
+    assert parquetindexaccessor.read_row_group_locations_for_reports(reports) == {
+        'A1': {'num.txt': {'': [0]}}, 'A2': {'num.txt': {'': [1]}}}
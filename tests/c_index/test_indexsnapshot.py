@@ -0,0 +1,126 @@
+import os
+
+import pandas as pd
+import pytest
+
+from secfsdstools.a_config.configmodel import Configuration
+from secfsdstools.b_setup.setupdb import DbCreator
+from secfsdstools.c_index.indexdataaccess import IndexFileProcessingState, \
+    ParquetDBIndexingAccessor
+from secfsdstools.c_index.indexsnapshot import IndexSnapshot, SnapshotIndexingAccessor, \
+    get_index_accessor, get_snapshot_path, write_index_snapshot
+
+
+def _create_reports_df(file_name: str, file_type: str, adshs, ciks, periods) -> pd.DataFrame:
+    return pd.DataFrame({'adsh': adshs, 'cik': ciks, 'name': 'bla',
+                         'form': ['10-K', '10-Q'] * (len(adshs) // 2) + ['10-K'] * (len(adshs) % 2),
+                         'filed': 20220130, 'period': periods, 'fullPath': f'/{file_name}',
+                         'originFile': file_name, 'originFileType': file_type, 'url': ''})
+
+
+@pytest.fixture
+def db_dir(tmp_path) -> str:
+    db_dir = str(tmp_path)
+    DbCreator(db_dir=db_dir).create_db()
+    accessor = ParquetDBIndexingAccessor(db_dir=db_dir)
+
+    quarter_df = _create_reports_df('2022q1.zip', 'quarter',
+                                    adshs=[f'0000000001-22-{i:06d}' for i in range(6)],
+                                    ciks=[1, 1, 1, 2, 2, 3],
+                                    periods=[20210331, 20210630, 20211231, 20210331, 20211231,
+                                             20211231])
+    daily_df = _create_reports_df('20220330.zip', 'daily',
+                                  adshs=['0000000001-22-000000', '0000000001-22-000010'],
+                                  ciks=[1, 1], periods=[20210331, 20220331])
+    accessor.add_index_reports([
+        (quarter_df, IndexFileProcessingState(fileName='2022q1.zip', fullPath='',
+                                              status='processed', entries=6, processTime='')),
+        (daily_df, IndexFileProcessingState(fileName='20220330.zip', fullPath='',
+                                            status='processed', entries=2, processTime=''))])
+    return db_dir
+
+
+def test_snapshot_lookups_match_sqlite(db_dir):
+    assert write_index_snapshot(db_dir) == 8
+
+    db_accessor = ParquetDBIndexingAccessor(db_dir=db_dir, read_only=True)
+    snapshot_accessor = SnapshotIndexingAccessor(db_dir=db_dir)
+    assert snapshot_accessor.get_snapshot() is not None
+
+    adshs = ['0000000001-22-000000', '0000000001-22-000003', '0000000001-22-000010',
+             '0000000001-22-000003', 'unknown', '0000000001-22-0000000']
+    assert snapshot_accessor.read_index_reports_for_adshs(adshs) == \
+           db_accessor.read_index_reports_for_adshs(adshs)
+    # the quarter report is preferred
+    assert snapshot_accessor.read_index_report_for_adsh('0000000001-22-000000') == \
+           db_accessor.read_index_report_for_adsh('0000000001-22-000000')
+    assert snapshot_accessor.read_index_report_for_adsh('0000000001-22-000000') \
+               .originFileType == 'quarter'
+
+    for forms in [None, ['10-k']]:
+        assert [r.period for r in snapshot_accessor.read_index_reports_for_ciks([1, 2], forms)] \
+               == [r.period for r in db_accessor.read_index_reports_for_ciks([1, 2], forms)]
+        assert len(snapshot_accessor.read_index_reports_for_ciks_df([1, 2], forms)) == \
+               len(db_accessor.read_index_reports_for_ciks_df([1, 2], forms))
+
+    assert snapshot_accessor.find_latest_company_report(1) == \
+           db_accessor.find_latest_company_report(1)
+
+    reports_df = snapshot_accessor.find_reports_df(forms=['10-K'], period_from=20211231,
+                                                   period_to=20211231)
+    assert reports_df.adsh.to_list() == ['0000000001-22-000002', '0000000001-22-000004']
+
+    with pytest.raises(IndexError):
+        snapshot_accessor.read_index_report_for_adsh('unknown')
+
+
+def test_snapshot_row_lookups(db_dir):
+    write_index_snapshot(db_dir)
+    snapshot = IndexSnapshot(get_snapshot_path(db_dir))
+    adshs = snapshot.table['adsh'].to_pylist()
+    types = snapshot.table['originFileType'].to_pylist()
+
+    rows = snapshot.find_adsh_rows(['0000000001-22-000010', '0000000001-22-000000', 'unknown',
+                                    'zzz', '0000000001-22-000003'.lower()])
+    assert rows[2] == -1 and rows[3] == -1
+    assert [adshs[row] for row in rows[[0, 1, 4]]] == \
+           ['0000000001-22-000010', '0000000001-22-000000', '0000000001-22-000003']
+    assert types[rows[1]] == 'quarter'
+
+    ciks = snapshot.table['cik'].to_pylist()
+    assert snapshot.find_cik_rows([3, 1, 1, 99]).tolist() == \
+           [row for row, cik in enumerate(ciks) if cik in (1, 3)]
+    assert len(snapshot.find_cik_rows([])) == 0
+    assert [adshs[row] for row in snapshot.find_rows(ciks=[1], forms=['10-q'],
+                                                     period_from=20210701)] == \
+           ['0000000001-22-000010']
+
+
+def test_snapshot_is_reloaded_and_optional(db_dir):
+    accessor = SnapshotIndexingAccessor(db_dir=db_dir)
+
+    # without snapshot, the sqlite db is used
+    assert accessor.get_snapshot() is None
+    assert len(accessor.read_index_reports_for_ciks([1])) == 5
+    with pytest.raises(ValueError):
+        accessor.find_reports_df(ciks=[1])
+
+    write_index_snapshot(db_dir)
+    first_snapshot = accessor.get_snapshot()
+    assert len(first_snapshot) == 8
+    assert accessor.get_snapshot() is first_snapshot
+
+    with ParquetDBIndexingAccessor(db_dir=db_dir).get_connection() as conn:
+        conn.execute("DELETE FROM index_parquet_reports WHERE cik = 3")
+    write_index_snapshot(db_dir)
+    os.utime(get_snapshot_path(db_dir), ns=(0, first_snapshot.mtime_ns + 1))
+    assert len(accessor.get_snapshot()) == 7
+
+
+def test_get_index_accessor(db_dir):
+    configuration = Configuration(download_dir='', db_dir=db_dir, parquet_dir='',
+                                  user_agent_email='')
+    assert not isinstance(get_index_accessor(configuration), SnapshotIndexingAccessor)
+
+    configuration.index_snapshot = True
+    assert isinstance(get_index_accessor(configuration), SnapshotIndexingAccessor)
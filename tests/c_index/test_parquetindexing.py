@@ -1,11 +1,18 @@
 import os
+import shutil
 from unittest.mock import patch
 
+import pandas as pd
 import pytest
 
+from secfsdstools.a_utils.manifestutils import TransformManifest, write_manifest
+from secfsdstools.a_utils.parquetutils import get_row_groups_validator
 from secfsdstools.b_setup.setupdb import DbCreator
-from secfsdstools.c_index.indexdataaccess import IndexFileProcessingState
+from secfsdstools.c_index.indexdataaccess import VALIDATOR_SOURCE_REPORTS, \
+    IndexFileProcessingState, ParquetDBIndexingAccessor
 from secfsdstools.c_index.indexing import ReportParquetIndexer
+from secfsdstools.c_transform.parquetschema import SCHEMA_VERSION_COMPACT
+from secfsdstools.c_transform.toparquettransforming import ToParquetTransformer
 
 
 @pytest.fixture
@@ -56,3 +63,156 @@ def test_add_reports(parquetreportindexer):
     reports_df = parquetreportindexer.dbaccessor.read_all_indexreports_df()
 
     assert len(reports_df) == 495
+
+    locations = parquetreportindexer.dbaccessor.read_row_group_locations('0001193125-10-012085')
+    assert locations == {'sub.txt': {'': [0]}, 'pre.txt': {'': [0]}, 'num.txt': {'': [0]}}
+
+    validators = parquetreportindexer.dbaccessor.read_row_group_validators(
+        ['2010q1.zip'], VALIDATOR_SOURCE_REPORTS)
+    assert validators['2010q1.zip'] == {
+        file_name: get_row_groups_validator(
+            f"{current_dir}/../_testdata/parquet/quarter/2010q1.zip/{file_name}.parquet")
+        for file_name in ['sub.txt', 'pre.txt', 'num.txt']}
+
+
+@pytest.mark.parametrize("batch_size, partitioned", [(None, False), (20_000, False),
+                                                      (None, True)])
+def test_add_reports_compact_schema(parquetreportindexer, tmp_path, batch_size, partitioned):
+    current_dir, _ = os.path.split(__file__)
+    zip_dir = tmp_path / 'zip'
+    os.makedirs(zip_dir)
+    shutil.copy(f"{current_dir}/../_testdata/zip/2010q1.zip", zip_dir)
+    ToParquetTransformer(zip_dir=str(zip_dir), parquet_dir=str(tmp_path), file_type='quarter',
+                         keep_zip_files=True, batch_size=batch_size, partitioned=partitioned,
+                         schema_version=SCHEMA_VERSION_COMPACT).process()
+
+    parquetreportindexer._index_file(file_name='2010q1.zip')
+
+    reports_df = parquetreportindexer.dbaccessor.read_all_indexreports_df()
+    assert len(reports_df) == 495
+    report = reports_df[reports_df.adsh == '0001193125-10-012085'].iloc[0]
+    assert report.url == 'https://www.sec.gov/Archives/edgar/data/' \
+                         f'{report.cik}/000119312510012085/0001193125-10-012085-index.htm'
+
+
+def test_not_completed_transformation_is_not_indexed(parquetreportindexer, tmp_path):
+    os.makedirs(tmp_path / 'quarter' / 'file1')
+    os.makedirs(tmp_path / 'quarter' / 'file2')
+    write_manifest(str(tmp_path / 'quarter' / 'file2'),
+                   TransformManifest(source_file='file2', source_size=1, source_mtime=0.0,
+                                     source_sha256='', schema_version=1, completed=False))
+
+    assert parquetreportindexer._calculate_not_indexed() == ['file1']
+
+
+def test_process_indexes_all_files_in_one_transaction(parquetreportindexer, tmp_path):
+    current_dir, _ = os.path.split(__file__)
+    quarter_dir = f"{current_dir}/../_testdata/parquet/quarter/"
+
+    # the same sub file in two directories, only the adshs of the copy are changed
+    shutil.copytree(os.path.join(quarter_dir, '2010q1.zip'), tmp_path / 'quarter' / '2010q1.zip')
+    copy_dir = tmp_path / 'quarter' / 'copy.zip'
+    os.makedirs(copy_dir)
+    sub_df = pd.read_parquet(os.path.join(quarter_dir, '2010q1.zip', 'sub.txt.parquet'))
+    sub_df['adsh'] = 'copy-' + sub_df['adsh']
+    sub_df.to_parquet(copy_dir / 'sub.txt.parquet')
+
+    with patch.object(ParquetDBIndexingAccessor, 'add_index_reports', autospec=True,
+                      side_effect=ParquetDBIndexingAccessor.add_index_reports) as add_mock:
+        parquetreportindexer.process()
+        assert add_mock.call_count == 1
+
+    reports_df = parquetreportindexer.dbaccessor.read_all_indexreports_df()
+    assert len(reports_df) == 990
+    assert set(reports_df.originFile) == {'2010q1.zip', 'copy.zip'}
+
+    processing_df = parquetreportindexer.dbaccessor.read_all_indexfileprocessing_df()
+    assert set(processing_df.fileName) == {'2010q1.zip', 'copy.zip'}
+    assert parquetreportindexer._calculate_not_indexed() == []
+
+
+def test_process_commits_chunks_and_skips_broken_files(parquetreportindexer, tmp_path):
+    current_dir, _ = os.path.split(__file__)
+    quarter_dir = f"{current_dir}/../_testdata/parquet/quarter/"
+    shutil.copytree(os.path.join(quarter_dir, '2010q1.zip'), tmp_path / 'quarter' / '2010q1.zip')
+    shutil.copytree(os.path.join(quarter_dir, '2010q2.zip'), tmp_path / 'quarter' / '2010q2.zip')
+    broken_dir = tmp_path / 'quarter' / 'broken.zip'
+    os.makedirs(broken_dir)
+    (broken_dir / 'sub.txt.parquet').write_text('no parquet file')
+
+    parquetreportindexer.execute_serial = True
+    with patch('secfsdstools.c_index.indexing.INDEX_CHUNK_SIZE', 1), \
+            patch.object(ParquetDBIndexingAccessor, 'add_index_reports', autospec=True,
+                         side_effect=ParquetDBIndexingAccessor.add_index_reports) as add_mock:
+        parquetreportindexer.process()
+        assert add_mock.call_count == 2
+
+    processing_df = parquetreportindexer.dbaccessor.read_all_indexfileprocessing_df()
+    assert set(processing_df.fileName) == {'2010q1.zip', '2010q2.zip'}
+    assert parquetreportindexer._calculate_not_indexed() == ['broken.zip']
+
+
+def test_changed_files_are_indexed_again(parquetreportindexer, tmp_path):
+    current_dir, _ = os.path.split(__file__)
+    quarter_dir = f"{current_dir}/../_testdata/parquet/quarter/"
+    shutil.copytree(os.path.join(quarter_dir, '2010q1.zip'), tmp_path / 'quarter' / '2010q1.zip')
+    shutil.copytree(os.path.join(quarter_dir, '2010q2.zip'), tmp_path / 'quarter' / '2010q2.zip')
+    accessor = parquetreportindexer.dbaccessor
+
+    parquetreportindexer.execute_serial = True
+    parquetreportindexer.process()
+    q2_count = (accessor.read_all_indexreports_df().originFile == '2010q2.zip').sum()
+    assert set(accessor.read_fingerprints().keys()) == {'2010q1.zip', '2010q2.zip'}
+    assert parquetreportindexer._calculate_changed() == []
+
+    # the zip file was republished with fewer reports
+    sub_file = tmp_path / 'quarter' / '2010q1.zip' / 'sub.txt.parquet'
+    pd.read_parquet(sub_file).iloc[:100].to_parquet(sub_file)
+    assert parquetreportindexer._calculate_changed() == ['2010q1.zip']
+
+    with patch.object(ReportParquetIndexer, 'prepare_index_entries', autospec=True,
+                      side_effect=ReportParquetIndexer.prepare_index_entries) as prepare_mock:
+        parquetreportindexer.process()
+        assert [call.args[1] for call in prepare_mock.call_args_list] == ['2010q1.zip']
+
+    reports_df = accessor.read_all_indexreports_df()
+    assert (reports_df.originFile == '2010q1.zip').sum() == 100
+    assert (reports_df.originFile == '2010q2.zip').sum() == q2_count
+    assert accessor.read_index_file_for_filename('2010q1.zip').entries == 100
+    assert parquetreportindexer._calculate_changed() == []
+
+
+def test_index_file_checks_only_the_file(parquetreportindexer, tmp_path):
+    current_dir, _ = os.path.split(__file__)
+    quarter_dir = f"{current_dir}/../_testdata/parquet/quarter/"
+    shutil.copytree(os.path.join(quarter_dir, '2010q1.zip'), tmp_path / 'quarter' / '2010q1.zip')
+
+    with patch.object(ReportParquetIndexer, '_calculate_to_index') as to_index_mock, \
+            patch.object(ReportParquetIndexer, '_index_file', autospec=True,
+                         side_effect=ReportParquetIndexer._index_file) as index_mock:
+        parquetreportindexer.index_file('2010q1.zip')
+        parquetreportindexer.index_file('2010q1.zip')
+        parquetreportindexer.index_file('unknown.zip')
+        to_index_mock.assert_not_called()
+        assert index_mock.call_count == 1
+
+    # the file changed, so it is indexed again
+    sub_file = tmp_path / 'quarter' / '2010q1.zip' / 'sub.txt.parquet'
+    pd.read_parquet(sub_file).iloc[:100].to_parquet(sub_file)
+    parquetreportindexer.index_file('2010q1.zip')
+    assert parquetreportindexer.dbaccessor.read_index_file_for_filename('2010q1.zip').entries == 100
+
+
+def test_fingerprints_of_old_index_are_stored(parquetreportindexer, tmp_path):
+    current_dir, _ = os.path.split(__file__)
+    quarter_dir = f"{current_dir}/../_testdata/parquet/quarter/"
+    shutil.copytree(os.path.join(quarter_dir, '2010q1.zip'), tmp_path / 'quarter' / '2010q1.zip')
+    parquetreportindexer._index_file('2010q1.zip')
+
+    # an index created by an older version has no fingerprints
+    with parquetreportindexer.dbaccessor.get_connection() as conn:
+        conn.execute('DELETE FROM index_parquet_fingerprints')
+
+    parquetreportindexer.process()
+    assert list(parquetreportindexer.dbaccessor.read_fingerprints().keys()) == ['2010q1.zip']
+    assert len(parquetreportindexer.dbaccessor.read_all_indexreports_df()) == 495
@@ -0,0 +1,26 @@
+import pyarrow as pa
+import pytest
+
+from secfsdstools.c_transform.parquetschema import SCHEMA_VERSION_COMPACT, \
+    SCHEMA_VERSION_LEGACY, get_form_family, to_schema_version
+
+
+@pytest.mark.parametrize("form, family",
+                         [('10-K', '10-K'), ('10-K/A', '10-K'), ('10-KT', '10-K'),
+                          ('10-Q', '10-Q'), ('10-QT/A', '10-Q'), ('20-F', '20-F'),
+                          ('8-K', '8-K'), ('S-1', 'other'), (None, 'other')])
+def test_get_form_family(form, family):
+    assert get_form_family(form) == family
+
+
+def test_to_schema_version():
+    table = pa.table({'adsh': ['a', 'b', 'a'], 'qtrs': [0, 1, 4]})
+
+    assert to_schema_version(table, 'num.txt', SCHEMA_VERSION_LEGACY) is table
+
+    compact = to_schema_version(table, 'num.txt', SCHEMA_VERSION_COMPACT)
+    assert pa.types.is_dictionary(compact.schema.field('adsh').type)
+    assert compact.schema.field('qtrs').type == pa.int8()
+
+    with pytest.raises(ValueError):
+        to_schema_version(table, 'num.txt', 99)
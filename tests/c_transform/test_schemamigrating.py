@@ -0,0 +1,96 @@
+import os
+import shutil
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from secfsdstools.a_utils.manifestutils import read_manifest
+from secfsdstools.c_transform.parquetschema import SCHEMA_VERSION_COMPACT, \
+    SCHEMA_VERSION_LEGACY, get_schema_version
+from secfsdstools.c_transform.schemamigrating import ParquetSchemaMigrator
+from secfsdstools.c_transform.toparquettransforming import ToParquetTransformer
+from secfsdstools.d_container.databagmodel import RawDataBag
+
+CURRENT_DIR, _ = os.path.split(__file__)
+PARQUET_DIR = os.path.join(CURRENT_DIR, '../_testdata/parquet')
+ZIP_DIR = os.path.join(CURRENT_DIR, '../_testdata/zip')
+
+
+def test_migrate_to_compact(tmp_path):
+    shutil.copytree(PARQUET_DIR, tmp_path / 'parquet')
+    zip_dir = tmp_path / 'parquet' / 'quarter' / '2010q1.zip'
+    assert get_schema_version(str(zip_dir / 'num.txt.parquet')) == SCHEMA_VERSION_LEGACY
+
+    migrator = ParquetSchemaMigrator(parquet_dir=str(tmp_path / 'parquet'),
+                                     schema_version=SCHEMA_VERSION_COMPACT)
+    assert len(migrator._calculate_not_migrated()) == 6
+
+    migrator.process()
+
+    assert len(migrator._calculate_not_migrated()) == 0
+    for file in ['sub.txt.parquet', 'pre.txt.parquet', 'num.txt.parquet']:
+        assert get_schema_version(str(zip_dir / file)) == SCHEMA_VERSION_COMPACT
+    assert not os.path.exists(zip_dir / 'num.txt.parquet.tmp')
+
+    bag = RawDataBag.load(str(zip_dir))
+    assert bag.num_df.shape == (151692, 9)
+    assert bag.pre_df.shape == (88378, 10)
+    assert bag.sub_df.shape == (495, 36)
+    assert bag.num_df.adsh.dtype == 'category'
+    assert bag.num_df.adsh.cat.categories.is_monotonic_increasing
+
+    legacy_bag = RawDataBag.load(os.path.join(PARQUET_DIR, 'quarter', '2010q1.zip'))
+    assert bag.num_df.value.sum() == legacy_bag.num_df.value.sum()
+    # the migrated files are sorted, so only the content is compared
+    assert sorted(bag.pre_df.tag.astype(str)) == sorted(legacy_bag.pre_df.tag)
+    assert pd.api.types.is_integer_dtype(bag.pre_df.line)
+
+
+def test_migrate_writes_sorted_row_groups(tmp_path):
+    shutil.copytree(PARQUET_DIR, tmp_path / 'parquet')
+    zip_dir = tmp_path / 'parquet' / 'quarter' / '2010q1.zip'
+
+    migrator = ParquetSchemaMigrator(parquet_dir=str(tmp_path / 'parquet'),
+                                     schema_version=SCHEMA_VERSION_COMPACT,
+                                     row_group_size=50_000)
+    migrator.process()
+
+    metadata = pq.ParquetFile(str(zip_dir / 'num.txt.parquet')).metadata
+    assert metadata.num_row_groups == 4
+    assert metadata.row_group(0).column(0).statistics.has_min_max
+
+    num_df = pd.read_parquet(zip_dir / 'num.txt.parquet', columns=['adsh', 'tag'])
+    adsh_tag = list(zip(num_df.adsh.astype(str), num_df.tag.astype(str)))
+    assert adsh_tag == sorted(adsh_tag)
+
+
+def test_migrate_partitioned(tmp_path):
+    os.makedirs(tmp_path / 'quarter')
+    transformer = ToParquetTransformer(zip_dir=ZIP_DIR, parquet_dir=str(tmp_path),
+                                       file_type='quarter', keep_zip_files=True,
+                                       partitioned=True)
+    transformer.process()
+    zip_dir = tmp_path / 'quarter' / '2010q1.zip'
+    created = read_manifest(str(zip_dir)).created
+
+    migrator = ParquetSchemaMigrator(parquet_dir=str(tmp_path),
+                                     schema_version=SCHEMA_VERSION_COMPACT)
+    not_migrated = migrator._calculate_not_migrated()
+    assert str(zip_dir / 'pre.txt.parquet' / 'stmt_partition=BS' / 'part-0.parquet') in \
+           [path for _, path in not_migrated]
+
+    migrator.process()
+
+    assert len(migrator._calculate_not_migrated()) == 0
+    part_file = zip_dir / 'num.txt.parquet' / 'form_family=10-K' / 'part-0.parquet'
+    assert get_schema_version(str(part_file)) == SCHEMA_VERSION_COMPACT
+    assert 'form_family' not in pq.ParquetFile(str(part_file)).schema_arrow.names
+
+    manifest = read_manifest(str(zip_dir))
+    assert manifest.schema_version == SCHEMA_VERSION_COMPACT
+    assert manifest.created != created
+
+    bag = RawDataBag.load(str(zip_dir))
+    assert bag.num_df.shape == (151692, 9)
+    assert bag.pre_df.shape == (88378, 10)
+    assert bag.num_df.adsh.dtype == 'category'
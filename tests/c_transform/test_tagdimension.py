@@ -0,0 +1,132 @@
+import os
+import shutil
+import socket
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pyarrow as pa
+import pytest
+
+from secfsdstools.c_transform.tagdimension import TAG_DIMENSION_FILE, TagRegistry, \
+    _is_stale_lock, add_tag_ids, build_tag_dimension, read_tag_dimension
+from secfsdstools.c_transform.toparquettransforming import ToParquetTransformer
+from secfsdstools.d_container.databagmodel import RawDataBag
+
+CURRENT_DIR, _ = os.path.split(__file__)
+ZIP_DIR = os.path.join(CURRENT_DIR, '../_testdata/zip')
+
+
+def _get_tag_id(registry: TagRegistry, tag: str, version: str) -> int:
+    return registry.get_tag_ids(pa.chunked_array([[tag]]), pa.chunked_array([[version]]))[0] \
+        .as_py()
+
+
+def test_tag_registry(tmp_path):
+    registry = TagRegistry(str(tmp_path))
+    assets_id = _get_tag_id(registry, 'Assets', 'us-gaap/2009')
+
+    assert assets_id == 0
+    assert _get_tag_id(registry, 'Assets', 'us-gaap/2009') == assets_id
+    assert _get_tag_id(registry, 'Assets', 'us-gaap/2010') == 1
+    assert _get_tag_id(registry, 'Liabilities', 'us-gaap/2009') == 2
+
+    # another registry, e.g. of another process, sees the same ids and continues the numbering
+    other_registry = TagRegistry(str(tmp_path))
+    assert _get_tag_id(other_registry, 'Liabilities', 'us-gaap/2009') == 2
+    assert _get_tag_id(other_registry, 'Equity', 'us-gaap/2009') == 3
+    assert _get_tag_id(registry, 'Equity', 'us-gaap/2009') == 3
+    assert not os.path.exists(tmp_path / 'tag_registry' / '.lock')
+
+
+def test_tag_registry_compaction(tmp_path):
+    registry = TagRegistry(str(tmp_path))
+    with patch('secfsdstools.c_transform.tagdimension.COMPACT_PART_COUNT', 2):
+        tag_ids = [_get_tag_id(registry, f'Tag{index}', 'us-gaap/2009') for index in range(5)]
+
+    assert tag_ids == [0, 1, 2, 3, 4]
+    # the first three parts were compacted into the registry file
+    assert sorted(os.listdir(tmp_path / 'tag_registry')) == \
+           ['part-0000000003.parquet', 'part-0000000004.parquet', 'registry.parquet']
+
+    other_registry = TagRegistry(str(tmp_path))
+    assert _get_tag_id(other_registry, 'Tag1', 'us-gaap/2009') == 1
+    assert _get_tag_id(other_registry, 'Tag4', 'us-gaap/2009') == 4
+    assert _get_tag_id(other_registry, 'Tag5', 'us-gaap/2009') == 5
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='the owner of a lock is only checked on posix')
+def test_stale_lock(tmp_path):
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+
+    lock_file = tmp_path / 'tag_registry' / '.lock'
+    os.makedirs(lock_file.parent)
+    lock_file.write_text(f'{socket.gethostname()} {os.getpid()}')
+    assert not _is_stale_lock(str(lock_file))
+
+    # the lock of a process that is gone is removed at once
+    lock_file.write_text(f'{socket.gethostname()} {process.pid}')
+    assert _is_stale_lock(str(lock_file))
+    assert _get_tag_id(TagRegistry(str(tmp_path)), 'Assets', 'us-gaap/2009') == 0
+    assert not os.path.exists(lock_file)
+
+
+def test_add_tag_ids(tmp_path):
+    registry = TagRegistry(str(tmp_path))
+    table = pa.table({'tag': ['Assets', 'Liabilities', 'Assets', None],
+                      'version': ['us-gaap/2009', 'us-gaap/2009', 'us-gaap/2009', 'dei/2009']})
+
+    tag_ids = add_tag_ids(table, registry)['tag_id']
+
+    assert tag_ids.type == pa.int32()
+    assert tag_ids.to_pylist() == [0, 1, 0, None]
+
+
+@pytest.mark.parametrize("schema_version", [1, 2])
+def test_build_tag_dimension(tmp_path, schema_version):
+    zip_dir = tmp_path / 'zip'
+    os.makedirs(zip_dir)
+    shutil.copy(os.path.join(ZIP_DIR, '2010q1.zip'), zip_dir)
+    shutil.copy(os.path.join(ZIP_DIR, '2010q2.zip'), zip_dir)
+
+    ToParquetTransformer(zip_dir=str(zip_dir), parquet_dir=str(tmp_path), file_type='quarter',
+                         keep_zip_files=True, schema_version=schema_version,
+                         tag_dimension=True).process()
+
+    bag = RawDataBag.load(str(tmp_path / 'quarter' / '2010q1.zip'))
+    assert 'tag_id' in bag.num_df.columns
+    assert 'tag_id' in bag.pre_df.columns
+    row = bag.num_df.iloc[0]
+    assert row.tag_id == _get_tag_id(TagRegistry(str(tmp_path)), row.tag, row.version)
+    assert bag.num_df.tag_id.dtype == 'int32'
+    assert bag.num_df.tag.dtype == 'category'
+    assert bag.pre_df.version.dtype == 'category'
+    # the ids are dense
+    tag_ids = set(bag.num_df.tag_id) | set(bag.pre_df.tag_id)
+    assert max(tag_ids) < 2 * len(tag_ids)
+
+    # joining on the tag_id has the same result as joining on tag and version
+    string_bag = RawDataBag.create(sub_df=bag.sub_df,
+                                   pre_df=bag.pre_df.drop(columns=['tag_id']),
+                                   num_df=bag.num_df.drop(columns=['tag_id']))
+    assert bag.join().pre_num_df.shape[0] == string_bag.join().pre_num_df.shape[0]
+
+    nr_of_tags = build_tag_dimension(str(tmp_path))
+    assert os.path.isfile(tmp_path / TAG_DIMENSION_FILE)
+
+    tag_df = read_tag_dimension(str(tmp_path))
+    assert len(tag_df) == nr_of_tags
+    assert tag_df.tag_id.is_unique
+    assert {'tag_id', 'tag', 'version', 'custom', 'datatype', 'iord', 'crdr'} \
+        <= set(tag_df.columns)
+
+    assets_id = _get_tag_id(TagRegistry(str(tmp_path)), 'Assets', 'us-gaap/2009')
+    assets_df = read_tag_dimension(str(tmp_path), tag_ids=[assets_id])
+    assert assets_df.tag.tolist() == ['Assets']
+    assert assets_df.custom.tolist() == [0]
+
+
+def test_build_tag_dimension_without_tag_files(tmp_path):
+    assert build_tag_dimension(str(tmp_path)) == 0
+    assert not os.path.exists(tmp_path / TAG_DIMENSION_FILE)
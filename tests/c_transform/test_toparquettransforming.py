@@ -1,9 +1,20 @@
+import glob
 import os
 import shutil
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
 
-from secfsdstools.c_transform.toparquettransforming import ToParquetTransformer
+from secfsdstools.a_utils.manifestutils import read_manifest, write_manifest
+from secfsdstools.a_utils.parquetutils import read_parquet_df
+from secfsdstools.c_transform.parquetschema import SCHEMA_VERSION_COMPACT, get_schema_version
+from secfsdstools.c_transform.toparquettransforming import TMP_DIR, ParquetTableWriter, \
+    ToParquetTransformer
+from secfsdstools.d_container.databagmodel import RawDataBag
+from secfsdstools.e_collector.basecollector import BaseCollector
 
 CURRENT_DIR, _ = os.path.split(__file__)
 ZIP_DIR = os.path.join(CURRENT_DIR, '../_testdata/zip')
@@ -61,3 +72,371 @@ def test_transformation_removefiles(tmp_path):
     # check if file is deleted
     files_in_zip_temp_dir = os.listdir(zip_temp_dir)
     assert len(files_in_zip_temp_dir) == 0
+
+
+def test_transformation_streaming(tmp_path):
+    os.makedirs(tmp_path / 'quarter')
+    transformer = ToParquetTransformer(
+        zip_dir=ZIP_DIR,
+        parquet_dir=str(tmp_path),
+        file_type='quarter',
+        keep_zip_files=True,
+        batch_size=20_000
+    )
+
+    transformer.process()
+
+    sub_1_df = pd.read_parquet(tmp_path / 'quarter' / '2010q1.zip' / 'sub.txt.parquet')
+    pre_1_df = pd.read_parquet(tmp_path / 'quarter' / '2010q1.zip' / 'pre.txt.parquet')
+    num_1_df = pd.read_parquet(tmp_path / 'quarter' / '2010q1.zip' / 'num.txt.parquet')
+
+    assert num_1_df.shape == (151692, 9)
+    assert pre_1_df.shape == (88378, 10)
+    assert sub_1_df.shape == (495, 36)
+
+    assert num_1_df.value.dtype == float
+    assert pre_1_df.line.dtype == 'int64'
+
+    # the batches are merged, so the files are sorted as a whole
+    num_adsh_tag = list(zip(num_1_df.adsh, num_1_df.tag))
+    assert num_adsh_tag == sorted(num_adsh_tag)
+    pre_keys = list(zip(pre_1_df.adsh, pre_1_df.stmt.fillna(''), pre_1_df.tag))
+    assert pre_keys == sorted(pre_keys)
+    assert not os.path.exists(tmp_path / 'quarter' / '2010q1.zip' / '_num.txt.runs')
+
+    # every merged chunk is written as its own row group
+    num_file = pq.ParquetFile(tmp_path / 'quarter' / '2010q1.zip' / 'num.txt.parquet')
+    assert num_file.num_row_groups > 1
+
+
+@pytest.mark.parametrize("batch_size", [None, 20_000])
+def test_transformation_pyarrow_engine(tmp_path, batch_size):
+    os.makedirs(tmp_path / 'quarter')
+    transformer = ToParquetTransformer(
+        zip_dir=ZIP_DIR,
+        parquet_dir=str(tmp_path),
+        file_type='quarter',
+        keep_zip_files=True,
+        batch_size=batch_size,
+        reader_engine='pyarrow'
+    )
+
+    transformer.process()
+
+    sub_1_df = pd.read_parquet(tmp_path / 'quarter' / '2010q1.zip' / 'sub.txt.parquet')
+    pre_1_df = pd.read_parquet(tmp_path / 'quarter' / '2010q1.zip' / 'pre.txt.parquet')
+    num_1_df = pd.read_parquet(tmp_path / 'quarter' / '2010q1.zip' / 'num.txt.parquet')
+
+    assert num_1_df.shape == (151692, 9)
+    assert pre_1_df.shape == (88378, 10)
+    assert sub_1_df.shape == (495, 36)
+
+    assert num_1_df.value.dtype == float
+    assert pre_1_df.line.dtype == 'int64'
+    assert sub_1_df.period.dtype == 'int64'
+
+
+def test_pyarrow_engine_daily_num_preparation():
+    transformer = ToParquetTransformer(zip_dir=ZIP_DIR, parquet_dir='', file_type='daily',
+                                       keep_zip_files=True, reader_engine='pyarrow')
+    num_table = pa.table({'tag': ['Assets', 'TradingSymbol', 'SecurityExchangeName'],
+                          'value': ['1.5E3', 'AAPL', 'NASDAQ']})
+
+    prepared = transformer._prepare_num_table(num_table)
+
+    assert prepared.num_rows == 1
+    assert prepared['value'].type == pa.float64()
+    assert prepared['value'].to_pylist() == [1500.0]
+
+
+def test_unknown_reader_engine():
+    with pytest.raises(ValueError):
+        ToParquetTransformer(zip_dir=ZIP_DIR, parquet_dir='', file_type='quarter',
+                             keep_zip_files=True, reader_engine='bla')
+
+
+@pytest.mark.parametrize("reader_engine, batch_size",
+                         [('pandas', None), ('pandas', 20_000), ('pyarrow', None)])
+def test_transformation_compact_schema(tmp_path, reader_engine, batch_size):
+    os.makedirs(tmp_path / 'quarter')
+    transformer = ToParquetTransformer(
+        zip_dir=ZIP_DIR,
+        parquet_dir=str(tmp_path),
+        file_type='quarter',
+        keep_zip_files=True,
+        batch_size=batch_size,
+        reader_engine=reader_engine,
+        schema_version=SCHEMA_VERSION_COMPACT
+    )
+
+    transformer.process()
+
+    num_file = tmp_path / 'quarter' / '2010q1.zip' / 'num.txt.parquet'
+    pre_file = tmp_path / 'quarter' / '2010q1.zip' / 'pre.txt.parquet'
+    assert get_schema_version(str(num_file)) == SCHEMA_VERSION_COMPACT
+
+    num_1_df = pd.read_parquet(num_file)
+    pre_1_df = pd.read_parquet(pre_file)
+
+    assert num_1_df.shape == (151692, 9)
+    assert pre_1_df.shape == (88378, 10)
+    assert num_1_df.tag.dtype == 'category'
+    assert num_1_df.qtrs.dtype == 'int8'
+    assert pre_1_df.stmt.dtype == 'category'
+    assert pre_1_df.line.dtype == 'int32'
+
+
+def test_compact_schema_is_not_larger(tmp_path):
+    for schema_version in [1, 2]:
+        os.makedirs(tmp_path / str(schema_version) / 'quarter')
+        ToParquetTransformer(zip_dir=ZIP_DIR, parquet_dir=str(tmp_path / str(schema_version)),
+                             file_type='quarter', keep_zip_files=True,
+                             schema_version=schema_version, row_group_size=5_000).process()
+
+    for file in ['sub.txt.parquet', 'pre.txt.parquet', 'num.txt.parquet']:
+        legacy_size = os.path.getsize(tmp_path / '1' / 'quarter' / '2010q1.zip' / file)
+        compact_size = os.path.getsize(tmp_path / '2' / 'quarter' / '2010q1.zip' / file)
+        assert compact_size <= legacy_size
+
+    # every row group only stores the tags it contains
+    num_file = pq.ParquetFile(tmp_path / '2' / 'quarter' / '2010q1.zip' / 'num.txt.parquet')
+    tags = num_file.read_row_group(0, columns=['tag']).column('tag')
+    assert len(tags.chunk(0).dictionary) == len(pc.unique(tags))
+
+
+def test_unknown_schema_version():
+    with pytest.raises(ValueError):
+        ToParquetTransformer(zip_dir=ZIP_DIR, parquet_dir='', file_type='quarter',
+                             keep_zip_files=True, schema_version=99)
+
+
+def test_sort_tables_merges_runs(tmp_path):
+    tables = [pa.table({'adsh': ['b', 'a', 'b', 'b'], 'tag': ['t2', 't1', 't1', 't3']}),
+              pa.table({'adsh': ['b', 'b', 'c', 'a'], 'tag': ['t5', 't4', 't1', 't2']}),
+              pa.table({'adsh': ['b'], 'tag': ['t0']})]
+
+    writer = ParquetTableWriter()
+    sorted_tables = list(writer.sort_tables(tables=iter(tables), file_name='num.txt',
+                                            tmp_dir=str(tmp_path / 'runs')))
+
+    result = pa.concat_tables(sorted_tables)
+    keys = list(zip(result['adsh'].to_pylist(), result['tag'].to_pylist()))
+    assert keys == sorted(keys)
+    assert len(keys) == 9
+    assert not os.path.exists(tmp_path / 'runs')
+
+
+@pytest.mark.parametrize("schema_version", [1, 2])
+def test_transformation_sorted_row_groups(tmp_path, schema_version):
+    os.makedirs(tmp_path / 'quarter')
+    transformer = ToParquetTransformer(
+        zip_dir=ZIP_DIR,
+        parquet_dir=str(tmp_path),
+        file_type='quarter',
+        keep_zip_files=True,
+        schema_version=schema_version,
+        row_group_size=50_000
+    )
+
+    transformer.process()
+
+    zip_path = tmp_path / 'quarter' / '2010q1.zip'
+    num_file = pq.ParquetFile(zip_path / 'num.txt.parquet')
+    assert num_file.metadata.num_row_groups == 4
+    assert num_file.metadata.row_group(0).column(0).statistics.has_min_max
+
+    num_df = pd.read_parquet(zip_path / 'num.txt.parquet')
+    pre_df = pd.read_parquet(zip_path / 'pre.txt.parquet')
+    assert num_df.adsh.astype(str).is_monotonic_increasing
+    assert pre_df.adsh.astype(str).is_monotonic_increasing
+
+    collector = BaseCollector(datapath=str(zip_path), stmt_filter=['BS'])
+    bag = collector.basecollect(sub_df_filter=('adsh', '==', '0001193125-10-012085'))
+
+    assert bag.num_df.shape == (145, 9)
+    assert bag.pre_df.shape == (40, 10)
+
+    num_stats = collector.read_stats[-1]
+    assert num_stats.row_groups_total == 4
+    assert num_stats.row_groups_read <= 2
+
+
+@pytest.mark.parametrize("partitioned", [False, True])
+def test_streaming_keeps_row_group_layout(tmp_path, partitioned):
+    for batch_size in [None, 20_000]:
+        os.makedirs(tmp_path / str(batch_size) / 'quarter')
+        ToParquetTransformer(zip_dir=ZIP_DIR, parquet_dir=str(tmp_path / str(batch_size)),
+                             file_type='quarter', keep_zip_files=True, batch_size=batch_size,
+                             schema_version=SCHEMA_VERSION_COMPACT, row_group_size=5_000,
+                             partitioned=partitioned).process()
+
+    def get_layout(batch_size) -> dict:
+        zip_path = tmp_path / str(batch_size) / 'quarter' / '2010q1.zip'
+        layout = {}
+        for file in ['pre.txt.parquet', 'num.txt.parquet']:
+            for parquet_file in sorted(glob.glob(str(zip_path / file / '**' / '*.parquet'),
+                                                 recursive=True)) or [str(zip_path / file)]:
+                metadata = pq.ParquetFile(parquet_file).metadata
+                layout[os.path.relpath(parquet_file, zip_path)] = \
+                    [metadata.row_group(index).num_rows
+                     for index in range(metadata.num_row_groups)]
+        return layout
+
+    layout = get_layout(None)
+    assert layout == get_layout(20_000)
+    assert layout['num.txt.parquet' if not partitioned
+                  else 'num.txt.parquet/form_family=10-Q/part-0.parquet'][0] == 5_000
+
+
+@pytest.mark.parametrize("schema_version, batch_size", [(1, None), (2, 20_000)])
+def test_transformation_partitioned(tmp_path, schema_version, batch_size):
+    for partitioned in [False, True]:
+        os.makedirs(tmp_path / str(partitioned) / 'quarter')
+        transformer = ToParquetTransformer(
+            zip_dir=ZIP_DIR,
+            parquet_dir=str(tmp_path / str(partitioned)),
+            file_type='quarter',
+            keep_zip_files=True,
+            batch_size=batch_size,
+            schema_version=schema_version,
+            partitioned=partitioned
+        )
+        transformer.process()
+
+    zip_path = tmp_path / 'True' / 'quarter' / '2010q1.zip'
+    assert os.path.isdir(zip_path / 'pre.txt.parquet' / 'stmt_partition=BS')
+    assert os.path.isdir(zip_path / 'num.txt.parquet' / 'form_family=10-K')
+    assert os.path.isdir(zip_path / 'sub.txt.parquet' / 'form_family=10-Q')
+
+    bags = []
+    for partitioned in [False, True]:
+        collector = BaseCollector(
+            datapath=str(tmp_path / str(partitioned) / 'quarter' / '2010q1.zip'),
+            stmt_filter=['BS'])
+        bags.append(collector.basecollect(sub_df_filter=('form', 'in', ['10-K'])))
+    partitioned_stats = collector.read_stats
+
+    for attr in ['sub_df', 'pre_df', 'num_df']:
+        expected_df = getattr(bags[0], attr)
+        partitioned_df = getattr(bags[1], attr)
+        assert list(partitioned_df.columns) == list(expected_df.columns)
+        assert len(partitioned_df) == len(expected_df)
+
+    # only the 10-K partitions of sub and num, and the BS partition of pre are read
+    assert partitioned_stats[0].row_groups_read == 1
+    assert partitioned_stats[1].row_groups_read < partitioned_stats[1].row_groups_total
+    assert partitioned_stats[2].row_groups_read < partitioned_stats[2].row_groups_total
+
+    bag = RawDataBag.load(str(zip_path))
+    assert bag.num_df.shape == (151692, 9)
+    assert bag.pre_df.shape == (88378, 10)
+    assert bag.sub_df.shape == (495, 36)
+
+
+@pytest.mark.parametrize("compression, compression_level, codec",
+                         [('zstd', 3, 'ZSTD'), ('lz4', None, 'LZ4'), ('none', None, 'UNCOMPRESSED')])
+def test_transformation_compression(tmp_path, compression, compression_level, codec):
+    os.makedirs(tmp_path / 'quarter')
+    transformer = ToParquetTransformer(
+        zip_dir=ZIP_DIR,
+        parquet_dir=str(tmp_path),
+        file_type='quarter',
+        keep_zip_files=True,
+        compression=compression,
+        compression_level=compression_level
+    )
+
+    transformer.process()
+
+    for file in ['sub.txt.parquet', 'pre.txt.parquet', 'num.txt.parquet']:
+        metadata = pq.ParquetFile(tmp_path / 'quarter' / '2010q1.zip' / file).metadata
+        assert metadata.row_group(0).column(0).compression == codec
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        ToParquetTransformer(zip_dir=ZIP_DIR, parquet_dir='', file_type='quarter',
+                             keep_zip_files=True, compression='gzip')
+
+
+def _create_single_zip_transformer(tmp_path) -> ToParquetTransformer:
+    zip_dir = tmp_path / 'zip'
+    os.makedirs(zip_dir)
+    shutil.copy(os.path.join(ZIP_DIR, '2010q1.zip'), zip_dir)
+    return ToParquetTransformer(zip_dir=str(zip_dir),
+                                parquet_dir=str(tmp_path / 'parquet'),
+                                file_type='quarter',
+                                keep_zip_files=True)
+
+
+def test_transformation_manifest(tmp_path):
+    transformer = _create_single_zip_transformer(tmp_path)
+    transformer.process()
+
+    target_dir = tmp_path / 'parquet' / 'quarter' / '2010q1.zip'
+    manifest = read_manifest(str(target_dir))
+    assert manifest.completed
+    assert manifest.source_file == '2010q1.zip'
+    assert manifest.source_size == os.path.getsize(os.path.join(ZIP_DIR, '2010q1.zip'))
+    assert manifest.row_counts == {'sub.txt': 495, 'pre.txt': 88378, 'num.txt': 151692}
+    assert manifest.schema_version == 1
+
+    # the temporary directory is empty after the transformation
+    assert os.listdir(tmp_path / 'parquet' / TMP_DIR / 'quarter') == []
+
+    # an unchanged zip file is not transformed again
+    assert transformer.get_not_transformed() == []
+
+
+def test_transformation_manifest_not_completed(tmp_path):
+    transformer = _create_single_zip_transformer(tmp_path)
+    transformer.process()
+
+    target_dir = str(tmp_path / 'parquet' / 'quarter' / '2010q1.zip')
+    manifest = read_manifest(target_dir)
+    manifest.completed = False
+    write_manifest(target_dir, manifest)
+    os.remove(os.path.join(target_dir, 'num.txt.parquet'))
+
+    assert len(transformer.get_not_transformed()) == 1
+
+    transformer.process()
+    assert read_manifest(target_dir).completed
+    assert pd.read_parquet(os.path.join(target_dir, 'num.txt.parquet')).shape == (151692, 9)
+
+
+def test_transformation_without_manifest(tmp_path):
+    transformer = _create_single_zip_transformer(tmp_path)
+
+    # directories transformed by older versions have no manifest and are trusted
+    os.makedirs(tmp_path / 'parquet' / 'quarter' / '2010q1.zip')
+    assert transformer.get_not_transformed() == []
+
+
+def test_transformation_changed_zip(tmp_path):
+    transformer = _create_single_zip_transformer(tmp_path)
+    transformer.process()
+
+    shutil.copy(os.path.join(ZIP_DIR, '2010q2.zip'), tmp_path / 'zip' / '2010q1.zip')
+    assert len(transformer.get_not_transformed()) == 1
+
+    transformer.process()
+    manifest = read_manifest(str(tmp_path / 'parquet' / 'quarter' / '2010q1.zip'))
+    assert manifest.row_counts['sub.txt'] == 522
+
+
+@pytest.mark.parametrize("schema_version, partitioned", [(1, False), (2, False), (2, True)])
+def test_transformation_materialize_join(tmp_path, schema_version, partitioned):
+    transformer = _create_single_zip_transformer(tmp_path)
+    transformer.schema_version = schema_version
+    transformer.partitioned = partitioned
+    transformer.materialize_join = True
+    transformer.process()
+
+    target_dir = tmp_path / 'parquet' / 'quarter' / '2010q1.zip'
+    expected_df = RawDataBag.load(str(target_dir)).join().pre_num_df
+
+    pre_num_df = read_parquet_df(str(target_dir / 'pre_num.txt.parquet'))
+    assert pre_num_df.shape == expected_df.shape
+    assert sorted(pre_num_df.columns) == sorted(expected_df.columns)
+    assert read_manifest(str(target_dir)).row_counts['pre_num.txt'] == len(expected_df)
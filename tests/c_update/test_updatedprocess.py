@@ -8,6 +8,7 @@ import pytest
 from secfsdstools.a_utils.fileutils import get_directories_in_directory
 from secfsdstools.b_setup.setupdb import DbCreator
 from secfsdstools.c_index.indexdataaccess import ParquetDBIndexingAccessor
+from secfsdstools.c_index.indexsnapshot import get_snapshot_path
 from secfsdstools.c_update.updateprocess import Updater
 
 current_dir, _ = os.path.split(__file__)
@@ -128,3 +129,43 @@ def test_integration_test(updater):
         # check that
         last_check = updater.db_state_accesor.get_key(Updater.LAST_UPDATE_CHECK_KEY)
         assert start_time < float(last_check)
+
+
+def test_pipelined_update(updater):
+    updater.dld_dir = f'{current_dir}/../_testdata/zip'
+    updater.update_pipelined = True
+    updater.pipeline_transform_workers = 2
+    updater.pipeline_queue_size = 1
+    updater.pipeline_index_workers = 2
+
+    with patch('secfsdstools.c_download.secdownloading.SecZipDownloader.download') \
+            as sec_download:
+        updater._update()
+        sec_download.assert_called_once()
+
+    transformed = get_directories_in_directory(os.path.join(updater.parquet_dir, 'quarter'))
+    assert len(transformed) == 3
+
+    indexer = ParquetDBIndexingAccessor(db_dir=updater.db_dir)
+    indexed_files_df = indexer.read_all_indexfileprocessing_df()
+    assert len(indexed_files_df) == 3
+
+    reports_df = indexer.read_all_indexreports_df()
+    assert len(reports_df) == 1456
+
+
+def test_index_snapshot_is_written_after_indexing(updater):
+    updater.index_snapshot = True
+    with patch("secfsdstools.c_index.indexing.ReportParquetIndexer.process") as process_mock:
+        updater._do_index()
+        assert process_mock.call_count == 2
+
+    assert os.path.isfile(get_snapshot_path(updater.db_dir))
+
+
+def test_tags_are_indexed_after_indexing(updater):
+    updater.index_tags = True
+    with patch("secfsdstools.c_index.indexing.ReportParquetIndexer.process"), \
+            patch("secfsdstools.c_index.indexing.TagParquetIndexer.process") as tag_process_mock:
+        updater._do_index()
+        assert tag_process_mock.call_count == 2
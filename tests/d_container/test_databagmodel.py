@@ -1,5 +1,8 @@
 import os
 
+import pyarrow.parquet as pq
+import pytest
+
 from secfsdstools.d_container.databagmodel import RawDataBag, RawDataBagStats, JoinedDataBag
 
 CURRENT_DIR, _ = os.path.split(__file__)
@@ -43,6 +46,19 @@ def test_save(tmp_path):
     assert bag1_load.pre_df.shape == bag1.pre_df.shape
 
 
+def test_save_with_compression(tmp_path):
+    bag1: RawDataBag = RawDataBag.load(PATH_TO_BAG_1)
+
+    bag1.save(str(tmp_path), compression='zstd', compression_level=5)
+
+    num_metadata = pq.ParquetFile(os.path.join(str(tmp_path), 'num.txt.parquet')).metadata
+    assert num_metadata.row_group(0).column(0).compression == 'ZSTD'
+    assert RawDataBag.load(str(tmp_path)).num_df.shape == bag1.num_df.shape
+
+    with pytest.raises(ValueError):
+        bag1.save(str(tmp_path / 'other'), compression='gzip')
+
+
 def test_statistics():
     bag1: RawDataBag = RawDataBag.load(PATH_TO_BAG_1)
 
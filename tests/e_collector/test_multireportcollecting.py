@@ -44,7 +44,11 @@ def test_cm_get_report_by_adshs(basicconf):
 
     with patch(
             "secfsdstools.c_index.indexdataaccess.ParquetDBIndexingAccessor.read_index_reports_for_adshs",
-            return_value=indexreports):
+            return_value=indexreports), patch(
+            "secfsdstools.c_index.indexdataaccess.ParquetDBIndexingAccessor.read_row_group_locations_for_reports",
+            return_value={}), patch(
+            "secfsdstools.c_index.indexdataaccess.ParquetDBIndexingAccessor.read_row_group_validators",
+            return_value={}):
         collector = MultiReportCollector.get_reports_by_adshs(
             adshs=[APPLE_ADSH_10Q_2010_Q1, APPLE_ADSH_10Q_2010_Q2],
             configuration=basicconf)
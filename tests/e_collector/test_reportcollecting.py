@@ -29,7 +29,11 @@ def test_cm_get_report_by_adsh():
 
     with patch(
             "secfsdstools.c_index.indexdataaccess.ParquetDBIndexingAccessor.read_index_report_for_adsh",
-            return_value=instance):
+            return_value=instance), patch(
+            "secfsdstools.c_index.indexdataaccess.ParquetDBIndexingAccessor.read_row_group_locations",
+            return_value=None), patch(
+            "secfsdstools.c_index.indexdataaccess.ParquetDBIndexingAccessor.read_row_group_validators",
+            return_value={}):
         reportreader = SingleReportCollector.get_report_by_adsh(
             adsh=APPLE_ADSH_10Q_2010_Q1,
             configuration=Configuration(db_dir="",
@@ -43,3 +47,21 @@ def test_read_raw_data(reportcollector):
     bag = reportcollector.collect()
     assert bag.num_df.shape == (145, 9)
     assert bag.pre_df.shape == (100, 10)
+
+
+def test_read_raw_data_with_row_group_locations(reportcollector):
+    reportcollector.row_group_locations = {'sub.txt': {'': [0]}, 'pre.txt': {'': [0]},
+                                           'num.txt': {'': [0]}}
+    bag = reportcollector.collect()
+    assert bag.num_df.shape == (145, 9)
+    assert bag.pre_df.shape == (100, 10)
+    assert bag.sub_df.shape[0] == 1
+
+    # outdated locations fall back to reading the whole file
+    reportcollector.row_group_locations = {'num.txt': {'': [7]}}
+    assert reportcollector.collect().num_df.shape == (145, 9)
+
+    # locations of a file that was rewritten since it was indexed are not used
+    reportcollector.row_group_locations = {'num.txt': {}}
+    reportcollector.row_group_validators = {'num.txt': 'outdated'}
+    assert reportcollector.collect().num_df.shape == (145, 9)
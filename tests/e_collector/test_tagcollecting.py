@@ -0,0 +1,79 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from secfsdstools.a_config.configmodel import Configuration
+from secfsdstools.b_setup.setupdb import DbCreator
+from secfsdstools.c_index.indexdataaccess import VALIDATOR_SOURCE_TAGS
+from secfsdstools.c_index.indexing import ReportParquetIndexer, TagParquetIndexer
+from secfsdstools.e_collector.tagcollecting import TagCollector
+from secfsdstools.e_collector.zipcollecting import ZipCollector
+
+CURRENT_DIR, _ = os.path.split(__file__)
+PARQUET_DIR = f'{CURRENT_DIR}/../_testdata/parquet'
+
+
+@pytest.fixture
+def configuration(tmp_path) -> Configuration:
+    db_dir = str(tmp_path)
+    DbCreator(db_dir=db_dir).create_db()
+    ReportParquetIndexer(db_dir=db_dir, parquet_dir=PARQUET_DIR, file_type='quarter',
+                         execute_serial=True).process()
+    return Configuration(db_dir=db_dir, download_dir='', user_agent_email='',
+                         parquet_dir=PARQUET_DIR)
+
+
+def test_tag_index_is_required(configuration):
+    with pytest.raises(ValueError):
+        TagCollector.get_tags(tags=['Assets'], configuration=configuration)
+
+
+def test_collect_tags(configuration):
+    indexer = TagParquetIndexer(db_dir=configuration.db_dir, parquet_dir=PARQUET_DIR,
+                                file_type='quarter', execute_serial=True)
+    with patch('secfsdstools.c_index.indexing.LOGGER') as logger_mock:
+        indexer.process()
+        # no file is reported as failed
+        logger_mock.error.assert_not_called()
+    assert sorted(indexer.dbaccessor.read_tag_indexed_files()) == ['2010q1.zip', '2010q2.zip']
+    # nothing left to index
+    assert indexer._calculate_not_indexed() == []
+
+    collector = TagCollector.get_tags(tags=['Assets', 'Liabilities'], forms_filter=['10-K'],
+                                      configuration=configuration)
+    assert collector.files_skipped == 0
+    bag = collector.collect()
+
+    expected = ZipCollector.get_all_zips(forms_filter=['10-K'], tag_filter=['Assets', 'Liabilities'],
+                                         configuration=configuration).collect()
+    assert bag.num_df.shape == expected.num_df.shape
+    assert bag.pre_df.shape == expected.pre_df.shape
+    assert set(bag.num_df.tag) == {'Assets', 'Liabilities'}
+
+
+def test_unknown_tag_skips_all_files(configuration):
+    TagParquetIndexer(db_dir=configuration.db_dir, parquet_dir=PARQUET_DIR,
+                      file_type='quarter', execute_serial=True).process()
+
+    collector = TagCollector.get_tags(tags=['NoSuchTag'], configuration=configuration)
+    assert collector.files_skipped == 2
+    with pytest.raises(ValueError):
+        collector.collect()
+
+
+def test_changed_files_are_not_skipped(configuration):
+    indexer = TagParquetIndexer(db_dir=configuration.db_dir, parquet_dir=PARQUET_DIR,
+                                file_type='quarter', execute_serial=True)
+    indexer.process()
+    assert indexer.dbaccessor.read_row_group_validators(
+        ['2010q1.zip'], VALIDATOR_SOURCE_TAGS)['2010q1.zip'].keys() == {'pre.txt', 'num.txt'}
+
+    # pre.txt of 2010q2 was rewritten after its tags were indexed
+    with indexer.dbaccessor.get_connection() as conn:
+        conn.execute("UPDATE index_parquet_validators SET validator = 'outdated' "
+                     "WHERE originFile = '2010q2.zip' AND fileName = 'pre.txt'")
+
+    collector = TagCollector.get_tags(tags=['NoSuchTag'], configuration=configuration)
+    assert collector.files_skipped == 1
+    assert collector.collect().num_df.shape[0] == 0
@@ -1,15 +1,20 @@
 import os
+import shutil
 from unittest.mock import patch
 
 import pandas as pd
 import pytest
 
 from secfsdstools.a_config.configmodel import Configuration
+from secfsdstools.b_setup.setupdb import DbCreator
 from secfsdstools.c_index.indexdataaccess import IndexFileProcessingState
+from secfsdstools.c_index.indexing import ReportParquetIndexer
+from secfsdstools.c_transform.toparquettransforming import ToParquetTransformer
 from secfsdstools.e_collector.zipcollecting import ZipCollector
 
 CURRENT_DIR, _ = os.path.split(__file__)
 PATH_TO_ZIP = f'{CURRENT_DIR}/../_testdata/parquet/quarter/2010q1.zip'
+PARQUET_DIR = f'{CURRENT_DIR}/../_testdata/parquet'
 
 
 @pytest.fixture
@@ -20,12 +25,14 @@ def zipcollector():
 
 
 def test_cm_get_zip_by_name():
-    instances = [IndexFileProcessingState(fileName="", status="", entries=0, processTime="",
+    instances = [IndexFileProcessingState(fileName="", status="", entries=495, processTime="",
                                         fullPath=PATH_TO_ZIP)]
 
     with patch(
             "secfsdstools.c_index.indexdataaccess.ParquetDBIndexingAccessor.read_index_files_for_filenames",
-            return_value=instances):
+            return_value=instances), patch(
+            "secfsdstools.c_index.indexdataaccess.ParquetDBIndexingAccessor.read_zip_stats_df",
+            return_value=pd.DataFrame(columns=['fileName', 'category', 'key', 'value'])):
         zipcollector = ZipCollector.get_zip_by_name(name="2010q1.zip",
                                                     configuration=Configuration(db_dir="",
                                                                                 download_dir="",
@@ -63,3 +70,72 @@ def test_tag_filter():
 
     assert bag.pre_df.tag.unique().tolist() == ['Assets']
     assert bag.num_df.tag.unique().tolist() == ['Assets']
+
+
+def _sorted_pre_num_df(pre_num_df: pd.DataFrame) -> pd.DataFrame:
+    pre_num_df = pre_num_df.astype({'adsh': str, 'stmt': str, 'tag': str, 'version': str})
+    columns = sorted(pre_num_df.columns)
+    return pre_num_df[columns].sort_values(['adsh', 'stmt', 'tag', 'version', 'ddate', 'qtrs',
+                                            'uom', 'coreg', 'report', 'line']) \
+        .reset_index(drop=True)
+
+
+@pytest.mark.parametrize("schema_version, partitioned", [(1, False), (2, True)])
+def test_collect_joined(tmp_path, schema_version, partitioned):
+    zip_dir = tmp_path / 'zip'
+    os.makedirs(zip_dir)
+    shutil.copy(f'{CURRENT_DIR}/../_testdata/zip/2010q1.zip', zip_dir)
+    ToParquetTransformer(zip_dir=str(zip_dir), parquet_dir=str(tmp_path), file_type='quarter',
+                         keep_zip_files=True, schema_version=schema_version,
+                         partitioned=partitioned, materialize_join=True).process()
+    datapath = str(tmp_path / 'quarter' / '2010q1.zip')
+
+    zipcollector = ZipCollector(datapaths=[datapath], forms_filter=['10-K'],
+                                stmt_filter=['BS', 'IS'], tag_filter=['Assets', 'NetIncomeLoss'])
+    joined_bag = zipcollector.collect_joined()
+    expected_bag = zipcollector.collect().join()
+
+    assert len(joined_bag.pre_num_df) > 0
+    assert joined_bag.sub_df.shape == expected_bag.sub_df.shape
+    pd.testing.assert_frame_equal(_sorted_pre_num_df(joined_bag.pre_num_df),
+                                  _sorted_pre_num_df(expected_bag.pre_num_df),
+                                  check_dtype=False, check_categorical=False)
+
+
+def test_collect_joined_without_materialized_join():
+    zipcollector = ZipCollector(datapaths=[PATH_TO_ZIP], stmt_filter=['BS'])
+    joined_bag = zipcollector.collect_joined()
+
+    assert joined_bag.pre_num_df.shape == zipcollector.collect().join().pre_num_df.shape
+
+
+def test_plan_datapaths(tmp_path):
+    DbCreator(db_dir=str(tmp_path)).create_db()
+    indexer = ReportParquetIndexer(db_dir=str(tmp_path), parquet_dir=PARQUET_DIR,
+                                   file_type='quarter', execute_serial=True)
+    indexer.process()
+    accessor = indexer.dbaccessor
+
+    stats_df = accessor.read_zip_stats_df()
+    q1_stats = stats_df[stats_df.fileName == '2010q1.zip'].set_index(['category', 'key']).value
+    assert q1_stats[('rows', 'num.txt')] == 151692
+    assert q1_stats[('rows', 'sub.txt')] == 495
+    assert q1_stats[('stmt', 'BS')] > 0
+    assert q1_stats[('uom', 'USD')] > 0
+    assert q1_stats[('min', 'ddate')] <= q1_stats[('max', 'ddate')]
+
+    states = accessor.read_all_indexfileprocessing()
+    states.append(IndexFileProcessingState(fileName='2009q1.zip', fullPath='empty', status='',
+                                           entries=0, processTime=''))
+
+    # largest first, the empty zip file is skipped
+    sizes = stats_df[stats_df.category == 'bytes'].groupby('fileName').value.sum()
+    expected = [f'{PARQUET_DIR}/quarter/{file_name}'
+                for file_name in sizes.sort_values(ascending=False).index]
+    datapaths = ZipCollector._plan_datapaths(accessor, states, None, None)
+    assert [os.path.realpath(path) for path in datapaths] == \
+           [os.path.realpath(path) for path in expected]
+
+    # no zip file contains the form, but one is kept for the columns of the empty result
+    assert len(ZipCollector._plan_datapaths(accessor, states, ['NO-FORM'], None)) == 1
+    assert len(ZipCollector._plan_datapaths(accessor, states, ['10-K'], ['BS'])) == 2
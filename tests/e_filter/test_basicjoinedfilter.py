@@ -1,12 +1,14 @@
 import os
 
+import pyarrow as pa
 import pytest
 
+from secfsdstools.c_transform.tagdimension import TagRegistry
 from secfsdstools.d_container.databagmodel import JoinedDataBag, RawDataBag
 from secfsdstools.e_filter.joinedfiltering import ReportPeriodJoinedFilter, AdshJoinedFilter, \
     ReportPeriodAndPreviousPeriodJoinedFilter, TagJoinedFilter, MainCoregJoinedFilter, \
     StmtJoinedFilter, \
-    OfficialTagsOnlyJoinedFilter, USDOnlyJoinedFilter
+    OfficialTagsOnlyJoinedFilter, USDOnlyJoinedFilter, TagIdJoinedFilter
 
 CURRENT_DIR, _ = os.path.split(__file__)
 PATH_TO_BAG_1 = f'{CURRENT_DIR}/../_testdata/parquet/quarter/2010q1.zip'
@@ -126,3 +128,17 @@ def test_USDOnlyFilter(bag1):
 
     assert bag1.pre_num_df.shape == (165456, 16)
     assert filtered_bag.pre_num_df.shape == (163706, 16)
+
+
+def test_filter_TagIdJoinedFilter(bag1, tmp_path):
+    registry = TagRegistry(str(tmp_path))
+    bag1.pre_num_df['tag_id'] = registry.get_tag_ids(
+        pa.chunked_array([pa.array(bag1.pre_num_df.tag.astype(str))]),
+        pa.chunked_array([pa.array(bag1.pre_num_df.version.astype(str))])).to_pandas().values
+    tag_ids = bag1.pre_num_df[bag1.pre_num_df.tag.isin(["Assets", "Liabilities"])] \
+        .tag_id.unique().tolist()
+
+    filtered_bag = TagIdJoinedFilter(tag_ids=tag_ids).filter(bag1)
+
+    assert filtered_bag.sub_df.shape == bag1.sub_df.shape
+    assert filtered_bag.pre_num_df.shape == (1656, 17)
@@ -1,9 +1,13 @@
 import os
 
+import pandas as pd
+import pyarrow as pa
+
+from secfsdstools.c_transform.tagdimension import TagRegistry, add_tag_ids
 from secfsdstools.d_container.databagmodel import RawDataBag
 from secfsdstools.e_filter.rawfiltering import ReportPeriodRawFilter, AdshRawFilter, \
     ReportPeriodAndPreviousPeriodRawFilter, TagRawFilter, MainCoregRawFilter, StmtRawFilter, \
-    OfficialTagsOnlyRawFilter, USDOnlyRawFilter
+    OfficialTagsOnlyRawFilter, USDOnlyRawFilter, TagIdRawFilter
 
 CURRENT_DIR, _ = os.path.split(__file__)
 PATH_TO_BAG_1 = f'{CURRENT_DIR}/../_testdata/parquet/quarter/2010q1.zip'
@@ -11,6 +15,12 @@ PATH_TO_BAG_1 = f'{CURRENT_DIR}/../_testdata/parquet/quarter/2010q1.zip'
 APPLE_10Q_2010Q1 = '0001193125-10-012085'
 
 
+def _add_tag_ids(bag: RawDataBag, registry: TagRegistry):
+    for data_df in [bag.pre_df, bag.num_df]:
+        tag_table = pa.Table.from_pandas(data_df[['tag', 'version']], preserve_index=False)
+        data_df['tag_id'] = add_tag_ids(tag_table, registry)['tag_id'].to_pandas().values
+
+
 def test_filter_StmtsRawFilter():
     bag1: RawDataBag = RawDataBag.load(PATH_TO_BAG_1)
     filter = StmtRawFilter(stmts=['BS'])
@@ -119,6 +129,21 @@ def test_filter_OfficialTagsOnlyRawFilter():
     assert len(nr_of_tags_before_filter) > len(nr_of_tags_after_filter)
 
 
+def test_filter_OfficialTagsOnlyRawFilter_with_tag_dimension(tmp_path):
+    bag1: RawDataBag = RawDataBag.load(PATH_TO_BAG_1)
+    version_filtered_bag = bag1.filter(OfficialTagsOnlyRawFilter())
+
+    _add_tag_ids(bag1, TagRegistry(str(tmp_path)))
+    tag_dimension_df = pd.concat([bag1.pre_df, bag1.num_df])[['tag_id', 'version']] \
+        .drop_duplicates()
+    tag_dimension_df['custom'] = tag_dimension_df.version.isin(bag1.sub_df.adsh).astype(int)
+
+    filtered_bag = bag1.filter(OfficialTagsOnlyRawFilter(tag_dimension_df=tag_dimension_df))
+
+    assert filtered_bag.pre_df.shape[0] == version_filtered_bag.pre_df.shape[0]
+    assert filtered_bag.num_df.shape[0] == version_filtered_bag.num_df.shape[0]
+
+
 def test_concatenation():
     bag1: RawDataBag = RawDataBag.load(PATH_TO_BAG_1)
 
@@ -145,3 +170,17 @@ def test_USDOnlyFilter():
 
     assert bag1.num_df.shape == (151692, 9)
     assert filtered_bag.num_df.shape == (150120, 9)
+
+
+def test_filter_TagIdRawFilter(tmp_path):
+    bag1: RawDataBag = RawDataBag.load(PATH_TO_BAG_1)
+    _add_tag_ids(bag1, TagRegistry(str(tmp_path)))
+
+    tag_bag = TagRawFilter(tags=["Assets", "Liabilities"]).filter(bag1)
+    tag_ids = tag_bag.num_df.tag_id.unique().tolist()
+
+    filtered_bag = TagIdRawFilter(tag_ids=tag_ids).filter(bag1)
+
+    assert filtered_bag.sub_df.shape == bag1.sub_df.shape
+    assert filtered_bag.pre_df.shape == (795, 11)
+    assert filtered_bag.num_df.shape == (1652, 10)
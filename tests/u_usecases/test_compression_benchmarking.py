@@ -0,0 +1,23 @@
+import os
+
+from secfsdstools.u_usecases.compression_benchmarking import benchmark_compression
+
+CURRENT_DIR, _ = os.path.split(__file__)
+ZIP_FILE = os.path.join(CURRENT_DIR, '../_testdata/zip/2010q1.zip')
+
+
+def test_benchmark_compression(tmp_path):
+    result_df = benchmark_compression(zip_file=ZIP_FILE,
+                                      codecs=[('none', None), ('zstd', 3)],
+                                      read_repetitions=1,
+                                      work_dir=str(tmp_path))
+
+    assert result_df.compression.to_list() == ['none', 'zstd']
+    assert result_df.compression_level.to_list()[1] == 3
+    assert (result_df.size_mb > 0).all()
+    assert result_df.size_mb[1] < result_df.size_mb[0]
+    assert (result_df.write_seconds > 0).all()
+    assert (result_df.read_seconds > 0).all()
+
+    # the temporary files are removed
+    assert os.listdir(tmp_path) == []
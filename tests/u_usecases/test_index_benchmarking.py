@@ -0,0 +1,19 @@
+from secfsdstools.u_usecases.index_benchmarking import benchmark_cik_lookup, \
+    benchmark_name_search
+
+
+def test_benchmark_cik_lookup(tmp_path):
+    result_df = benchmark_cik_lookup(nr_of_reports=2_000, nr_of_companies=100,
+                                     nr_of_lookups=10, work_dir=str(tmp_path))
+
+    assert result_df.indexes.tolist() == [True, False]
+    assert (result_df.lookup_micros > 0).all()
+
+
+def test_benchmark_name_search(tmp_path):
+    result_df = benchmark_name_search(nr_of_reports=2_000, nr_of_companies=100,
+                                      repetitions=2, work_dir=str(tmp_path))
+
+    assert len(result_df) == 3
+    assert (result_df.fts_micros > 0).all()
+    assert (result_df.like_micros > 0).all()